@@ -9,6 +9,49 @@ import pandas as pd
 from pathlib import Path
 import sys
 
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.analysis.condition_cube import refresh_condition_cube
+from backend.analysis.predictor_stats import refresh_predictor_stats
+
+# 予想家ごとの基本統計（インデックス設計とクエリプランのテストでも参照する）
+BASIC_STATS_QUERY = """
+SELECT 
+    pred.id as predictor_id,
+    pred.name as predictor_name,
+    pred.netkeiba_id,
+    pred.data_reliability,
+    COUNT(*) as total_predictions,
+    SUM(CASE WHEN p.is_hit = 1 THEN 1 ELSE 0 END) as hit_count,
+    ROUND(AVG(CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END) * 100, 2) as hit_rate,
+    SUM(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END) as total_payout,
+    ROUND(AVG(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END), 0) as avg_payout,
+    SUM(CASE WHEN p.roi IS NOT NULL THEN 1 ELSE 0 END) as roi_count,
+    ROUND(AVG(CASE WHEN p.roi IS NOT NULL THEN p.roi ELSE NULL END), 2) as avg_roi,
+    -- 重賞の成績
+    SUM(CASE WHEN r.is_grade_race = 1 THEN 1 ELSE 0 END) as grade_predictions,
+    SUM(CASE WHEN r.is_grade_race = 1 AND p.is_hit = 1 THEN 1 ELSE 0 END) as grade_hits,
+    ROUND(
+        AVG(CASE 
+            WHEN r.is_grade_race = 1 THEN 
+                CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END 
+            ELSE NULL 
+        END) * 100, 
+        2
+    ) as grade_hit_rate
+FROM predictors pred
+JOIN predictions p ON pred.id = p.predictor_id
+LEFT JOIN races r ON p.race_id = r.id
+WHERE p.is_hit IS NOT NULL
+GROUP BY pred.id
+-- total_predictions は predictors の列名と同じで、別名ではなく列に解決されるため COUNT(*) で書く
+HAVING COUNT(*) >= 10
+ORDER BY hit_rate DESC
+"""
+
 def calculate_basic_stats():
     """予想家ごとの基本統計を計算"""
     
@@ -26,38 +69,7 @@ def calculate_basic_stats():
     conn = sqlite3.connect(db_path)
     
     # 予想家ごとの基本統計を計算
-    query = """
-    SELECT 
-        pred.id as predictor_id,
-        pred.name as predictor_name,
-        pred.netkeiba_id,
-        pred.data_reliability,
-        COUNT(*) as total_predictions,
-        SUM(CASE WHEN p.is_hit = 1 THEN 1 ELSE 0 END) as hit_count,
-        ROUND(AVG(CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END) * 100, 2) as hit_rate,
-        SUM(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END) as total_payout,
-        ROUND(AVG(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END), 0) as avg_payout,
-        SUM(CASE WHEN p.roi IS NOT NULL THEN 1 ELSE 0 END) as roi_count,
-        ROUND(AVG(CASE WHEN p.roi IS NOT NULL THEN p.roi ELSE NULL END), 2) as avg_roi,
-        -- 重賞の成績
-        SUM(CASE WHEN r.is_grade_race = 1 THEN 1 ELSE 0 END) as grade_predictions,
-        SUM(CASE WHEN r.is_grade_race = 1 AND p.is_hit = 1 THEN 1 ELSE 0 END) as grade_hits,
-        ROUND(
-            AVG(CASE 
-                WHEN r.is_grade_race = 1 THEN 
-                    CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END 
-                ELSE NULL 
-            END) * 100, 
-            2
-        ) as grade_hit_rate
-    FROM predictors pred
-    JOIN predictions p ON pred.id = p.predictor_id
-    LEFT JOIN races r ON p.race_id = r.id
-    WHERE p.is_hit IS NOT NULL
-    GROUP BY pred.id
-    HAVING total_predictions >= 10
-    ORDER BY hit_rate DESC
-    """
+    query = BASIC_STATS_QUERY
     
     print("データベースから統計を計算中...")
     df = pd.read_sql_query(query, conn)
@@ -106,39 +118,16 @@ def calculate_basic_stats():
     df.to_csv(csv_path, index=False, encoding='utf-8-sig')
     print(f"✅ 統計データを保存しました: {csv_path}")
     
-    # データベースにも保存（テーブル作成）
+    # データベースの統計テーブル（PredictorStats）は変更があった予想家だけ差分更新する
     print()
-    print("データベースに統計テーブルを作成中...")
-    
-    # 既存のテーブルを削除
-    conn.execute("DROP TABLE IF EXISTS predictor_stats")
-    
-    # 新しいテーブルを作成
-    conn.execute("""
-    CREATE TABLE predictor_stats (
-        predictor_id INTEGER PRIMARY KEY,
-        predictor_name TEXT,
-        netkeiba_id INTEGER,
-        data_reliability TEXT,
-        total_predictions INTEGER,
-        hit_count INTEGER,
-        hit_rate REAL,
-        total_payout INTEGER,
-        avg_payout REAL,
-        roi_count INTEGER,
-        avg_roi REAL,
-        grade_predictions INTEGER,
-        grade_hits INTEGER,
-        grade_hit_rate REAL,
-        FOREIGN KEY (predictor_id) REFERENCES predictors(id)
-    )
-    """)
-    
-    # データを挿入
-    df.to_sql('predictor_stats', conn, if_exists='replace', index=False)
-    
-    conn.commit()
-    print("✅ データベースに統計テーブル（predictor_stats）を作成しました")
+    print("データベースの統計テーブルを更新中...")
+    
+    refreshed = refresh_predictor_stats(conn)
+    print(f"✅ 統計テーブル（predictor_stats）を更新しました: {refreshed}人の予想家を再集計")
+    
+    # 検索APIが使う条件別集計キューブも再集計待ちを残さない
+    cube_refreshed = refresh_condition_cube(conn)
+    print(f"✅ 条件別集計キューブを更新しました: {cube_refreshed}人の予想家を再集計")
     
     conn.close()
     
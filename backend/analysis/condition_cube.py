@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Phase 4.2 補助: 条件別集計キューブ
+予想家 × 競馬場 × コース種別 × 距離 × グレード単位で
+予想数・的中数・払戻合計・ROI合計を事前集計しておき、
+条件指定検索を小さな集計行のロールアップで返せるようにする
+
+- 予想・レースの変更はトリガーで「要再集計の予想家」として記録
+- refresh_condition_cube() は記録された予想家だけを再集計（差分更新）
+- 再集計待ちが残っている間は検索側が元のJOINクエリにフォールバック
+"""
+
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from typing import Optional, List, Tuple
+import argparse
+import itertools
+import sys
+import time
+
+CUBE_TABLE = "predictor_condition_cube"
+DIRTY_TABLE = "predictor_condition_cube_dirty"
+
+# 集計の軸（racesの列名と同じ名前で保持する）
+CUBE_DIMENSIONS = ["venue", "track_type", "distance", "grade", "is_grade_race"]
+
+GRADES = ['G1', 'G2', 'G3', 'オープン', '一般']
+
+
+def build_condition_filter(
+    venue: Optional[str],
+    track_type: Optional[str],
+    distances: Optional[List[int]],
+    grade: Optional[str],
+    alias: str = "r"
+) -> Tuple[str, list]:
+    """
+    検索条件からWHERE句とパラメータを構築
+
+    racesテーブルとキューブは同じ列名を持つため、どちらにも使える
+
+    Returns:
+        (WHERE句, パラメータのリスト)
+    """
+    where_clauses = []
+    params = []
+
+    if venue:
+        where_clauses.append(f"{alias}.venue = ?")
+        params.append(venue)
+
+    if track_type:
+        where_clauses.append(f"{alias}.track_type = ?")
+        params.append(track_type)
+
+    if distances:
+        distance_placeholders = ','.join(['?'] * len(distances))
+        where_clauses.append(f"{alias}.distance IN ({distance_placeholders})")
+        params.extend(distances)
+
+    if grade:
+        if grade in ['G1', 'G2', 'G3']:
+            where_clauses.append(f"{alias}.grade = ?")
+            params.append(grade)
+        elif grade == 'オープン':
+            where_clauses.append(f"{alias}.is_grade_race = 1")
+        elif grade == '一般':
+            where_clauses.append(f"({alias}.is_grade_race = 0 OR {alias}.is_grade_race IS NULL)")
+
+    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+
+    return where_sql, params
+
+
+def ensure_condition_cube(conn: sqlite3.Connection) -> bool:
+    """
+    キューブ用テーブルと変更検知トリガーを作成
+
+    Returns:
+        新規作成した場合True（呼び出し側で全件構築が必要）
+    """
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (CUBE_TABLE,)
+    )
+    created = cursor.fetchone() is None
+
+    cursor.executescript(f"""
+    CREATE TABLE IF NOT EXISTS {CUBE_TABLE} (
+        predictor_id INTEGER NOT NULL,
+        venue TEXT,
+        track_type TEXT,
+        distance INTEGER,
+        grade TEXT,
+        is_grade_race INTEGER,
+        prediction_count INTEGER NOT NULL,
+        hit_count INTEGER NOT NULL,
+        payout_sum INTEGER NOT NULL,
+        roi_sum REAL,
+        roi_count INTEGER NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_{CUBE_TABLE}_predictor
+        ON {CUBE_TABLE} (predictor_id);
+
+    CREATE INDEX IF NOT EXISTS idx_{CUBE_TABLE}_condition
+        ON {CUBE_TABLE} (venue, track_type, distance);
+
+    CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (
+        predictor_id INTEGER PRIMARY KEY
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_cube_predictions_insert
+    AFTER INSERT ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (NEW.predictor_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_cube_predictions_update
+    AFTER UPDATE OF predictor_id, race_id, is_hit, payout, roi ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (OLD.predictor_id);
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (NEW.predictor_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_cube_predictions_delete
+    AFTER DELETE ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (OLD.predictor_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_cube_races_update
+    AFTER UPDATE OF venue, track_type, distance, grade, is_grade_race ON races
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id)
+        SELECT DISTINCT predictor_id FROM predictions WHERE race_id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_cube_races_delete
+    AFTER DELETE ON races
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id)
+        SELECT DISTINCT predictor_id FROM predictions WHERE race_id = OLD.id;
+    END;
+    """)
+
+    conn.commit()
+
+    return created
+
+
+def _insert_cube_rows(cursor: sqlite3.Cursor, predictor_filter: str = "") -> None:
+    """predictions ⨝ races を集計してキューブに挿入"""
+    dimensions = ", ".join(f"r.{d}" for d in CUBE_DIMENSIONS)
+
+    cursor.execute(f"""
+        INSERT INTO {CUBE_TABLE} (
+            predictor_id, {", ".join(CUBE_DIMENSIONS)},
+            prediction_count, hit_count, payout_sum, roi_sum, roi_count
+        )
+        SELECT
+            p.predictor_id,
+            {dimensions},
+            COUNT(*),
+            SUM(CASE WHEN p.is_hit = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END),
+            SUM(p.roi),
+            COUNT(p.roi)
+        FROM predictions p
+        JOIN races r ON p.race_id = r.id
+        WHERE p.is_hit IS NOT NULL
+          {predictor_filter}
+        GROUP BY p.predictor_id, {dimensions}
+    """)
+
+
+def rebuild_condition_cube(conn: sqlite3.Connection) -> int:
+    """
+    キューブを全件再構築
+
+    Returns:
+        キューブの行数
+    """
+    ensure_condition_cube(conn)
+    cursor = conn.cursor()
+
+    cursor.execute(f"DELETE FROM {CUBE_TABLE}")
+    _insert_cube_rows(cursor)
+    cursor.execute(f"DELETE FROM {DIRTY_TABLE}")
+    conn.commit()
+
+    cursor.execute(f"SELECT COUNT(*) FROM {CUBE_TABLE}")
+    return cursor.fetchone()[0]
+
+
+def refresh_condition_cube(conn: sqlite3.Connection) -> int:
+    """
+    変更があった予想家のみキューブを再集計（差分更新）
+
+    キューブが存在しない場合は全件構築する
+
+    Returns:
+        再集計した予想家数
+    """
+    if ensure_condition_cube(conn):
+        rebuild_condition_cube(conn)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(DISTINCT predictor_id) FROM {CUBE_TABLE}")
+        return cursor.fetchone()[0]
+
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {DIRTY_TABLE}")
+    dirty_count = cursor.fetchone()[0]
+
+    if dirty_count == 0:
+        return 0
+
+    # 再集計中に入った変更を取りこぼさないよう、対象を固定してから処理する
+    cursor.execute("DROP TABLE IF EXISTS temp.cube_refresh_targets")
+    cursor.execute(f"""
+        CREATE TEMP TABLE cube_refresh_targets AS
+        SELECT predictor_id FROM {DIRTY_TABLE}
+    """)
+    cursor.execute(f"""
+        DELETE FROM {CUBE_TABLE}
+        WHERE predictor_id IN (SELECT predictor_id FROM temp.cube_refresh_targets)
+    """)
+    _insert_cube_rows(
+        cursor,
+        "AND p.predictor_id IN (SELECT predictor_id FROM temp.cube_refresh_targets)"
+    )
+    cursor.execute(f"""
+        DELETE FROM {DIRTY_TABLE}
+        WHERE predictor_id IN (SELECT predictor_id FROM temp.cube_refresh_targets)
+    """)
+    cursor.execute("DROP TABLE temp.cube_refresh_targets")
+    conn.commit()
+
+    return dirty_count
+
+
+def is_cube_fresh(conn: sqlite3.Connection) -> bool:
+    """キューブが存在し、再集計待ちの予想家がいなければTrue"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+        (CUBE_TABLE, DIRTY_TABLE)
+    )
+    if cursor.fetchone()[0] < 2:
+        return False
+
+    cursor.execute(f"SELECT 1 FROM {DIRTY_TABLE} LIMIT 1")
+    return cursor.fetchone() is None
+
+
+def build_live_search_query(where_sql: str, sort_by: str) -> str:
+    """predictions ⨝ races を直接集計する検索クエリ"""
+    order_by = "hit_rate DESC" if sort_by == 'hit_rate' else "avg_roi DESC"
+
+    return f"""
+    SELECT
+        pred.id as predictor_id,
+        pred.name as predictor_name,
+        pred.netkeiba_id,
+        COUNT(*) as prediction_count,
+        SUM(CASE WHEN p.is_hit = 1 THEN 1 ELSE 0 END) as hit_count,
+        ROUND(AVG(CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END) * 100, 2) as hit_rate,
+        SUM(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END) as total_payout,
+        ROUND(AVG(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END), 0) as avg_payout,
+        COUNT(CASE WHEN p.roi IS NOT NULL THEN 1 END) as roi_count,
+        ROUND(AVG(CASE WHEN p.roi IS NOT NULL THEN p.roi ELSE NULL END), 2) as avg_roi
+    FROM predictors pred
+    JOIN predictions p ON pred.id = p.predictor_id
+    JOIN races r ON p.race_id = r.id
+    WHERE {where_sql}
+      AND p.is_hit IS NOT NULL
+    GROUP BY pred.id
+    HAVING prediction_count >= ?
+    ORDER BY {order_by}, pred.id
+    LIMIT ?
+    """
+
+
+def build_cube_search_query(where_sql: str, sort_by: str) -> str:
+    """
+    キューブをロールアップする検索クエリ
+
+    列・丸め方は build_live_search_query と同一の結果になるように揃えている
+    （AVG は SUM / COUNT に分解し、キューブの部分和から再計算する）
+    HAVING は集計列と同名のキューブ列に解決されないよう SUM() で明示する
+    """
+    order_by = "hit_rate DESC" if sort_by == 'hit_rate' else "avg_roi DESC"
+
+    return f"""
+    SELECT
+        pred.id as predictor_id,
+        pred.name as predictor_name,
+        pred.netkeiba_id,
+        SUM(r.prediction_count) as prediction_count,
+        SUM(r.hit_count) as hit_count,
+        ROUND(SUM(r.hit_count) * 1.0 / SUM(r.prediction_count) * 100, 2) as hit_rate,
+        SUM(r.payout_sum) as total_payout,
+        ROUND(SUM(r.payout_sum) * 1.0 / SUM(r.prediction_count), 0) as avg_payout,
+        SUM(r.roi_count) as roi_count,
+        ROUND(SUM(r.roi_sum) / SUM(r.roi_count), 2) as avg_roi
+    FROM predictors pred
+    JOIN {CUBE_TABLE} r ON pred.id = r.predictor_id
+    WHERE {where_sql}
+    GROUP BY pred.id
+    HAVING SUM(r.prediction_count) >= ?
+    ORDER BY {order_by}, pred.id
+    LIMIT ?
+    """
+
+
+def build_search_query(
+    conn: sqlite3.Connection,
+    venue: Optional[str],
+    track_type: Optional[str],
+    distances: Optional[List[int]],
+    grade: Optional[str],
+    sort_by: str,
+    limit: int,
+    min_predictions: int,
+    use_cube: Optional[bool] = None
+) -> Tuple[str, list]:
+    """
+    条件指定検索のSQLとパラメータを構築（キューブが最新ならキューブ、そうでなければ直接集計）
+
+    Args:
+        use_cube: None=自動判定, True/False=強制（検証用）
+    """
+    if use_cube is None:
+        use_cube = is_cube_fresh(conn)
+
+    where_sql, params = build_condition_filter(venue, track_type, distances, grade)
+
+    if use_cube:
+        query = build_cube_search_query(where_sql, sort_by)
+    else:
+        query = build_live_search_query(where_sql, sort_by)
+
+    params.extend([min_predictions, limit])
+
+    return query, params
+
+
+def search_with_cube(
+    conn: sqlite3.Connection,
+    venue: Optional[str],
+    track_type: Optional[str],
+    distances: Optional[List[int]],
+    grade: Optional[str],
+    sort_by: str,
+    limit: int,
+    min_predictions: int,
+    use_cube: Optional[bool] = None
+) -> pd.DataFrame:
+    """条件指定検索（結果をDataFrameで返す）"""
+    query, params = build_search_query(
+        conn, venue, track_type, distances, grade, sort_by, limit, min_predictions, use_cube
+    )
+
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def fetch_search_rows(
+    conn: sqlite3.Connection,
+    venue: Optional[str],
+    track_type: Optional[str],
+    distances: Optional[List[int]],
+    grade: Optional[str],
+    sort_by: str,
+    limit: int,
+    min_predictions: int,
+    use_cube: Optional[bool] = None
+) -> Tuple[List[str], List[tuple]]:
+    """
+    条件指定検索（pandasを通さず、列名とカーソルの行タプルをそのまま返す）
+
+    APIのレスポンス作成用。列の順序は search_with_cube と同じ
+    """
+    query, params = build_search_query(
+        conn, venue, track_type, distances, grade, sort_by, limit, min_predictions, use_cube
+    )
+
+    cursor = conn.execute(query, params)
+    columns = [description[0] for description in cursor.description]
+
+    return columns, cursor.fetchall()
+
+
+def verify_condition_cube(conn: sqlite3.Connection, min_predictions: int = 5) -> int:
+    """
+    全ての条件組み合わせでキューブ検索と直接集計の結果を比較
+
+    Returns:
+        不一致の件数
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT venue FROM races WHERE venue IS NOT NULL AND venue != '不明'")
+    venues = [None] + [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT DISTINCT track_type FROM races WHERE track_type IS NOT NULL AND track_type != '不明'")
+    track_types = [None] + [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT DISTINCT distance FROM races WHERE distance IS NOT NULL AND distance > 0")
+    distances = [None] + [[row[0]] for row in cursor.fetchall()]
+    grades = [None] + GRADES
+
+    mismatches = 0
+    checked = 0
+
+    for venue, track_type, distance, grade in itertools.product(venues, track_types, distances, grades):
+        for sort_by in ['hit_rate', 'roi']:
+            args = (venue, track_type, distance, grade, sort_by, 10000, min_predictions)
+            live = search_with_cube(conn, *args, use_cube=False)
+            cube = search_with_cube(conn, *args, use_cube=True)
+            checked += 1
+
+            if not live.equals(cube):
+                mismatches += 1
+                print(f"❌ 不一致: venue={venue}, track_type={track_type}, "
+                      f"distance={distance}, grade={grade}, sort_by={sort_by}")
+
+    print(f"検証した条件数: {checked}件 / 不一致: {mismatches}件")
+
+    return mismatches
+
+
+def main():
+    """キューブの構築・差分更新・検証"""
+    parser = argparse.ArgumentParser(description='条件別集計キューブの更新')
+    parser.add_argument('--rebuild', action='store_true', help='キューブを全件再構築')
+    parser.add_argument('--verify', action='store_true', help='直接集計との一致を検証')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    conn = sqlite3.connect(db_path)
+
+    start_time = time.time()
+
+    if args.rebuild:
+        row_count = rebuild_condition_cube(conn)
+        print(f"✅ キューブを再構築しました: {row_count:,}行")
+    else:
+        refreshed = refresh_condition_cube(conn)
+        print(f"✅ キューブを更新しました: {refreshed:,}人の予想家を再集計")
+
+    print(f"   処理時間: {time.time() - start_time:.2f}秒")
+
+    mismatches = 0
+    if args.verify:
+        print()
+        mismatches = verify_condition_cube(conn)
+
+    conn.close()
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
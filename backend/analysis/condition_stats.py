@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Phase 4.2: 条件別の予想家統計（predictor_stats の条件行）の一括計算
+
+競馬場 × コース種別 × 距離 × グレードの全ての組み合わせ（GROUPING SETS の
+ロールアップを含む）について、予想家ごとの的中率・回収率・サンプル数・信頼度を
+予想ファクトのスナップショット（prediction_facts.py）から1回の集計で計算し、
+predictor_stats にまとめて書き込む
+
+- stat_type: 集計の軸を "_" でつないだもの（例: venue, venue_track_type_grade）
+- condition: 軸の値を同じ順に "_" でつないだもの（例: 東京, 東京_芝_G1, 東京_芝_1600_G1）
+- グレードは G1 / G2 / G3 / オープン（グレードなしの重賞）/ 一般 のいずれか1つに分類する
+- 値が不明（'不明'・NULL・距離0）の軸を含む組み合わせには数えない
+- overall / grade_race の行は predictor_stats.py の差分更新が管理する（この処理では書き換えない）
+
+全行の集計は「予想家 × 全軸」の最細粒度で1回だけ行い、各組み合わせは
+その集計結果（元の予想より十分小さい）をロールアップして求める
+"""
+
+import argparse
+import itertools
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.analysis.condition_cube import GRADES
+from backend.analysis.prediction_facts import _round, open_prediction_facts
+from backend.analysis.predictor_stats import (
+    CONFIDENCE_HIGH, CONFIDENCE_MEDIUM, STATS_COLUMNS, STATS_TABLE, refresh_predictor_stats,
+)
+
+# 集計の軸（prediction_facts の列名。grade は is_grade_race と合わせて分類する）
+SWEEP_DIMENSIONS = ["venue", "track_type", "distance", "grade"]
+
+# 軸の組み合わせ（空集合は overall と同じなので除く）
+GROUPING_SETS = [
+    list(dimensions)
+    for size in range(1, len(SWEEP_DIMENSIONS) + 1)
+    for dimensions in itertools.combinations(SWEEP_DIMENSIONS, size)
+]
+
+SWEEP_STAT_TYPES = ["_".join(dimensions) for dimensions in GROUPING_SETS]
+
+# 書き込みは件数が多いため、この行数ごとに executemany する
+WRITE_BATCH_SIZE = 50_000
+
+UNKNOWN_VALUES = {'不明', ''}
+
+
+def _category_codes(column: pd.Series, rows: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+    """カテゴリ列のコード（不明な値は -1）とコード → 値のリスト"""
+    categories = list(column.cat.categories)
+    unknown = np.array([value in UNKNOWN_VALUES for value in categories] + [True])
+    codes = column.cat.codes.to_numpy()[rows].astype(np.int64)
+    return np.where(unknown[codes], -1, codes), [str(value) for value in categories]
+
+
+def _dimension_codes(facts: pd.DataFrame, rows: np.ndarray) -> List[Tuple[np.ndarray, List[str]]]:
+    """SWEEP_DIMENSIONS の順に (行ごとのコード（不明は -1）, コード → 値のリスト)"""
+    venue = _category_codes(facts["venue"], rows)
+    track_type = _category_codes(facts["track_type"], rows)
+
+    distance = facts["distance"].to_numpy()[rows]
+    distance_codes, distance_values = pd.factorize(distance, sort=True)
+    distance_codes = np.where(distance > 0, distance_codes, -1).astype(np.int64)
+
+    # G1〜G3 はそのまま、それ以外の重賞はオープン、重賞でなければ一般
+    grade_column = facts["grade"]
+    grade_map = np.array(
+        [GRADES.index(value) if value in GRADES[:3] else -1 for value in grade_column.cat.categories] + [-1]
+    )
+    grade_codes = grade_map[grade_column.cat.codes.to_numpy()[rows]]
+    is_grade_race = facts["is_grade_race"].to_numpy()[rows] == 1
+    grade_codes = np.where(
+        grade_codes >= 0, grade_codes,
+        np.where(is_grade_race, GRADES.index('オープン'), GRADES.index('一般'))
+    ).astype(np.int64)
+
+    return [
+        venue,
+        track_type,
+        (distance_codes, [str(value) for value in distance_values]),
+        (grade_codes, list(GRADES)),
+    ]
+
+
+def _confidence_levels(sample_size: np.ndarray) -> np.ndarray:
+    """predictor_stats.py の信頼度と同じ基準"""
+    return np.select(
+        [sample_size >= CONFIDENCE_HIGH, sample_size >= CONFIDENCE_MEDIUM],
+        ['high', 'medium'],
+        default='low'
+    ).astype(object)
+
+
+def sweep_condition_stats(
+    facts: pd.DataFrame,
+    grouping_sets: Sequence[Sequence[str]] = GROUPING_SETS,
+    min_sample_size: int = 1
+) -> pd.DataFrame:
+    """
+    全ての条件の組み合わせについて予想家ごとの統計を計算
+
+    Args:
+        facts: load_prediction_facts() の結果
+        grouping_sets: 集計する軸の組み合わせ（SWEEP_DIMENSIONS の部分集合）
+        min_sample_size: これよりサンプル数が少ない行は除く
+
+    Returns:
+        predictor_id, stat_type, condition, sample_size, hit_rate, roi, confidence_level
+        （hit_rate・roi の丸め方は predictor_stats の overall 行と同じ）
+    """
+    is_hit = facts["is_hit"].to_numpy()
+    rows = np.flatnonzero(is_hit >= 0)
+    dimensions = _dimension_codes(facts, rows)
+
+    # 予想家 × 全軸の最細粒度で1回だけ集計する（不明の値はコード 0 として残す）
+    predictor_codes, predictor_ids = pd.factorize(facts["predictor_id"].to_numpy()[rows], sort=True)
+    key = predictor_codes.astype(np.int64)
+    for codes, values in dimensions:
+        key = key * (len(values) + 1) + codes + 1
+    base_index, base_keys = pd.factorize(key)
+
+    sample_size = np.bincount(base_index)
+    hit_count = np.bincount(base_index, weights=is_hit[rows] == 1)
+    roi = facts["roi"].to_numpy()[rows]
+    has_roi = ~np.isnan(roi)
+    roi_count = np.bincount(base_index, weights=has_roi)
+    roi_sum = np.bincount(base_index, weights=np.where(has_roi, roi, 0.0))
+
+    # 最細粒度のグループのキーを軸ごとのコードに戻す
+    base_codes = {}
+    for name, (codes, values) in zip(reversed(SWEEP_DIMENSIONS), reversed(dimensions)):
+        base_codes[name] = base_keys % (len(values) + 1) - 1
+        base_keys = base_keys // (len(values) + 1)
+    base_predictors = base_keys
+    labels = dict(zip(SWEEP_DIMENSIONS, (values for _, values in dimensions)))
+
+    results = []
+    for grouping_set in grouping_sets:
+        valid = np.ones(len(base_predictors), dtype=bool)
+        combination = np.zeros(len(base_predictors), dtype=np.int64)
+        for name in grouping_set:
+            valid &= base_codes[name] >= 0
+            combination = combination * len(labels[name]) + base_codes[name]
+        valid = np.flatnonzero(valid)
+
+        # 条件の組み合わせごとに予想家でまとめる
+        group_index, group_keys = pd.factorize(
+            combination[valid] * len(predictor_ids) + base_predictors[valid], sort=True
+        )
+        group_sample_size = np.bincount(group_index, weights=sample_size[valid]).astype(np.int64)
+        group_hit_count = np.bincount(group_index, weights=hit_count[valid])
+        group_roi_count = np.bincount(group_index, weights=roi_count[valid])
+        group_roi_sum = np.bincount(group_index, weights=roi_sum[valid])
+
+        keep = group_sample_size >= min_sample_size
+        group_keys = group_keys[keep]
+
+        # 条件の文字列は組み合わせごとに1回だけ作る
+        combination_index, combinations = pd.factorize(group_keys // len(predictor_ids))
+        parts = []
+        for name in reversed(grouping_set):
+            parts.append(np.array(labels[name], dtype=object)[combinations % len(labels[name])])
+            combinations = combinations // len(labels[name])
+        conditions = np.array(["_".join(values) for values in zip(*reversed(parts))], dtype=object)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            results.append(pd.DataFrame({
+                "predictor_id": predictor_ids[group_keys % len(predictor_ids)],
+                "stat_type": "_".join(grouping_set),
+                "condition": conditions[combination_index],
+                "sample_size": group_sample_size[keep],
+                "hit_rate": _round(group_hit_count[keep] / group_sample_size[keep] * 100, 2),
+                "roi": _round(np.where(group_roi_count[keep] > 0,
+                                       group_roi_sum[keep] / group_roi_count[keep], np.nan), 2),
+                "confidence_level": _confidence_levels(group_sample_size[keep]),
+            }))
+
+    return pd.concat(results, ignore_index=True)
+
+
+def write_condition_stats(conn: sqlite3.Connection, stats: pd.DataFrame) -> int:
+    """
+    条件別の統計で predictor_stats の条件行（SWEEP_STAT_TYPES）を置き換える
+
+    overall / grade_race の行は差分更新で最新にしておく
+
+    Returns:
+        書き込んだ行数
+    """
+    refresh_predictor_stats(conn)
+    cursor = conn.cursor()
+
+    stat_types = ", ".join(f"'{stat_type}'" for stat_type in SWEEP_STAT_TYPES)
+    cursor.execute(f"DELETE FROM {STATS_TABLE} WHERE stat_type IN ({stat_types})")
+
+    updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+    insert_sql = f"INSERT INTO {STATS_TABLE} ({STATS_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+    for start in range(0, len(stats), WRITE_BATCH_SIZE):
+        chunk = stats.iloc[start:start + WRITE_BATCH_SIZE]
+        roi = chunk["roi"].to_numpy()
+        cursor.executemany(insert_sql, zip(
+            chunk["predictor_id"].tolist(),
+            chunk["stat_type"].tolist(),
+            chunk["condition"].tolist(),
+            chunk["sample_size"].tolist(),
+            chunk["hit_rate"].tolist(),
+            np.where(np.isnan(roi), None, roi).tolist(),
+            chunk["confidence_level"].tolist(),
+            itertools.repeat(updated_at),
+        ))
+
+    conn.commit()
+
+    return len(stats)
+
+
+def main():
+    """全条件の統計を計算して predictor_stats に書き込む"""
+    parser = argparse.ArgumentParser(description='条件別の予想家統計を predictor_stats に一括計算')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--min-sample', type=int, default=1, help='書き込むサンプル数の下限')
+
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    start_time = time.time()
+    facts = open_prediction_facts(db_path)
+    load_seconds = time.time() - start_time
+
+    start_time = time.time()
+    stats = sweep_condition_stats(facts, min_sample_size=args.min_sample)
+    sweep_seconds = time.time() - start_time
+
+    start_time = time.time()
+    conn = sqlite3.connect(db_path)
+    written = write_condition_stats(conn, stats)
+    conn.close()
+    write_seconds = time.time() - start_time
+
+    conditions = stats[["stat_type", "condition"]].drop_duplicates()
+    print(f"✅ 条件別の統計を書き込みました: {written:,}行"
+          f"（{len(GROUPING_SETS)}種類の軸の組み合わせ, {len(conditions):,}条件）")
+    print(f"   処理時間: 読み込み {load_seconds:.2f}秒 / 集計 {sweep_seconds:.2f}秒 / 書き込み {write_seconds:.2f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+データベースの健全性・進捗の指標（check_* スクリプト共通）
+
+check_data.py・check_phase4_data.py・check_progress.py・check_race_progress.py が
+それぞれ数十回の COUNT(*) や予想家ごとのクエリで求めていた指標を、
+テーブルごとに1回の集計（条件付きSUM）でまとめて求める。
+
+- predictions: races と結合し、予想家 × グレードで GROUP BY する1回の走査
+  （全体・グレード別・予想家別の値はこの結果から組み立てる）
+- races: グレード・コース種別・競馬場ごとの件数を1回の走査で
+- predictors: 信頼度ごとの件数を1回の走査で
+
+結果（DiagnosticsSnapshot）はDBの隣のファイル（keiba.db.diagnostics.json）に保存し、
+データバージョン（backend/data_version.py）が変わるまで再利用する。
+"""
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from backend.data_version import read_data_version
+
+
+# races の詳細を取得済みかどうか
+RACE_DETAIL_CONDITION = "track_type IS NOT NULL AND track_type != '不明'"
+
+# 分析対象にする予想家の結果ありの予想数
+MIN_ANALYZABLE_PREDICTIONS = 10
+
+PREDICTION_PASS_QUERY = """
+SELECT
+    p.predictor_id,
+    r.grade,
+    r.is_grade_race,
+    COUNT(*),
+    COUNT(CASE WHEN p.is_hit IS NOT NULL THEN 1 END),
+    COUNT(CASE WHEN p.is_hit = 1 THEN 1 END),
+    COUNT(CASE WHEN p.is_hit = 0 THEN 1 END),
+    COUNT(CASE WHEN p.roi IS NOT NULL THEN 1 END),
+    SUM(p.roi),
+    COUNT(CASE WHEN p.payout > 0 THEN 1 END),
+    MIN(CASE WHEN p.payout > 0 THEN p.payout END),
+    MAX(CASE WHEN p.payout > 0 THEN p.payout END),
+    SUM(CASE WHEN p.payout > 0 THEN p.payout ELSE 0 END),
+    COUNT(CASE WHEN p.is_hit = 1 AND p.payout = 0 THEN 1 END),
+    COUNT(CASE WHEN r.race_date > :now THEN 1 END),
+    COUNT(CASE WHEN r.track_type IS NOT NULL AND r.track_type != '不明' AND p.is_hit IS NOT NULL THEN 1 END),
+    COUNT(CASE WHEN r.id IS NULL THEN 1 END)
+FROM predictions p
+LEFT JOIN races r ON r.id = p.race_id
+GROUP BY p.predictor_id, r.grade, r.is_grade_race
+"""
+
+RACE_PASS_QUERY = f"""
+SELECT
+    grade,
+    is_grade_race,
+    track_type,
+    venue,
+    COUNT(*),
+    COUNT(CASE WHEN {RACE_DETAIL_CONDITION} THEN 1 END),
+    COUNT(CASE WHEN race_name IS NULL OR race_name = '' THEN 1 END)
+FROM races
+GROUP BY grade, is_grade_race, track_type, venue
+"""
+
+PREDICTOR_PASS_QUERY = """
+SELECT
+    data_reliability,
+    COUNT(*),
+    COUNT(CASE WHEN total_predictions > 0 THEN 1 END),
+    COUNT(CASE WHEN total_predictions > 0 AND total_predictions < 10 THEN 1 END),
+    COUNT(CASE WHEN total_predictions > 0 AND grade_race_predictions < 5 THEN 1 END)
+FROM predictors
+GROUP BY data_reliability
+"""
+
+TOP_PREDICTORS_QUERY = """
+SELECT id, netkeiba_id, name, total_predictions, grade_race_predictions, data_reliability
+FROM predictors
+WHERE total_predictions > 0
+ORDER BY total_predictions DESC
+LIMIT ?
+"""
+
+LATEST_PREDICTIONS_QUERY = """
+SELECT pr.name, r.race_name, p.is_hit, p.payout
+FROM predictions p
+JOIN predictors pr ON pr.id = p.predictor_id
+JOIN races r ON r.id = p.race_id
+ORDER BY p.id DESC
+LIMIT ?
+"""
+
+LATEST_GRADE_RACES_QUERY = """
+SELECT race_name, race_date, venue, grade
+FROM races
+WHERE is_grade_race = 1
+ORDER BY race_date DESC
+LIMIT ?
+"""
+
+
+@dataclass
+class DiagnosticsSnapshot:
+    """check_* スクリプトが表示する指標（値はすべてJSONにできる型）"""
+    computed_at: str = ""
+    data_version: str = ""
+    elapsed: float = 0.0
+
+    # 予想家
+    predictors: int = 0
+    active_predictors: int = 0
+    predictors_by_reliability: Dict[str, int] = field(default_factory=dict)
+    low_prediction_predictors: int = 0
+    low_grade_predictors: int = 0
+
+    # 予想
+    predictions: int = 0
+    predictions_with_result: int = 0
+    hits: int = 0
+    misses: int = 0
+    roi_count: int = 0
+    avg_roi: Optional[float] = None
+    payout_count: int = 0
+    payout_min: Optional[int] = None
+    payout_max: Optional[int] = None
+    payout_total: int = 0
+    hit_without_payout: int = 0
+    future_predictions: int = 0
+    predictions_with_race_detail: int = 0
+    predictions_without_race: int = 0
+    grade_predictions: int = 0
+    grade_hits: int = 0
+    predictions_by_grade: Dict[str, int] = field(default_factory=dict)
+
+    # 予想家ごとの結果ありの予想数
+    predictors_with_result: int = 0
+    results_per_predictor_min: int = 0
+    results_per_predictor_max: int = 0
+    results_per_predictor_avg: float = 0.0
+    analyzable_predictors: int = 0
+
+    # レース
+    races: int = 0
+    races_with_detail: int = 0
+    races_without_name: int = 0
+    grade_races: int = 0
+    grade_races_with_detail: int = 0
+    races_by_track_type: Dict[str, int] = field(default_factory=dict)
+    grade_races_by_grade: Dict[str, int] = field(default_factory=dict)
+    races_by_grade: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    races_by_venue: Dict[str, int] = field(default_factory=dict)
+
+    # サンプル
+    top_predictors: List[Dict] = field(default_factory=list)
+    latest_predictions: List[Dict] = field(default_factory=list)
+    latest_grade_races: List[Dict] = field(default_factory=list)
+
+    @property
+    def predictions_unknown(self) -> int:
+        return self.predictions - self.predictions_with_result
+
+    @property
+    def payout_avg(self) -> Optional[float]:
+        return self.payout_total / self.payout_count if self.payout_count else None
+
+    @property
+    def races_pending(self) -> int:
+        return self.races - self.races_with_detail
+
+    @property
+    def grade_races_pending(self) -> int:
+        return self.grade_races - self.grade_races_with_detail
+
+
+def _predictions_pass(conn: sqlite3.Connection, snapshot: DiagnosticsSnapshot, now: datetime) -> Dict[int, List[int]]:
+    """
+    predictions を1回走査して予想の指標を埋める
+
+    Returns:
+        予想家ID → [結果ありの予想数, 的中数, 払戻金の合計（払戻ありのみ）]
+    """
+    per_predictor: Dict[int, List[int]] = {}
+    roi_sum = 0.0
+
+    rows = conn.execute(PREDICTION_PASS_QUERY, {'now': now.strftime('%Y-%m-%d %H:%M:%S.%f')})
+    for (predictor_id, grade, is_grade_race, count, with_result, hits, misses, roi_count, group_roi_sum,
+         payout_count, payout_min, payout_max, payout_total, hit_without_payout,
+         future, with_detail, without_race) in rows:
+        s = snapshot
+        s.predictions += count
+        s.predictions_with_result += with_result
+        s.hits += hits
+        s.misses += misses
+        s.roi_count += roi_count
+        roi_sum += group_roi_sum or 0.0
+        s.payout_count += payout_count
+        s.payout_total += payout_total
+        if payout_min is not None:
+            s.payout_min = payout_min if s.payout_min is None else min(s.payout_min, payout_min)
+            s.payout_max = payout_max if s.payout_max is None else max(s.payout_max, payout_max)
+        s.hit_without_payout += hit_without_payout
+        s.future_predictions += future
+        s.predictions_with_race_detail += with_detail
+        s.predictions_without_race += without_race
+        # 重賞の判定は予想家の重賞予想数（grade_race_predictions）と同じ is_grade_race
+        if is_grade_race:
+            s.grade_predictions += count
+            s.grade_hits += hits
+            s.predictions_by_grade[grade] = s.predictions_by_grade.get(grade, 0) + count
+
+        totals = per_predictor.setdefault(predictor_id, [0, 0, 0])
+        totals[0] += with_result
+        totals[1] += hits
+        totals[2] += payout_total
+
+    if snapshot.roi_count:
+        snapshot.avg_roi = roi_sum / snapshot.roi_count
+
+    result_counts = [totals[0] for totals in per_predictor.values() if totals[0] > 0]
+    if result_counts:
+        snapshot.predictors_with_result = len(result_counts)
+        snapshot.results_per_predictor_min = min(result_counts)
+        snapshot.results_per_predictor_max = max(result_counts)
+        snapshot.results_per_predictor_avg = sum(result_counts) / len(result_counts)
+        snapshot.analyzable_predictors = sum(1 for n in result_counts if n >= MIN_ANALYZABLE_PREDICTIONS)
+    return per_predictor
+
+
+def _races_pass(conn: sqlite3.Connection, snapshot: DiagnosticsSnapshot):
+    """races を1回走査してレースの指標を埋める"""
+    for grade, is_grade_race, track_type, venue, count, with_detail, without_name in conn.execute(RACE_PASS_QUERY):
+        s = snapshot
+        s.races += count
+        s.races_with_detail += with_detail
+        s.races_without_name += without_name
+        key = track_type if track_type else 'NULL'
+        s.races_by_track_type[key] = s.races_by_track_type.get(key, 0) + count
+        if is_grade_race:
+            s.grade_races += count
+            s.grade_races_with_detail += with_detail
+            s.grade_races_by_grade[str(grade)] = s.grade_races_by_grade.get(str(grade), 0) + count
+        if grade is not None:
+            by_grade = s.races_by_grade.setdefault(grade, {'total': 0, 'completed': 0})
+            by_grade['total'] += count
+            by_grade['completed'] += with_detail
+        if venue and venue != '不明':
+            s.races_by_venue[venue] = s.races_by_venue.get(venue, 0) + count
+
+
+def _predictors_pass(conn: sqlite3.Connection, snapshot: DiagnosticsSnapshot):
+    """predictors を1回走査して予想家の指標を埋める"""
+    for reliability, count, active, low_predictions, low_grade in conn.execute(PREDICTOR_PASS_QUERY):
+        snapshot.predictors += count
+        snapshot.active_predictors += active
+        snapshot.low_prediction_predictors += low_predictions
+        snapshot.low_grade_predictors += low_grade
+        snapshot.predictors_by_reliability[str(reliability)] = count
+
+
+def collect_diagnostics(
+    conn: sqlite3.Connection,
+    now: Optional[datetime] = None,
+    sample_size: int = 10
+) -> DiagnosticsSnapshot:
+    """
+    全指標を集計する（predictions・races・predictors をそれぞれ1回走査）
+
+    Args:
+        conn: DB接続
+        now: 「未来のレース」の基準日時（省略時は現在時刻）
+        sample_size: 予想家・予想・重賞レースのサンプル件数
+    """
+    start = time.perf_counter()
+    now = now or datetime.now()
+    snapshot = DiagnosticsSnapshot(computed_at=now.isoformat(timespec='seconds'))
+
+    _predictors_pass(conn, snapshot)
+    _races_pass(conn, snapshot)
+    per_predictor = _predictions_pass(conn, snapshot, now)
+
+    # サンプルはインデックスで先頭の数件だけ読む
+    for predictor_id, netkeiba_id, name, total, grade_total, reliability in conn.execute(TOP_PREDICTORS_QUERY, (sample_size,)):
+        _, hits, payout = per_predictor.get(predictor_id, (0, 0, 0))
+        snapshot.top_predictors.append({
+            'netkeiba_id': netkeiba_id,
+            'name': name,
+            'total_predictions': total,
+            'grade_race_predictions': grade_total,
+            'data_reliability': reliability,
+            'hits': hits,
+            'total_payout': payout,
+        })
+    snapshot.latest_predictions = [
+        {'predictor_name': predictor_name, 'race_name': race_name, 'is_hit': is_hit, 'payout': payout}
+        for predictor_name, race_name, is_hit, payout in conn.execute(LATEST_PREDICTIONS_QUERY, (sample_size,))
+    ]
+    snapshot.latest_grade_races = [
+        {'race_name': race_name, 'race_date': race_date, 'venue': venue, 'grade': grade}
+        for race_name, race_date, venue, grade in conn.execute(LATEST_GRADE_RACES_QUERY, (sample_size,))
+    ]
+
+    snapshot.elapsed = time.perf_counter() - start
+    return snapshot
+
+
+def diagnostics_cache_path(db_path: Union[str, Path]) -> Path:
+    """保存した指標のパス"""
+    db_path = Path(db_path)
+    return db_path.with_name(db_path.name + ".diagnostics.json")
+
+
+def load_diagnostics(
+    db_path: Union[str, Path] = "data/keiba.db",
+    refresh: bool = False,
+    max_age: float = 3600
+) -> DiagnosticsSnapshot:
+    """
+    指標を取得（データバージョンが変わっていなければ保存したものを使う）
+
+    Args:
+        db_path: データベースパス
+        refresh: 保存したものを使わずに集計し直す
+        max_age: 保存したものを使う最長の秒数（「未来のレース」の件数が古くならないように）
+
+    Raises:
+        FileNotFoundError: データベースがない
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        raise FileNotFoundError(f"データベースファイルが見つかりません: {db_path}")
+
+    version = read_data_version(db_path)
+    cache_path = diagnostics_cache_path(db_path)
+
+    if not refresh:
+        try:
+            data = json.loads(cache_path.read_text(encoding='utf-8'))
+            age = (datetime.now() - datetime.fromisoformat(data['computed_at'])).total_seconds()
+            if data.get('data_version') == version and age <= max_age:
+                return DiagnosticsSnapshot(**data)
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            pass
+
+    conn = sqlite3.connect(db_path)
+    try:
+        snapshot = collect_diagnostics(conn)
+    finally:
+        conn.close()
+    snapshot.data_version = version
+
+    # 一時ファイルに書いてから置き換え、同時に実行した他のスクリプトが途中の状態を読まないようにする
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(asdict(snapshot), ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, cache_path)
+    return snapshot
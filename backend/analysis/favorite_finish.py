@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+本命馬の着順分析（予想家別）
+
+予想の本命馬番（predictions.favorite_horse）を出走馬テーブル（race_entries）と
+(race_id, horse_number) の一意インデックスで結合し、予想家ごとに
+本命馬の勝率・複勝率・平均着順・平均人気を集計する。
+race_details のJSONを読み込まずにSQL1本で求められる。
+"""
+
+import sqlite3
+import pandas as pd
+from pathlib import Path
+import argparse
+import sys
+import time
+
+# 最小予想数
+MIN_PREDICTIONS = 5
+
+FAVORITE_FINISH_QUERY = """
+    SELECT
+        p.predictor_id,
+        pr.name AS predictor_name,
+        COUNT(*) AS prediction_count,
+        SUM(e.finish_position = 1) AS win_count,
+        SUM(e.finish_position <= 3) AS top3_count,
+        ROUND(AVG(e.finish_position), 2) AS avg_finish,
+        ROUND(AVG(e.popularity), 2) AS avg_popularity,
+        ROUND(SUM(e.finish_position = 1) * 100.0 / COUNT(*), 2) AS win_rate,
+        ROUND(SUM(e.finish_position <= 3) * 100.0 / COUNT(*), 2) AS top3_rate
+    FROM predictions p
+    JOIN race_entries e ON e.race_id = p.race_id AND e.horse_number = p.favorite_horse
+    JOIN predictors pr ON pr.id = p.predictor_id
+    WHERE p.favorite_horse IS NOT NULL
+    AND e.finish_position IS NOT NULL
+    GROUP BY p.predictor_id
+    HAVING COUNT(*) >= ?
+    ORDER BY top3_rate DESC, prediction_count DESC
+    LIMIT ?
+"""
+
+
+def favorite_finish_by_predictor(
+    conn: sqlite3.Connection,
+    min_predictions: int = MIN_PREDICTIONS,
+    limit: int = 50
+) -> pd.DataFrame:
+    """
+    予想家ごとの本命馬の着順
+
+    Args:
+        conn: DB接続
+        min_predictions: 本命馬の着順が分かる予想がこの件数以上の予想家のみ
+        limit: 取得件数
+
+    Returns:
+        pd.DataFrame: 予想家ごとの勝率・複勝率・平均着順・平均人気（複勝率の高い順）
+    """
+    return pd.read_sql_query(FAVORITE_FINISH_QUERY, conn, params=(min_predictions, limit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本命馬の着順分析（予想家別）')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--min-predictions', type=int, default=MIN_PREDICTIONS, help='最小予想数')
+    parser.add_argument('--limit', type=int, default=50, help='表示件数')
+
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    conn = sqlite3.connect(db_path)
+
+    start_time = time.time()
+    try:
+        df = favorite_finish_by_predictor(conn, args.min_predictions, args.limit)
+    except pd.errors.DatabaseError as e:
+        print(f"❌ エラー: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    print("=" * 70)
+    print(f"本命馬の着順（予想家別、{args.min_predictions}件以上）")
+    print("=" * 70)
+    if df.empty:
+        print("該当する予想家がいません")
+    else:
+        print(df.to_string(index=False))
+    print(f"\n処理時間: {time.time() - start_time:.3f}秒")
+
+
+if __name__ == "__main__":
+    main()
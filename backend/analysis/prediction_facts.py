@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+"""
+Phase 4 補助: 予想ファクトテーブルの列指向スナップショット
+predictions ⨝ races ⨝ predictors を1行1予想に非正規化し、列ごとの .npy ファイルに保存する。
+分析スクリプトは毎回SQLiteで結合する代わりに、スナップショットをメモリマップで読み込み、
+pandas / NumPy の groupby で条件別の集計を行う。
+
+- 文字列の列（競馬場・コース種別・グレード等）はカテゴリのコード（int8/int16）で持つ
+- 予想・レース・予想家の変更はトリガーで「要再読込の予想ID」として記録
+- refresh_prediction_facts() は追加された予想と記録された予想だけを読み直す（差分更新）
+- 書き込みは世代ごとのディレクトリに行い、manifest.json の置き換えで切り替える
+  （読み込み中のプロセスは古い世代をそのまま使える）
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+DIRTY_TABLE = "prediction_facts_dirty"
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+# 1回に読み込む行数
+FETCH_SIZE = 100_000
+
+# (列名, SQL式, 種類, 型, NULLの値)
+# 種類: int / float / datetime / category
+FACT_COLUMNS = [
+    ("prediction_id", "p.id", "int", "int32", 0),
+    ("predictor_id", "p.predictor_id", "int", "int32", 0),
+    ("race_id", "p.race_id", "int", "int32", 0),
+    ("netkeiba_id", "pred.netkeiba_id", "int", "int64", 0),
+    ("predictor_name", "pred.name", "category", None, None),
+    ("data_reliability", "pred.data_reliability", "category", None, None),
+    ("predicted_at", "p.predicted_at", "datetime", "datetime64[s]", None),
+    ("race_date", "r.race_date", "datetime", "datetime64[s]", None),
+    ("venue", "r.venue", "category", None, None),
+    ("track_type", "r.track_type", "category", None, None),
+    ("distance", "r.distance", "int", "int16", 0),
+    ("grade", "r.grade", "category", None, None),
+    ("is_grade_race", "r.is_grade_race", "int", "int8", 0),
+    ("track_condition", "r.track_condition", "category", None, None),
+    ("horse_count", "r.horse_count", "int", "int16", 0),
+    ("bet_type", "p.bet_type", "category", None, None),
+    # is_hit: 1=的中, 0=不的中, -1=結果なし
+    ("is_hit", "p.is_hit", "int", "int8", -1),
+    ("payout", "p.payout", "int", "int64", 0),
+    ("roi", "p.roi", "float", "float64", np.nan),
+]
+
+FACT_QUERY = f"""
+SELECT {", ".join(expr for _, expr, _, _, _ in FACT_COLUMNS)}
+FROM predictions p
+JOIN races r ON r.id = p.race_id
+JOIN predictors pred ON pred.id = p.predictor_id
+"""
+
+# 世代ごとの予想家名（predictor_names() のキャッシュ）
+_predictor_names_cache: Dict[str, pd.DataFrame] = {}
+
+# 集計結果の列（condition_cube.build_live_search_query と同じ名前・丸め方）
+SUMMARY_COLUMNS = [
+    "prediction_count", "hit_count", "hit_rate", "total_payout", "avg_payout", "roi_count", "avg_roi",
+]
+
+
+def facts_directory(db_path: Union[str, Path] = "data/keiba.db") -> Path:
+    """DBに対応するスナップショットのディレクトリ"""
+    return Path(db_path).parent / "analytics" / "prediction_facts"
+
+
+def ensure_prediction_facts(conn: sqlite3.Connection) -> None:
+    """要再読込の予想IDを記録するテーブルとトリガーを作成"""
+    conn.executescript(f"""
+    CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (
+        prediction_id INTEGER PRIMARY KEY
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_facts_predictions_update
+    AFTER UPDATE OF predictor_id, race_id, predicted_at, bet_type, is_hit, payout, roi ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (prediction_id) VALUES (NEW.id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_facts_predictions_delete
+    AFTER DELETE ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (prediction_id) VALUES (OLD.id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_facts_races_insert
+    AFTER INSERT ON races
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (prediction_id)
+        SELECT id FROM predictions WHERE race_id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_facts_races_update
+    AFTER UPDATE OF race_date, venue, track_type, distance, grade, is_grade_race,
+                    track_condition, horse_count ON races
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (prediction_id)
+        SELECT id FROM predictions WHERE race_id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_facts_races_delete
+    AFTER DELETE ON races
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (prediction_id)
+        SELECT id FROM predictions WHERE race_id = OLD.id;
+    END;
+
+    -- 予想家の同期は毎回 name 等も SET するため、値が変わった場合だけ記録する
+    CREATE TRIGGER IF NOT EXISTS trg_facts_predictors_update
+    AFTER UPDATE OF netkeiba_id, name, data_reliability ON predictors
+    WHEN OLD.netkeiba_id IS NOT NEW.netkeiba_id
+      OR OLD.name IS NOT NEW.name
+      OR OLD.data_reliability IS NOT NEW.data_reliability
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (prediction_id)
+        SELECT id FROM predictions WHERE predictor_id = NEW.id;
+    END;
+    """)
+    conn.commit()
+
+
+class _CategoryEncoder:
+    """文字列 → カテゴリのコード（既存のコードは変えずに新しい値を末尾に追加する）"""
+
+    def __init__(self, categories: Sequence[str] = ()):
+        self.index: Dict[str, int] = {value: code for code, value in enumerate(categories)}
+
+    def encode(self, values: Sequence[Optional[str]]) -> np.ndarray:
+        index = self.index
+        return np.fromiter(
+            (-1 if value is None else index.setdefault(value, len(index)) for value in values),
+            dtype=np.int32, count=len(values)
+        )
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self.index)
+
+
+def _code_dtype(category_count: int) -> str:
+    """カテゴリ数が収まる最小のコードの型"""
+    if category_count < 2 ** 7:
+        return "int8"
+    if category_count < 2 ** 15:
+        return "int16"
+    return "int32"
+
+
+def _read_facts(
+    cursor: sqlite3.Cursor,
+    encoders: Dict[str, _CategoryEncoder]
+) -> Dict[str, np.ndarray]:
+    """結合クエリの結果を列ごとの配列に変換（カテゴリは int32 のコード）"""
+    chunks: Dict[str, List[np.ndarray]] = {name: [] for name, *_ in FACT_COLUMNS}
+
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        count = len(rows)
+        for values, (name, _, kind, dtype, null) in zip(zip(*rows), FACT_COLUMNS):
+            if kind == "category":
+                array = encoders[name].encode(values)
+            elif kind == "datetime":
+                array = pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601", errors="coerce") \
+                    .to_numpy().astype(dtype)
+            else:
+                array = np.fromiter((null if v is None else v for v in values), dtype=dtype, count=count)
+            chunks[name].append(array)
+
+    columns = {}
+    for name, _, kind, dtype, _ in FACT_COLUMNS:
+        if chunks[name]:
+            columns[name] = np.concatenate(chunks[name])
+        else:
+            columns[name] = np.empty(0, dtype="int32" if kind == "category" else dtype)
+    return columns
+
+
+def _read_manifest(directory: Path) -> Optional[dict]:
+    try:
+        manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    expected = [name for name, *_ in FACT_COLUMNS]
+    if manifest.get("format") != FORMAT_VERSION or list(manifest.get("columns", {})) != expected:
+        return None
+    return manifest
+
+
+def _write_snapshot(
+    directory: Path,
+    columns: Dict[str, np.ndarray],
+    encoders: Dict[str, _CategoryEncoder],
+    max_prediction_id: int,
+    data_version: Optional[str] = None
+) -> dict:
+    """新しい世代のディレクトリに列を書き、manifest.json を置き換える"""
+    directory.mkdir(parents=True, exist_ok=True)
+    generation = f"gen-{time.time_ns()}"
+    generation_dir = directory / generation
+    generation_dir.mkdir()
+
+    column_meta = {}
+    for name, _, kind, dtype, _ in FACT_COLUMNS:
+        array = columns[name]
+        meta = {"kind": kind}
+        if kind == "category":
+            categories = encoders[name].categories
+            array = array.astype(_code_dtype(len(categories)))
+            meta["categories"] = categories
+        np.save(generation_dir / f"{name}.npy", array, allow_pickle=False)
+        meta["dtype"] = str(array.dtype)
+        column_meta[name] = meta
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "generation": generation,
+        "rows": int(len(columns["prediction_id"])),
+        "max_prediction_id": int(max_prediction_id),
+        "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "data_version": data_version,
+        "columns": column_meta,
+    }
+    tmp_path = directory / f"{MANIFEST_NAME}.{os.getpid()}.tmp"
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, directory / MANIFEST_NAME)
+
+    # 古い世代を削除（読み込み中でメモリマップが残っていて消せない場合は次回に回す）
+    for path in directory.glob("gen-*"):
+        if path.name != generation:
+            shutil.rmtree(path, ignore_errors=True)
+
+    return manifest
+
+
+def rebuild_prediction_facts(
+    conn: sqlite3.Connection,
+    directory: Union[str, Path],
+    data_version: Optional[str] = None
+) -> dict:
+    """
+    スナップショットを全件再構築
+
+    Returns:
+        manifest（行数・世代・列の型）
+    """
+    ensure_prediction_facts(conn)
+    cursor = conn.cursor()
+
+    max_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0]
+    encoders = {name: _CategoryEncoder() for name, _, kind, *_ in FACT_COLUMNS if kind == "category"}
+    cursor.execute(FACT_QUERY + " WHERE p.id <= ? ORDER BY p.id", (max_id,))
+    columns = _read_facts(cursor, encoders)
+
+    cursor.execute(f"DELETE FROM {DIRTY_TABLE}")
+    manifest = _write_snapshot(Path(directory), columns, encoders, max_id, data_version)
+    conn.commit()
+    return manifest
+
+
+def refresh_prediction_facts(
+    conn: sqlite3.Connection,
+    directory: Union[str, Path],
+    data_version: Optional[str] = None
+) -> Tuple[dict, int]:
+    """
+    追加・変更があった予想だけを読み直してスナップショットを更新（差分更新）
+
+    スナップショットがない・形式が古い場合は全件構築する
+
+    Returns:
+        (manifest, 読み直した予想数)
+    """
+    directory = Path(directory)
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        manifest = rebuild_prediction_facts(conn, directory, data_version)
+        return manifest, manifest["rows"]
+
+    ensure_prediction_facts(conn)
+    cursor = conn.cursor()
+
+    # 読み直し中に入った変更を取りこぼさないよう、対象を固定してから処理する
+    max_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0]
+    cursor.execute("DROP TABLE IF EXISTS temp.facts_refresh_targets")
+    cursor.execute(f"""
+        CREATE TEMP TABLE facts_refresh_targets AS
+        SELECT prediction_id FROM {DIRTY_TABLE}
+        UNION
+        SELECT id FROM predictions WHERE id > ? AND id <= ?
+    """, (manifest["max_prediction_id"], max_id))
+    target_ids = np.array(
+        [row[0] for row in cursor.execute("SELECT prediction_id FROM temp.facts_refresh_targets")],
+        dtype=np.int64
+    )
+
+    if len(target_ids) == 0:
+        cursor.execute("DROP TABLE temp.facts_refresh_targets")
+        conn.commit()
+        if data_version and manifest.get("data_version") != data_version:
+            manifest["data_version"] = data_version
+            tmp_path = directory / f"{MANIFEST_NAME}.{os.getpid()}.tmp"
+            tmp_path.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, directory / MANIFEST_NAME)
+        return manifest, 0
+
+    encoders = {
+        name: _CategoryEncoder(meta.get("categories", []))
+        for name, meta in manifest["columns"].items() if meta["kind"] == "category"
+    }
+    cursor.execute(FACT_QUERY + " JOIN temp.facts_refresh_targets t ON t.prediction_id = p.id")
+    changed = _read_facts(cursor, encoders)
+
+    # 既存の行から対象の予想を除き、読み直した行を追加して予想ID順に並べる
+    generation_dir = directory / manifest["generation"]
+    current = {name: np.load(generation_dir / f"{name}.npy") for name, *_ in FACT_COLUMNS}
+    keep = ~np.isin(current["prediction_id"], target_ids)
+    columns = {
+        name: np.concatenate([current[name][keep].astype(changed[name].dtype), changed[name]])
+        for name, *_ in FACT_COLUMNS
+    }
+    order = np.argsort(columns["prediction_id"], kind="stable")
+    if not np.array_equal(order, np.arange(len(order))):
+        columns = {name: array[order] for name, array in columns.items()}
+
+    cursor.execute(f"""
+        DELETE FROM {DIRTY_TABLE}
+        WHERE prediction_id IN (SELECT prediction_id FROM temp.facts_refresh_targets)
+    """)
+    cursor.execute("DROP TABLE temp.facts_refresh_targets")
+    manifest = _write_snapshot(directory, columns, encoders, max(max_id, manifest["max_prediction_id"]), data_version)
+    conn.commit()
+    return manifest, len(target_ids)
+
+
+def load_prediction_facts(directory: Union[str, Path]) -> pd.DataFrame:
+    """
+    スナップショットをメモリマップで読み込む（列はコピーせずにファイルを参照する）
+
+    Raises:
+        FileNotFoundError: スナップショットがない
+    """
+    directory = Path(directory)
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"予想ファクトのスナップショットがありません: {directory}")
+
+    generation_dir = directory / manifest["generation"]
+    data = {}
+    for name, meta in manifest["columns"].items():
+        array = np.load(generation_dir / f"{name}.npy", mmap_mode="r")
+        if meta["kind"] == "category":
+            array = pd.Categorical.from_codes(array, categories=meta["categories"])
+        data[name] = array
+
+    facts = pd.DataFrame(data, copy=False)
+    # attrs は派生したDataFrameにもコピーされるため、世代のパスだけを持たせる
+    facts.attrs["generation"] = str(generation_dir)
+    return facts
+
+
+def open_prediction_facts(
+    db_path: Union[str, Path] = "data/keiba.db",
+    directory: Optional[Union[str, Path]] = None,
+    refresh: bool = True
+) -> pd.DataFrame:
+    """
+    スナップショットを最新にしてから読み込む
+
+    データバージョン（backend/data_version.py）が前回の更新時から変わっていなければ
+    DBを開かずにそのまま読み込む
+
+    Args:
+        db_path: データベースパス
+        directory: スナップショットのディレクトリ（省略時は facts_directory(db_path)）
+        refresh: False の場合は更新せずに読み込む
+    """
+    from backend.data_version import read_data_version
+
+    db_path = Path(db_path)
+    directory = Path(directory) if directory else facts_directory(db_path)
+
+    if refresh:
+        if not db_path.exists():
+            raise FileNotFoundError(f"データベースファイルが見つかりません: {db_path}")
+        version = read_data_version(db_path)
+        manifest = _read_manifest(directory)
+        if manifest is None or manifest.get("data_version") != version:
+            conn = sqlite3.connect(db_path)
+            try:
+                refresh_prediction_facts(conn, directory, version)
+            finally:
+                conn.close()
+
+    return load_prediction_facts(directory)
+
+
+def condition_mask(
+    facts: pd.DataFrame,
+    venue: Optional[str] = None,
+    track_type: Optional[str] = None,
+    distances: Optional[List[int]] = None,
+    grade: Optional[str] = None
+) -> np.ndarray:
+    """検索条件に合う行のマスク（condition_cube.build_condition_filter と同じ条件）"""
+    mask = np.ones(len(facts), dtype=bool)
+
+    if venue:
+        mask &= (facts["venue"] == venue).to_numpy()
+    if track_type:
+        mask &= (facts["track_type"] == track_type).to_numpy()
+    if distances:
+        mask &= np.isin(facts["distance"].to_numpy(), distances)
+    if grade:
+        if grade in ['G1', 'G2', 'G3']:
+            mask &= (facts["grade"] == grade).to_numpy()
+        elif grade == 'オープン':
+            mask &= facts["is_grade_race"].to_numpy() == 1
+        elif grade == '一般':
+            mask &= facts["is_grade_race"].to_numpy() != 1
+
+    return mask
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    """SQLiteの ROUND() と同じ四捨五入（np.round は偶数への丸め）"""
+    scale = 10.0 ** digits
+    return np.sign(values) * np.floor(np.abs(values) * scale + 0.5) / scale
+
+
+def _key_codes(column: pd.Series, rows: np.ndarray) -> Tuple[np.ndarray, object]:
+    """
+    集計キーの列を 0 始まりの整数コードにする
+
+    Returns:
+        (コード, コード → 値の変換に使う値の配列)
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # NULL（コード -1）も1つのグループとして数える（SQLの GROUP BY と同じ）
+        codes = column.cat.codes.to_numpy()[rows].astype(np.int64) + 1
+        return codes, column.cat.categories
+    codes, values = pd.factorize(column.to_numpy()[rows], sort=True)
+    return codes.astype(np.int64), values
+
+
+def _group_rows(
+    facts: pd.DataFrame,
+    by: Sequence[str],
+    rows: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, list]:
+    """
+    rows の行をキーの列 by でグループ分けする
+
+    Returns:
+        (行ごとのグループ番号, グループごとのキー（昇順）, _decode_keys() に渡す列の情報)
+    """
+    # キーの列ごとのコードを混合基数の1つの整数にまとめる
+    key = np.zeros(len(rows), dtype=np.int64)
+    levels = []
+    for name in by:
+        codes, values = _key_codes(facts[name], rows)
+        size = len(values) + 1
+        key = key * size + codes
+        levels.append((name, values, size))
+
+    group_index, group_keys = pd.factorize(key, sort=True)
+    return group_index, group_keys, levels
+
+
+def _decode_keys(group_keys: np.ndarray, levels: list) -> Dict[str, object]:
+    """まとめた整数を列ごとの値に戻す"""
+    result = {}
+    for name, values, size in reversed(levels):
+        codes = group_keys % size
+        group_keys = group_keys // size
+        if isinstance(values, pd.Index):
+            result[name] = pd.Categorical.from_codes(codes - 1, categories=values)
+        else:
+            result[name] = values[codes]
+    return {name: result[name] for name, _, _ in levels}
+
+
+def summarize(
+    facts: pd.DataFrame,
+    by: Sequence[str],
+    mask: Optional[np.ndarray] = None,
+    min_predictions: int = 1
+) -> pd.DataFrame:
+    """
+    結果ありの予想を by の列で集計（予想数・的中数・的中率・払戻・ROI）
+
+    キーの列をまとめて1つの整数にし、pd.factorize と np.bincount で集計する。
+
+    Args:
+        facts: load_prediction_facts() の結果
+        by: 集計の軸（例: ['predictor_id', 'venue', 'track_type']）
+        mask: 対象の行（condition_mask() の結果など）
+        min_predictions: これより予想数が少ないグループは除く
+
+    Returns:
+        by の列 + SUMMARY_COLUMNS（キーの昇順）
+    """
+    is_hit = facts["is_hit"].to_numpy()
+    selected = is_hit >= 0
+    if mask is not None:
+        selected &= mask
+    rows = np.flatnonzero(selected)
+
+    group_index, group_keys, levels = _group_rows(facts, by, rows)
+    prediction_count = np.bincount(group_index, minlength=len(group_keys))
+    hit_count = np.bincount(group_index, weights=is_hit[rows] == 1, minlength=len(group_keys))
+    total_payout = np.bincount(group_index, weights=facts["payout"].to_numpy()[rows], minlength=len(group_keys))
+    roi = facts["roi"].to_numpy()[rows]
+    has_roi = ~np.isnan(roi)
+    roi_count = np.bincount(group_index, weights=has_roi, minlength=len(group_keys))
+    roi_sum = np.bincount(group_index, weights=np.where(has_roi, roi, 0.0), minlength=len(group_keys))
+
+    keep = prediction_count >= min_predictions
+    group_keys = group_keys[keep]
+    prediction_count = prediction_count[keep]
+    hit_count = hit_count[keep].astype(np.int64)
+    total_payout = np.rint(total_payout[keep]).astype(np.int64)
+    roi_count = roi_count[keep].astype(np.int64)
+    roi_sum = roi_sum[keep]
+
+    result = _decode_keys(group_keys, levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result.update({
+            "prediction_count": prediction_count,
+            "hit_count": hit_count,
+            "hit_rate": _round(hit_count / prediction_count * 100, 2),
+            "total_payout": total_payout,
+            "avg_payout": _round(total_payout / prediction_count, 0),
+            "roi_count": roi_count,
+            "avg_roi": _round(np.where(roi_count > 0, roi_sum / roi_count, np.nan), 2),
+        })
+    return pd.DataFrame(result)
+
+
+def count_by(
+    facts: pd.DataFrame,
+    by: Sequence[str],
+    mask: Optional[np.ndarray] = None
+) -> pd.DataFrame:
+    """
+    予想を by の列で数える（結果のない予想も含む）
+
+    Returns:
+        by の列 + prediction_count（予想数）+ predictor_count（予想家数）
+    """
+    rows = np.arange(len(facts)) if mask is None else np.flatnonzero(mask)
+    group_index, group_keys, levels = _group_rows(facts, by, rows)
+    prediction_count = np.bincount(group_index, minlength=len(group_keys))
+
+    # (グループ, 予想家) の組を数え、グループごとの予想家数にする
+    predictor_codes, predictors = pd.factorize(facts["predictor_id"].to_numpy()[rows])
+    pairs = pd.unique(group_index.astype(np.int64) * (len(predictors) + 1) + predictor_codes)
+    predictor_count = np.bincount(pairs // (len(predictors) + 1), minlength=len(group_keys))
+
+    result = _decode_keys(group_keys, levels)
+    result["prediction_count"] = prediction_count
+    result["predictor_count"] = predictor_count
+    return pd.DataFrame(result)
+
+
+def predictor_names(facts: pd.DataFrame) -> pd.DataFrame:
+    """予想家ID → 名前・netkeiba_id（スナップショットの世代ごとに1回だけ作る）"""
+    generation = facts.attrs.get("generation")
+    names = _predictor_names_cache.get(generation) if generation else None
+    if names is None:
+        names = facts.loc[:, ["predictor_id", "predictor_name", "netkeiba_id"]] \
+            .drop_duplicates("predictor_id", keep="last")
+        names = names.assign(predictor_name=names["predictor_name"].astype(object))
+        if generation:
+            _predictor_names_cache.clear()
+            _predictor_names_cache[generation] = names
+    return names
+
+
+def search_facts(
+    facts: pd.DataFrame,
+    venue: Optional[str] = None,
+    track_type: Optional[str] = None,
+    distances: Optional[List[int]] = None,
+    grade: Optional[str] = None,
+    sort_by: str = 'hit_rate',
+    limit: int = 50,
+    min_predictions: int = 5
+) -> pd.DataFrame:
+    """
+    条件指定検索（列・並び順は condition_cube.search_with_cube と同じ）
+    """
+    mask = condition_mask(facts, venue, track_type, distances, grade)
+    result = summarize(facts, ["predictor_id"], mask, min_predictions)
+
+    result = result.merge(predictor_names(facts), on="predictor_id", how="left")
+
+    order_by = "hit_rate" if sort_by == 'hit_rate' else "avg_roi"
+    result = result.sort_values([order_by, "predictor_id"], ascending=[False, True], na_position="last")
+    columns = ["predictor_id", "predictor_name", "netkeiba_id"] + SUMMARY_COLUMNS
+    return result[columns].head(limit).reset_index(drop=True)
+
+
+def main():
+    """スナップショットの構築・差分更新"""
+    parser = argparse.ArgumentParser(description='予想ファクトの列指向スナップショットの更新')
+    parser.add_argument('--rebuild', action='store_true', help='全件再構築')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--out-dir', type=str, default=None,
+                        help='スナップショットのディレクトリ（デフォルト: DBと同じ場所の analytics/prediction_facts）')
+
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    from backend.data_version import read_data_version
+
+    directory = Path(args.out_dir) if args.out_dir else facts_directory(db_path)
+    conn = sqlite3.connect(db_path)
+
+    start_time = time.time()
+
+    if args.rebuild:
+        manifest = rebuild_prediction_facts(conn, directory, read_data_version(db_path))
+        print(f"✅ スナップショットを再構築しました: {manifest['rows']:,}行")
+    else:
+        manifest, refreshed = refresh_prediction_facts(conn, directory, read_data_version(db_path))
+        print(f"✅ スナップショットを更新しました: {refreshed:,}件の予想を読み直し（全{manifest['rows']:,}行）")
+
+    conn.close()
+
+    size = sum(path.stat().st_size for path in (directory / manifest["generation"]).glob("*.npy"))
+    print(f"   サイズ: {size / 1024 / 1024:.1f}MB（{directory}）")
+    print(f"   処理時間: {time.time() - start_time:.2f}秒")
+
+
+if __name__ == "__main__":
+    project_root = Path(__file__).resolve().parents[2]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    main()
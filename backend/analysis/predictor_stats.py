@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Phase 4.1 補助: 予想家統計テーブル（predictor_stats）の差分更新
+
+backend/models/database.py の PredictorStats のスキーマのまま
+予想家ごとの統計行（stat_type / condition）を保持する
+
+- overall    : 結果が確定した全予想
+- grade_race : 重賞（races.is_grade_race = 1）の予想
+
+- 予想・レース・予想家の変更はトリガーで「要再集計の予想家」として記録
+- refresh_predictor_stats() は記録された予想家の行だけを入れ替える（差分更新）
+- 旧 calculate_basic_stats() が作った独自スキーマのテーブルはORMのスキーマに作り直す
+"""
+
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import argparse
+import sys
+import time
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from backend.models.database import PredictorStats
+
+STATS_TABLE = PredictorStats.__tablename__
+DIRTY_TABLE = "predictor_stats_dirty"
+
+# このモジュールが管理する stat_type（他の stat_type の行には触れない）
+STAT_TYPES = ["overall", "grade_race"]
+
+# 信頼度（サンプル数の下限）
+CONFIDENCE_HIGH = 100
+CONFIDENCE_MEDIUM = 30
+
+CONFIDENCE_LEVEL_SQL = f"""CASE
+            WHEN COUNT(*) >= {CONFIDENCE_HIGH} THEN 'high'
+            WHEN COUNT(*) >= {CONFIDENCE_MEDIUM} THEN 'medium'
+            ELSE 'low'
+        END"""
+
+# 的中率・回収率は BASIC_STATS_QUERY（calculate_basic_stats.py）と同じ式・丸めで計算する
+STATS_ROWS_QUERY = f"""
+    SELECT
+        p.predictor_id,
+        'overall',
+        NULL,
+        COUNT(*),
+        ROUND(AVG(CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END) * 100, 2),
+        ROUND(AVG(p.roi), 2),
+        {CONFIDENCE_LEVEL_SQL},
+        :updated_at
+    FROM predictions p
+    WHERE p.is_hit IS NOT NULL
+      {{predictor_filter}}
+    GROUP BY p.predictor_id
+
+    UNION ALL
+
+    SELECT
+        p.predictor_id,
+        'grade_race',
+        NULL,
+        COUNT(*),
+        ROUND(AVG(CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END) * 100, 2),
+        ROUND(AVG(p.roi), 2),
+        {CONFIDENCE_LEVEL_SQL},
+        :updated_at
+    FROM predictions p
+    JOIN races r ON r.id = p.race_id
+    WHERE p.is_hit IS NOT NULL
+      AND r.is_grade_race = 1
+      {{predictor_filter}}
+    GROUP BY p.predictor_id
+"""
+
+STATS_COLUMNS = (
+    "predictor_id, stat_type, condition, sample_size, hit_rate, roi, confidence_level, updated_at"
+)
+
+
+def _now() -> str:
+    """SQLAlchemy の DateTime 列と同じ形式の文字列"""
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _create_orm_table(cursor: sqlite3.Cursor) -> None:
+    """PredictorStats のモデル定義どおりにテーブルとインデックスを作成"""
+    table = PredictorStats.__table__
+    dialect = sqlite_dialect.dialect()
+
+    cursor.execute(str(CreateTable(table).compile(dialect=dialect)))
+    for index in sorted(table.indexes, key=lambda i: i.name):
+        cursor.execute(str(CreateIndex(index).compile(dialect=dialect)))
+
+
+def ensure_predictor_stats(conn: sqlite3.Connection) -> bool:
+    """
+    統計テーブルと変更検知トリガーを作成
+
+    旧 calculate_basic_stats() の独自スキーマ（stat_type 列がない）のテーブルは
+    削除してモデル定義のスキーマで作り直す
+
+    Returns:
+        全件構築が必要な場合True（新規作成・作り直し・変更検知の開始前）
+    """
+    cursor = conn.cursor()
+
+    cursor.execute(f"PRAGMA table_info({STATS_TABLE})")
+    columns = {row[1] for row in cursor.fetchall()}
+    if columns and 'stat_type' not in columns:
+        cursor.execute(f"DROP TABLE {STATS_TABLE}")
+        columns = set()
+    if not columns:
+        _create_orm_table(cursor)
+
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (DIRTY_TABLE,)
+    )
+    created = not columns or cursor.fetchone() is None
+
+    cursor.executescript(f"""
+    CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (
+        predictor_id INTEGER PRIMARY KEY
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_predictions_insert
+    AFTER INSERT ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (NEW.predictor_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_predictions_update
+    AFTER UPDATE OF predictor_id, race_id, is_hit, roi ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (OLD.predictor_id);
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (NEW.predictor_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_predictions_delete
+    AFTER DELETE ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (OLD.predictor_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_races_update
+    AFTER UPDATE OF is_grade_race ON races
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id)
+        SELECT DISTINCT predictor_id FROM predictions WHERE race_id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_races_delete
+    AFTER DELETE ON races
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id)
+        SELECT DISTINCT predictor_id FROM predictions WHERE race_id = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_predictors_delete
+    AFTER DELETE ON predictors
+    BEGIN
+        INSERT OR IGNORE INTO {DIRTY_TABLE} (predictor_id) VALUES (OLD.id);
+    END;
+    """)
+
+    conn.commit()
+
+    return created
+
+
+def _insert_stats_rows(cursor: sqlite3.Cursor, predictor_filter: str = "") -> None:
+    """predictions（⨝ races）を予想家ごとに集計して統計行を挿入"""
+    cursor.execute(
+        f"INSERT INTO {STATS_TABLE} ({STATS_COLUMNS}) "
+        + STATS_ROWS_QUERY.format(predictor_filter=predictor_filter),
+        {'updated_at': _now()}
+    )
+
+
+def _stat_type_filter() -> str:
+    return ", ".join(f"'{stat_type}'" for stat_type in STAT_TYPES)
+
+
+def rebuild_predictor_stats(conn: sqlite3.Connection) -> int:
+    """
+    統計行を全件再構築
+
+    Returns:
+        統計の行数
+    """
+    ensure_predictor_stats(conn)
+    cursor = conn.cursor()
+
+    cursor.execute(f"DELETE FROM {STATS_TABLE} WHERE stat_type IN ({_stat_type_filter()})")
+    _insert_stats_rows(cursor)
+    cursor.execute(f"DELETE FROM {DIRTY_TABLE}")
+    conn.commit()
+
+    cursor.execute(f"SELECT COUNT(*) FROM {STATS_TABLE} WHERE stat_type IN ({_stat_type_filter()})")
+    return cursor.fetchone()[0]
+
+
+def refresh_predictor_stats(conn: sqlite3.Connection) -> int:
+    """
+    変更があった予想家のみ統計行を再集計（差分更新）
+
+    テーブルが未作成・旧スキーマの場合は全件構築する
+
+    Returns:
+        再集計した予想家数
+    """
+    if ensure_predictor_stats(conn):
+        rebuild_predictor_stats(conn)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(DISTINCT predictor_id) FROM {STATS_TABLE}")
+        return cursor.fetchone()[0]
+
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {DIRTY_TABLE}")
+    dirty_count = cursor.fetchone()[0]
+
+    if dirty_count == 0:
+        return 0
+
+    # 再集計中に入った変更を取りこぼさないよう、対象を固定してから処理する
+    cursor.execute("DROP TABLE IF EXISTS temp.stats_refresh_targets")
+    cursor.execute(f"""
+        CREATE TEMP TABLE stats_refresh_targets AS
+        SELECT predictor_id FROM {DIRTY_TABLE}
+    """)
+    cursor.execute(f"""
+        DELETE FROM {STATS_TABLE}
+        WHERE stat_type IN ({_stat_type_filter()})
+          AND predictor_id IN (SELECT predictor_id FROM temp.stats_refresh_targets)
+    """)
+    _insert_stats_rows(
+        cursor,
+        "AND p.predictor_id IN (SELECT predictor_id FROM temp.stats_refresh_targets)"
+    )
+    cursor.execute(f"""
+        DELETE FROM {DIRTY_TABLE}
+        WHERE predictor_id IN (SELECT predictor_id FROM temp.stats_refresh_targets)
+    """)
+    cursor.execute("DROP TABLE temp.stats_refresh_targets")
+    conn.commit()
+
+    return dirty_count
+
+
+def main():
+    """統計テーブルの構築・差分更新"""
+    parser = argparse.ArgumentParser(description='予想家統計テーブル（predictor_stats）の更新')
+    parser.add_argument('--rebuild', action='store_true', help='統計を全件再構築')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    conn = sqlite3.connect(db_path)
+
+    start_time = time.time()
+
+    if args.rebuild:
+        row_count = rebuild_predictor_stats(conn)
+        print(f"✅ 統計を再構築しました: {row_count:,}行")
+    else:
+        refreshed = refresh_predictor_stats(conn)
+        print(f"✅ 統計を更新しました: {refreshed:,}人の予想家を再集計")
+
+    print(f"   処理時間: {time.time() - start_time:.2f}秒")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,13 @@ from pathlib import Path
 from typing import Optional, List, Dict, Any
 import sys
 
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.analysis.prediction_facts import open_prediction_facts, search_facts
+
 # 最小予想数（固定値）
 MIN_PREDICTIONS = 5
 
@@ -42,71 +49,19 @@ def search_predictors(
         print("❌ エラー: data/keiba.db が見つかりません")
         sys.exit(1)
     
-    conn = sqlite3.connect(db_path)
-    
-    # WHERE句を構築
-    where_clauses = []
-    params = []
-    
-    if venue:
-        where_clauses.append("r.venue = ?")
-        params.append(venue)
-    
-    if track_type:
-        where_clauses.append("r.track_type = ?")
-        params.append(track_type)
-    
-    if distances:
-        # 複数の距離をORで結合
-        distance_placeholders = ','.join(['?'] * len(distances))
-        where_clauses.append(f"r.distance IN ({distance_placeholders})")
-        params.extend(distances)
-    
-    if grade:
-        if grade in ['G1', 'G2', 'G3']:
-            where_clauses.append("r.grade = ?")
-            params.append(grade)
-        elif grade == 'オープン':
-            where_clauses.append("r.is_grade_race = 1")
-        elif grade == '一般':
-            where_clauses.append("(r.is_grade_race = 0 OR r.is_grade_race IS NULL)")
-    
-    # WHERE句を結合
-    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
-    
-    # ソート基準
-    order_by = "hit_rate DESC" if sort_by == 'hit_rate' else "avg_roi DESC"
-    
-    # クエリ実行
-    query = f"""
-    SELECT 
-        pred.id as predictor_id,
-        pred.name as predictor_name,
-        pred.netkeiba_id,
-        COUNT(*) as prediction_count,
-        SUM(CASE WHEN p.is_hit = 1 THEN 1 ELSE 0 END) as hit_count,
-        ROUND(AVG(CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END) * 100, 2) as hit_rate,
-        SUM(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END) as total_payout,
-        ROUND(AVG(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END), 0) as avg_payout,
-        COUNT(CASE WHEN p.roi IS NOT NULL THEN 1 END) as roi_count,
-        ROUND(AVG(CASE WHEN p.roi IS NOT NULL THEN p.roi ELSE NULL END), 2) as avg_roi
-    FROM predictors pred
-    JOIN predictions p ON pred.id = p.predictor_id
-    JOIN races r ON p.race_id = r.id
-    WHERE {where_sql}
-      AND p.is_hit IS NOT NULL
-    GROUP BY pred.id
-    HAVING prediction_count >= ?
-    ORDER BY {order_by}
-    LIMIT ?
-    """
-    
-    params.extend([MIN_PREDICTIONS, limit])
-    
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
-    
-    return df
+    # 予想ファクトのスナップショットを集計（SQLで毎回結合しない）
+    facts = open_prediction_facts(db_path)
+    
+    return search_facts(
+        facts,
+        venue=venue,
+        track_type=track_type,
+        distances=distances,
+        grade=grade,
+        sort_by=sort_by,
+        limit=limit,
+        min_predictions=MIN_PREDICTIONS
+    )
 
 
 def display_search_results(
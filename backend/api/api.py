@@ -4,18 +4,34 @@ Phase 4.3: FastAPI実装
 条件指定検索機能をWeb APIとして提供
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Optional, List
 import sqlite3
-import pandas as pd
+import json
 from pathlib import Path
 import sys
+import os
+import threading
+
+# プロジェクトルートをsys.pathに追加（python backend/api/api.py で起動した場合の対策）
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.analysis.condition_cube import fetch_search_rows
+from backend.api.db_pool import ReadOnlyConnectionPool
+from backend.api.response_cache import ResponseCache
 
 # 最小予想数（固定値）
 MIN_PREDICTIONS = 5
 
+# データベースパスとコネクションプールの接続数
+# SQLiteのクエリはCPUバウンドなので、同時実行数はコア数程度に抑える
+DB_PATH = Path('data/keiba.db')
+DB_POOL_SIZE = min(8, os.cpu_count() or 1)
+
 # FastAPIアプリケーション
 app = FastAPI(
     title="競馬予想家分析API",
@@ -58,6 +74,11 @@ class PredictorResult(BaseModel):
     roi_count: int
     avg_roi: Optional[float]
 
+# 検索SQLの列順（condition_cube の検索クエリと一致させる）
+PREDICTOR_RESULT_FIELDS = list(PredictorResult.model_fields)
+HIT_RATE_INDEX = PREDICTOR_RESULT_FIELDS.index("hit_rate")
+PREDICTION_COUNT_INDEX = PREDICTOR_RESULT_FIELDS.index("prediction_count")
+
 class SearchResponse(BaseModel):
     """検索レスポンス"""
     total_count: int = Field(..., description="該当予想家数")
@@ -78,14 +99,37 @@ class OptionsResponse(BaseModel):
 # ヘルパー関数
 # ========================================
 
-def get_db_connection():
-    """データベース接続を取得"""
-    db_path = Path('data/keiba.db')
+# /api/options, /api/stats のレスポンスキャッシュ
+response_cache = ResponseCache()
+
+_db_pool: Optional[ReadOnlyConnectionPool] = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> ReadOnlyConnectionPool:
+    """読み取り専用コネクションプールを取得（初回呼び出し時に作成）"""
+    global _db_pool
     
-    if not db_path.exists():
-        raise HTTPException(status_code=500, detail="データベースが見つかりません")
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                if not DB_PATH.exists():
+                    raise HTTPException(status_code=500, detail="データベースが見つかりません")
+                pool = ReadOnlyConnectionPool(DB_PATH, size=DB_POOL_SIZE)
+                # 最初の接続でWALファイルが作られるため、ここで1本開いてプールに残しておく
+                # （データバージョンがWALファイルの更新時刻を含むので、初回検索で変わらないように）
+                with pool.connection() as conn:
+                    conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+                _db_pool = pool
+    
+    return _db_pool
+
+def get_db_connection():
+    """
+    データベース接続を取得
     
-    return sqlite3.connect(db_path)
+    with get_db_connection() as conn: の形で使い、抜けるとプールに返却される
+    """
+    return get_db_pool().connection()
 
 def search_predictors_internal(
     venue: Optional[str],
@@ -94,74 +138,66 @@ def search_predictors_internal(
     grade: Optional[str],
     sort_by: str,
     limit: int
-) -> pd.DataFrame:
+) -> List[tuple]:
     """
     内部用の検索関数
-    """
-    
-    conn = get_db_connection()
     
-    # WHERE句を構築
-    where_clauses = []
-    params = []
-    
-    if venue:
-        where_clauses.append("r.venue = ?")
-        params.append(venue)
-    
-    if track_type:
-        where_clauses.append("r.track_type = ?")
-        params.append(track_type)
-    
-    if distances:
-        distance_placeholders = ','.join(['?'] * len(distances))
-        where_clauses.append(f"r.distance IN ({distance_placeholders})")
-        params.extend(distances)
+    集計は backend/analysis/condition_cube.py のキューブ（事前集計）を優先して使う
+    行は PredictorResult のフィールド順のタプルで返す（pandasは経由しない）
+    """
     
-    if grade:
-        if grade in ['G1', 'G2', 'G3']:
-            where_clauses.append("r.grade = ?")
-            params.append(grade)
-        elif grade == 'オープン':
-            where_clauses.append("r.is_grade_race = 1")
-        elif grade == '一般':
-            where_clauses.append("(r.is_grade_race = 0 OR r.is_grade_race IS NULL)")
+    # 条件別集計キューブが最新ならロールアップ、そうでなければ直接集計
+    with get_db_connection() as conn:
+        columns, rows = fetch_search_rows(
+            conn,
+            venue=venue,
+            track_type=track_type,
+            distances=distances,
+            grade=grade,
+            sort_by=sort_by,
+            limit=limit,
+            min_predictions=MIN_PREDICTIONS
+        )
     
-    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+    if columns != PREDICTOR_RESULT_FIELDS:
+        raise RuntimeError(f"検索結果の列が PredictorResult と一致しません: {columns}")
     
-    # ソート基準
-    order_by = "hit_rate DESC" if sort_by == 'hit_rate' else "avg_roi DESC"
+    return rows
+
+def encode_search_response(rows: List[tuple]) -> bytes:
+    """
+    検索結果の行タプルから SearchResponse 形式のJSONを直接作成
     
-    # クエリ実行
-    query = f"""
-    SELECT 
-        pred.id as predictor_id,
-        pred.name as predictor_name,
-        pred.netkeiba_id,
-        COUNT(*) as prediction_count,
-        SUM(CASE WHEN p.is_hit = 1 THEN 1 ELSE 0 END) as hit_count,
-        ROUND(AVG(CASE WHEN p.is_hit = 1 THEN 1.0 ELSE 0.0 END) * 100, 2) as hit_rate,
-        SUM(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END) as total_payout,
-        ROUND(AVG(CASE WHEN p.payout IS NOT NULL THEN p.payout ELSE 0 END), 0) as avg_payout,
-        COUNT(CASE WHEN p.roi IS NOT NULL THEN 1 END) as roi_count,
-        ROUND(AVG(CASE WHEN p.roi IS NOT NULL THEN p.roi ELSE NULL END), 2) as avg_roi
-    FROM predictors pred
-    JOIN predictions p ON pred.id = p.predictor_id
-    JOIN races r ON p.race_id = r.id
-    WHERE {where_sql}
-      AND p.is_hit IS NOT NULL
-    GROUP BY pred.id
-    HAVING prediction_count >= ?
-    ORDER BY {order_by}
-    LIMIT ?
+    行ごとのPydanticモデル生成・検証を省く。SQLiteの集計結果は既に
+    PredictorResult の型（整数列はint、ROUND()列はfloat、avg_roiはfloat/None）で返るため、
+    キャストは不要
     """
     
-    params.extend([MIN_PREDICTIONS, limit])
+    predictors = []
+    hit_rate_sum = 0.0
+    max_hit_rate = 0.0
+    total_predictions = 0
     
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
+    for row in rows:
+        predictors.append(dict(zip(PREDICTOR_RESULT_FIELDS, row)))
+        hit_rate = row[HIT_RATE_INDEX]
+        hit_rate_sum += hit_rate
+        if hit_rate > max_hit_rate:
+            max_hit_rate = hit_rate
+        total_predictions += row[PREDICTION_COUNT_INDEX]
     
-    return df
+    content = {
+        "total_count": len(rows),
+        "avg_hit_rate": hit_rate_sum / len(rows) if rows else 0.0,
+        "max_hit_rate": float(max_hit_rate),
+        "total_predictions": total_predictions,
+        "predictors": predictors
+    }
+    
+    # FastAPI の JSONResponse と同じ設定でエンコード
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
 
 # ========================================
 # エンドポイント
@@ -177,67 +213,78 @@ async def root():
     }
 
 @app.get("/api/options", response_model=OptionsResponse)
-async def get_options():
+def get_options(request: Request):
     """
     検索条件の選択肢を取得
+    
+    DBアクセスはブロッキングのため、同期関数にしてFastAPIのスレッドプールで実行する
+    データバージョンが変わるまではキャッシュを返す（ETag対応）
     """
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        def build():
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
         
-        # 競馬場
-        cursor.execute("""
-            SELECT DISTINCT venue 
-            FROM races 
-            WHERE venue IS NOT NULL AND venue != '不明'
-            ORDER BY venue
-        """)
-        venues = [row[0] for row in cursor.fetchall()]
+                # 競馬場
+                cursor.execute("""
+                    SELECT DISTINCT venue 
+                    FROM races 
+                    WHERE venue IS NOT NULL AND venue != '不明'
+                    ORDER BY venue
+                """)
+                venues = [row[0] for row in cursor.fetchall()]
         
-        # コース種別
-        cursor.execute("""
-            SELECT DISTINCT track_type 
-            FROM races 
-            WHERE track_type IS NOT NULL AND track_type != '不明'
-            ORDER BY track_type
-        """)
-        track_types = [row[0] for row in cursor.fetchall()]
+                # コース種別
+                cursor.execute("""
+                    SELECT DISTINCT track_type 
+                    FROM races 
+                    WHERE track_type IS NOT NULL AND track_type != '不明'
+                    ORDER BY track_type
+                """)
+                track_types = [row[0] for row in cursor.fetchall()]
         
-        # 距離
-        cursor.execute("""
-            SELECT DISTINCT distance 
-            FROM races 
-            WHERE distance IS NOT NULL AND distance > 0
-            ORDER BY distance
-        """)
-        distances = [row[0] for row in cursor.fetchall()]
+                # 距離
+                cursor.execute("""
+                    SELECT DISTINCT distance 
+                    FROM races 
+                    WHERE distance IS NOT NULL AND distance > 0
+                    ORDER BY distance
+                """)
+                distances = [row[0] for row in cursor.fetchall()]
         
-        # グレード
-        grades = ['G1', 'G2', 'G3', 'オープン', '一般']
+                # グレード
+                grades = ['G1', 'G2', 'G3', 'オープン', '一般']
         
-        conn.close()
+            return OptionsResponse(
+                venues=venues,
+                track_types=track_types,
+                distances=distances,
+                grades=grades,
+                min_predictions=MIN_PREDICTIONS
+            )
         
-        return OptionsResponse(
-            venues=venues,
-            track_types=track_types,
-            distances=distances,
-            grades=grades,
-            min_predictions=MIN_PREDICTIONS
-        )
+        # プール初期化でDB/WALファイルが更新されるため、データバージョンの確認より先に行う
+        get_db_pool()
+        return response_cache.get_or_build("options", DB_PATH, request, build)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/search", response_model=SearchResponse)
-async def search_predictors(request: SearchRequest):
+def search_predictors(request: SearchRequest):
     """
     条件指定による予想家検索
+    
+    limit=500 以上ではレスポンス作成が処理時間の大半を占めるため、
+    DataFrame・Pydanticモデルを経由せずカーソルの行から直接JSONを返す
     """
     
     try:
         # 検索実行
-        df = search_predictors_internal(
+        rows = search_predictors_internal(
             venue=request.venue,
             track_type=request.track_type,
             distances=request.distances,
@@ -246,80 +293,56 @@ async def search_predictors(request: SearchRequest):
             limit=request.limit
         )
         
-        # 結果が空の場合
-        if len(df) == 0:
-            return SearchResponse(
-                total_count=0,
-                avg_hit_rate=0.0,
-                max_hit_rate=0.0,
-                total_predictions=0,
-                predictors=[]
-            )
-        
-        # DataFrameをPydanticモデルに変換
-        predictors = []
-        for _, row in df.iterrows():
-            predictors.append(PredictorResult(
-                predictor_id=int(row['predictor_id']),
-                predictor_name=row['predictor_name'],
-                netkeiba_id=int(row['netkeiba_id']),
-                prediction_count=int(row['prediction_count']),
-                hit_count=int(row['hit_count']),
-                hit_rate=float(row['hit_rate']),
-                total_payout=int(row['total_payout']),
-                avg_payout=float(row['avg_payout']),
-                roi_count=int(row['roi_count']),
-                avg_roi=float(row['avg_roi']) if pd.notna(row['avg_roi']) else None
-            ))
-        
-        return SearchResponse(
-            total_count=len(df),
-            avg_hit_rate=float(df['hit_rate'].mean()),
-            max_hit_rate=float(df['hit_rate'].max()),
-            total_predictions=int(df['prediction_count'].sum()),
-            predictors=predictors
-        )
+        # 行タプルから直接JSONを作る（形式は SearchResponse と同じ）
+        return Response(content=encode_search_response(rows), media_type="application/json")
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/stats")
-async def get_stats():
+def get_stats(request: Request):
     """
     全体統計を取得
+    
+    データバージョンが変わるまではキャッシュを返す（ETag対応）
     """
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        def build():
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
         
-        # 基本統計
-        cursor.execute("SELECT COUNT(*) FROM predictors")
-        total_predictors = cursor.fetchone()[0]
+                # 基本統計
+                cursor.execute("SELECT COUNT(*) FROM predictors")
+                total_predictors = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM predictions")
-        total_predictions = cursor.fetchone()[0]
+                cursor.execute("SELECT COUNT(*) FROM predictions")
+                total_predictions = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM races")
-        total_races = cursor.fetchone()[0]
+                cursor.execute("SELECT COUNT(*) FROM races")
+                total_races = cursor.fetchone()[0]
         
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM races 
-            WHERE track_type IS NOT NULL AND track_type != '不明'
-        """)
-        races_with_detail = cursor.fetchone()[0]
+                cursor.execute("""
+                    SELECT COUNT(*) 
+                    FROM races 
+                    WHERE track_type IS NOT NULL AND track_type != '不明'
+                """)
+                races_with_detail = cursor.fetchone()[0]
         
-        conn.close()
+            return {
+                "total_predictors": total_predictors,
+                "total_predictions": total_predictions,
+                "total_races": total_races,
+                "races_with_detail": races_with_detail,
+                "min_predictions": MIN_PREDICTIONS
+            }
         
-        return {
-            "total_predictors": total_predictors,
-            "total_predictions": total_predictions,
-            "total_races": total_races,
-            "races_with_detail": races_with_detail,
-            "min_predictions": MIN_PREDICTIONS
-        }
+        # プール初期化でDB/WALファイルが更新されるため、データバージョンの確認より先に行う
+        get_db_pool()
+        return response_cache.get_or_build("stats", DB_PATH, request, build)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
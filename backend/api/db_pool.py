@@ -0,0 +1,129 @@
+"""
+API用 SQLite 読み取り専用コネクションプール
+
+- 接続は mode=ro で開き、APIから誤って書き込まないようにする
+- WALモードにしておくことで、スクレイパーの書き込み中も検索が待たされない
+- 各接続はプリペアドステートメントをキャッシュする（cached_statements）
+- check_same_thread=False で、FastAPIのスレッドプールから共有して使う
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from queue import LifoQueue, Empty
+from typing import Iterator, Union
+
+
+class ReadOnlyConnectionPool:
+    """読み取り専用SQLite接続のプール"""
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        size: int = 8,
+        cached_statements: int = 256,
+        timeout: float = 30.0
+    ):
+        """
+        Args:
+            db_path: データベースパス
+            size: プールする接続数の上限
+            cached_statements: 接続ごとにキャッシュするプリペアドステートメント数
+            timeout: 空き接続を待つ最大秒数
+        """
+        self.db_path = Path(db_path)
+        self.size = size
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+
+        self._idle: LifoQueue = LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(size)
+
+        enable_wal(self.db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        """読み取り専用の接続を新規作成"""
+        conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """接続を取得（空きがなければ返却を待つ）"""
+        if not self._semaphore.acquire(timeout=self.timeout):
+            raise TimeoutError("Timed out waiting for a database connection")
+
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        try:
+            with self._lock:
+                self._created += 1
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            self._semaphore.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection):
+        """接続をプールに返却"""
+        try:
+            # 読み取り専用なので通常は不要だが、未完了のトランザクションは破棄する
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except Exception:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+        finally:
+            self._semaphore.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """with文で接続を借りる"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """プール中の接続を全て閉じる"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+def enable_wal(db_path: Union[str, Path]):
+    """
+    データベースをWALモードに切り替える
+
+    journal_mode はファイルに保存されるため、一度切り替えれば以降の接続にも効く
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode.lower() != "wal":
+                conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+    except sqlite3.OperationalError:
+        # 書き込み権限がない場合などは従来のジャーナルモードのまま読み取る
+        pass
@@ -0,0 +1,82 @@
+"""
+API用レスポンスキャッシュ
+
+データバージョン（backend/data_version.py）が変わるまでレスポンスを保持する。
+ETag / If-None-Match にも対応し、変更がなければ 304 Not Modified を返す。
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from backend.data_version import read_data_version
+
+
+class ResponseCache:
+    """データバージョンをキーにしたインプロセスのレスポンスキャッシュ"""
+
+    def __init__(self):
+        # key -> (データバージョン, ETag, JSONエンコード済みの本文)
+        self._entries: Dict[str, Tuple[str, str, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(
+        self,
+        key: str,
+        db_path: Path,
+        request: Request,
+        build: Callable[[], Any]
+    ) -> Response:
+        """
+        キャッシュ済みならそれを、なければ build() の結果をキャッシュして返す
+
+        Args:
+            key: エンドポイントを識別するキー
+            db_path: データバージョンを確認するDBのパス
+            request: If-None-Match ヘッダーの確認用
+            build: レスポンスを作る関数（SQLはここでのみ実行される）
+        """
+        version = read_data_version(db_path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None or entry[0] != version:
+            body = json.dumps(
+                jsonable_encoder(build()), ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            etag = '"' + hashlib.sha1(f"{key}:{version}".encode("utf-8")).hexdigest() + '"'
+            entry = (version, etag, body)
+            with self._lock:
+                self._entries[key] = entry
+
+        _, etag, body = entry
+        # 毎回再検証させる（ブラウザは If-None-Match 付きで問い合わせる）
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if_none_match = _parse_if_none_match(request.headers.get("if-none-match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def clear(self):
+        """キャッシュを全て破棄"""
+        with self._lock:
+            self._entries.clear()
+
+
+def _parse_if_none_match(header: str) -> set:
+    """If-None-Match ヘッダーをETagの集合に分解（弱いETagの W/ は無視して比較）"""
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.add(tag)
+    return tags
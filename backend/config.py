@@ -16,9 +16,14 @@ class Settings(BaseSettings):
     netkeiba_password: Optional[str] = None
     
     # Scraping Settings
-    scraping_delay: int = 3  # リクエスト間隔（秒）
+    scraping_delay: int = 3  # リクエスト間隔（秒）。レスポンスに応じてこの値から自動調整する
+    scraping_min_delay: float = 1.0  # 自動調整するリクエスト間隔の下限（秒）
+    scraping_max_delay: float = 60.0  # 自動調整するリクエスト間隔の上限（秒）
     max_retries: int = 3     # 最大リトライ回数
     request_timeout: int = 30  # タイムアウト（秒）
+    driver_pool_size: int = 1  # 起動しておくヘッドレスChromeの数
+    driver_max_pages: int = 50  # この回数使ったChromeは再起動
+    page_archive_dir: str = "data/archive"  # 取得したページの保存先（空にすると保存しない）
     
     # API Settings
     api_host: str = "0.0.0.0"
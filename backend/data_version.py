@@ -0,0 +1,73 @@
+"""
+データバージョン（DB変更カウンタ）
+
+スクレイパー等の書き込み処理がコミットするたびに bump_data_version() を呼び、
+API側はこの値が変わらない限りキャッシュ済みのレスポンスを返す。
+値はDBと同じディレクトリの小さなファイル（keiba.db.version）に保存するため、
+確認にSQLは不要。
+"""
+import os
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from backend.config import settings
+
+
+def _default_db_path() -> Path:
+    """settings.database_url からSQLiteのファイルパスを取り出す"""
+    return Path(settings.database_url.replace("sqlite:///", "", 1))
+
+
+def data_version_path(db_path: Optional[Union[str, Path]] = None) -> Path:
+    """バージョンファイルのパス"""
+    db_path = Path(db_path) if db_path else _default_db_path()
+    return db_path.with_name(db_path.name + ".version")
+
+
+def bump_data_version(db_path: Optional[Union[str, Path]] = None) -> str:
+    """
+    データバージョンを更新（書き込み処理のコミット後に呼ぶ）
+
+    値は「時刻_プロセスID」の一意な文字列。並行して複数のプロセスが更新しても
+    必ず前と異なる値になる。
+
+    Returns:
+        新しいバージョン
+    """
+    path = data_version_path(db_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    version = f"{time.time_ns()}_{os.getpid()}"
+
+    # 一時ファイルに書いてから置き換え、読み手が途中の状態を見ないようにする
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(version, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+    return version
+
+
+def read_data_version(db_path: Optional[Union[str, Path]] = None) -> str:
+    """
+    現在のデータバージョンを取得
+
+    バージョンファイルに加え、DB本体とWALファイルの更新時刻も含める。
+    bump_data_version() を呼ばない書き込み（手動のスクリプト等）があっても
+    変更を取りこぼさないようにするため。
+    """
+    db_path = Path(db_path) if db_path else _default_db_path()
+    parts = []
+
+    try:
+        parts.append(data_version_path(db_path).read_text(encoding="utf-8").strip())
+    except FileNotFoundError:
+        parts.append("0")
+
+    for path in (db_path, db_path.with_name(db_path.name + "-wal")):
+        try:
+            parts.append(str(path.stat().st_mtime_ns))
+        except FileNotFoundError:
+            parts.append("0")
+
+    return ":".join(parts)
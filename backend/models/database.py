@@ -1,7 +1,7 @@
 """
 データベースモデル
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -12,8 +12,12 @@ Base = declarative_base()
 class Predictor(Base):
     """予想家テーブル"""
     __tablename__ = "predictors"
+    __table_args__ = (
+        # 検索・統計クエリ用のカバリングインデックス（テーブル本体を読まずに済む）
+        Index("ix_predictors_search", "id", "name", "netkeiba_id", "data_reliability"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     netkeiba_id = Column(Integer, unique=True, index=True, nullable=False)
     name = Column(String(100), nullable=False)
     profile = Column(Text, nullable=True)
@@ -26,14 +30,27 @@ class Predictor(Base):
     # リレーション
     predictions = relationship("Prediction", back_populates="predictor", cascade="all, delete-orphan")
     stats = relationship("PredictorStats", back_populates="predictor", cascade="all, delete-orphan")
+    sync_state = relationship("PredictorSyncState", back_populates="predictor", uselist=False,
+                              cascade="all, delete-orphan")
 
 
 class Race(Base):
     """レーステーブル"""
     __tablename__ = "races"
+    __table_args__ = (
+        # 条件指定検索（競馬場・コース種別・距離・グレード）用のカバリングインデックス
+        # 条件はどれか1つだけ指定されることもあるため、それぞれを先頭列にしたものを用意する
+        Index("ix_races_venue", "venue", "track_type", "distance", "grade", "is_grade_race"),
+        Index("ix_races_track_type", "track_type", "distance", "grade", "is_grade_race", "venue"),
+        Index("ix_races_distance", "distance", "grade", "is_grade_race", "venue", "track_type"),
+        Index("ix_races_grade", "grade", "is_grade_race", "venue", "track_type", "distance"),
+        # 予想から作るレースの同一性（日付|競馬場|レース番号|レース名）
+        Index("ix_races_race_key", "race_key", unique=True),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     race_id = Column(String(20), unique=True, index=True, nullable=False)  # netkeibaのレースID
+    race_key = Column(String(200), nullable=True)  # 予想から作るレースの正規化キー（race_identity.py）
     race_name = Column(String(200), nullable=False)
     race_date = Column(DateTime, nullable=False, index=True)
     venue = Column(String(50), nullable=False)  # 競馬場
@@ -48,15 +65,25 @@ class Race(Base):
     # リレーション
     predictions = relationship("Prediction", back_populates="race", cascade="all, delete-orphan")
     result = relationship("RaceResult", back_populates="race", uselist=False, cascade="all, delete-orphan")
+    entries = relationship("RaceEntry", back_populates="race", cascade="all, delete-orphan")
+    payouts = relationship("RacePayout", back_populates="race", cascade="all, delete-orphan")
+    corner_passes = relationship("RaceCornerPass", back_populates="race", cascade="all, delete-orphan")
+    laps = relationship("RaceLap", back_populates="race", cascade="all, delete-orphan")
 
 
 class Prediction(Base):
     """予想テーブル"""
     __tablename__ = "predictions"
+    __table_args__ = (
+        # 集計に使う列（is_hit, payout, roi）まで含めたカバリングインデックス
+        # predictor_id / race_id の単独インデックスを兼ねる
+        Index("ix_predictions_predictor_hit", "predictor_id", "is_hit", "race_id", "payout", "roi"),
+        Index("ix_predictions_race_hit", "race_id", "is_hit", "predictor_id", "payout", "roi"),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    predictor_id = Column(Integer, ForeignKey("predictors.id"), nullable=False, index=True)
-    race_id = Column(Integer, ForeignKey("races.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    predictor_id = Column(Integer, ForeignKey("predictors.id"), nullable=False)
+    race_id = Column(Integer, ForeignKey("races.id"), nullable=False)
     netkeiba_prediction_id = Column(Integer, unique=True, index=True)  # netkeibaの予想ID
     predicted_at = Column(DateTime, nullable=False)
     
@@ -84,7 +111,7 @@ class RaceResult(Base):
     """レース結果テーブル"""
     __tablename__ = "race_results"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     race_id = Column(Integer, ForeignKey("races.id"), nullable=False, unique=True)
     
     # 着順（JSON文字列として保存）
@@ -105,11 +132,97 @@ class RaceResult(Base):
     race = relationship("Race", back_populates="result")
 
 
+class RaceEntry(Base):
+    """出走馬ごとのレース結果テーブル（race_detail_tables.py で書き込む）"""
+    __tablename__ = "race_entries"
+    __table_args__ = (
+        # 予想の本命馬番などからの結合用
+        Index("ix_race_entries_race_horse", "race_id", "horse_number", unique=True),
+        Index("ix_race_entries_horse_name", "horse_name"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    race_id = Column(Integer, ForeignKey("races.id"), nullable=False)
+    horse_number = Column(Integer, nullable=False)       # 馬番
+    bracket = Column(Integer, nullable=True)             # 枠番
+    finish_position = Column(Integer, nullable=True)     # 着順
+    horse_name = Column(String(100), nullable=True)
+    sex_age = Column(String(10), nullable=True)          # 性齢（例: 牡4）
+    jockey_weight = Column(Float, nullable=True)         # 斤量
+    jockey = Column(String(50), nullable=True)
+    finish_time = Column(String(20), nullable=True)      # タイム（例: 2:30.2）
+    finish_seconds = Column(Float, nullable=True)        # タイム（秒）
+    margin = Column(String(20), nullable=True)           # 着差
+    odds = Column(Float, nullable=True)                  # 単勝オッズ
+    popularity = Column(Integer, nullable=True)          # 人気
+    horse_weight = Column(Integer, nullable=True)        # 馬体重
+    weight_change = Column(Integer, nullable=True)       # 馬体重の増減
+    trainer_location = Column(String(10), nullable=True)  # 東 / 西
+    trainer_name = Column(String(50), nullable=True)
+    last_3f = Column(Float, nullable=True)               # 上がり3F（秒）
+    corner_pass = Column(String(50), nullable=True)      # 通過順（例: 1-1-1-1）
+    
+    # リレーション
+    race = relationship("Race", back_populates="entries")
+
+
+class RacePayout(Base):
+    """払い戻しテーブル（1行 = 1つの馬券種の1つの組み合わせ）"""
+    __tablename__ = "race_payouts"
+    __table_args__ = (
+        Index("ix_race_payouts_race_bet", "race_id", "bet_type", "combination", unique=True),
+        Index("ix_race_payouts_bet_payout", "bet_type", "payout"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    race_id = Column(Integer, ForeignKey("races.id"), nullable=False)
+    bet_type = Column(String(20), nullable=False)     # 単勝, 複勝, 枠連, 馬連, ワイド, 馬単, 3連複, 3連単
+    combination = Column(String(50), nullable=False)  # 馬番（枠番）を "-" でつないだもの（馬単・3連単は着順どおり）
+    payout = Column(Integer, nullable=True)           # 100円あたりの払戻金
+    popularity = Column(Integer, nullable=True)       # 人気
+    
+    # リレーション
+    race = relationship("Race", back_populates="payouts")
+
+
+class RaceCornerPass(Base):
+    """コーナー通過順テーブル"""
+    __tablename__ = "race_corner_passes"
+    __table_args__ = (
+        Index("ix_race_corner_passes_race_corner", "race_id", "corner", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    race_id = Column(Integer, ForeignKey("races.id"), nullable=False)
+    corner = Column(Integer, nullable=False)              # 1〜4コーナー
+    passing_order = Column(String(200), nullable=False)   # 例: 13-10,11(2,14)3
+    
+    # リレーション
+    race = relationship("Race", back_populates="corner_passes")
+
+
+class RaceLap(Base):
+    """ラップタイムテーブル（1行 = 1ハロン）"""
+    __tablename__ = "race_laps"
+    __table_args__ = (
+        Index("ix_race_laps_race_lap", "race_id", "lap_number", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    race_id = Column(Integer, ForeignKey("races.id"), nullable=False)
+    lap_number = Column(Integer, nullable=False)       # 1から
+    split_time = Column(Float, nullable=True)          # 区間タイム（秒）
+    cumulative_time = Column(Float, nullable=True)     # 累積タイム（秒）
+    
+    # リレーション
+    race = relationship("Race", back_populates="laps")
+
+
 class PredictorStats(Base):
     """予想家統計テーブル"""
     __tablename__ = "predictor_stats"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     predictor_id = Column(Integer, ForeignKey("predictors.id"), nullable=False, index=True)
     
     stat_type = Column(String(50), nullable=False)  # overall, grade_race, venue, distance等
@@ -124,3 +237,46 @@ class PredictorStats(Base):
     
     # リレーション
     predictor = relationship("Predictor", back_populates="stats")
+
+
+class PredictorSyncState(Base):
+    """予想家ごとの予想履歴の同期状態（backend/scraper/predictor_sync.py）"""
+    __tablename__ = "predictor_sync_state"
+    
+    id = Column(Integer, primary_key=True)
+    predictor_id = Column(Integer, ForeignKey("predictors.id"), nullable=False, unique=True)
+    
+    last_prediction_id = Column(Integer, nullable=True)       # 保存済みの最新の予想ID（高水位点）
+    listed_prediction_count = Column(Integer, nullable=True)  # 前回同期時の予想家一覧の予想数
+    etag = Column(String(200), nullable=True)                 # 予想一覧APIのETag
+    content_hash = Column(String(40), nullable=True)          # 予想一覧APIのレスポンスのSHA-1
+    
+    last_fetched_at = Column(DateTime, nullable=True)  # 最後に予想一覧を取得した時刻
+    last_new_at = Column(DateTime, nullable=True)      # 最後に新しい予想が見つかった時刻
+    
+    # リレーション
+    predictor = relationship("Predictor", back_populates="sync_state")
+
+
+class BatchJob(Base):
+    """バッチ処理のジョブキュー（backend/scraper/job_queue.py）"""
+    __tablename__ = "batch_jobs"
+    __table_args__ = (
+        Index("ix_batch_jobs_queue_key", "queue", "job_key", unique=True),
+        # 取得待ちのジョブを登録順に取り出す
+        Index("ix_batch_jobs_queue_status", "queue", "status", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    queue = Column(String(50), nullable=False)     # race_detail, race_id など
+    job_key = Column(String(100), nullable=False)  # 処理対象（netkeibaのレースIDなど）
+    
+    status = Column(String(20), nullable=False, default="pending")  # pending, in_flight, done, failed
+    attempts = Column(Integer, nullable=False, default=0)           # 取り出した回数
+    lease_owner = Column(String(100), nullable=True)                # 処理中のワーカー（ホスト名:プロセスID）
+    lease_expires_at = Column(DateTime, nullable=True)              # これを過ぎた処理中のジョブは他のワーカーが取り出せる
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -3,24 +3,41 @@
 """
 import requests
 from bs4 import BeautifulSoup
-import time
 from typing import Optional
 from backend.config import settings
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.page_archive import PageArchive, PageNotArchived, archive_response, get_default_archive
+from backend.scraper.rate_limiter import AdaptiveRateLimiter, shared_rate_limiter
 from loguru import logger
 
 
 class BaseScraper:
     """スクレイピングのベースクラス"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        archive: Optional[PageArchive] = None,
+        replay: bool = False,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None
+    ):
+        """
+        Args:
+            archive: 取得したページの保存庫（省略時は設定の保存先）
+            replay: ネットワークに接続せず保存庫のページを使う（待機もしない）
+            rate_limiter: リクエスト間隔の制御（省略時は全スクレイパー共通のもの）
+        """
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
-        self.delay = settings.scraping_delay
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
         self.max_retries = settings.max_retries
         self.timeout = settings.request_timeout
         self.is_logged_in = False
+        self.archive = archive or get_default_archive()
+        self.replay = replay
+        if replay and self.archive is None:
+            raise ValueError("replay mode requires a page archive")
     
     def login(self, username: Optional[str] = None, password: Optional[str] = None) -> bool:
         """netkeibaにログイン"""
@@ -70,33 +87,41 @@ class BaseScraper:
         Returns:
             BeautifulSoupオブジェクト、失敗時はNone
         """
+        if self.replay:
+            try:
+                content = self.archive.latest(url)
+            except PageNotArchived:
+                logger.warning(f"Not archived: {url}")
+                return None
+            with stage_metrics.stage('parse'):
+                return BeautifulSoup(content.decode(encoding, errors='replace'), 'lxml')
+        
         for attempt in range(self.max_retries):
+            # リクエスト間隔はレスポンスに応じて自動調整される（失敗後は間隔が広がる）
+            with stage_metrics.stage('wait'):
+                self.rate_limiter.acquire(url)
             try:
                 logger.info(f"Fetching: {url} (attempt {attempt + 1}/{self.max_retries})")
                 
-                response = self.session.get(url, timeout=self.timeout)
+                with stage_metrics.stage('fetch') as timer:
+                    response = self.session.get(url, timeout=self.timeout)
+                    timer.bytes = len(response.content)
+                self.rate_limiter.observe(url, response)
                 response.encoding = encoding
                 
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'lxml')
-                    
-                    # リクエスト間隔を守る
-                    time.sleep(self.delay)
-                    
-                    return soup
+                    archive_response(self.archive, url, response.content)
+                    with stage_metrics.stage('parse'):
+                        return BeautifulSoup(response.text, 'lxml')
                 else:
                     logger.warning(f"Status code {response.status_code} for {url}")
                     
-            except requests.exceptions.Timeout:
+            except requests.exceptions.Timeout as e:
+                self.rate_limiter.observe(url, error=e)
                 logger.warning(f"Timeout error for {url} (attempt {attempt + 1})")
             except requests.exceptions.RequestException as e:
+                self.rate_limiter.observe(url, error=e)
                 logger.error(f"Request error for {url}: {e}")
-            
-            # リトライ前に待機
-            if attempt < self.max_retries - 1:
-                wait_time = self.delay * (attempt + 1)
-                logger.info(f"Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
         
         logger.error(f"Failed to fetch {url} after {self.max_retries} attempts")
         return None
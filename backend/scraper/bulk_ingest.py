@@ -0,0 +1,253 @@
+"""
+予想家・予想データの一括保存（バルクアップサート）
+
+スクレイピング結果をまとめて受け取り、1トランザクションで保存する。
+
+- 予想家: INSERT ... ON CONFLICT(netkeiba_id) DO UPDATE（executemany）
+- 予想: 一時テーブルに executemany で流し込み、保存済みの予想を除外してから
+  races（temp形式のrace_id）と predictions へ INSERT ... SELECT
+  同じレース（race_identity.race_identity_key が同じ）の予想は1つのレース行を共有する
+- 予想家の集計（total_predictions / grade_race_predictions / data_reliability）は
+  対象の予想家をまとめて1文の UPDATE ... FROM で更新
+
+ORM版（1件ごとのSELECT・flush、予想家ごとのCOUNT）と同じ内容を保存する。
+ただし netkeiba の予想IDがない予想は再取得のたびに重複するため保存しない。
+（ORM版は autoflush=False のため集計が最後の1件を数え漏らしていたが、こちらは実際の件数になる）
+UPDATE ... FROM を使うため SQLite 3.33 以上が必要。
+"""
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from backend.scraper.race_identity import race_identity_key, temp_race_id
+
+
+# データの信頼度の閾値（重賞予想数）
+RELIABILITY_HIGH = 15
+RELIABILITY_MEDIUM = 10
+
+GRADE_RACES = ('G1', 'G2', 'G3')
+
+# 一時テーブル（executescript は途中でコミットしてしまうため1文ずつ実行する）
+_STAGING_SCHEMA = [
+    """
+    CREATE TEMP TABLE IF NOT EXISTS _ingest_predictions (
+        netkeiba_prediction_id INTEGER PRIMARY KEY,
+        predictor_netkeiba_id INTEGER NOT NULL,
+        temp_race_id TEXT NOT NULL,
+        race_key TEXT,
+        race_name TEXT NOT NULL,
+        race_date TEXT NOT NULL,
+        venue TEXT NOT NULL,
+        grade TEXT,
+        is_grade_race INTEGER NOT NULL,
+        is_hit INTEGER,
+        payout INTEGER
+    )
+    """,
+    """
+    CREATE TEMP TABLE IF NOT EXISTS _ingest_predictors (
+        netkeiba_id INTEGER PRIMARY KEY
+    )
+    """,
+]
+
+# 予想家の集計を更新（対象は _ingest_predictors の予想家）
+REFRESH_PREDICTOR_TOTALS_QUERY = f"""
+    UPDATE predictors
+    SET total_predictions = c.total_predictions,
+        grade_race_predictions = c.grade_race_predictions,
+        data_reliability = CASE
+            WHEN c.grade_race_predictions >= {RELIABILITY_HIGH} THEN 'high'
+            WHEN c.grade_race_predictions >= {RELIABILITY_MEDIUM} THEN 'medium'
+            ELSE 'low'
+        END
+    FROM (
+        SELECT pr.id AS predictor_id,
+               COUNT(p.id) AS total_predictions,
+               COUNT(CASE WHEN r.is_grade_race = 1 THEN 1 END) AS grade_race_predictions
+        FROM _ingest_predictors ip
+        JOIN predictors pr ON pr.netkeiba_id = ip.netkeiba_id
+        LEFT JOIN predictions p ON p.predictor_id = pr.id
+        LEFT JOIN races r ON r.id = p.race_id
+        GROUP BY pr.id
+    ) AS c
+    WHERE predictors.id = c.predictor_id
+"""
+
+
+@dataclass
+class IngestStats:
+    """一括保存の結果"""
+    predictors_inserted: int = 0
+    predictors_updated: int = 0
+    predictions_received: int = 0
+    predictions_inserted: int = 0
+    predictions_existing: int = 0  # 保存済みのためスキップ
+    predictions_skipped: int = 0  # レース名・予想IDがない、または予想家が未登録
+
+
+def _format_datetime(value: Optional[datetime]) -> str:
+    """SQLAlchemy の DateTime 列と同じ形式の文字列"""
+    return (value or datetime.utcnow()).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def upsert_predictors(conn: sqlite3.Connection, predictors_data: Iterable[Dict], stats: IngestStats):
+    """
+    予想家をまとめて登録・更新（コミットは呼び出し側）
+
+    Args:
+        conn: DB接続
+        predictors_data: {'netkeiba_id', 'name'} のリスト
+        stats: 結果の集計先
+    """
+    now = _format_datetime(datetime.utcnow())
+    rows = [(p['netkeiba_id'], p['name'], now, now) for p in predictors_data]
+    if not rows:
+        return
+
+    before = conn.execute("SELECT COUNT(*) FROM predictors").fetchone()[0]
+    conn.executemany("""
+        INSERT INTO predictors (netkeiba_id, name, total_predictions, grade_race_predictions,
+                                data_reliability, created_at, updated_at)
+        VALUES (?, ?, 0, 0, 'low', ?, ?)
+        ON CONFLICT(netkeiba_id) DO UPDATE SET
+            name = excluded.name,
+            updated_at = excluded.updated_at
+    """, rows)
+    after = conn.execute("SELECT COUNT(*) FROM predictors").fetchone()[0]
+
+    stats.predictors_inserted += after - before
+    stats.predictors_updated += len(rows) - (after - before)
+
+
+def insert_predictions(conn: sqlite3.Connection, predictions_by_predictor: Dict[int, List[Dict]], stats: IngestStats):
+    """
+    予想をまとめて保存し、対象の予想家の集計を更新（コミットは呼び出し側）
+
+    Args:
+        conn: DB接続
+        predictions_by_predictor: {予想家のnetkeiba_id: PredictionScraper が返す予想のリスト}
+        stats: 結果の集計先
+    """
+    for statement in _STAGING_SCHEMA:
+        conn.execute(statement)
+    conn.execute("DELETE FROM _ingest_predictions")
+    conn.execute("DELETE FROM _ingest_predictors")
+
+    staging = []
+    for predictor_netkeiba_id, predictions_data in predictions_by_predictor.items():
+        for pred_data in predictions_data:
+            stats.predictions_received += 1
+            prediction_id = pred_data.get('prediction_id')
+            if not pred_data.get('race_name') or not prediction_id:
+                stats.predictions_skipped += 1
+                continue
+
+            grade = pred_data.get('grade')
+            race_date = _format_datetime(pred_data.get('race_date'))
+            is_hit = pred_data.get('is_hit')
+            venue = pred_data.get('venue') or '不明'
+            race_key = race_identity_key(pred_data.get('race_date'), venue,
+                                         pred_data.get('race_num'), pred_data['race_name'])
+            staging.append((
+                prediction_id,
+                predictor_netkeiba_id,
+                temp_race_id(race_key) if race_key else f"temp_{predictor_netkeiba_id}_{prediction_id}",
+                race_key,
+                pred_data['race_name'],
+                race_date,
+                venue,
+                grade,
+                1 if grade in GRADE_RACES else 0,
+                None if is_hit is None else int(bool(is_hit)),
+                pred_data.get('payout'),
+            ))
+
+    conn.executemany("INSERT OR IGNORE INTO _ingest_predictors (netkeiba_id) VALUES (?)",
+                     [(netkeiba_id,) for netkeiba_id in predictions_by_predictor])
+    # 同じバッチ内で重複した予想IDは最初の1件だけ
+    conn.executemany("INSERT OR IGNORE INTO _ingest_predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", staging)
+    staged = conn.execute("SELECT COUNT(*) FROM _ingest_predictions").fetchone()[0]
+    stats.predictions_skipped += len(staging) - staged
+
+    # 保存済みの予想・未登録の予想家の予想を除外
+    existing = conn.execute("""
+        DELETE FROM _ingest_predictions
+        WHERE netkeiba_prediction_id IN (SELECT netkeiba_prediction_id FROM predictions)
+    """).rowcount
+    unknown = conn.execute("""
+        DELETE FROM _ingest_predictions
+        WHERE predictor_netkeiba_id NOT IN (SELECT netkeiba_id FROM predictors)
+    """).rowcount
+    stats.predictions_existing += existing
+    stats.predictions_skipped += unknown
+    if unknown:
+        logger.warning(f"{unknown} predictions skipped: predictor not found in database")
+
+    now = _format_datetime(datetime.utcnow())
+
+    # 簡易的なレースを作成（詳細は後で更新）
+    # 同じレースは1行だけ。既に同じ race_key のレースがあれば（race_id 解決済みでも）作らない
+    conn.execute("""
+        INSERT INTO races (race_id, race_key, race_name, race_date, venue, grade, distance, track_type,
+                           is_grade_race, created_at)
+        SELECT temp_race_id, race_key, race_name, MIN(race_date), venue, grade, 0, '不明', is_grade_race, ?
+        FROM _ingest_predictions s
+        WHERE s.race_key IS NULL
+           OR NOT EXISTS (SELECT 1 FROM races r WHERE r.race_key = s.race_key)
+        GROUP BY temp_race_id
+        ON CONFLICT DO NOTHING
+    """, (now,))
+
+    inserted = conn.execute("""
+        INSERT INTO predictions (predictor_id, race_id, netkeiba_prediction_id, predicted_at,
+                                 is_hit, payout, created_at)
+        SELECT pr.id, r.id, s.netkeiba_prediction_id, s.race_date, s.is_hit, s.payout, ?
+        FROM _ingest_predictions s
+        JOIN predictors pr ON pr.netkeiba_id = s.predictor_netkeiba_id
+        JOIN races r ON r.id = COALESCE(
+            (SELECT id FROM races WHERE race_key = s.race_key),
+            (SELECT id FROM races WHERE race_id = s.temp_race_id)
+        )
+        WHERE true
+        ON CONFLICT(netkeiba_prediction_id) DO NOTHING
+    """, (now,)).rowcount
+    stats.predictions_inserted += inserted
+
+    conn.execute(REFRESH_PREDICTOR_TOTALS_QUERY)
+
+    conn.execute("DELETE FROM _ingest_predictions")
+    conn.execute("DELETE FROM _ingest_predictors")
+
+
+def ingest_batch(
+    conn: sqlite3.Connection,
+    predictors_data: Optional[Iterable[Dict]] = None,
+    predictions_by_predictor: Optional[Dict[int, List[Dict]]] = None
+) -> IngestStats:
+    """
+    予想家と予想を1トランザクションで一括保存
+
+    Args:
+        conn: DB接続
+        predictors_data: 予想家のリスト（PredictorListScraper の結果）
+        predictions_by_predictor: {予想家のnetkeiba_id: 予想のリスト}
+
+    Returns:
+        保存結果
+    """
+    stats = IngestStats()
+    try:
+        if predictors_data:
+            upsert_predictors(conn, predictors_data, stats)
+        if predictions_by_predictor:
+            insert_predictions(conn, predictions_by_predictor, stats)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return stats
@@ -0,0 +1,227 @@
+"""
+Selenium（ヘッドレスChrome）ドライバーのプール
+
+起動済みのChromeを使い回し、ページごとの起動・終了のコストをなくす。
+貸し出し時にヘルスチェックを行い、応答しないドライバーや
+一定ページ数を表示したドライバーは作り直す（メモリ増加・状態の蓄積対策）。
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from loguru import logger
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+
+DEFAULT_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+
+
+def build_chrome_options(user_agent: str = DEFAULT_USER_AGENT) -> Options:
+    """ヘッドレスChromeの起動オプションを作成"""
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disable-software-rasterizer')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_argument('--proxy-server="direct://"')
+    chrome_options.add_argument('--proxy-bypass-list=*')
+    chrome_options.add_argument('--start-maximized')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument(f'user-agent={user_agent}')
+    chrome_options.add_argument('--remote-debugging-port=0')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    return chrome_options
+
+
+class PooledDriver:
+    """プール内のドライバーと、その表示ページ数"""
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.pages = 0
+        self.broken = False
+        self.created_at = time.time()
+
+
+class ChromeDriverPool:
+    """起動済みヘッドレスChromeのプール"""
+
+    # 上限まで貸し出し中のとき、空きを待ちながら起動できるか確認し直す間隔（秒）
+    # （他のスレッドが壊れたドライバーを破棄すると、空きは戻らず起動枠だけが空く）
+    checkout_poll_interval = 0.5
+
+    def __init__(
+        self,
+        size: int = 1,
+        max_pages: int = 50,
+        user_agent: str = DEFAULT_USER_AGENT,
+        page_load_timeout: int = 30
+    ):
+        """
+        Args:
+            size: 同時に起動しておくChromeの数
+            max_pages: この回数貸し出したドライバーは作り直す（0なら作り直さない）
+            user_agent: User-Agent
+            page_load_timeout: driver.get のタイムアウト（秒）
+        """
+        self.size = size
+        self.max_pages = max_pages
+        self.user_agent = user_agent
+        self.page_load_timeout = page_load_timeout
+
+        self._idle: queue.Queue = queue.Queue()
+        self._created = 0
+        self._all: List[PooledDriver] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create(self) -> PooledDriver:
+        """Chromeを起動"""
+        try:
+            driver = webdriver.Chrome(options=build_chrome_options(self.user_agent))
+        except Exception as e:
+            logger.error(f"Failed to initialize Chrome driver: {e}")
+            raise
+
+        driver.set_page_load_timeout(self.page_load_timeout)
+        pooled = PooledDriver(driver)
+        with self._lock:
+            self._all.append(pooled)
+        logger.info(f"Selenium Chrome driver started ({len(self._all)}/{self.size})")
+        return pooled
+
+    def _discard(self, pooled: PooledDriver, reason: str):
+        """ドライバーを終了してプールから外す"""
+        logger.debug(f"Recycling Chrome driver ({reason}, pages={pooled.pages})")
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error during driver.quit(): {e}")
+        with self._lock:
+            if pooled in self._all:
+                self._all.remove(pooled)
+            self._created -= 1
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        """ドライバーが応答するか確認"""
+        if pooled.broken:
+            return False
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def _checkout(self) -> PooledDriver:
+        """使えるドライバーを1つ取り出す（空きがなく上限未満なら起動、上限なら空くまで待つ）"""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._create()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                if self._closed:
+                    raise RuntimeError("ChromeDriverPool is closed")
+                try:
+                    pooled = self._idle.get(timeout=self.checkout_poll_interval)
+                except queue.Empty:
+                    continue
+
+            if self.max_pages and pooled.pages >= self.max_pages:
+                self._discard(pooled, "max pages reached")
+                continue
+            if not self._is_healthy(pooled):
+                self._discard(pooled, "health check failed")
+                continue
+            return pooled
+
+    def _checkin(self, pooled: PooledDriver):
+        """ドライバーをプールに戻す"""
+        if pooled.broken or self._closed:
+            self._discard(pooled, "broken" if pooled.broken else "pool closed")
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def driver(self) -> Iterator[webdriver.Chrome]:
+        """
+        ドライバーを借りる
+
+        WebDriverException が発生した場合はそのドライバーを破棄し、次回は新しいChromeを起動する
+
+        使い方:
+            with pool.driver() as driver:
+                driver.get(url)
+        """
+        if self._closed:
+            raise RuntimeError("ChromeDriverPool is closed")
+
+        pooled = self._checkout()
+        pooled.pages += 1
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            pooled.broken = True
+            raise
+        finally:
+            self._checkin(pooled)
+
+    def warm_up(self):
+        """size 個のChromeを先に起動しておく"""
+        started = []
+        try:
+            while True:
+                with self._lock:
+                    if self._created >= self.size:
+                        break
+                started.append(self._checkout())
+        finally:
+            for pooled in started:
+                self._checkin(pooled)
+
+    def close(self, cleanup_processes: bool = False):
+        """
+        全てのドライバーを終了
+
+        Args:
+            cleanup_processes: 残ったChrome/ChromeDriverプロセスも強制終了する（Windowsのみ）
+        """
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled, "pool closed")
+
+        if cleanup_processes and os.name == 'nt':
+            os.system("taskkill /F /IM chromedriver.exe /T >nul 2>&1")
+            os.system("taskkill /F /IM chrome.exe /T >nul 2>&1")
+            logger.debug("Chrome processes cleaned up")
+
+    @property
+    def active_count(self) -> int:
+        """起動中のChromeの数"""
+        with self._lock:
+            return len(self._all)
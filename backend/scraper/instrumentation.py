@@ -0,0 +1,275 @@
+"""
+スクレイピングの段階ごとの所要時間の計測
+
+取得待ち（wait）・HTTP取得（fetch）・Selenium描画（render）・解析（parse）・
+JSON保存（json）・DB更新（db）・コミット（commit）の時間と取得バイト数を記録し、
+p50/p95・1分あたりのページ数を定期的なログ、またはPrometheus形式のテキストで出す。
+実行がリクエスト間隔の待機・ネットワーク・CPU・DBのどれで律速されているかを見分けるために使う。
+
+    with stage_metrics.stage('fetch') as timer:
+        response = session.get(url)
+        timer.bytes = len(response.content)
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+
+# 律速の判定に使う段階の分類（wait はリクエスト間隔を守るための待機）
+STAGE_RESOURCES = {
+    'wait': 'throttle',
+    'fetch': 'network',
+    'render': 'network',
+    'parse': 'cpu',
+    'json': 'db',
+    'db': 'db',
+    'commit': 'db',
+}
+RESOURCE_LABELS = {'throttle': 'リクエスト間隔', 'network': 'ネットワーク', 'cpu': 'CPU', 'db': 'DB'}
+
+# ページ数として数える段階
+PAGE_STAGES = ('fetch', 'render')
+
+
+@dataclass
+class StageSummary:
+    """1段階の集計（StageMetrics.snapshot() の値）"""
+    stage: str
+    count: int
+    errors: int
+    total: float
+    bytes: int
+    p50: float
+    p95: float
+
+
+class StageTimer:
+    """stage() で計測中の段階。取得したバイト数を bytes に設定する"""
+
+    def __init__(self):
+        self.bytes = 0
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    """最近傍順位法による分位点"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class StageMetrics:
+    """スレッドセーフな段階ごとの計測値"""
+
+    def __init__(self, window: int = 2048):
+        """
+        Args:
+            window: 分位点の計算に使う直近のサンプル数（段階ごと）
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """計測値を消して、1分あたりのページ数の起点を今にする"""
+        with self._lock:
+            self._started = time.monotonic()
+            self._counts: Dict[str, int] = {}
+            self._errors: Dict[str, int] = {}
+            self._totals: Dict[str, float] = {}
+            self._bytes: Dict[str, int] = {}
+            self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, stage: str, seconds: float, nbytes: int = 0, error: bool = False):
+        """1回分の所要時間を記録"""
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.window)
+                self._counts[stage] = 0
+                self._errors[stage] = 0
+                self._totals[stage] = 0.0
+                self._bytes[stage] = 0
+            self._samples[stage].append(seconds)
+            self._counts[stage] += 1
+            self._totals[stage] += seconds
+            self._bytes[stage] += nbytes
+            if error:
+                self._errors[stage] += 1
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageTimer]:
+        """with ブロックの所要時間を name の段階として記録（例外で抜けた場合はエラーとして数える）"""
+        timer = StageTimer()
+        start = time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            self.record(name, time.perf_counter() - start, timer.bytes, error=True)
+            raise
+        self.record(name, time.perf_counter() - start, timer.bytes)
+
+    def snapshot(self) -> Dict[str, StageSummary]:
+        """段階ごとの件数・合計時間・p50/p95"""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            return {
+                stage: StageSummary(
+                    stage=stage,
+                    count=self._counts[stage],
+                    errors=self._errors[stage],
+                    total=self._totals[stage],
+                    bytes=self._bytes[stage],
+                    p50=_quantile(values, 0.5),
+                    p95=_quantile(values, 0.95),
+                )
+                for stage, values in samples.items()
+            }
+
+    def elapsed(self) -> float:
+        """計測を始めてからの秒数"""
+        with self._lock:
+            return time.monotonic() - self._started
+
+    def pages_per_minute(self) -> float:
+        """取得（fetch・render）に成功したページ数の1分あたりの平均"""
+        with self._lock:
+            pages = sum(self._counts.get(stage, 0) - self._errors.get(stage, 0) for stage in PAGE_STAGES)
+            elapsed = time.monotonic() - self._started
+        return pages / elapsed * 60 if elapsed > 0 else 0.0
+
+    def bottleneck(self) -> Optional[Tuple[str, float]]:
+        """合計時間が最も長い資源（'throttle'・'network'・'cpu'・'db'）と全体に占める割合"""
+        totals: Dict[str, float] = {}
+        for summary in self.snapshot().values():
+            resource = STAGE_RESOURCES.get(summary.stage)
+            if resource:
+                totals[resource] = totals.get(resource, 0.0) + summary.total
+        overall = sum(totals.values())
+        if not overall:
+            return None
+        resource = max(totals, key=totals.get)
+        return resource, totals[resource] / overall
+
+    def summary_lines(self) -> List[str]:
+        """ログ用の集計（段階ごとに1行 + ページ数・律速している資源）"""
+        snapshot = self.snapshot()
+        overall = sum(summary.total for summary in snapshot.values()) or 1.0
+        lines = []
+        for stage in sorted(snapshot, key=lambda s: -snapshot[s].total):
+            s = snapshot[stage]
+            line = (f"{stage:<6} {s.count:>6}件 | p50 {s.p50:.3f}秒 | p95 {s.p95:.3f}秒 | "
+                    f"計 {s.total:.1f}秒（{s.total / overall * 100:.0f}%）")
+            if s.bytes >= 1024 * 1024:
+                line += f" | {s.bytes / 1024 / 1024:.1f}MB"
+            elif s.bytes:
+                line += f" | {s.bytes / 1024:.0f}KB"
+            if s.errors:
+                line += f" | エラー {s.errors}件"
+            lines.append(line)
+
+        summary = f"{self.pages_per_minute():.1f}ページ/分（{self.elapsed() / 60:.1f}分）"
+        bottleneck = self.bottleneck()
+        if bottleneck:
+            resource, share = bottleneck
+            summary += f" | 律速: {RESOURCE_LABELS[resource]}（{share * 100:.0f}%）"
+        lines.append(summary)
+        return lines
+
+    def log_summary(self, log: Callable[[str], None] = logger.info):
+        """集計をログに出す"""
+        for line in self.summary_lines():
+            log(f"⏱️  {line}")
+
+    def prometheus_text(self, rate_limiter=None) -> str:
+        """
+        Prometheusのテキスト形式
+
+        Args:
+            rate_limiter: AdaptiveRateLimiter を渡すと、ホストごとの間隔・頻度を下げた回数も出す
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP scraper_stage_seconds Time spent in each scraping stage.",
+            "# TYPE scraper_stage_seconds summary",
+        ]
+        for stage, s in sorted(snapshot.items()):
+            lines.append(f'scraper_stage_seconds{{stage="{stage}",quantile="0.5"}} {s.p50:.6f}')
+            lines.append(f'scraper_stage_seconds{{stage="{stage}",quantile="0.95"}} {s.p95:.6f}')
+            lines.append(f'scraper_stage_seconds_sum{{stage="{stage}"}} {s.total:.6f}')
+            lines.append(f'scraper_stage_seconds_count{{stage="{stage}"}} {s.count}')
+        lines += ["# HELP scraper_stage_errors_total Stage runs that raised an exception.",
+                  "# TYPE scraper_stage_errors_total counter"]
+        lines += [f'scraper_stage_errors_total{{stage="{stage}"}} {s.errors}' for stage, s in sorted(snapshot.items())]
+        lines += ["# HELP scraper_stage_bytes_total Bytes fetched in each stage.",
+                  "# TYPE scraper_stage_bytes_total counter"]
+        lines += [f'scraper_stage_bytes_total{{stage="{stage}"}} {s.bytes}' for stage, s in sorted(snapshot.items())]
+        lines += ["# HELP scraper_pages_per_minute Pages fetched per minute since the run started.",
+                  "# TYPE scraper_pages_per_minute gauge",
+                  f"scraper_pages_per_minute {self.pages_per_minute():.3f}"]
+
+        if rate_limiter is not None:
+            metrics = rate_limiter.metrics()
+            lines += ["# HELP scraper_request_interval_seconds Current adaptive request interval per host.",
+                      "# TYPE scraper_request_interval_seconds gauge"]
+            lines += [f'scraper_request_interval_seconds{{host="{host}"}} {m.interval:.3f}'
+                      for host, m in sorted(metrics.items())]
+            lines += ["# HELP scraper_backoffs_total Times the request rate was cut, by reason.",
+                      "# TYPE scraper_backoffs_total counter"]
+            lines += [f'scraper_backoffs_total{{host="{host}",reason="{reason}"}} {count}'
+                      for host, m in sorted(metrics.items()) for reason, count in sorted(m.backoffs.items())]
+        return "\n".join(lines) + "\n"
+
+    def start_reporter(self, every: float = 60.0, log: Callable[[str], None] = logger.info) -> threading.Event:
+        """
+        every 秒ごとに集計をログに出すスレッドを開始
+
+        Returns:
+            セットすると停止するイベント
+        """
+        stop = threading.Event()
+
+        def report():
+            while not stop.wait(every):
+                self.log_summary(log)
+
+        threading.Thread(target=report, daemon=True, name="stage-metrics-reporter").start()
+        return stop
+
+    def serve(self, port: int, host: str = "127.0.0.1", rate_limiter=None) -> ThreadingHTTPServer:
+        """
+        /metrics でPrometheus形式のテキストを返すHTTPサーバーをバックグラウンドで開始
+
+        Returns:
+            サーバー（shutdown() で停止）
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text(rate_limiter).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="stage-metrics-server").start()
+        logger.info(f"Metrics endpoint: http://{host}:{server.server_port}/metrics")
+        return server
+
+
+# 全スクレイパーで共有する計測値
+stage_metrics = StageMetrics()
@@ -0,0 +1,343 @@
+"""
+再開できるバッチ処理のジョブキュー（batch_jobs テーブル）
+
+batch_race_detail.py・batch_update_race_ids*.py の offset/limit のループの代わりに、
+処理対象をDBのキューに登録して少しずつ取り出す。
+
+    pending ──claim──▶ in_flight ──complete──▶ done
+                          │
+                          └──fail──▶ pending（attempts が max_attempts 未満）/ failed
+
+- 取り出したジョブにはワーカーごとのリース（期限）を付ける。期限を過ぎた処理中のジョブは
+  他のワーカーが取り出せるため、プロセスが落ちても次の実行でそのジョブから再開できる
+- 取り出しは BEGIN IMMEDIATE の中で UPDATE ... RETURNING 1文で行い、複数のワーカーが
+  同じDBのキューを同時に処理しても同じジョブを取り出さない
+- 処理結果は1件ごとにコミットするため、中断しても完了済みのジョブはやり直さない
+
+    queue = JobQueue("data/keiba.db", "race_detail")
+    queue.enqueue(race_ids)
+    drain(queue, process_chunk, chunk_size=100)
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from backend.models.database import Base
+
+
+JOB_TABLE = "batch_jobs"
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+JOB_STATUSES = (PENDING, IN_FLIGHT, DONE, FAILED)
+
+# SQLAlchemy の DateTime と同じ形式（文字列の大小で比較できる）
+_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+@dataclass
+class Job:
+    """取り出したジョブ"""
+    id: int
+    key: str
+    attempts: int
+
+
+def ensure_job_table(conn: sqlite3.Connection):
+    """batch_jobs テーブルとインデックスがなければ作成（モデル定義から生成）"""
+    dialect = sqlite_dialect.dialect()
+    table = Base.metadata.tables[JOB_TABLE]
+    conn.execute(str(CreateTable(table, if_not_exists=True).compile(dialect=dialect)))
+    for index in table.indexes:
+        conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now() -> datetime:
+    return datetime.utcnow()
+
+
+def _format(value: datetime) -> str:
+    return value.strftime(_DATETIME_FORMAT)
+
+
+class JobQueue:
+    """SQLiteのテーブルを使ったジョブキュー（1つのDBに名前付きで複数持てる）"""
+
+    def __init__(
+        self,
+        db_path: str,
+        queue: str,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 600,
+        max_attempts: int = 3
+    ):
+        """
+        Args:
+            db_path: データベースパス
+            queue: キューの名前（race_detail, race_id など）
+            worker_id: リースの持ち主（省略時は ホスト名:プロセスID）
+            lease_seconds: 取り出したジョブのリース期間（秒）。heartbeat で延長する
+            max_attempts: 取り出す回数の上限。失敗がこの回数に達したジョブは failed になる
+        """
+        self.db_path = db_path
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+
+        # 結果の記録はパイプラインの保存スレッドからも呼ばれるため、接続をロックで共有する
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            ensure_job_table(self._conn)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, sql: str, params=()) -> Tuple[List[tuple], int]:
+        """
+        1文を書き込みトランザクション（BEGIN IMMEDIATE）で実行してコミット
+
+        Returns:
+            (RETURNING の行, 変更した行数)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(sql, params)
+                rows = cursor.fetchall()
+                rowcount = cursor.rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows, rowcount
+
+    def enqueue(self, keys: Iterable[str]) -> int:
+        """
+        ジョブを登録（登録済みのキーは状態を変えない）
+
+        Returns:
+            新しく登録したジョブ数
+        """
+        now = _format(_now())
+        rows = [(self.queue, str(key), PENDING, now, now) for key in keys]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(f"""
+                    INSERT OR IGNORE INTO {JOB_TABLE} (queue, job_key, status, attempts, created_at, updated_at)
+                    VALUES (?, ?, ?, 0, ?, ?)
+                """, rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.total_changes - before
+
+    def claim(self, limit: int) -> List[Job]:
+        """
+        取得待ちのジョブ（とリースが切れた処理中のジョブ）を登録順に最大 limit 件取り出す
+
+        リースが切れたまま取り出す回数の上限に達していたジョブは failed にする。
+        """
+        now = _now()
+        self._write(f"""
+            UPDATE {JOB_TABLE}
+            SET status = '{FAILED}', lease_owner = NULL, lease_expires_at = NULL,
+                last_error = COALESCE(last_error, 'lease expired'), updated_at = ?
+            WHERE queue = ? AND status = '{IN_FLIGHT}' AND lease_expires_at < ? AND attempts >= ?
+        """, (_format(now), self.queue, _format(now), self.max_attempts))
+
+        rows, _ = self._write(f"""
+            UPDATE {JOB_TABLE}
+            SET status = '{IN_FLIGHT}', lease_owner = ?, lease_expires_at = ?,
+                attempts = attempts + 1, updated_at = ?
+            WHERE id IN (
+                SELECT id FROM {JOB_TABLE}
+                WHERE queue = ?
+                AND (status = '{PENDING}' OR (status = '{IN_FLIGHT}' AND lease_expires_at < ?))
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING id, job_key, attempts
+        """, (self.worker_id, _format(now + self.lease), _format(now), self.queue, _format(now), limit))
+        return sorted((Job(*row) for row in rows), key=lambda job: job.id)
+
+    def heartbeat(self):
+        """このワーカーが処理中のジョブのリースを延長"""
+        now = _now()
+        self._write(f"""
+            UPDATE {JOB_TABLE} SET lease_expires_at = ?, updated_at = ?
+            WHERE queue = ? AND status = '{IN_FLIGHT}' AND lease_owner = ?
+        """, (_format(now + self.lease), _format(now), self.queue, self.worker_id))
+
+    def complete(self, key: str):
+        """ジョブを完了にする"""
+        now = _format(_now())
+        self._write(f"""
+            UPDATE {JOB_TABLE}
+            SET status = '{DONE}', lease_owner = NULL, lease_expires_at = NULL,
+                last_error = NULL, updated_at = ?, finished_at = ?
+            WHERE queue = ? AND job_key = ?
+        """, (now, now, self.queue, str(key)))
+
+    def fail(self, key: str, error: str = "") -> bool:
+        """
+        ジョブの失敗を記録（取り出す回数の上限に達していなければ取得待ちに戻す）
+
+        リースが切れて他のワーカーが取り出したジョブ、記録済みのジョブは変更しない。
+
+        Returns:
+            記録したか
+        """
+        now = _format(_now())
+        _, rowcount = self._write(f"""
+            UPDATE {JOB_TABLE}
+            SET status = CASE WHEN attempts >= ? THEN '{FAILED}' ELSE '{PENDING}' END,
+                lease_owner = NULL, lease_expires_at = NULL, last_error = ?, updated_at = ?,
+                finished_at = CASE WHEN attempts >= ? THEN ? END
+            WHERE queue = ? AND job_key = ? AND status = '{IN_FLIGHT}' AND lease_owner = ?
+        """, (self.max_attempts, error or None, now, self.max_attempts, now, self.queue, str(key), self.worker_id))
+        return rowcount > 0
+
+    def release(self, jobs: Iterable[Job] = None) -> int:
+        """
+        処理していないジョブを取得待ちに戻す（取り出した回数は数えない）
+
+        Args:
+            jobs: 戻すジョブ（省略時はこのワーカーが処理中の全ジョブ）
+
+        Returns:
+            戻したジョブ数
+        """
+        sql = f"""
+            UPDATE {JOB_TABLE}
+            SET status = '{PENDING}', lease_owner = NULL, lease_expires_at = NULL,
+                attempts = MAX(attempts - 1, 0), updated_at = ?
+            WHERE queue = ? AND status = '{IN_FLIGHT}' AND lease_owner = ?
+        """
+        params = [_format(_now()), self.queue, self.worker_id]
+        if jobs is not None:
+            ids = [job.id for job in jobs]
+            if not ids:
+                return 0
+            sql += f" AND id IN ({', '.join('?' * len(ids))})"
+            params += ids
+        return self._write(sql, params)[1]
+
+    def reclaim(self) -> int:
+        """
+        全ワーカーの処理中のジョブを取得待ちに戻す（リースの期限を待たずに再開する）
+
+        他のワーカーが動いていないときだけ使う。
+
+        Returns:
+            戻したジョブ数
+        """
+        return self._write(f"""
+            UPDATE {JOB_TABLE}
+            SET status = '{PENDING}', lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+            WHERE queue = ? AND status = '{IN_FLIGHT}'
+        """, (_format(_now()), self.queue))[1]
+
+    def retry_failed(self) -> int:
+        """
+        失敗したジョブを取得待ちに戻す（取り出した回数も0に戻す）
+
+        Returns:
+            戻したジョブ数
+        """
+        return self._write(f"""
+            UPDATE {JOB_TABLE}
+            SET status = '{PENDING}', attempts = 0, finished_at = NULL, updated_at = ?
+            WHERE queue = ? AND status = '{FAILED}'
+        """, (_format(_now()), self.queue))[1]
+
+    def counts(self) -> Dict[str, int]:
+        """{状態: ジョブ数}"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT status, COUNT(*) FROM {JOB_TABLE} WHERE queue = ? GROUP BY status", (self.queue,)
+            ).fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def failed_jobs(self, limit: int = 10) -> List[tuple]:
+        """[(キー, 最後のエラー)]"""
+        with self._lock:
+            return self._conn.execute(f"""
+                SELECT job_key, last_error FROM {JOB_TABLE}
+                WHERE queue = ? AND status = '{FAILED}'
+                ORDER BY id LIMIT ?
+            """, (self.queue, limit)).fetchall()
+
+
+def drain(
+    queue: JobQueue,
+    process_chunk: Callable[[List[Job]], None],
+    chunk_size: int = 100,
+    limit: Optional[int] = None,
+    pause_seconds: float = 0.0,
+    sleep: Callable[[float], None] = time.sleep
+) -> int:
+    """
+    キューが空になるまでジョブを chunk_size 件ずつ取り出して処理
+
+    process_chunk はジョブごとに queue.complete / queue.fail を呼ぶ。呼ばれないまま
+    戻ったジョブは失敗として記録し、中断（KeyboardInterrupt）時は処理していない
+    ジョブを取得待ちに戻してから例外を送り直す。
+
+    Args:
+        queue: ジョブキュー
+        process_chunk: 取り出したジョブを処理する関数
+        chunk_size: 一度に取り出すジョブ数
+        limit: このワーカーが取り出すジョブ数の上限（省略時はキューが空になるまで）
+        pause_seconds: チャンクの間の休憩（秒）
+        sleep: 休憩に使う関数（カウントダウン表示など）
+
+    Returns:
+        取り出したジョブ数
+    """
+    claimed = 0
+    while limit is None or claimed < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - claimed)
+        jobs = queue.claim(size)
+        if not jobs:
+            break
+        claimed += len(jobs)
+
+        try:
+            process_chunk(jobs)
+        except KeyboardInterrupt:
+            released = queue.release(jobs)
+            logger.warning(f"中断されました。処理していない{released}件を取得待ちに戻しました")
+            raise
+
+        # 結果が記録されなかったジョブ（記録済みのジョブは fail しても変わらない）
+        unfinished = sum(queue.fail(job.key, "no result") for job in jobs)
+        if unfinished:
+            logger.warning(f"結果が記録されなかったジョブ: {unfinished}件")
+
+        if pause_seconds > 0 and (limit is None or claimed < limit) and queue.counts()[PENDING]:
+            sleep(pause_seconds)
+
+    return claimed
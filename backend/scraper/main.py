@@ -1,5 +1,10 @@
 """
 メインスクレイピングスクリプト（--limit, --offset対応版）
+
+予想履歴は差分同期（backend/scraper/predictor_sync.py）で取得する。
+予想家一覧の予想数が前回から変わっていない予想家は取得せず、
+取得した一覧も保存済みの予想に達した時点で解析を打ち切る。
+取得に失敗した予想家は次回の実行で自動的に再取得される。
 """
 import sys
 import os
@@ -11,137 +16,70 @@ if project_root not in sys.path:
 
 from backend.scraper.predictor_list import PredictorListScraper
 from backend.scraper.prediction import PredictionScraper
-from backend.database import SessionLocal, init_db
-from backend.models.database import Predictor, Prediction, Race
+from backend.database import SessionLocal, engine, init_db
+from backend.models.database import Predictor, Prediction
+from backend.data_version import bump_data_version
+from backend.analysis.condition_cube import refresh_condition_cube
+from backend.analysis.predictor_stats import refresh_predictor_stats
+from backend.scraper.bulk_ingest import IngestStats, ingest_batch
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.rate_limiter import shared_rate_limiter
+from backend.scraper.predictor_sync import DEFAULT_MAX_AGE, PredictorSync
 from loguru import logger
+from datetime import timedelta
 import argparse
-from datetime import datetime
+
+
+def _ingest(predictors_data=None, predictions_by_predictor=None) -> IngestStats:
+    """一括保存（SQLAlchemyのエンジンからsqlite3の接続を借りる）"""
+    raw_conn = engine.raw_connection()
+    try:
+        stats = ingest_batch(raw_conn.driver_connection, predictors_data, predictions_by_predictor)
+    finally:
+        raw_conn.close()
+    bump_data_version()
+    return stats
 
 
 def save_predictors(predictors_data: list):
     """予想家情報をデータベースに保存"""
-    db = SessionLocal()
     try:
-        saved_count = 0
-        for predictor_data in predictors_data:
-            # 既存の予想家をチェック
-            existing = db.query(Predictor).filter(
-                Predictor.netkeiba_id == predictor_data['netkeiba_id']
-            ).first()
-            
-            if existing:
-                # 既存の予想家を更新
-                existing.name = predictor_data['name']
-                existing.updated_at = datetime.utcnow()
-                logger.debug(f"Updated predictor: {predictor_data['name']}")
-            else:
-                # 新規予想家を作成
-                predictor = Predictor(
-                    netkeiba_id=predictor_data['netkeiba_id'],
-                    name=predictor_data['name']
-                )
-                db.add(predictor)
-                saved_count += 1
-                logger.debug(f"Created new predictor: {predictor_data['name']}")
-        
-        db.commit()
-        logger.info(f"Saved {saved_count} new predictors to database")
-        
+        stats = _ingest(predictors_data=predictors_data)
+        logger.info(f"Saved {stats.predictors_inserted} new predictors to database "
+                    f"({stats.predictors_updated} updated)")
     except Exception as e:
         logger.error(f"Error saving predictors: {e}")
-        db.rollback()
-    finally:
-        db.close()
 
 
-def save_predictions(predictor_id: int, predictions_data: list):
-    """予想情報をデータベースに保存"""
-    db = SessionLocal()
+def save_predictions(predictor_id: int, predictions_data: list) -> int:
+    """
+    予想情報をデータベースに保存
+    
+    Returns:
+        新たに保存した予想数
+    """
+    return save_predictions_batch({predictor_id: predictions_data})
+
+
+def save_predictions_batch(predictions_by_predictor: dict) -> int:
+    """
+    複数の予想家の予想情報をまとめてデータベースに保存
+    
+    Args:
+        predictions_by_predictor: {予想家のnetkeiba_id: 予想のリスト}
+    
+    Returns:
+        新たに保存した予想数
+    """
     try:
-        saved_count = 0
-        
-        # 予想家を取得
-        predictor = db.query(Predictor).filter(
-            Predictor.netkeiba_id == predictor_id
-        ).first()
-        
-        if not predictor:
-            logger.error(f"Predictor {predictor_id} not found in database")
-            return
-        
-        for pred_data in predictions_data:
-            # レース名がない予想はスキップ
-            if not pred_data.get('race_name'):
-                logger.debug(f"Skipping prediction with no race_name: {pred_data.get('prediction_id')}")
-                continue
-            
-            # 既存の予想をチェック
-            if pred_data.get('prediction_id'):
-                existing = db.query(Prediction).filter(
-                    Prediction.netkeiba_prediction_id == pred_data['prediction_id']
-                ).first()
-                
-                if existing:
-                    logger.debug(f"Prediction {pred_data['prediction_id']} already exists")
-                    continue
-            
-            # レースを作成または取得
-            race = None
-            if pred_data.get('race_name'):
-                # 簡易的なレース作成（詳細は後で更新可能）
-                race = Race(
-                    race_id=f"temp_{predictor_id}_{pred_data.get('prediction_id', 0)}",
-                    race_name=pred_data['race_name'],
-                    race_date=pred_data.get('race_date', datetime.utcnow()),
-                    venue=pred_data.get('venue', '不明'),
-                    grade=pred_data.get('grade'),
-                    distance=0,  # 後で更新
-                    track_type='不明',  # 後で更新
-                    is_grade_race=pred_data.get('grade') in ['G1', 'G2', 'G3']
-                )
-                db.add(race)
-                db.flush()  # IDを取得
-            
-            # 予想を作成
-            prediction = Prediction(
-                predictor_id=predictor.id,
-                race_id=race.id if race else None,
-                netkeiba_prediction_id=pred_data.get('prediction_id'),
-                predicted_at=pred_data.get('race_date', datetime.utcnow()),
-                is_hit=pred_data.get('is_hit'),
-                payout=pred_data.get('payout')
-            )
-            
-            db.add(prediction)
-            saved_count += 1
-        
-        # 予想家の総予想数を更新
-        predictor.total_predictions = db.query(Prediction).filter(
-            Prediction.predictor_id == predictor.id
-        ).count()
-        
-        # 重賞予想数を更新
-        predictor.grade_race_predictions = db.query(Prediction).join(Race).filter(
-            Prediction.predictor_id == predictor.id,
-            Race.is_grade_race == True
-        ).count()
-        
-        # 信頼度を更新
-        if predictor.grade_race_predictions >= 15:
-            predictor.data_reliability = "high"
-        elif predictor.grade_race_predictions >= 10:
-            predictor.data_reliability = "medium"
-        else:
-            predictor.data_reliability = "low"
-        
-        db.commit()
-        logger.info(f"Saved {saved_count} predictions for predictor {predictor_id}")
-        
+        stats = _ingest(predictions_by_predictor=predictions_by_predictor)
     except Exception as e:
-        logger.error(f"Error saving predictions for predictor {predictor_id}: {e}")
-        db.rollback()
-    finally:
-        db.close()
+        logger.error(f"Error saving predictions for predictors {list(predictions_by_predictor)}: {e}")
+        return 0
+    
+    logger.info(f"Saved {stats.predictions_inserted} predictions for {len(predictions_by_predictor)} predictor(s) "
+                f"(existing: {stats.predictions_existing}, skipped: {stats.predictions_skipped})")
+    return stats.predictions_inserted
 
 
 def main():
@@ -151,11 +89,23 @@ def main():
     parser.add_argument('--limit', type=int, default=None, help='処理する予想家の数')
     parser.add_argument('--offset', type=int, default=0, help='開始位置（スキップする予想家の数）')
     parser.add_argument('--test', action='store_true', help='テストモード（最初の5人のみ）')
+    parser.add_argument('--full', action='store_true', help='同期状態に関わらず全員の予想一覧を取得')
+    parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE.days,
+                        help=f'予想数が同じでもこの日数取得していない予想家は取得（デフォルト: {DEFAULT_MAX_AGE.days}）')
+    parser.add_argument('--report-every', type=float, default=60,
+                        help='段階ごとの所要時間（p50/p95）・ページ数/分をログに出す間隔（秒、0で出さない。デフォルト: 60）')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='指定したポートの /metrics でPrometheus形式の計測値を公開')
     
     args = parser.parse_args()
     
+    if args.report_every > 0:
+        stage_metrics.start_reporter(args.report_every)
+    if args.metrics_port is not None:
+        stage_metrics.serve(args.metrics_port, rate_limiter=shared_rate_limiter())
+    
     logger.info("Starting scraping process...")
-    logger.info(f"Arguments: limit={args.limit}, offset={args.offset}, test={args.test}")
+    logger.info(f"Arguments: limit={args.limit}, offset={args.offset}, test={args.test}, full={args.full}")
     
     # データベースを初期化（初回のみ）
     try:
@@ -206,21 +156,52 @@ def main():
     logger.info(f"Processing predictors [{start_idx}:{end_idx}] ({total_count} predictors)")
     logger.info(f"Total predictors in list: {len(predictors)}")
     
-    for i, predictor_data in enumerate(target_predictors, 1):
-        predictor_id = predictor_data['netkeiba_id']
-        predictor_name = predictor_data['name']
-        actual_index = start_idx + i - 1
+    raw_conn = engine.raw_connection()
+    try:
+        sync = PredictorSync(
+            raw_conn.driver_connection,
+            prediction_scraper,
+            limit=50,
+            max_age=timedelta(days=args.max_age_days),
+            force=args.full
+        )
         
-        logger.info(f"[{i}/{total_count}] [index {actual_index}] Processing: {predictor_name} (ID: {predictor_id})")
+        # 予想数が変わっていない予想家は取得しない
+        due_predictors = sync.select_due(target_predictors)
+        logger.info(f"Predictors with new activity: {len(due_predictors)}/{total_count} "
+                    f"(skipped: {total_count - len(due_predictors)})")
+        
+        for i, predictor_data in enumerate(due_predictors, 1):
+            predictor_id = predictor_data['netkeiba_id']
+            predictor_name = predictor_data['name']
+            
+            logger.info(f"[{i}/{len(due_predictors)}] Processing: {predictor_name} (ID: {predictor_id})")
+            
+            # 新しい予想だけを取得して保存
+            saved = sync.sync_predictor(predictor_data)
+            
+            if saved is None:
+                logger.warning(f"Failed to fetch predictions for predictor {predictor_id} (will retry next run)")
+            elif saved:
+                logger.info(f"Saved {saved} new predictions for predictor {predictor_id}")
+                bump_data_version()
         
-        # 予想履歴を取得
-        predictions = prediction_scraper.get_predictor_predictions(predictor_id, limit=50)
+        logger.info(f"Sync: fetched {sync.stats.fetched}, unchanged {sync.stats.unchanged}, "
+                    f"failed {sync.stats.failed}, new predictions {sync.stats.predictions_new}")
         
-        if predictions:
-            # データベースに保存
-            save_predictions(predictor_id, predictions)
-        else:
-            logger.warning(f"No predictions found for predictor {predictor_id}")
+        # 統計テーブル・条件別集計キューブは今回保存した予想の予想家だけ再集計する
+        # （キューブに再集計待ちが残っていると /api/search が直接集計にフォールバックする）
+        with stage_metrics.stage('stats'):
+            refreshed = refresh_predictor_stats(raw_conn.driver_connection)
+            cube_refreshed = refresh_condition_cube(raw_conn.driver_connection)
+        logger.info(f"Refreshed predictor stats for {refreshed} predictors, "
+                    f"condition cube for {cube_refreshed} predictors")
+    finally:
+        raw_conn.close()
+        # 使い回していたChromeを終了
+        prediction_scraper.close()
+    
+    stage_metrics.log_summary()
     
     logger.info("Scraping process completed!")
     logger.info(f"Processed {total_count} predictors [index {start_idx} to {end_idx-1}]")
@@ -0,0 +1,181 @@
+"""
+取得したページの保存庫（コンテンツアドレス方式）
+
+スクレイパーが取得したレスポンス本文をそのまま圧縮して保存し、パーサーを直したときに
+再スクレイピングせずに解析し直せるようにする（replay_archive.py）。
+
+    data/archive/
+        index.db                 取得履歴（URL・取得時刻・本文のSHA-256）
+        blobs/ab/abcdef....gz    本文（gzip）。同じ内容は1つのファイルを共有する
+
+POSTで取得するAPIは、URLにパラメータを付けた文字列（request_key）をURLとして記録する。
+保存先は設定（page_archive_dir）で変更でき、空にすると保存しない。
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlencode
+
+from loguru import logger
+
+from backend.config import settings
+
+
+_INDEX_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS fetches (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL,
+        fetched_at TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        status INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_fetches_url ON fetches (url, fetched_at)",
+]
+
+
+class PageNotArchived(LookupError):
+    """保存庫にページがない（replay時）"""
+
+
+def request_key(url: str, params: Optional[Dict] = None) -> str:
+    """POSTなどURLだけでは区別できないリクエストの記録用URL（パラメータは名前順）"""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+class PageArchive:
+    """取得したページの保存庫"""
+
+    def __init__(self, root: str = "data/archive"):
+        """
+        Args:
+            root: 保存先ディレクトリ
+        """
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+
+        # 取得スレッド（race_detail_pipeline）から共有されるため接続は1本にしてロックで守る
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.root / "index.db", timeout=30, check_same_thread=False)
+        for statement in _INDEX_SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}.gz"
+
+    def put(self, url: str, content: bytes, status: int = 200, fetched_at: Optional[datetime] = None) -> str:
+        """
+        レスポンス本文を保存
+
+        Returns:
+            本文のSHA-256
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            # 書きかけのファイルを読まないよう一時ファイルに書いてから置き換える
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(gzip.compress(content, compresslevel=6))
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO fetches (url, fetched_at, sha256, size, status) VALUES (?, ?, ?, ?, ?)",
+                (url, (fetched_at or datetime.now()).isoformat(), digest, len(content), status)
+            )
+            self._conn.commit()
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        """SHA-256から本文を取得"""
+        return gzip.decompress(self._blob_path(digest).read_bytes())
+
+    def latest(self, url: str) -> bytes:
+        """
+        URLの最新の本文
+
+        Raises:
+            PageNotArchived: 保存されていない
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM fetches WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)
+            ).fetchone()
+        if not row:
+            raise PageNotArchived(url)
+        return self.get_blob(row[0])
+
+    def iter_latest_paths(self, url_prefix: str = "") -> Iterator[Tuple[str, Path]]:
+        """
+        url_prefix で始まるURLごとに最新の本文のファイル（gzip）を返す（URL順）
+
+        本文を読まないため、読み込み・展開を別のプロセスに任せられる
+
+        Yields:
+            (URL, 本文のファイルのパス)
+        """
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT url, MAX(fetched_at), sha256
+                FROM fetches
+                WHERE substr(url, 1, ?) = ?
+                GROUP BY url
+                ORDER BY url
+            """, (len(url_prefix), url_prefix)).fetchall()
+        for url, _, digest in rows:
+            yield url, self._blob_path(digest)
+
+    def iter_latest(self, url_prefix: str = "") -> Iterator[Tuple[str, bytes]]:
+        """
+        url_prefix で始まるURLごとに最新の本文を返す（URL順）
+
+        Yields:
+            (URL, 本文)
+        """
+        for url, path in self.iter_latest_paths(url_prefix):
+            yield url, gzip.decompress(path.read_bytes())
+
+
+_default_archives: Dict[str, PageArchive] = {}
+_default_lock = threading.Lock()
+
+
+def get_default_archive() -> Optional[PageArchive]:
+    """設定の保存先の保存庫（page_archive_dir が空なら None）"""
+    root = settings.page_archive_dir
+    if not root:
+        return None
+    with _default_lock:
+        if root not in _default_archives:
+            try:
+                _default_archives[root] = PageArchive(root)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Page archive disabled ({root}): {e}")
+                return None
+        return _default_archives[root]
+
+
+def archive_response(archive: Optional[PageArchive], url: str, content: bytes, status: int = 200):
+    """保存庫があれば本文を保存（保存の失敗でスクレイピングを止めない）"""
+    if archive is None:
+        return
+    try:
+        archive.put(url, content, status)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Failed to archive {url}: {e}")
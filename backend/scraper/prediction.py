@@ -1,18 +1,27 @@
 """
 予想家の予想履歴を取得するスクレイパー（最終安定版 - ベストプラクティス適用）
+
+予想一覧はプロフィールページのJavaScriptが取得するAPIへ直接リクエストして取得し、
+取得できなかった場合のみSeleniumでページを描画する
 """
+from dataclasses import dataclass
 from typing import List, Dict, Optional
+from backend.config import settings
 from backend.scraper.base import BaseScraper
+from backend.scraper.driver_pool import ChromeDriverPool
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.page_archive import PageArchive, PageNotArchived, archive_response, request_key
+from backend.scraper.rate_limiter import AdaptiveRateLimiter
 from loguru import logger
 from datetime import datetime
 import re
+import json
 import time
-import os
-from selenium import webdriver
+import hashlib
+import requests
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import (
     TimeoutException,
     NoSuchElementException,
@@ -23,83 +32,110 @@ from selenium.common.exceptions import (
 from bs4 import BeautifulSoup
 
 
+# 予想家プロフィールページ
+PROFILE_URL = "https://yoso.sp.netkeiba.com/yosoka/jra/profile.html?id={predictor_id}"
+
+# プロフィールページのJavaScript（YosoGoodsList.ShowGoodsListProfile）が予想一覧のHTMLを取得するAPI
+GOODS_LIST_API_URL = "https://yoso.sp.netkeiba.com/yosoka/jra/api_get_goods_list_prof.html"
+
+# JSONP のコールバック名（レスポンスは callback("<HTML>") の形）
+JSONP_CALLBACK = "jsonp_goods_list"
+
+_JSONP_PATTERN = re.compile(r'^\s*[\w$.]+\s*\((.*)\)\s*;?\s*$', re.DOTALL)
+
+
+def decode_jsonp(text: str) -> str:
+    """
+    JSONP / JSON のレスポンスからHTML文字列を取り出す
+    
+    callback("...") → "..." を JSON として復号する。JSONP でない場合はそのまま返す
+    """
+    match = _JSONP_PATTERN.match(text)
+    payload = match.group(1) if match else text
+    try:
+        value = json.loads(payload)
+    except ValueError:
+        return text
+    return value if isinstance(value, str) else text
+
+
+@dataclass
+class PredictionListPage:
+    """予想一覧APIのレスポンス"""
+    html: Optional[str]  # 予想一覧のHTML（not_modified の場合は None）
+    etag: Optional[str] = None
+    content_hash: Optional[str] = None  # レスポンス本文のSHA-1
+    not_modified: bool = False  # If-None-Match に 304 が返った
+
+
+def prediction_id_of(element) -> Optional[int]:
+    """予想一覧の行（<li id="goods_state_XXXX">）から予想IDを取り出す"""
+    li_id = element.get('id', '')
+    if li_id.startswith('goods_state_'):
+        try:
+            return int(li_id.replace('goods_state_', ''))
+        except ValueError:
+            return None
+    return None
+
+
 class PredictionScraper(BaseScraper):
     """予想家の予想履歴を取得するスクレイパー"""
     
-    def __init__(self):
-        super().__init__()
-        self.driver = None
-        self.retry_count = 3  # リトライ回数
+    # 予想一覧の各行
+    PREDICTION_ITEM_SELECTOR = "div.GensenYosoList ul li.Selectable"
     
-    def _cleanup_chrome_processes(self):
-        """Chrome関連プロセスを完全にクリーンアップ"""
-        try:
-            # ChromeDriverを終了
-            os.system("taskkill /F /IM chromedriver.exe /T >nul 2>&1")
-            time.sleep(1)
-            # Chrome本体も終了
-            os.system("taskkill /F /IM chrome.exe /T >nul 2>&1")
-            time.sleep(1)
-            logger.debug("Chrome processes cleaned up")
-        except Exception as e:
-            logger.warning(f"Error cleaning up Chrome processes: {e}")
+    def __init__(
+        self,
+        driver_pool: Optional[ChromeDriverPool] = None,
+        archive: Optional[PageArchive] = None,
+        replay: bool = False,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None
+    ):
+        """
+        Args:
+            driver_pool: 使い回すChromeのプール（省略時は設定値で作成し、close()で終了する）
+            archive: 取得したページの保存庫（省略時は設定の保存先）
+            replay: ネットワーク・Chromeを使わず保存庫のページを解析する
+            rate_limiter: リクエスト間隔の制御（省略時は全スクレイパー共通のもの）
+        """
+        super().__init__(archive, replay, rate_limiter)
+        self.retry_count = 3  # リトライ回数
+        self._owns_pool = driver_pool is None
+        self._driver_pool = driver_pool
     
-    def _init_driver(self):
-        """Seleniumドライバーを初期化"""
-        if self.driver is None:
-            chrome_options = Options()
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--disable-extensions')
-            chrome_options.add_argument('--disable-software-rasterizer')
-            chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-            chrome_options.add_argument('--proxy-server="direct://"')
-            chrome_options.add_argument('--proxy-bypass-list=*')
-            chrome_options.add_argument('--start-maximized')
-            chrome_options.add_argument('--window-size=1920,1080')
-            chrome_options.add_argument(f'user-agent={self.session.headers["User-Agent"]}')
-            chrome_options.add_argument('--remote-debugging-port=0')
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-            
-            try:
-                self.driver = webdriver.Chrome(options=chrome_options)
-                # 暗黙的な待機を設定（全てのfind_element処理に適用）
-                self.driver.implicitly_wait(10)
-                logger.info("Selenium Chrome driver initialized with implicit wait")
-            except Exception as e:
-                logger.error(f"Failed to initialize Chrome driver: {e}")
-                raise
+    @property
+    def driver_pool(self) -> ChromeDriverPool:
+        """Chromeのプール（Seleniumでの取得が必要になった時点で作成）"""
+        if self._driver_pool is None:
+            self._driver_pool = ChromeDriverPool(
+                size=settings.driver_pool_size,
+                max_pages=settings.driver_max_pages,
+                user_agent=self.session.headers["User-Agent"],
+                page_load_timeout=self.timeout
+            )
+        return self._driver_pool
     
-    def _safe_quit_driver(self):
-        """ドライバーを安全に終了"""
-        if self.driver:
-            try:
-                self.driver.quit()
-                logger.debug("Driver quit called")
-            except Exception as e:
-                logger.warning(f"Error during driver.quit(): {e}")
-            finally:
-                self.driver = None
-            
-            time.sleep(3)
-            self._cleanup_chrome_processes()
-            time.sleep(3)
-            logger.debug("Driver safely closed")
+    def close(self):
+        """プールのChromeを終了（自分で作成したプールのみ）"""
+        if self._owns_pool and self._driver_pool is not None:
+            self._driver_pool.close(cleanup_processes=True)
+            self._driver_pool = None
     
     def __del__(self):
         """デストラクタでドライバーを閉じる"""
-        self._safe_quit_driver()
+        try:
+            self.close()
+        except Exception:
+            pass
     
-    def _wait_for_element(self, by, value, timeout=30):
+    def _wait_for_element(self, driver, by, value, timeout=30):
         """要素が表示されるまで明示的に待機（リトライ機能付き）"""
         last_error = None
         
         for attempt in range(self.retry_count):
             try:
-                element = WebDriverWait(self.driver, timeout).until(
+                element = WebDriverWait(driver, timeout).until(
                     EC.visibility_of_element_located((by, value))
                 )
                 logger.debug(f"Element found: {value}")
@@ -120,13 +156,13 @@ class PredictionScraper(BaseScraper):
         logger.error(f"Failed to find element after {self.retry_count} attempts: {value}")
         return None
     
-    def _click_element_safely(self, by, value, timeout=30):
+    def _click_element_safely(self, driver, by, value, timeout=30):
         """要素を安全にクリック（リトライ機能付き）"""
         last_error = None
         
         for attempt in range(self.retry_count):
             try:
-                element = WebDriverWait(self.driver, timeout).until(
+                element = WebDriverWait(driver, timeout).until(
                     EC.element_to_be_clickable((by, value))
                 )
                 element.click()
@@ -141,8 +177,8 @@ class PredictionScraper(BaseScraper):
                 logger.warning(f"Click intercepted (attempt {attempt + 1}/{self.retry_count}): {value}")
                 # JavaScriptで直接クリックを試みる
                 try:
-                    element = self.driver.find_element(by, value)
-                    self.driver.execute_script("arguments[0].click();", element)
+                    element = driver.find_element(by, value)
+                    driver.execute_script("arguments[0].click();", element)
                     logger.debug(f"Element clicked via JavaScript: {value}")
                     return True
                 except Exception as js_error:
@@ -152,77 +188,213 @@ class PredictionScraper(BaseScraper):
         logger.error(f"Failed to click element after {self.retry_count} attempts: {value}")
         return False
     
-    def get_predictor_predictions(self, predictor_id: int, limit: int = 50) -> List[Dict]:
+    def _wait_for_prediction_list(self, driver, previous_item=None, timeout=10) -> bool:
+        """
+        予想一覧の描画を待機（固定時間のsleepの代わり）
+        
+        Args:
+            driver: WebDriver
+            previous_item: タブ切り替え前の先頭行。指定時はこの行が置き換わるのを先に待つ
+            timeout: 待機の上限（秒）
+        
+        Returns:
+            予想の行が表示されたか
+        """
+        if previous_item is not None:
+            try:
+                WebDriverWait(driver, min(timeout, 5)).until(EC.staleness_of(previous_item))
+            except TimeoutException:
+                # 既に「新着」が表示されていた場合は置き換わらない
+                logger.debug("Prediction list was not re-rendered after tab click")
+        
+        try:
+            WebDriverWait(driver, timeout).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+                and d.find_elements(By.CSS_SELECTOR, self.PREDICTION_ITEM_SELECTOR)
+            )
+            return True
+        except TimeoutException:
+            return False
+    
+    def get_predictor_predictions(
+        self,
+        predictor_id: int,
+        limit: int = 50,
+        use_selenium_fallback: bool = True,
+        since_prediction_id: Optional[int] = None
+    ) -> List[Dict]:
         """
         予想家の予想履歴を取得（最新50件）
         
+        予想一覧のHTMLを返すAPIへ直接リクエストし、取得できなかった場合のみ
+        Seleniumでプロフィールページを描画して取得する
+        
         Args:
             predictor_id: 予想家のID
             limit: 取得する予想の最大数
+            use_selenium_fallback: HTTPで取得できなかったときにSeleniumで取得する
+            since_prediction_id: この予想ID以下（保存済み）に達したら解析を打ち切る
         
         Returns:
             予想情報のリスト
         """
-        url = f"https://yoso.sp.netkeiba.com/yosoka/jra/profile.html?id={predictor_id}"
+        predictions = self.fetch_predictions_http(predictor_id, limit, since_prediction_id)
+        if predictions is not None:
+            return predictions
         
-        try:
-            # 既存のドライバーを完全に終了
-            self._safe_quit_driver()
-            
-            # 新しいドライバーを初期化
-            self._init_driver()
-            
-            logger.info(f"Loading page with Selenium: {url}")
-            self.driver.get(url)
-            
-            # ページの読み込みを待機（明示的な待機）
-            gensenlist_element = self._wait_for_element(
-                By.CLASS_NAME, 
-                "GensenYosoList", 
-                timeout=10
-            )
-            
-            if not gensenlist_element:
-                logger.warning(f"GensenYosoList not found for predictor {predictor_id}")
-                return []
-            
-            logger.info("Page loaded successfully")
-            
-            # 「新着」タブをクリック
-            new_tab_clicked = self._click_element_safely(
-                By.LINK_TEXT,
-                "新着",
-                timeout=5
-            )
-            
-            if new_tab_clicked:
-                logger.info("Clicked '新着' tab")
-                time.sleep(3)
-            else:
-                logger.warning("Could not click '新着' tab, using default view")
-            
-            # JavaScript実行待機
-            time.sleep(10)
-            
-            # ページソースを取得してBeautifulSoupでパース
-            page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'lxml')
-            
-        except WebDriverException as e:
-            logger.error(f"WebDriver error for predictor {predictor_id}: {e}")
+        if not use_selenium_fallback:
             return []
-        except Exception as e:
-            logger.error(f"Error loading page with Selenium: {e}")
-            return []
-        finally:
-            # 処理が終わったら必ずドライバーを終了
-            self._safe_quit_driver()
+        
+        logger.info(f"Falling back to Selenium for predictor {predictor_id}")
+        predictions = self._get_predictor_predictions_selenium(predictor_id, limit)
+        if since_prediction_id is None:
+            return predictions
+        return [p for p in predictions if (p.get('prediction_id') or 0) > since_prediction_id]
+    
+    def fetch_predictions_http(
+        self,
+        predictor_id: int,
+        limit: int = 50,
+        since_prediction_id: Optional[int] = None
+    ) -> Optional[List[Dict]]:
+        """
+        予想一覧APIから予想履歴を取得（Seleniumなし）
+        
+        Args:
+            predictor_id: 予想家のID
+            limit: 取得する予想の最大数
+            since_prediction_id: この予想ID以下（保存済み）に達したら解析を打ち切る
+        
+        Returns:
+            予想情報のリスト。APIが使えない・想定外の形式の場合は None
+        """
+        page = self.fetch_prediction_list_page(predictor_id)
+        if page is None:
+            return None
+        return self.parse_prediction_list(page.html, predictor_id, limit, since_prediction_id)
+    
+    def fetch_prediction_list_page(self, predictor_id: int, etag: Optional[str] = None) -> Optional[PredictionListPage]:
+        """
+        予想一覧APIのレスポンスを取得（解析はしない）
+        
+        Args:
+            predictor_id: 予想家のID
+            etag: 前回のレスポンスのETag（If-None-Match として送る）
+        
+        Returns:
+            レスポンス。リクエストエラー・200/304以外の場合は None
+        """
+        # ShowGoodsListProfile('goods_list_main', '', <予想家ID>, 'all') と同じパラメータ（開催日指定なし = 新着）
+        data = {
+            'pid': 'api_get_goods_list_prof',
+            'input': 'UTF-8',
+            'output': 'jsonp',
+            'show_id': 'goods_list_main',
+            'kaisai_date': '',
+            'yosoka_id': predictor_id,
+            'jyo': 'all',
+        }
+        headers = {
+            'Referer': PROFILE_URL.format(predictor_id=predictor_id),
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+        if etag:
+            headers['If-None-Match'] = etag
+        archive_key = request_key(GOODS_LIST_API_URL, data)
+        
+        if self.replay:
+            try:
+                return self._prediction_list_page(self.archive.latest(archive_key), None)
+            except PageNotArchived:
+                logger.warning(f"Prediction list not archived for predictor {predictor_id}")
+                return None
+        
+        # リクエスト間隔はレスポンスに応じて自動調整される（他のスクレイパーと共通）
+        with stage_metrics.stage('wait'):
+            self.rate_limiter.acquire(GOODS_LIST_API_URL)
+        
+        try:
+            logger.info(f"Fetching prediction list via API: predictor {predictor_id}")
+            started = time.monotonic()
+            with stage_metrics.stage('fetch') as timer:
+                response = self.session.post(
+                    GOODS_LIST_API_URL,
+                    params={'callback': JSONP_CALLBACK},
+                    data=data,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+                timer.bytes = len(response.content)
+        except requests.exceptions.RequestException as e:
+            self.rate_limiter.observe(GOODS_LIST_API_URL, error=e)
+            logger.warning(f"Prediction list API request error for predictor {predictor_id}: {e}")
+            return None
+        self.rate_limiter.observe(GOODS_LIST_API_URL, response, latency=time.monotonic() - started)
+        
+        if response.status_code == 304:
+            return PredictionListPage(html=None, etag=etag, not_modified=True)
+        
+        if response.status_code != 200:
+            logger.warning(f"Prediction list API returned status {response.status_code} for predictor {predictor_id}")
+            return None
+        
+        archive_response(self.archive, archive_key, response.content)
+        return self._prediction_list_page(response.content, response.headers.get('ETag'))
+    
+    @staticmethod
+    def _prediction_list_page(content: bytes, etag: Optional[str]) -> PredictionListPage:
+        """予想一覧APIのレスポンス本文を復号"""
+        # input=UTF-8 を指定しているため、ヘッダーの文字コードに関わらずUTF-8として復号する
+        return PredictionListPage(
+            html=decode_jsonp(content.decode('utf-8', errors='replace')),
+            etag=etag,
+            content_hash=hashlib.sha1(content).hexdigest(),
+        )
+    
+    def parse_prediction_list(
+        self,
+        html: str,
+        predictor_id: int,
+        limit: int = 50,
+        since_prediction_id: Optional[int] = None
+    ) -> Optional[List[Dict]]:
+        """
+        予想一覧のHTML（APIのレスポンス、またはJavaScript実行後のページ）を解析
+        
+        一覧は新しい順に並んでいるため、since_prediction_id 以下の予想に達したら
+        それ以降（保存済み）の行は解析しない
+        
+        Args:
+            html: HTML
+            predictor_id: 予想家のID（ログ用）
+            limit: 取得する予想の最大数
+            since_prediction_id: 保存済みの最新の予想ID（高水位点）
+        
+        Returns:
+            予想情報のリスト。予想一覧（GensenYosoList）自体がない場合は None
+        """
+        with stage_metrics.stage('parse'):
+            return self._parse_prediction_list(html, predictor_id, limit, since_prediction_id)
+    
+    def _parse_prediction_list(
+        self,
+        html: str,
+        predictor_id: int,
+        limit: int,
+        since_prediction_id: Optional[int]
+    ) -> Optional[List[Dict]]:
+        """parse_prediction_list の本体"""
+        soup = BeautifulSoup(html, 'lxml')
+        
+        if not soup.select_one('div.GensenYosoList'):
+            logger.warning(f"GensenYosoList not found for predictor {predictor_id}")
+            return None
         
         predictions = []
         
         try:
             # 予想履歴のリストを探す
-            prediction_elements = soup.select('div.GensenYosoList ul li.Selectable')
+            prediction_elements = soup.select(self.PREDICTION_ITEM_SELECTOR)
             
             if not prediction_elements:
                 logger.warning(f"No prediction elements found for predictor {predictor_id}")
@@ -231,6 +403,12 @@ class PredictionScraper(BaseScraper):
             logger.info(f"Found {len(prediction_elements)} prediction elements")
             
             for element in prediction_elements[:limit]:
+                if since_prediction_id is not None:
+                    prediction_id = prediction_id_of(element)
+                    if prediction_id is not None and prediction_id <= since_prediction_id:
+                        logger.info(f"Reached stored prediction {prediction_id} for predictor {predictor_id}")
+                        break
+                
                 try:
                     prediction = self._parse_prediction_element(element)
                     if prediction:
@@ -248,14 +426,114 @@ class PredictionScraper(BaseScraper):
             logger.error(f"Error extracting predictions for predictor {predictor_id}: {e}")
             return []
     
+    def _get_predictor_predictions_selenium(self, predictor_id: int, limit: int = 50) -> List[Dict]:
+        """
+        Seleniumでプロフィールページを描画して予想履歴を取得（APIで取得できない場合のフォールバック）
+        
+        Args:
+            predictor_id: 予想家のID
+            limit: 取得する予想の最大数
+        
+        Returns:
+            予想情報のリスト
+        """
+        url = PROFILE_URL.format(predictor_id=predictor_id)
+        
+        if self.replay:
+            try:
+                page_source = self.archive.latest(url).decode('utf-8', errors='replace')
+            except PageNotArchived:
+                logger.warning(f"Rendered profile page not archived for predictor {predictor_id}")
+                return []
+            return self.parse_prediction_list(page_source, predictor_id, limit) or []
+        
+        try:
+            # 起動済みのChromeを借りる（終了・再起動はプール側で管理）
+            with self.driver_pool.driver() as driver:
+                # ページの描画もAPIと同じくホスト単位の間隔制御に従う
+                with stage_metrics.stage('wait'):
+                    self.rate_limiter.acquire(url)
+                
+                with stage_metrics.stage('render') as timer:
+                    page_source = self._render_prediction_list(driver, url, predictor_id)
+                    if page_source is None:
+                        return []
+                    timer.bytes = len(page_source.encode('utf-8'))
+                archive_response(self.archive, url, page_source.encode('utf-8'))
+            
+        except WebDriverException as e:
+            logger.error(f"WebDriver error for predictor {predictor_id}: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"Error loading page with Selenium: {e}")
+            return []
+        
+        return self.parse_prediction_list(page_source, predictor_id, limit) or []
+    
+    def _render_prediction_list(self, driver, url: str, predictor_id: int) -> Optional[str]:
+        """
+        プロフィールページを描画して「新着」の予想一覧のページソースを返す
+        
+        読み込みの結果はレートリミッターに記録する（WebDriverの例外は記録してから送出する）
+        
+        Returns:
+            ページソース。予想一覧（GensenYosoList）が表示されない場合は None
+        """
+        started = time.monotonic()
+        try:
+            logger.info(f"Loading page with Selenium: {url}")
+            driver.get(url)
+        except WebDriverException as e:
+            self.rate_limiter.observe(url, error=e)
+            raise
+        
+        # ページの読み込みを待機（明示的な待機）
+        gensenlist_element = self._wait_for_element(
+            driver,
+            By.CLASS_NAME, 
+            "GensenYosoList", 
+            timeout=10
+        )
+        
+        if not gensenlist_element:
+            # 混雑・ブロックとは限らないため、間隔は変えずに件数だけ記録する
+            self.rate_limiter.observe(url)
+            logger.warning(f"GensenYosoList not found for predictor {predictor_id}")
+            return None
+        
+        self.rate_limiter.success(url, time.monotonic() - started)
+        logger.info("Page loaded successfully")
+        
+        # タブ切り替えで一覧が描き直されたことを検知するため、切り替え前の先頭行を覚えておく
+        current_items = driver.find_elements(By.CSS_SELECTOR, self.PREDICTION_ITEM_SELECTOR)
+        previous_item = current_items[0] if current_items else None
+        
+        # 「新着」タブをクリック
+        new_tab_clicked = self._click_element_safely(
+            driver,
+            By.LINK_TEXT,
+            "新着",
+            timeout=5
+        )
+        
+        if new_tab_clicked:
+            logger.info("Clicked '新着' tab")
+        else:
+            logger.warning("Could not click '新着' tab, using default view")
+            previous_item = None
+        
+        # JavaScriptで予想一覧が描画されるまで待機
+        if not self._wait_for_prediction_list(driver, previous_item, timeout=10):
+            logger.debug(f"Prediction list did not render for predictor {predictor_id}")
+        
+        # ページソースを取得（解析は呼び出し側でBeautifulSoupを使う）
+        return driver.page_source
+    
     def _parse_prediction_element(self, element) -> Optional[Dict]:
         """予想要素を解析"""
         try:
             # 予想IDを <li> の id 属性から抽出
-            li_id = element.get('id', '')
-            prediction_id = None
-            if li_id.startswith('goods_state_'):
-                prediction_id = int(li_id.replace('goods_state_', ''))
+            prediction_id = prediction_id_of(element)
             
             # 的中/不的中の判定
             li_classes = element.get('class', [])
@@ -0,0 +1,228 @@
+"""
+予想履歴の差分同期（高水位点）
+
+予想家ごとに同期状態（predictor_sync_state）を持ち、新しい予想がありそうな予想家だけ取得する。
+
+- 予想家一覧の「予想数」が前回同期時から変わっていない予想家は取得しない
+  （max_age を過ぎた予想家は念のため取得する）
+- 予想一覧APIには前回のETagを If-None-Match で送り、304 またはレスポンスが前回と
+  同じ（SHA-1が一致）なら解析しない
+- 解析は保存済みの最新の予想ID（高水位点）に達した時点で打ち切る
+
+取得に失敗した予想家は同期状態を更新しないため、次回の実行で再取得される。
+同期状態がない予想家の高水位点は、保存済みの予想の最大IDから始める。
+"""
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from backend.scraper.bulk_ingest import ingest_batch
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.prediction import PredictionScraper
+
+
+# 予想数が変わっていなくても、この期間取得していない予想家は取得する
+DEFAULT_MAX_AGE = timedelta(days=7)
+
+_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+@dataclass
+class SyncState:
+    """予想家1人の同期状態"""
+    last_prediction_id: Optional[int] = None
+    listed_prediction_count: Optional[int] = None
+    etag: Optional[str] = None
+    content_hash: Optional[str] = None
+    last_fetched_at: Optional[datetime] = None
+
+
+@dataclass
+class SyncStats:
+    """同期の結果"""
+    fetched: int = 0  # 予想一覧を取得した予想家
+    unchanged: int = 0  # 304、またはレスポンスが前回と同じ
+    failed: int = 0
+    predictions_new: int = 0
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def load_sync_states(conn: sqlite3.Connection) -> Dict[int, SyncState]:
+    """
+    全予想家の同期状態を取得
+
+    Returns:
+        {予想家のnetkeiba_id: 同期状態}
+    """
+    rows = conn.execute("""
+        SELECT pr.netkeiba_id,
+               COALESCE(s.last_prediction_id,
+                        (SELECT MAX(p.netkeiba_prediction_id) FROM predictions p WHERE p.predictor_id = pr.id)),
+               s.listed_prediction_count, s.etag, s.content_hash, s.last_fetched_at
+        FROM predictors pr
+        LEFT JOIN predictor_sync_state s ON s.predictor_id = pr.id
+    """)
+    return {
+        netkeiba_id: SyncState(last_prediction_id, listed_count, etag, content_hash, _parse_datetime(fetched_at))
+        for netkeiba_id, last_prediction_id, listed_count, etag, content_hash, fetched_at in rows
+    }
+
+
+def needs_fetch(
+    predictor: Dict,
+    state: Optional[SyncState],
+    now: datetime,
+    max_age: timedelta = DEFAULT_MAX_AGE
+) -> bool:
+    """
+    予想家の予想一覧を取得する必要があるか
+
+    Args:
+        predictor: PredictorListScraper の予想家情報（prediction_count を使う）
+        state: 同期状態
+        now: 現在時刻
+        max_age: 予想数が同じでもこの期間を過ぎたら取得する
+    """
+    if state is None or state.last_fetched_at is None:
+        return True
+
+    listed_count = predictor.get('prediction_count')
+    if listed_count is None or state.listed_prediction_count is None:
+        return True
+    if listed_count != state.listed_prediction_count:
+        return True
+
+    return now - state.last_fetched_at >= max_age
+
+
+def save_sync_state(
+    conn: sqlite3.Connection,
+    predictor_netkeiba_id: int,
+    state: SyncState,
+    found_new: bool
+):
+    """同期状態を保存（コミットは呼び出し側）"""
+    fetched_at = state.last_fetched_at.strftime(_DATETIME_FORMAT)
+    conn.execute("""
+        INSERT INTO predictor_sync_state (predictor_id, last_prediction_id, listed_prediction_count,
+                                          etag, content_hash, last_fetched_at, last_new_at)
+        SELECT id, ?, ?, ?, ?, ?, ?
+        FROM predictors
+        WHERE netkeiba_id = ?
+        ON CONFLICT(predictor_id) DO UPDATE SET
+            last_prediction_id = excluded.last_prediction_id,
+            listed_prediction_count = excluded.listed_prediction_count,
+            etag = excluded.etag,
+            content_hash = excluded.content_hash,
+            last_fetched_at = excluded.last_fetched_at,
+            last_new_at = COALESCE(excluded.last_new_at, predictor_sync_state.last_new_at)
+    """, (state.last_prediction_id, state.listed_prediction_count, state.etag, state.content_hash,
+          fetched_at, fetched_at if found_new else None, predictor_netkeiba_id))
+
+
+class PredictorSync:
+    """予想履歴の差分同期"""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        scraper: PredictionScraper,
+        limit: int = 50,
+        max_age: timedelta = DEFAULT_MAX_AGE,
+        force: bool = False
+    ):
+        """
+        Args:
+            conn: DB接続
+            scraper: 予想履歴のスクレイパー
+            limit: 1人あたりの取得件数の上限
+            max_age: 予想数が同じでもこの期間を過ぎたら取得する
+            force: 同期状態に関わらず全員取得する（高水位点での打ち切りは行う）
+        """
+        self.conn = conn
+        self.scraper = scraper
+        self.limit = limit
+        self.max_age = max_age
+        self.force = force
+        self.states = load_sync_states(conn)
+        self.stats = SyncStats()
+
+    def select_due(self, predictors: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+        """取得が必要な予想家だけを返す"""
+        if self.force:
+            return list(predictors)
+        now = now or datetime.utcnow()
+        return [p for p in predictors if needs_fetch(p, self.states.get(p['netkeiba_id']), now, self.max_age)]
+
+    def sync_predictor(self, predictor: Dict) -> Optional[int]:
+        """
+        予想家1人の新しい予想を取得して保存
+
+        Returns:
+            新たに保存した予想数。取得に失敗した場合は None
+        """
+        predictor_id = predictor['netkeiba_id']
+        previous = self.states.get(predictor_id) or SyncState()
+        now = datetime.utcnow()
+
+        page = self.scraper.fetch_prediction_list_page(predictor_id, etag=previous.etag)
+        if page is not None and (page.not_modified or page.content_hash == previous.content_hash):
+            logger.info(f"Prediction list unchanged for predictor {predictor_id}")
+            self.stats.unchanged += 1
+            self._save(predictor, previous, previous.last_prediction_id, page.etag or previous.etag,
+                       previous.content_hash, now, found_new=False)
+            return 0
+
+        since = previous.last_prediction_id
+        predictions = None
+        if page is not None:
+            predictions = self.scraper.parse_prediction_list(page.html, predictor_id, self.limit, since)
+        if predictions is None:
+            logger.info(f"Falling back to Selenium for predictor {predictor_id}")
+            predictions = self.scraper._get_predictor_predictions_selenium(predictor_id, self.limit)
+            if not predictions:
+                self.stats.failed += 1
+                return None
+            if since is not None:
+                predictions = [p for p in predictions if (p.get('prediction_id') or 0) > since]
+            page = None
+
+        inserted = 0
+        if predictions:
+            try:
+                with stage_metrics.stage('db'):
+                    stats = ingest_batch(self.conn, predictions_by_predictor={predictor_id: predictions})
+            except sqlite3.Error as e:
+                logger.error(f"Error saving predictions for predictor {predictor_id}: {e}")
+                self.stats.failed += 1
+                return None
+            inserted = stats.predictions_inserted
+            self.stats.predictions_new += inserted
+
+        self.stats.fetched += 1
+        prediction_ids = [p['prediction_id'] for p in predictions if p.get('prediction_id')]
+        high_water = max([since or 0, *prediction_ids]) or None
+        self._save(predictor, previous, high_water,
+                   page.etag if page else None, page.content_hash if page else None,
+                   now, found_new=bool(prediction_ids))
+        return inserted
+
+    def _save(self, predictor: Dict, previous: SyncState, last_prediction_id: Optional[int],
+              etag: Optional[str], content_hash: Optional[str], fetched_at: datetime, found_new: bool):
+        state = SyncState(
+            last_prediction_id=last_prediction_id,
+            listed_prediction_count=predictor.get('prediction_count', previous.listed_prediction_count),
+            etag=etag,
+            content_hash=content_hash,
+            last_fetched_at=fetched_at,
+        )
+        save_sync_state(self.conn, predictor['netkeiba_id'], state, found_new)
+        with stage_metrics.stage('commit'):
+            self.conn.commit()
+        self.states[predictor['netkeiba_id']] = state
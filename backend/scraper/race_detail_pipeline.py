@@ -0,0 +1,307 @@
+"""
+レース詳細の並行取得パイプライン
+
+取得（HTTP）・解析（lxml）・保存（JSON + DB）を
+別々のスレッドで流し、ネットワーク待ちの間に前のレースの解析・保存を進める。
+リクエスト間隔はホスト単位のトークンバケット（rate_limiter.AdaptiveRateLimiter）で制御するため、
+スレッド数を増やしてもnetkeibaへのリクエスト頻度は増えない。間隔はレスポンスに応じて自動調整する。
+
+    取得スレッド ×N ──▶ 解析スレッド ×M ──▶ 保存スレッド ×1（DB接続を1本に集約）
+"""
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional
+
+import requests
+from loguru import logger
+
+from backend.data_version import bump_data_version
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.race_detail_scraper_with_db import RaceDetailScraperPandas
+from backend.scraper.race_detail_tables import ensure_race_detail_tables
+from backend.scraper.rate_limiter import AdaptiveRateLimiter
+
+
+# キューの終端を表す値
+_STOP = object()
+
+
+@dataclass
+class PipelineStats:
+    """パイプラインの処理結果"""
+    success: int = 0
+    failed: int = 0
+    requests: int = 0
+    elapsed: float = 0.0
+    failed_race_ids: List[str] = field(default_factory=list)
+
+
+class RaceDetailPipeline:
+    """レース詳細の並行取得パイプライン"""
+
+    def __init__(
+        self,
+        db_path: str = "data/keiba.db",
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        fetch_workers: int = 2,
+        parse_workers: int = 1,
+        max_retries: int = 3,
+        commit_every: int = 10,
+        scraper: Optional[RaceDetailScraperPandas] = None
+    ):
+        """
+        Args:
+            db_path: データベースパス
+            rate_limiter: ホストごとのリクエスト間隔制御（省略時は従来と同じ間隔から自動調整）
+            fetch_workers: 取得スレッド数（レスポンス待ちを重ねるため。頻度は rate_limiter で決まる）
+            parse_workers: 解析スレッド数
+            max_retries: 1レースあたりの最大リクエスト回数
+            commit_every: この件数ごとにDBをコミット（キューが空になったときもコミット）
+            scraper: 取得・解析・保存処理を持つスクレイパー
+        """
+        self.db_path = db_path
+        # 従来の逐次処理（リクエスト後に2-3秒 + レース間3秒）と同じ最短間隔から始める
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(interval=5.0, jitter=1.0)
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.max_retries = max_retries
+        self.commit_every = commit_every
+        self.scraper = scraper or RaceDetailScraperPandas(db_path)
+
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """処理中のパイプラインを止める（取得待ちのレースは処理しない）"""
+        self._stop_event.set()
+
+    def run(
+        self,
+        race_ids: Iterable[str],
+        on_result: Optional[Callable[[str, bool], None]] = None
+    ) -> PipelineStats:
+        """
+        レース詳細をまとめて取得してJSONとDBに保存
+
+        Args:
+            race_ids: 取得するレースIDの一覧
+            on_result: 1レース処理し終えるごとに (race_id, 成功したか) で呼ばれる
+                       （保存スレッドから、書き込みをコミットした後に呼ばれる）
+
+        Returns:
+            処理結果
+        """
+        race_ids = list(race_ids)
+        stats = PipelineStats()
+        if not race_ids:
+            return stats
+
+        self._stop_event.clear()
+        start_time = time.time()
+
+        fetch_queue: queue.Queue = queue.Queue()
+        parse_queue: queue.Queue = queue.Queue(maxsize=self.fetch_workers * 4)
+        write_queue: queue.Queue = queue.Queue(maxsize=self.commit_every * 4)
+        remaining = {"count": len(race_ids)}
+        remaining_lock = threading.Lock()
+        all_done = threading.Event()
+
+        for race_id in race_ids:
+            fetch_queue.put((race_id, 1))
+
+        def finish(race_id: str, success: bool):
+            """1レースの処理完了（保存スレッドからのみ呼ばれる）"""
+            if success:
+                stats.success += 1
+            else:
+                stats.failed += 1
+                stats.failed_race_ids.append(race_id)
+            if on_result:
+                on_result(race_id, success)
+            with remaining_lock:
+                remaining["count"] -= 1
+                if remaining["count"] == 0:
+                    all_done.set()
+
+        def retry_or_fail(race_id: str, attempt: int, reason: str):
+            """再取得できる回数が残っていれば取得キューに戻す"""
+            if attempt < self.max_retries and not self._stop_event.is_set():
+                logger.warning(f"{reason}: race_id={race_id} (attempt {attempt}/{self.max_retries}) - 再取得します")
+                fetch_queue.put((race_id, attempt + 1))
+            else:
+                logger.warning(f"{reason}: race_id={race_id} (attempt {attempt}/{self.max_retries})")
+                write_queue.put((race_id, None))
+
+        def fetch_worker():
+            session = requests.Session()
+            while not self._stop_event.is_set() and not all_done.is_set():
+                try:
+                    race_id, attempt = fetch_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                with stage_metrics.stage('wait'):
+                    self.rate_limiter.acquire(self.scraper.race_url(race_id), self._stop_event)
+                if self._stop_event.is_set():
+                    write_queue.put((race_id, None))
+                    continue
+
+                with remaining_lock:
+                    stats.requests += 1
+                try:
+                    logger.info(f"Scraping race_id={race_id} (attempt {attempt}/{self.max_retries})")
+                    content = self.scraper._fetch_html(race_id, session=session, rate_limiter=self.rate_limiter)
+                except requests.exceptions.RequestException as e:
+                    retry_or_fail(race_id, attempt, f"HTTP request error: {e}")
+                    continue
+
+                parse_queue.put((race_id, attempt, content))
+            session.close()
+
+        def parse_worker():
+            while True:
+                item = parse_queue.get()
+                if item is _STOP:
+                    return
+
+                race_id, attempt, content = item
+                try:
+                    race_data = self.scraper._parse_race_html(race_id, content)
+                except Exception as e:
+                    logger.error(f"Error parsing race {race_id}: {e}")
+                    race_data = None
+
+                if not race_data or not race_data.get('race_info'):
+                    retry_or_fail(race_id, attempt, "No data retrieved")
+                    continue
+
+                write_queue.put((race_id, race_data))
+
+        def write_worker():
+            conn = sqlite3.connect(self.db_path)
+            ensure_race_detail_tables(conn)
+            cursor = conn.cursor()
+            pending: List[str] = []
+
+            def commit():
+                if not pending:
+                    return
+                try:
+                    with stage_metrics.stage('commit'):
+                        conn.commit()
+                    success = True
+                except sqlite3.Error as e:
+                    logger.error(f"Database commit error: {e}")
+                    conn.rollback()
+                    success = False
+                if success:
+                    self.scraper._refresh_condition_cube(conn)
+                    bump_data_version(self.db_path)
+                for race_id in pending:
+                    finish(race_id, success)
+                pending.clear()
+
+            try:
+                while True:
+                    try:
+                        item = write_queue.get(timeout=0.5)
+                    except queue.Empty:
+                        # 取得待ちの間にまとめてコミットしておく
+                        commit()
+                        continue
+
+                    if item is _STOP:
+                        commit()
+                        return
+
+                    race_id, race_data = item
+                    if race_data is None:
+                        # on_result はコミット済みの状態で呼ぶ（呼び出し側が別の接続で書き込めるように）
+                        commit()
+                        finish(race_id, False)
+                        continue
+
+                    self.scraper._save_json(race_id, race_data)
+
+                    try:
+                        with stage_metrics.stage('db'):
+                            updated = self.scraper._apply_race_update(cursor, race_id, race_data)
+                    except sqlite3.Error as e:
+                        logger.error(f"Database update error for race_id={race_id}: {e}")
+                        updated = False
+
+                    if updated:
+                        logger.info(f"✅ Successfully updated race_id={race_id}")
+                        pending.append(race_id)
+                        if len(pending) >= self.commit_every or write_queue.empty():
+                            commit()
+                    else:
+                        commit()
+                        finish(race_id, False)
+            finally:
+                conn.close()
+
+        fetchers = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(self.fetch_workers)]
+        parsers = [threading.Thread(target=parse_worker, daemon=True) for _ in range(self.parse_workers)]
+        writer = threading.Thread(target=write_worker, daemon=True)
+
+        for thread in fetchers + parsers + [writer]:
+            thread.start()
+
+        try:
+            while not all_done.wait(timeout=0.5):
+                if self._stop_event.is_set():
+                    break
+        except KeyboardInterrupt:
+            logger.warning("中断されました。処理中のレースを保存して終了します")
+            self._stop_event.set()
+
+        # 取得 → 解析 → 保存の順に止め、処理途中のデータは保存してから終わる
+        for thread in fetchers:
+            thread.join()
+        for _ in parsers:
+            parse_queue.put(_STOP)
+        for thread in parsers:
+            thread.join()
+        write_queue.put(_STOP)
+        writer.join()
+
+        stats.elapsed = time.time() - start_time
+        return stats
+
+
+def scrape_race_details_concurrent(
+    race_ids: Iterable[str],
+    db_path: str = "data/keiba.db",
+    interval: float = 5.0,
+    pause_every: int = 0,
+    pause_seconds: float = 0.0,
+    on_result: Optional[Callable[[str, bool], None]] = None,
+    rate_limiter: Optional[AdaptiveRateLimiter] = None
+) -> PipelineStats:
+    """
+    複数のレース詳細を並行パイプラインで取得してJSONとDBに保存（バッチ処理用）
+
+    Args:
+        race_ids: レースIDの一覧
+        db_path: データベースパス
+        interval: 同一ホストへの最初の平均リクエスト間隔（秒）
+        pause_every: この件数のリクエストごとに休憩する（0なら休憩なし）
+        pause_seconds: 休憩時間（秒）
+        on_result: 1レース処理し終えるごとに (race_id, 成功したか) で呼ばれる
+        rate_limiter: リクエスト間隔の制御（複数回呼ぶ場合に調整した間隔を引き継ぐ。
+            指定した場合は interval・pause_every・pause_seconds を使わない）
+
+    Returns:
+        処理結果
+    """
+    rate_limiter = rate_limiter or AdaptiveRateLimiter(
+        interval=interval,
+        jitter=1.0,
+        pause_every=pause_every,
+        pause_seconds=pause_seconds
+    )
+    pipeline = RaceDetailPipeline(db_path, rate_limiter=rate_limiter)
+    return pipeline.run(race_ids, on_result=on_result)
@@ -2,14 +2,15 @@
 レース詳細情報スクレイパー（pandas.read_html()方式 - Zenn完全準拠版）
 2024年11月のnetkeiba仕様変更に完全対応
 - User-Agentランダム化（12種類）
-- スクレイピング間隔ランダム化（2-3秒）
+- スクレイピング間隔はレスポンスに応じて自動調整（rate_limiter.AdaptiveRateLimiter）
 - 高速（Seleniumの6-10倍）
+- ページの解析はlxmlで1回だけ行う（race_html_extractor.py）
 """
+import io
 import pandas as pd
 import requests
 import sqlite3
 import json
-import time
 import random
 import re
 from typing import Dict, List, Optional, Tuple
@@ -17,6 +18,14 @@ from datetime import datetime
 from pathlib import Path
 from loguru import logger
 
+from backend.analysis.condition_cube import refresh_condition_cube
+from backend.data_version import bump_data_version
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.page_archive import PageArchive, archive_response, get_default_archive
+from backend.scraper.race_detail_tables import ensure_race_detail_tables, write_race_details
+from backend.scraper.race_html_extractor import parse_race_html, parse_race_info_text
+from backend.scraper.rate_limiter import AdaptiveRateLimiter, shared_rate_limiter
+
 
 class RaceDetailScraperPandas:
     """pandas.read_html()を使用した高速スクレイパー"""
@@ -37,9 +46,30 @@ class RaceDetailScraperPandas:
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36 Brave/1.40.107",
     ]
     
-    def __init__(self, db_path="data/keiba.db"):
-        """初期化"""
+    RACE_URL = "https://db.netkeiba.com/race/{race_id}"
+    
+    def __init__(
+        self,
+        db_path="data/keiba.db",
+        archive: Optional[PageArchive] = None,
+        replay: bool = False,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            db_path: データベースパス
+            archive: 取得したページの保存庫（省略時は設定の保存先）
+            replay: ネットワークに接続せず保存庫のページを解析する（待機・リトライなし）
+            rate_limiter: リクエスト間隔の制御（省略時は全スクレイパー共通のもの）
+        """
         self.db_path = db_path
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.archive = archive or get_default_archive()
+        self.replay = replay
+        if replay and self.archive is None:
+            raise ValueError("replay mode requires a page archive")
         
     def scrape_and_update(self, race_id: str, max_retries: int = 3) -> bool:
         """
@@ -52,6 +82,9 @@ class RaceDetailScraperPandas:
         Returns:
             成功時True、失敗時False
         """
+        if self.replay:
+            max_retries = 1
+        
         for attempt in range(1, max_retries + 1):
             try:
                 logger.info(f"Scraping race_id={race_id} (attempt {attempt}/{max_retries})")
@@ -61,11 +94,8 @@ class RaceDetailScraperPandas:
                 
                 if not race_data or not race_data.get('race_info'):
                     logger.warning(f"No data retrieved for race_id={race_id}")
+                    # リトライ前の待機は rate_limiter が行う（失敗が続くと間隔が広がる）
                     if attempt < max_retries:
-                        # Zenn推奨：2-3秒のランダム待機
-                        wait_time = random.uniform(2.0, 3.0)
-                        logger.debug(f"Waiting {wait_time:.1f} seconds before retry...")
-                        time.sleep(wait_time)
                         continue
                     return False
                 
@@ -80,18 +110,12 @@ class RaceDetailScraperPandas:
                     return True
                 else:
                     if attempt < max_retries:
-                        wait_time = random.uniform(2.0, 3.0)
-                        logger.debug(f"Waiting {wait_time:.1f} seconds before retry...")
-                        time.sleep(wait_time)
                         continue
                     return False
                     
             except Exception as e:
                 logger.error(f"Error in attempt {attempt} for race_id={race_id}: {e}")
                 if attempt < max_retries:
-                    wait_time = random.uniform(2.0, 3.0)
-                    logger.debug(f"Waiting {wait_time:.1f} seconds before retry...")
-                    time.sleep(wait_time)
                     continue
                 return False
         
@@ -99,62 +123,13 @@ class RaceDetailScraperPandas:
     
     def _scrape_race_details(self, race_id: str) -> Optional[Dict]:
         """レース詳細をpandas.read_html()でスクレイピング"""
-        url = f"https://db.netkeiba.com/race/{race_id}"
-        
         try:
-            # User-Agentをランダムに選択
-            selected_user_agent = random.choice(self.USER_AGENTS)
-            headers = {
-                "User-Agent": selected_user_agent,
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7",
-            }
-            
-            logger.debug(f"Selected User-Agent: {selected_user_agent[:80]}...")
-            
-            # HTTPリクエスト（User-Agent付き）
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()  # HTTPエラーをチェック
-            
-            # Zenn推奨：2-3秒のランダム待機
-            wait_time = random.uniform(2.0, 3.0)
-            logger.debug(f"Waiting {wait_time:.1f} seconds after request...")
-            time.sleep(wait_time)
+            if not self.replay:
+                with stage_metrics.stage('wait'):
+                    self.rate_limiter.acquire(self.race_url(race_id))
+            content = self._fetch_html(race_id)
             
-            # HTMLからテーブルを取得
-            tables = pd.read_html(response.content)
-            
-            # BeautifulSoupでメタ情報を取得
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # レース情報を抽出
-            race_info = self._extract_race_info(soup)
-            
-            # レース結果を抽出（table[0]）
-            race_results = self._extract_race_results(tables[0]) if len(tables) > 0 else []
-            
-            # 出走頭数をレース結果の数から設定
-            race_info['horse_count'] = len(race_results)
-            
-            # 払い戻し情報を抽出（table[1], table[2]）
-            payback_info = self._extract_payback_info(tables)
-            
-            # コーナー通過順を抽出（table[4]）
-            corner_pass = self._extract_corner_pass_from_table(tables[4]) if len(tables) > 4 else {}
-            
-            # ラップタイムを抽出（table[5]）
-            lap_times = self._extract_lap_times_from_table(tables[5]) if len(tables) > 5 else {}
-            
-            return {
-                'race_id': race_id,
-                'race_info': race_info,
-                'race_results': race_results,
-                'payback': payback_info,
-                'corner_pass': corner_pass,
-                'lap_times': lap_times,
-                'scraped_at': datetime.now().isoformat()
-            }
+            return self._parse_race_html(race_id, content)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"HTTP request error for race {race_id}: {e}")
@@ -163,6 +138,99 @@ class RaceDetailScraperPandas:
             logger.error(f"Error scraping race {race_id}: {e}")
             return None
     
+    def race_url(self, race_id: str) -> str:
+        """レース詳細ページのURL"""
+        return self.RACE_URL.format(race_id=race_id)
+    
+    def _fetch_html(
+        self,
+        race_id: str,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None
+    ) -> bytes:
+        """
+        レース詳細ページのHTMLを取得（待機はしない。呼び出し側で間隔を制御する）
+        
+        レスポンス（ステータス・応答時間・タイムアウト）は rate_limiter（省略時は self.rate_limiter）に
+        記録し、次のリクエストまでの間隔の調整に使う
+        
+        Raises:
+            requests.exceptions.RequestException: HTTPエラー
+            PageNotArchived: replay時に保存庫にページがない
+        """
+        if self.replay:
+            with stage_metrics.stage('fetch') as timer:
+                content = self.archive.latest(self.race_url(race_id))
+                timer.bytes = len(content)
+            return content
+        
+        # User-Agentをランダムに選択
+        selected_user_agent = random.choice(self.USER_AGENTS)
+        headers = {
+            "User-Agent": selected_user_agent,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Language": "ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7",
+        }
+        
+        logger.debug(f"Selected User-Agent: {selected_user_agent[:80]}...")
+        
+        # HTTPリクエスト（User-Agent付き）
+        rate_limiter = rate_limiter or self.rate_limiter
+        try:
+            with stage_metrics.stage('fetch') as timer:
+                response = (session or requests).get(self.race_url(race_id), headers=headers, timeout=30)
+                timer.bytes = len(response.content)
+        except requests.exceptions.RequestException as e:
+            rate_limiter.observe(self.race_url(race_id), error=e)
+            raise
+        rate_limiter.observe(self.race_url(race_id), response)
+        response.raise_for_status()  # HTTPエラーをチェック
+        
+        archive_response(self.archive, self.race_url(race_id), response.content)
+        return response.content
+    
+    def _parse_race_html(self, race_id: str, content: bytes) -> Dict:
+        """取得済みのHTMLからレース詳細を抽出（lxmlで1回だけ解析）"""
+        with stage_metrics.stage('parse'):
+            return parse_race_html(race_id, content)
+    
+    def _parse_race_html_pandas(self, race_id: str, content: bytes) -> Dict:
+        """従来の抽出（pandas.read_html + BeautifulSoup）。race_html_extractor との比較・ベンチマーク用"""
+        # HTMLからテーブルを取得
+        tables = pd.read_html(io.BytesIO(content))
+        
+        # BeautifulSoupでメタ情報を取得
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # レース情報を抽出
+        race_info = self._extract_race_info(soup)
+        
+        # レース結果を抽出（table[0]）
+        race_results = self._extract_race_results(tables[0]) if len(tables) > 0 else []
+        
+        # 出走頭数をレース結果の数から設定
+        race_info['horse_count'] = len(race_results)
+        
+        # 払い戻し情報を抽出（table[1], table[2]）
+        payback_info = self._extract_payback_info(tables)
+        
+        # コーナー通過順を抽出（table[4]）
+        corner_pass = self._extract_corner_pass_from_table(tables[4]) if len(tables) > 4 else {}
+        
+        # ラップタイムを抽出（table[5]）
+        lap_times = self._extract_lap_times_from_table(tables[5]) if len(tables) > 5 else {}
+        
+        return {
+            'race_id': race_id,
+            'race_info': race_info,
+            'race_results': race_results,
+            'payback': payback_info,
+            'corner_pass': corner_pass,
+            'lap_times': lap_times,
+            'scraped_at': datetime.now().isoformat()
+        }
+    
     def _extract_race_info(self, soup) -> Dict:
         """レース基本情報をBeautifulSoupで抽出（data_introクラス使用）"""
         info = {}
@@ -173,88 +241,7 @@ class RaceDetailScraperPandas:
             racedata_elem = soup.find('dl', class_='racedata')
             
             if data_intro_elem:
-                data_intro_text = data_intro_elem.get_text(strip=True)
-                
-                # レース名（例: "9 R亀岡特別(2勝)"）
-                race_name_match = re.search(r'\d+\s*R\s*([^(]+)', data_intro_text)
-                if race_name_match:
-                    info['race_name'] = race_name_match.group(1).strip()
-                else:
-                    info['race_name'] = None
-                
-                # グレード判定（2勝、3勝などはグレードではない）
-                if 'G1' in data_intro_text:
-                    info['grade'] = 'G1'
-                elif 'G2' in data_intro_text:
-                    info['grade'] = 'G2'
-                elif 'G3' in data_intro_text:
-                    info['grade'] = 'G3'
-                else:
-                    info['grade'] = None
-                
-                # Zenn方式：テキストを単語に分割して個別にチェック
-                # この方法は重賞レースのような複雑な名前でも確実に情報を抽出できる
-                info_words = re.findall(r'\w+', data_intro_text)
-                
-                # デフォルト値を設定
-                info['track_type'] = '不明'
-                info['distance'] = 0
-                
-                for word in info_words:
-                    # 芝/ダートの判定
-                    if word in ["芝", "ダート"]:
-                        info['track_type'] = word
-                    # 障害の判定
-                    if "障" in word:
-                        info['track_type'] = "障害"
-                    # 距離の抽出（"m"を含む単語から数字を抽出）
-                    if "m" in word:
-                        distance_nums = re.findall(r"\d+", word)
-                        if distance_nums:
-                            info['distance'] = int(distance_nums[-1])
-                
-                # 天候（例: "天候 : 晴"）
-                weather_match = re.search(r'天候\s*:\s*([^\s/]+)', data_intro_text)
-                info['weather'] = weather_match.group(1) if weather_match else None
-                
-                # 馬場状態（例: "ダート : 良"）
-                track_condition_match = re.search(r'(芝|ダート)\s*:\s*([^\s/]+)', data_intro_text)
-                info['track_condition'] = track_condition_match.group(2) if track_condition_match else None
-                
-                # 発走時刻（例: "14:35"）
-                time_match = re.search(r'発走\s*:\s*(\d{1,2}:\d{2})', data_intro_text)
-                info['post_time'] = time_match.group(1) if time_match else None
-                
-                # 開催情報（例: "4回京都1日目"）
-                kaisai_match = re.search(r'(\d+)回([^0-9]+?)(\d+)日目', data_intro_text)
-                if kaisai_match:
-                    info['kaisai_count'] = int(kaisai_match.group(1))
-                    info['venue'] = kaisai_match.group(2).strip()
-                    info['day'] = int(kaisai_match.group(3))
-                else:
-                    info['venue'] = '不明'
-                
-                # レースクラス（例: "2勝クラス"）
-                class_match = re.search(r'([１-３1-3]勝クラス|オープン|1600万|1000万|500万|未勝利|新馬)', data_intro_text)
-                info['race_class'] = class_match.group(1) if class_match else None
-                
-                # 馬齢・重量条件
-                condition_match = re.search(r'(サラ系)?([3-9]歳以上|[3-9]歳)', data_intro_text)
-                info['race_condition'] = condition_match.group(0) if condition_match else None
-                
-                weight_match = re.search(r'\(([^)]*)\)', data_intro_text)
-                if weight_match:
-                    weight_text = weight_match.group(1)
-                    if '定' in weight_text:
-                        info['weight_type'] = '定量'
-                    elif 'ハ' in weight_text or 'ハンデ' in weight_text:
-                        info['weight_type'] = 'ハンデ'
-                    elif '別' in weight_text:
-                        info['weight_type'] = '別定'
-                    else:
-                        info['weight_type'] = None
-                else:
-                    info['weight_type'] = None
+                info = parse_race_info_text(data_intro_elem.get_text(strip=True))
             
             # 出走頭数と賞金は別の要素から取得
             # 馬体重の列数から出走頭数を推定（後でレース結果から取得）
@@ -502,7 +489,7 @@ class RaceDetailScraperPandas:
             output_dir.mkdir(parents=True, exist_ok=True)
             
             output_file = output_dir / f"race_{race_id}_details.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
+            with stage_metrics.stage('json'), open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(race_data, f, ensure_ascii=False, indent=2)
             
             logger.debug(f"JSON saved: {output_file}")
@@ -511,68 +498,108 @@ class RaceDetailScraperPandas:
     
     def _update_database(self, race_id: str, race_data: Dict) -> bool:
         """データベースを更新"""
+        conn = None
         try:
             conn = sqlite3.connect(self.db_path)
+            ensure_race_detail_tables(conn)
             cursor = conn.cursor()
             
-            race_info = race_data.get('race_info', {})
+            with stage_metrics.stage('db'):
+                updated = self._apply_race_update(cursor, race_id, race_data)
             
-            # race_idでレコードを検索
-            cursor.execute("SELECT id FROM races WHERE race_id = ?", (race_id,))
-            result = cursor.fetchone()
+            with stage_metrics.stage('commit'):
+                conn.commit()
             
-            if not result:
-                logger.warning(f"Race not found in database: race_id={race_id}")
-                conn.close()
-                return False
-            
-            # 更新
-            cursor.execute("""
-                UPDATE races
-                SET 
-                    venue = ?,
-                    distance = ?,
-                    track_type = ?,
-                    track_condition = ?,
-                    horse_count = ?
-                WHERE race_id = ?
-            """, (
-                race_info.get('venue', '不明'),
-                race_info.get('distance', 0),
-                race_info.get('track_type', '不明'),
-                race_info.get('track_condition'),
-                race_info.get('horse_count', 0),
-                race_id
-            ))
+            if updated:
+                self._refresh_condition_cube(conn)
+                bump_data_version(self.db_path)
             
-            conn.commit()
-            
-            if cursor.rowcount > 0:
-                logger.debug(f"Updated race_id={race_id}: {race_info.get('venue')}, {race_info.get('track_type')}, {race_info.get('distance')}m")
-                conn.close()
-                return True
-            else:
-                logger.warning(f"No rows updated for race_id={race_id}")
-                conn.close()
-                return False
+            conn.close()
+            return updated
                 
         except Exception as e:
             logger.error(f"Database update error for race_id={race_id}: {e}")
             if conn:
                 conn.close()
             return False
+    
+    def _refresh_condition_cube(self, conn: sqlite3.Connection) -> int:
+        """
+        レースの条件が変わった予想家の条件別集計キューブを再集計（コミット後に呼ぶ）
+        
+        失敗してもレースの更新は保存済みのため、警告だけ出す（次の再集計で反映される）
+        
+        Returns:
+            再集計した予想家数
+        """
+        try:
+            with stage_metrics.stage('stats'):
+                return refresh_condition_cube(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Condition cube refresh error: {e}")
+            return 0
+    
+    def _apply_race_update(self, cursor: sqlite3.Cursor, race_id: str, race_data: Dict) -> bool:
+        """
+        racesテーブルの1レースと正規化テーブル（race_detail_tables.py）を更新
+        （コミットは呼び出し側で行う。正規化テーブルは ensure_race_detail_tables で作成しておく）
+        
+        Returns:
+            更新できた場合True
+        """
+        race_info = race_data.get('race_info', {})
+        
+        # race_idでレコードを検索
+        cursor.execute("SELECT id FROM races WHERE race_id = ?", (race_id,))
+        result = cursor.fetchone()
+        
+        if not result:
+            logger.warning(f"Race not found in database: race_id={race_id}")
+            return False
+        
+        # 更新
+        cursor.execute("""
+            UPDATE races
+            SET 
+                venue = ?,
+                distance = ?,
+                track_type = ?,
+                track_condition = ?,
+                horse_count = ?
+            WHERE race_id = ?
+        """, (
+            race_info.get('venue', '不明'),
+            race_info.get('distance', 0),
+            race_info.get('track_type', '不明'),
+            race_info.get('track_condition'),
+            race_info.get('horse_count', 0),
+            race_id
+        ))
+        
+        if cursor.rowcount > 0:
+            write_race_details(cursor, result[0], race_data)
+            logger.debug(f"Updated race_id={race_id}: {race_info.get('venue')}, {race_info.get('track_type')}, {race_info.get('distance')}m")
+            return True
+        
+        logger.warning(f"No rows updated for race_id={race_id}")
+        return False
 
 
-def scrape_race_detail(race_id: str, db_path: str = "data/keiba.db") -> bool:
+def scrape_race_detail(
+    race_id: str,
+    db_path: str = "data/keiba.db",
+    rate_limiter: Optional[AdaptiveRateLimiter] = None
+) -> bool:
     """
     単一のレース詳細を取得してJSONとDBに保存（バッチ処理用）
     
     Args:
         race_id: レースID
         db_path: データベースパス
+        rate_limiter: リクエスト間隔の制御（省略時は全スクレイパー共通のもの）
         
     Returns:
         成功時True、失敗時False
     """
-    scraper = RaceDetailScraperPandas(db_path)
+    scraper = RaceDetailScraperPandas(db_path, rate_limiter=rate_limiter)
     return scraper.scrape_and_update(race_id)
@@ -0,0 +1,202 @@
+"""
+レース詳細の正規化テーブル（出走馬・払い戻し・コーナー通過順・ラップ）
+
+レース詳細（race_data）は data/race_details のJSONにしか残らず、races には一部の列しか
+コピーされていなかった。ここでは race_data を行に分解し、次のテーブルに書き込む。
+
+    race_entries        出走馬ごとの着順・オッズ・人気・馬体重など
+    race_payouts        馬券種 × 組み合わせごとの払戻金・人気
+    race_corner_passes  コーナーごとの通過順
+    race_laps           ハロンごとの区間タイム・累積タイム
+
+db.netkeiba.com の抽出結果（race_html_extractor.py）と、race.netkeiba.com の抽出結果
+（race_detail_scraper_full.py の JSON。"2,770円"・"9人気" などの表記）のどちらも読める。
+1レース分を削除してから executemany でまとめて挿入するため、同じレースを何度書いても
+行は重複しない。コミットは呼び出し側で行う。
+"""
+import re
+import sqlite3
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from backend.models.database import Base
+
+
+RACE_DETAIL_TABLES = ["race_entries", "race_payouts", "race_corner_passes", "race_laps"]
+
+# 着順どおりの組み合わせで払い戻す馬券種
+ORDERED_BET_TYPES = {"馬単", "3連単"}
+
+_RE_NUMBER = re.compile(r"\d+")
+_RE_AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_RE_TIME = re.compile(r"^(?:(\d+):)?(\d+(?:\.\d+)?)$")
+
+# 各テーブルの列（entry_rows などが返す行の並び。先頭の race_id は races.id）
+ENTRY_COLUMNS = (
+    "race_id", "horse_number", "bracket", "finish_position", "horse_name", "sex_age", "jockey_weight", "jockey",
+    "finish_time", "finish_seconds", "margin", "odds", "popularity", "horse_weight", "weight_change",
+    "trainer_location", "trainer_name", "last_3f", "corner_pass",
+)
+PAYOUT_COLUMNS = ("race_id", "bet_type", "combination", "payout", "popularity")
+CORNER_PASS_COLUMNS = ("race_id", "corner", "passing_order")
+LAP_COLUMNS = ("race_id", "lap_number", "split_time", "cumulative_time")
+
+TABLE_COLUMNS = {
+    "race_entries": ENTRY_COLUMNS,
+    "race_payouts": PAYOUT_COLUMNS,
+    "race_corner_passes": CORNER_PASS_COLUMNS,
+    "race_laps": LAP_COLUMNS,
+}
+
+
+def _insert_sql(table_name: str) -> str:
+    columns = TABLE_COLUMNS[table_name]
+    # 同じ馬番・組み合わせが2回現れた場合は最初の行を残す
+    return (f"INSERT OR IGNORE INTO {table_name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})")
+
+
+def ensure_race_detail_tables(conn: sqlite3.Connection):
+    """正規化テーブルとインデックスがなければ作成（モデル定義から生成）"""
+    dialect = sqlite_dialect.dialect()
+    for table_name in RACE_DETAIL_TABLES:
+        table = Base.metadata.tables[table_name]
+        conn.execute(str(CreateTable(table, if_not_exists=True).compile(dialect=dialect)))
+        for index in table.indexes:
+            conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+
+
+def parse_seconds(value) -> Optional[float]:
+    """タイムの文字列（"2:30.2", "34.6"）を秒にする"""
+    return _parse_seconds_text(str(value or ""))
+
+
+@lru_cache(maxsize=4096)
+def _parse_seconds_text(text: str) -> Optional[float]:
+    # 上がり3F・ラップは同じ値が多いため、一括読み込みではキャッシュが効く
+    match = _RE_TIME.match(text.strip())
+    if not match:
+        return None
+    minutes, seconds = match.groups()
+    return round(int(minutes or 0) * 60 + float(seconds), 2)
+
+
+def _amounts(text: str) -> List[int]:
+    """"2,260円\\n680円" / "2260 680" / "2770.0" → [2260, 680]"""
+    return [int(float(amount.replace(",", ""))) for amount in _RE_AMOUNT.findall(str(text))]
+
+
+def normalize_bet_type(bet_type: str) -> str:
+    """db.netkeiba の "三連複" などを race.netkeiba と同じ "3連複" にそろえる"""
+    return bet_type.strip().replace("三", "3")
+
+
+def entry_rows(race_results: List[Dict]) -> List[Tuple]:
+    """race_results → race_entries の行（race_id を除く）"""
+    rows = []
+    for result in race_results:
+        horse_number = result.get('horse_number')
+        if not horse_number:
+            continue
+        rows.append((
+            horse_number,
+            result.get('bracket') or None,
+            result.get('rank') or None,
+            result.get('horse_name') or None,
+            result.get('sex_age') or None,
+            result.get('jockey_weight') or None,
+            result.get('jockey') or None,
+            result.get('time') or None,
+            parse_seconds(result.get('time')),
+            result.get('margin') or None,
+            result.get('odds') or None,
+            result.get('popularity') or None,
+            result.get('horse_weight') or None,
+            result.get('weight_change') if result.get('horse_weight') else None,
+            result.get('trainer_location') or None,
+            result.get('trainer_name') or None,
+            parse_seconds(result.get('last_3f')),
+            result.get('corner_pass') or None,
+        ))
+    return rows
+
+
+def payout_rows(payback: Dict) -> List[Tuple]:
+    """
+    payback → race_payouts の行（race_id を除く）
+
+    複勝・ワイドのように1つの馬券種に複数の組み合わせがあるときは、払戻金の数で
+    馬番の並びを等分する（"13 - 18 6 - 13 6 - 18" と払戻金3つ → 13-18, 6-13, 6-18）。
+    """
+    rows = []
+    for bet_type, value in payback.items():
+        if not isinstance(value, dict):
+            continue
+        payouts = _amounts(value.get('payout', ""))
+        numbers = _RE_NUMBER.findall(str(value.get('result', "")))
+        if not payouts or not numbers or len(numbers) % len(payouts):
+            continue
+        popularities = _amounts(value.get('popularity', ""))
+        if len(popularities) != len(payouts):
+            popularities = [None] * len(payouts)
+
+        bet_type = normalize_bet_type(bet_type)
+        size = len(numbers) // len(payouts)
+        for i, (payout, popularity) in enumerate(zip(payouts, popularities)):
+            horses = [int(number) for number in numbers[i * size:(i + 1) * size]]
+            if bet_type not in ORDERED_BET_TYPES:
+                horses.sort()
+            rows.append((bet_type, "-".join(map(str, horses)), payout, popularity))
+    return rows
+
+
+def corner_pass_rows(corner_pass: Dict) -> List[Tuple]:
+    """corner_pass → race_corner_passes の行（race_id を除く）"""
+    rows = []
+    for corner_name, passing_order in corner_pass.items():
+        match = _RE_NUMBER.search(str(corner_name))
+        if match and passing_order:
+            rows.append((int(match.group()), str(passing_order)))
+    return rows
+
+
+def lap_rows(lap_times: Dict) -> List[Tuple]:
+    """lap_times → race_laps の行（race_id を除く）"""
+    intervals = [parse_seconds(t) for t in lap_times.get('intervals') or []]
+    cumulative = [parse_seconds(t) for t in lap_times.get('cumulative') or []]
+    count = max(len(intervals), len(cumulative))
+    intervals += [None] * (count - len(intervals))
+    cumulative += [None] * (count - len(cumulative))
+    return [(i + 1, split, total) for i, (split, total) in enumerate(zip(intervals, cumulative))]
+
+
+def race_detail_rows(race_data: Dict) -> Dict[str, List[Tuple]]:
+    """race_data → {テーブル名: 行のリスト}（各行は race_id を除いた列）"""
+    return {
+        'race_entries': entry_rows(race_data.get('race_results') or []),
+        'race_payouts': payout_rows(race_data.get('payback') or {}),
+        'race_corner_passes': corner_pass_rows(race_data.get('corner_pass') or {}),
+        'race_laps': lap_rows(race_data.get('lap_times') or {}),
+    }
+
+
+def write_race_details(cursor: sqlite3.Cursor, race_pk: int, race_data: Dict) -> Dict[str, int]:
+    """
+    1レースの正規化テーブルを書き直す（コミットは呼び出し側で行う）
+
+    Args:
+        cursor: DBカーソル
+        race_pk: races.id
+        race_data: レース詳細（_parse_race_html の戻り値、または race_details のJSON）
+
+    Returns:
+        {テーブル名: 挿入した行数}
+    """
+    rows_by_table = race_detail_rows(race_data)
+    for table_name, rows in rows_by_table.items():
+        cursor.execute(f"DELETE FROM {table_name} WHERE race_id = ?", (race_pk,))
+        cursor.executemany(_insert_sql(table_name), [(race_pk, *row) for row in rows])
+    return {table_name: len(rows) for table_name, rows in rows_by_table.items()}
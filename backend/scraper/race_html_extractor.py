@@ -0,0 +1,516 @@
+"""
+レース詳細ページ（db.netkeiba.com/race/<race_id>）の抽出（lxmlで1回だけ解析）
+
+従来の抽出（RaceDetailScraperPandas._parse_race_html_pandas）は、同じページを
+pandas.read_html（lxml）と BeautifulSoup（html.parser）で2回解析し、表ごとに
+DataFrameを作って iterrows で読み出していた。ここではlxmlで1回だけ解析し、
+XPathで取り出した表のセルから同じ race_data を作る。
+
+出力が従来と一致するよう、read_html の表の読み取りを再現する。
+- 表示されない表・要素（display:none）と <style> を除き、<br> は改行として扱う
+- セルの文字列は前後の空白を除き、改行・連続する空白を1つの空白にする
+- colspan / rowspan のセルは隣の列・下の行に複製する
+- <thead> または <th> だけの先頭行を列名にする（重複する列名は "名前.1"、空の列名は "Unnamed: 列番号"）
+- 列ごとに型を推定する（桁区切りの "," を除いて全て整数なら int、数値と欠損なら float、
+  それ以外は文字列。"" や "NaN" などは欠損）
+
+文字コードはページの meta charset に従う（db.netkeiba.com は EUC-JP）。宣言のないページは
+BeautifulSoup と違って推定しないため、レース名などが従来と異なることがある。
+"""
+import math
+import re
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from lxml import html as lxml_html
+
+
+# read_html のセルの空白の扱い
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+# 桁区切り（thousands=','）を取り除く数値の形（pandasのPythonParser.num）
+_RE_THOUSANDS_NUMBER = re.compile(r"^[\-\+]?([0-9]+,|[0-9])*(\.[0-9]*)?([0-9]?(E|e)\-?[0-9]+)?$")
+_RE_INTEGER = re.compile(r"^[+-]?[0-9]+$")
+_RE_FLOAT = re.compile(r"^[+-]?(([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?|inf|infinity)$", re.IGNORECASE)
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# read_html で欠損として扱う文字列（pandasの既定の na_values）
+_NA_VALUES = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+_TRUE_VALUES = frozenset(["True", "TRUE", "true"])
+_FALSE_VALUES = frozenset(["False", "FALSE", "false"])
+
+# BeautifulSoup の get_text() が含めない文字列（この要素の中のテキスト）
+_NON_TEXT_TAGS = frozenset(["script", "style", "template", "rt", "rp"])
+
+_RE_NAMESPACES = {"re": "http://exslt.org/regular-expressions"}
+_DATA_INTRO_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' data_intro ')]"
+
+NaN = float("nan")
+
+
+def _notna(value) -> bool:
+    """pd.notna 相当（欠損はNaN）"""
+    return not (isinstance(value, float) and math.isnan(value))
+
+
+class HtmlTable:
+    """read_html が返すDataFrameに相当する表（列名と、列ごとに型を推定した値の行）"""
+
+    def __init__(self, columns: List, rows: List[List]):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def iterrows(self) -> Iterator[Tuple[int, List]]:
+        """
+        DataFrame.iterrows 相当の (行番号, 値のリスト)
+
+        全ての列が数値で float の列があるときは、DataFrameと同じく行の値を float にそろえる。
+        """
+        kinds = {_column_kind(self.rows, i) for i in range(len(self.columns))}
+        upcast = bool(kinds) and kinds <= {int, float} and float in kinds
+        for index, row in enumerate(self.rows):
+            yield index, [float(value) for value in row] if upcast else row
+
+    def iterrecords(self) -> Iterator[Tuple[int, Dict]]:
+        """(行番号, {列名: 値})"""
+        for index, row in self.iterrows():
+            yield index, dict(zip(self.columns, row))
+
+
+def _column_kind(rows: List[List], index: int) -> type:
+    if not rows:
+        return object
+    kind = type(rows[0][index])
+    if kind in (int, float, bool) and all(type(row[index]) is kind for row in rows):
+        return kind
+    return object
+
+
+def _infer_column(values: List[str]) -> List:
+    """1列の文字列を read_html と同じ規則で int / float / bool / 文字列（欠損はNaN）にする"""
+    converted = []
+    has_float = False
+    for value in values:
+        if value in _NA_VALUES:
+            converted.append(NaN)
+            has_float = True
+        elif _RE_INTEGER.match(value):
+            number = int(value)
+            if not _INT64_MIN <= number <= _INT64_MAX:
+                break
+            converted.append(number)
+        elif _RE_FLOAT.match(value):
+            converted.append(float(value))
+            has_float = True
+        else:
+            break
+    else:
+        return [float(value) for value in converted] if has_float else converted
+
+    if all(value in _TRUE_VALUES or value in _FALSE_VALUES for value in values):
+        return [value in _TRUE_VALUES for value in values]
+    return [NaN if value in _NA_VALUES else value for value in values]
+
+
+def _remove_thousands(value: str) -> str:
+    if "," in value and _RE_THOUSANDS_NUMBER.search(value.strip()):
+        return value.replace(",", "")
+    return value
+
+
+def _dedup_names(names: List) -> List:
+    """重複する列名に ".1", ".2" を付ける"""
+    counts: Dict = {}
+    result = []
+    for name in names:
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        result.append(name)
+    return result
+
+
+def _expand_rows(rows) -> List[List[str]]:
+    """<tr> のリストをセルの文字列の行にする（colspan / rowspan は複製）"""
+    all_texts = []
+    remainder: List[Tuple[int, str, int]] = []  # (列番号, 文字列, 残りの行数)
+
+    for tr in rows:
+        texts = []
+        next_remainder = []
+        index = 0
+        for td in tr.xpath("./td|./th"):
+            while remainder and remainder[0][0] <= index:
+                prev_index, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+                index += 1
+
+            text = _RE_WHITESPACE.sub(" ", td.text_content().strip())
+            rowspan = int(td.get("rowspan") or 1)
+            colspan = int(td.get("colspan") or 1)
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+
+        for prev_index, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    while remainder:
+        next_remainder = []
+        texts = []
+        for prev_index, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    return all_texts
+
+
+def _read_table(table) -> Optional[HtmlTable]:
+    """<table> を HtmlTable にする（セルがない表は None）"""
+    header_rows = []
+    for thead in table.xpath(".//thead"):
+        header_rows.extend(thead.xpath("./tr"))
+        # <tr> のない <thead><th>...</th></thead> は <thead> を行とみなす
+        if thead.xpath("./td|./th"):
+            header_rows.append(thead)
+    body_rows = table.xpath(".//tbody//tr") + table.xpath("./tr")
+    footer_rows = table.xpath(".//tfoot//tr")
+
+    if not header_rows:
+        while body_rows and all(cell.tag == "th" for cell in body_rows[0].xpath("./td|./th")):
+            header_rows.append(body_rows.pop(0))
+
+    head = _expand_rows(header_rows)
+    lines = head + _expand_rows(body_rows) + _expand_rows(footer_rows)
+
+    width = max((len(line) for line in lines), default=0)
+    lines = [line + [""] * (width - len(line)) for line in lines]
+    # 空行（列が1つで空白だけの行）は読み飛ばす
+    lines = [line for line in lines if len(line) > 1 or (len(line) == 1 and line[0].strip())]
+    if not lines:
+        return None
+
+    if not head:
+        columns = list(range(width))
+        data = lines
+    else:
+        header = [0] if len(head) == 1 else [i for i, row in enumerate(head) if any(row)]
+        if not header:
+            raise ValueError("table header has no text")
+        if len(header) == 1:
+            columns = _dedup_names([name or f"Unnamed: {i}" for i, name in enumerate(lines[header[0]])])
+        else:
+            # 複数行の列名はタプル（DataFrameのMultiIndex）
+            columns = [
+                tuple(lines[h][i] or f"Unnamed: {i}_level_{level}" for level, h in enumerate(header))
+                for i in range(width)
+            ]
+        data = lines[header[-1] + 1:]
+
+    data = [[_remove_thousands(value) for value in line] for line in data]
+    typed_columns = [_infer_column([line[i] for line in data]) for i in range(width)]
+    rows = [list(values) for values in zip(*typed_columns)] if data else []
+    return HtmlTable(columns, rows)
+
+
+def _read_tables(root) -> List[HtmlTable]:
+    """文書中の表示される表（read_html と同じ順・同じ内容）"""
+    for br in root.xpath("*//br"):
+        br.tail = "\n" + (br.tail or "")
+
+    tables = root.xpath("//table[.//text()[re:test(., '.+')]]", namespaces=_RE_NAMESPACES)
+    tables = [t for t in tables if "display:none" not in t.get("style", "").replace(" ", "")]
+    for table in tables:
+        for elem in table.xpath(".//style"):
+            elem.drop_tree()
+        for elem in table.xpath(".//*[@style]"):
+            if "display:none" in elem.get("style", "").replace(" ", ""):
+                elem.drop_tree()
+    if not tables:
+        raise ValueError("No tables found")
+
+    return [frame for frame in (_read_table(table) for table in tables) if frame is not None]
+
+
+def _element_text(elem) -> str:
+    """BeautifulSoup の get_text(strip=True) 相当（各テキストの前後の空白を除いて連結）"""
+    parts = []
+
+    def walk(node, hidden):
+        if node.text and not hidden:
+            text = node.text.strip()
+            if text:
+                parts.append(text)
+        for child in node:
+            if isinstance(child.tag, str):
+                walk(child, hidden or child.tag in _NON_TEXT_TAGS)
+            if child.tail and not hidden:
+                text = child.tail.strip()
+                if text:
+                    parts.append(text)
+
+    walk(elem, elem.tag in _NON_TEXT_TAGS)
+    return "".join(parts)
+
+
+def parse_race_info_text(data_intro_text: str) -> Dict:
+    """data_intro のテキストからレース基本情報を抽出"""
+    info = {}
+
+    # レース名（例: "9 R亀岡特別(2勝)"）
+    race_name_match = re.search(r'\d+\s*R\s*([^(]+)', data_intro_text)
+    if race_name_match:
+        info['race_name'] = race_name_match.group(1).strip()
+    else:
+        info['race_name'] = None
+
+    # グレード判定（2勝、3勝などはグレードではない）
+    if 'G1' in data_intro_text:
+        info['grade'] = 'G1'
+    elif 'G2' in data_intro_text:
+        info['grade'] = 'G2'
+    elif 'G3' in data_intro_text:
+        info['grade'] = 'G3'
+    else:
+        info['grade'] = None
+
+    # Zenn方式：テキストを単語に分割して個別にチェック
+    # この方法は重賞レースのような複雑な名前でも確実に情報を抽出できる
+    info_words = re.findall(r'\w+', data_intro_text)
+
+    # デフォルト値を設定
+    info['track_type'] = '不明'
+    info['distance'] = 0
+
+    for word in info_words:
+        # 芝/ダートの判定
+        if word in ["芝", "ダート"]:
+            info['track_type'] = word
+        # 障害の判定
+        if "障" in word:
+            info['track_type'] = "障害"
+        # 距離の抽出（"m"を含む単語から数字を抽出）
+        if "m" in word:
+            distance_nums = re.findall(r"\d+", word)
+            if distance_nums:
+                info['distance'] = int(distance_nums[-1])
+
+    # 天候（例: "天候 : 晴"）
+    weather_match = re.search(r'天候\s*:\s*([^\s/]+)', data_intro_text)
+    info['weather'] = weather_match.group(1) if weather_match else None
+
+    # 馬場状態（例: "ダート : 良"）
+    track_condition_match = re.search(r'(芝|ダート)\s*:\s*([^\s/]+)', data_intro_text)
+    info['track_condition'] = track_condition_match.group(2) if track_condition_match else None
+
+    # 発走時刻（例: "14:35"）
+    time_match = re.search(r'発走\s*:\s*(\d{1,2}:\d{2})', data_intro_text)
+    info['post_time'] = time_match.group(1) if time_match else None
+
+    # 開催情報（例: "4回京都1日目"）
+    kaisai_match = re.search(r'(\d+)回([^0-9]+?)(\d+)日目', data_intro_text)
+    if kaisai_match:
+        info['kaisai_count'] = int(kaisai_match.group(1))
+        info['venue'] = kaisai_match.group(2).strip()
+        info['day'] = int(kaisai_match.group(3))
+    else:
+        info['venue'] = '不明'
+
+    # レースクラス（例: "2勝クラス"）
+    class_match = re.search(r'([１-３1-3]勝クラス|オープン|1600万|1000万|500万|未勝利|新馬)', data_intro_text)
+    info['race_class'] = class_match.group(1) if class_match else None
+
+    # 馬齢・重量条件
+    condition_match = re.search(r'(サラ系)?([3-9]歳以上|[3-9]歳)', data_intro_text)
+    info['race_condition'] = condition_match.group(0) if condition_match else None
+
+    weight_match = re.search(r'\(([^)]*)\)', data_intro_text)
+    if weight_match:
+        weight_text = weight_match.group(1)
+        if '定' in weight_text:
+            info['weight_type'] = '定量'
+        elif 'ハ' in weight_text or 'ハンデ' in weight_text:
+            info['weight_type'] = 'ハンデ'
+        elif '別' in weight_text:
+            info['weight_type'] = '別定'
+        else:
+            info['weight_type'] = None
+    else:
+        info['weight_type'] = None
+
+    return info
+
+
+def extract_race_info(root) -> Dict:
+    """レース基本情報（data_introクラス）"""
+    info = {}
+    try:
+        data_intro = root.xpath(_DATA_INTRO_XPATH)
+        if data_intro:
+            info = parse_race_info_text(_element_text(data_intro[0]))
+
+        # 出走頭数はレース結果の数から設定。データベースページでは本賞金情報がない場合が多い
+        info['horse_count'] = 0
+        info['prize_money'] = 0
+
+        logger.debug(f"Extracted: venue={info.get('venue')}, track={info.get('track_type')}, distance={info.get('distance')}")
+    except Exception as e:
+        logger.error(f"Error extracting race info: {e}")
+    return info
+
+
+def extract_race_results(table: HtmlTable) -> List[Dict]:
+    """レース結果（列名: '着 順', '枠 番', '馬 番', '馬名', '性齢', '斤量', '騎手', 'タイム', '着差', '単勝', '人 気', '馬体重', '調教師'）"""
+    results = []
+
+    for idx, row in table.iterrecords():
+        try:
+            result = {}
+            result['rank'] = int(row['着 順']) if _notna(row['着 順']) else 0
+            result['bracket'] = int(row['枠 番']) if _notna(row['枠 番']) else 0
+            result['horse_number'] = int(row['馬 番']) if _notna(row['馬 番']) else 0
+            result['horse_name'] = str(row['馬名']) if _notna(row['馬名']) else ""
+            result['sex_age'] = str(row['性齢']) if _notna(row['性齢']) else ""
+            result['jockey_weight'] = float(row['斤量']) if _notna(row['斤量']) else 0.0
+            result['jockey'] = str(row['騎手']) if _notna(row['騎手']) else ""
+            result['time'] = str(row['タイム']) if _notna(row['タイム']) else ""
+            result['margin'] = str(row['着差']) if _notna(row['着差']) else ""
+            result['odds'] = float(row['単勝']) if _notna(row['単勝']) else 0.0
+            result['popularity'] = int(row['人 気']) if _notna(row['人 気']) else 0
+
+            # 馬体重（例: "514(+4)"）
+            result['horse_weight'] = 0
+            result['weight_change'] = 0
+            if _notna(row['馬体重']):
+                weight_match = re.search(r'(\d+)\(([+-]?\d+)\)', str(row['馬体重']))
+                if weight_match:
+                    result['horse_weight'] = int(weight_match.group(1))
+                    result['weight_change'] = int(weight_match.group(2))
+
+            # 調教師（例: "[西] 清水久詞"）
+            result['trainer_location'] = ""
+            result['trainer_name'] = ""
+            if _notna(row['調教師']):
+                trainer_text = str(row['調教師'])
+                trainer_match = re.search(r'\[([^]]+)\]\s*(.+)', trainer_text)
+                if trainer_match:
+                    result['trainer_location'] = trainer_match.group(1)
+                    result['trainer_name'] = trainer_match.group(2)
+                else:
+                    result['trainer_name'] = trainer_text
+
+            # 上がり3F、コーナー通過順（レース結果の表にはない場合がある）
+            result['last_3f'] = ""
+            result['corner_pass'] = ""
+
+            results.append(result)
+        except Exception as e:
+            logger.warning(f"Error extracting horse result at index {idx}: {e}")
+
+    return results
+
+
+def extract_payback(tables: List[HtmlTable]) -> Dict:
+    """払い戻し（tables[1]: 単勝・複勝・枠連・馬連、tables[2]: ワイド・馬単・3連複・3連単）"""
+    payback = {}
+    for table in tables[1:3]:
+        for _, row in table.iterrows():
+            bet_type = str(row[0])
+            payback[bet_type] = {
+                'result': str(row[1]) if len(row) > 1 else "",
+                'payout': str(row[2]) if len(row) > 2 else "",
+                'popularity': str(row[3]) if len(row) > 3 else "",
+            }
+    return payback
+
+
+def extract_corner_pass(table: HtmlTable) -> Dict:
+    """コーナー通過順（[コーナー名, 通過順]）"""
+    corner_pass = {}
+    for _, row in table.iterrows():
+        try:
+            corner_name = str(row[0]) if _notna(row[0]) else ""
+            pass_order = str(row[1]) if _notna(row[1]) else ""
+        except IndexError as e:
+            logger.warning(f"Error extracting corner pass row: {e}")
+            continue
+        if corner_name and pass_order:
+            corner_pass[corner_name] = pass_order
+    return corner_pass
+
+
+def extract_lap_times(table: HtmlTable) -> Dict:
+    """ラップタイム（1行目: 区間タイム、2行目: 累積タイム。ペースは設定しない）"""
+    lap_times = {
+        'intervals': [],
+        'cumulative': [],
+        'pace': None
+    }
+
+    for key, index in (('intervals', 0), ('cumulative', 1)):
+        if len(table) <= index:
+            break
+        try:
+            value = table.rows[index][1]
+        except IndexError as e:
+            logger.error(f"Error extracting lap times: {e}")
+            break
+        data = str(value) if _notna(value) else ""
+        if data:
+            # "11.9 - 10.6 - 11.3 - ..." を分割
+            lap_times[key] = [t.strip() for t in data.split('-')]
+
+    return lap_times
+
+
+def parse_race_html(race_id: str, content: bytes) -> Dict:
+    """
+    レース詳細ページのHTMLから race_data を抽出
+
+    Raises:
+        ValueError: 表がない、または解析できないページ
+    """
+    parser = lxml_html.HTMLParser(recover=True, encoding=None)
+    root = lxml_html.parse(BytesIO(content), parser=parser).getroot()
+    if root is None:
+        raise ValueError("no text parsed from document")
+
+    # レース情報は <br> の扱いを変える前の文書から取得
+    race_info = extract_race_info(root)
+    tables = _read_tables(root)
+
+    race_results = extract_race_results(tables[0]) if len(tables) > 0 else []
+    race_info['horse_count'] = len(race_results)
+
+    return {
+        'race_id': race_id,
+        'race_info': race_info,
+        'race_results': race_results,
+        'payback': extract_payback(tables),
+        'corner_pass': extract_corner_pass(tables[4]) if len(tables) > 4 else {},
+        'lap_times': extract_lap_times(tables[5]) if len(tables) > 5 else {},
+        'scraped_at': datetime.now().isoformat()
+    }
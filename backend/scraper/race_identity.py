@@ -0,0 +1,56 @@
+"""
+レースの同一性（予想から作るレースの正規化キー）
+
+予想一覧から分かるレース情報（日付・競馬場・レース番号・レース名）から
+レースを一意に表すキー（races.race_key）を作り、同じレースを予想した
+予想家どうしで1つのレース行を共有する。
+
+    race_key: "2025-11-30|東京|11|ジャパンカップ(GI)"
+    race_id : "temp_" + race_key のハッシュ（正しいrace_idが分かるまでの仮ID）
+
+レース番号が分からない予想（古いデータなど）はキーを作らず、従来どおり予想ごとにレース行を作る。
+"""
+import re
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+
+# 同日・同競馬場で同名のレースがありうる条件戦（レース番号なしでは同一と判断しない）
+GENERIC_RACE_NAME_PATTERN = re.compile(r'(新馬|未勝利|[1-3１-３]勝クラス|万下)')
+
+_RACE_NUMBER_PATTERN = re.compile(r'(\d{1,2})')
+
+
+def parse_race_number(race_num) -> Optional[int]:
+    """'11R' などからレース番号を取り出す（1〜12以外は None）"""
+    if race_num is None:
+        return None
+    match = _RACE_NUMBER_PATTERN.search(str(race_num).translate(str.maketrans('０１２３４５６７８９', '0123456789')))
+    if not match:
+        return None
+    number = int(match.group(1))
+    return number if 1 <= number <= 12 else None
+
+
+def race_identity_key(
+    race_date: Optional[datetime],
+    venue: Optional[str],
+    race_num,
+    race_name: Optional[str]
+) -> Optional[str]:
+    """
+    レースの正規化キー
+
+    Returns:
+        "日付|競馬場|レース番号|レース名"。いずれかが不明な場合は None
+    """
+    race_number = parse_race_number(race_num)
+    if not race_date or not venue or venue == '不明' or not race_number or not race_name:
+        return None
+    return f"{race_date:%Y-%m-%d}|{venue.strip()}|{race_number}|{race_name.strip()}"
+
+
+def temp_race_id(race_key: str) -> str:
+    """正規化キーから仮のrace_id（temp_ + 12桁のハッシュ）を作る"""
+    return "temp_" + hashlib.sha1(race_key.encode('utf-8')).hexdigest()[:12]
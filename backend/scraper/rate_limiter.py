@@ -0,0 +1,467 @@
+"""
+ホスト単位のリクエスト間隔制御（トークンバケット）
+
+複数スレッドから同じホストへリクエストする場合でも、
+ホストごとの上限（平均間隔・バースト・一定件数ごとの長い休憩）を守る。
+
+AdaptiveRateLimiter はレスポンスに応じて間隔を自動調整する（AIMD）。
+速く正常なレスポンスが続く間は頻度を少しずつ上げ、429/5xx・タイムアウト・
+ブロックページでは頻度を半分に下げる。固定の待機時間や定期的な長い休憩の代わりに使う。
+"""
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from loguru import logger
+
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット"""
+
+    def __init__(self, interval: float, burst: int = 1, jitter: float = 0.0):
+        """
+        Args:
+            interval: トークン1個が補充されるまでの秒数（平均リクエスト間隔）
+            burst: 貯められるトークン数の上限（1なら連続リクエストなし）
+            jitter: リクエストごとに追加するランダム待機の最大秒数
+        """
+        self.interval = interval
+        self.burst = burst
+        self.jitter = jitter
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """トークンを1個予約し、使えるようになるまでの待ち秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+            self._updated = now
+
+            # ジッターの分だけ次のトークンも遅らせ、平均間隔が interval を下回らないようにする
+            extra = random.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+            self._tokens -= 1 + extra / self.interval
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * self.interval
+
+    def set_interval(self, interval: float):
+        """平均間隔を変更する（それまでに貯まったトークンは元の間隔で計算する）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+            self._updated = now
+            self.interval = interval
+
+    def reset(self):
+        """休憩明けなどに、トークン1個（バーストなし）の状態に戻す"""
+        with self._lock:
+            self._tokens = min(1.0, float(self.burst))
+            self._updated = time.monotonic()
+
+    def acquire(self) -> float:
+        """
+        トークンを1個取得（なければ補充されるまで待つ）
+
+        Returns:
+            待機した秒数
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """ホストごとのトークンバケットと、一定件数ごとの長い休憩"""
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        burst: int = 1,
+        jitter: float = 1.0,
+        pause_every: int = 0,
+        pause_seconds: float = 0.0
+    ):
+        """
+        Args:
+            interval: 同一ホストへの平均リクエスト間隔（秒）
+            burst: 同一ホストへの連続リクエスト数の上限
+            jitter: リクエストごとのランダム待機の最大秒数
+            pause_every: この件数ごとに休憩する（0なら休憩なし）
+            pause_seconds: 休憩時間（秒）
+        """
+        self.interval = interval
+        self.burst = burst
+        self.jitter = jitter
+        self.pause_every = pause_every
+        self.pause_seconds = pause_seconds
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._counts: Dict[str, int] = {}
+        self._pause_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host: str):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.interval, self.burst, self.jitter)
+                self._counts[host] = 0
+                self._pause_locks[host] = threading.Lock()
+            return self._buckets[host], self._pause_locks[host]
+
+    def acquire(self, url: str, stop_event: Optional[threading.Event] = None) -> float:
+        """
+        url のホストへリクエストしてよくなるまで待つ
+
+        Args:
+            url: リクエスト先URL
+            stop_event: セットされたら休憩を切り上げる
+
+        Returns:
+            待機した秒数
+        """
+        host = urlparse(url).netloc
+        bucket, pause_lock = self._host_state(host)
+
+        waited = 0.0
+
+        # 休憩中は同じホストへの全スレッドをここで止める
+        with pause_lock:
+            with self._lock:
+                count = self._counts[host]
+
+            # pause_every 件リクエストし終えたら、次のリクエストの前に休憩する
+            if self.pause_every and count and count % self.pause_every == 0:
+                logger.info(f"{host}: {count}件リクエストしたため{self.pause_seconds / 60:.0f}分休憩します")
+                if stop_event is not None:
+                    stop_event.wait(self.pause_seconds)
+                else:
+                    time.sleep(self.pause_seconds)
+                bucket.reset()
+                waited += self.pause_seconds
+
+            waited += bucket.acquire()
+
+            with self._lock:
+                self._counts[host] += 1
+
+        return waited
+
+    def request_count(self, url: str) -> int:
+        """url のホストへのリクエスト数"""
+        with self._lock:
+            return self._counts.get(urlparse(url).netloc, 0)
+
+
+# 頻度を下げるステータスコード（netkeibaはアクセス過多のとき400/403のページを返す）
+BLOCK_STATUS_CODES = (400, 403)
+THROTTLE_STATUS_CODES = (429,)
+
+
+@dataclass
+class HostMetrics:
+    """ホストごとの間隔制御の状態（AdaptiveRateLimiter.metrics() の値）"""
+    host: str
+    interval: float
+    requests: int = 0
+    successes: int = 0
+    slow: int = 0
+    backoffs: Dict[str, int] = field(default_factory=dict)
+    latency: float = 0.0
+    cooldown_remaining: float = 0.0
+
+    @property
+    def rate_per_minute(self) -> float:
+        """現在の1分あたりのリクエスト数の上限"""
+        return 60.0 / self.interval
+
+    @property
+    def backoff_count(self) -> int:
+        return sum(self.backoffs.values())
+
+
+class _AdaptiveHost:
+    """AdaptiveRateLimiter のホストごとの状態"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.requests = 0
+        self.successes = 0
+        self.slow = 0
+        self.backoffs: Counter = Counter()
+        self.latency = 0.0
+        self.cooldown_until = 0.0
+        self.last_decrease = 0.0
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Retry-After ヘッダー（秒数またはHTTP日付）を秒数で返す"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter(HostRateLimiter):
+    """
+    レスポンスに応じてホストごとの間隔を調整するレートリミッター（AIMD）
+
+    acquire() で待ってからリクエストし、結果を observe() に渡す。
+
+    - 正常なレスポンスが slow_latency 秒以内に返った: 頻度を increase（回/秒）だけ上げる
+    - 429/5xx・400/403（ブロックページ）・タイムアウト・接続エラー: 頻度に decrease を掛ける
+    - 最長間隔のまま頻度を下げる必要があった、または Retry-After があった:
+      そのホストへのリクエストを cooldown_seconds（または Retry-After）止める
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        min_interval: float = 1.0,
+        max_interval: float = 60.0,
+        increase: float = 0.01,
+        decrease: float = 0.5,
+        slow_latency: float = 3.0,
+        cooldown_seconds: float = 300.0,
+        burst: int = 1,
+        jitter: float = 1.0,
+        pause_every: int = 0,
+        pause_seconds: float = 0.0
+    ):
+        """
+        Args:
+            interval: 同一ホストへの最初の平均リクエスト間隔（秒）
+            min_interval: 間隔の下限（秒）
+            max_interval: 間隔の上限（秒）
+            increase: 速く正常なレスポンス1件ごとに上げる頻度（回/秒）
+            decrease: 頻度を下げるときに掛ける係数（0より大きく1未満）
+            slow_latency: これより遅いレスポンスでは頻度を上げない（秒）
+            cooldown_seconds: 最長間隔でも拒否されたときにリクエストを止める時間（秒）
+            burst: 同一ホストへの連続リクエスト数の上限
+            jitter: リクエストごとのランダム待機の最大秒数
+            pause_every: この件数ごとに休憩する（0なら休憩なし）
+            pause_seconds: 休憩時間（秒）
+        """
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        min_interval = min(min_interval, interval)
+        max_interval = max(max_interval, interval)
+        super().__init__(interval, burst, jitter, pause_every, pause_seconds)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_latency = slow_latency
+        self.cooldown_seconds = cooldown_seconds
+
+        self._hosts: Dict[str, _AdaptiveHost] = {}
+
+    def _adaptive_host(self, host: str) -> _AdaptiveHost:
+        # self._lock を取得した状態で呼ぶ
+        if host not in self._hosts:
+            self._hosts[host] = _AdaptiveHost(self.interval)
+        return self._hosts[host]
+
+    def acquire(self, url: str, stop_event: Optional[threading.Event] = None) -> float:
+        """
+        url のホストへリクエストしてよくなるまで待つ（頻度を下げた直後の停止時間も待つ）
+
+        Args:
+            url: リクエスト先URL
+            stop_event: セットされたら待機を切り上げる
+
+        Returns:
+            待機した秒数
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._adaptive_host(host)
+            cooldown = state.cooldown_until - time.monotonic()
+
+        waited = 0.0
+        if cooldown > 0:
+            logger.info(f"{host}: 頻度を下げたため{cooldown:.0f}秒待ってから再開します")
+            if stop_event is not None:
+                stop_event.wait(cooldown)
+            else:
+                time.sleep(cooldown)
+            waited += cooldown
+            bucket, _ = self._host_state(host)
+            bucket.reset()
+
+        if stop_event is not None and stop_event.is_set():
+            return waited
+        return waited + super().acquire(url, stop_event)
+
+    def observe(
+        self,
+        url: str,
+        response: Optional[requests.Response] = None,
+        error: Optional[BaseException] = None,
+        latency: Optional[float] = None,
+        blocked: bool = False
+    ) -> Optional[str]:
+        """
+        リクエストの結果を記録して間隔を調整する
+
+        Args:
+            url: リクエスト先URL
+            response: レスポンス（例外で終わった場合は None）
+            error: リクエストで発生した例外
+            latency: レスポンスまでの秒数（省略時は response.elapsed）
+            blocked: 呼び出し側がブロックページと判定した
+
+        Returns:
+            頻度を下げた理由（'429'・'5xx'・'block'・'timeout'・'error'）。下げなかった場合は None
+        """
+        retry_after = None
+        if error is not None:
+            reason = 'timeout' if isinstance(error, requests.exceptions.Timeout) else 'error'
+        elif blocked:
+            reason = 'block'
+        elif response is None:
+            reason = None
+        elif response.status_code in THROTTLE_STATUS_CODES:
+            reason = str(response.status_code)
+            retry_after = _retry_after_seconds(response)
+        elif response.status_code >= 500:
+            reason = '5xx'
+            retry_after = _retry_after_seconds(response)
+        elif response.status_code in BLOCK_STATUS_CODES:
+            reason = 'block'
+        else:
+            reason = None
+
+        if latency is None and response is not None and response.elapsed is not None:
+            latency = response.elapsed.total_seconds()
+
+        if reason is not None:
+            self.backoff(url, reason, retry_after)
+        elif response is not None and response.status_code < 400:
+            self.success(url, latency)
+        else:
+            # 404などはサーバーの混雑とは関係ないので間隔は変えない
+            with self._lock:
+                self._adaptive_host(urlparse(url).netloc).requests += 1
+        return reason
+
+    def success(self, url: str, latency: Optional[float] = None):
+        """正常なレスポンス。速ければ頻度を上げる（加算）"""
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._adaptive_host(host)
+            state.requests += 1
+            state.successes += 1
+            if latency is not None:
+                state.latency = latency if state.successes == 1 else 0.8 * state.latency + 0.2 * latency
+                if latency > self.slow_latency:
+                    state.slow += 1
+                    return
+            rate = 1.0 / state.interval + self.increase
+            state.interval = max(self.min_interval, 1.0 / rate)
+            interval = state.interval
+        bucket, _ = self._host_state(host)
+        bucket.set_interval(interval)
+
+    def backoff(self, url: str, reason: str, retry_after: Optional[float] = None):
+        """サーバーに拒否された・混雑している。頻度を下げる（乗算）"""
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        with self._lock:
+            state = self._adaptive_host(host)
+            state.requests += 1
+            state.backoffs[reason] += 1
+            old = state.interval
+
+            # 同時に送っていたリクエストの失敗で何度も下げないよう、1間隔に1回だけ下げる
+            if now - state.last_decrease < old and not retry_after:
+                return
+            state.last_decrease = now
+
+            cooldown = retry_after or 0.0
+            if old >= self.max_interval:
+                cooldown = max(cooldown, self.cooldown_seconds)
+            state.interval = min(self.max_interval, old / self.decrease)
+            state.cooldown_until = max(state.cooldown_until, now + cooldown)
+            interval = state.interval
+
+        logger.warning(f"{host}: {reason} のため間隔を {old:.1f}秒 → {interval:.1f}秒 に広げます"
+                       + (f"（{cooldown:.0f}秒停止）" if cooldown else ""))
+        bucket, _ = self._host_state(host)
+        bucket.set_interval(interval)
+
+    def current_interval(self, url: str) -> float:
+        """url のホストへの現在の平均リクエスト間隔（秒）"""
+        with self._lock:
+            return self._adaptive_host(urlparse(url).netloc).interval
+
+    def metrics(self) -> Dict[str, HostMetrics]:
+        """ホストごとの現在の間隔・リクエスト数・頻度を下げた回数"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: HostMetrics(
+                    host=host,
+                    interval=state.interval,
+                    requests=state.requests,
+                    successes=state.successes,
+                    slow=state.slow,
+                    backoffs=dict(state.backoffs),
+                    latency=state.latency,
+                    cooldown_remaining=max(0.0, state.cooldown_until - now)
+                )
+                for host, state in self._hosts.items()
+            }
+
+    def log_metrics(self):
+        """ホストごとの状態をログに出す"""
+        for m in self.metrics().values():
+            backoffs = ', '.join(f"{reason}: {count}" for reason, count in sorted(m.backoffs.items())) or 'なし'
+            logger.info(f"{m.host}: 間隔 {m.interval:.2f}秒（{m.rate_per_minute:.1f}回/分） | "
+                        f"リクエスト {m.requests}件 | 平均応答 {m.latency:.2f}秒 | 頻度低下 {backoffs}")
+
+
+_shared_limiter: Optional[AdaptiveRateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    スクレイパーで共有するレートリミッター（設定の scraping_delay から始める）
+
+    同じホストへのリクエストは同じ間隔・頻度低下の状態を共有する。利用箇所:
+    - BaseScraper.get_page（BaseScraper を継承するスクレイパーの GET）
+    - PredictionScraper の予想一覧API・Seleniumでのプロフィールページ描画
+    - RaceDetailScraperPandas / RaceDetailPipeline のレース詳細ページ
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            from backend.config import settings
+            _shared_limiter = AdaptiveRateLimiter(
+                interval=settings.scraping_delay,
+                min_interval=settings.scraping_min_delay,
+                max_interval=settings.scraping_max_delay
+            )
+        return _shared_limiter
@@ -1,7 +1,19 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-レース詳細情報のバッチ取得スクリプト（pandas版スクレイパー対応 + 100件ごと30分休憩）
+レース詳細情報のバッチ取得スクリプト（pandas版スクレイパー対応 + リクエスト間隔の自動調整）
+
+デフォルトは並行パイプライン（backend/scraper/race_detail_pipeline.py）で取得する。
+通信待ちの間に解析・DB保存を進める。--serial で従来の1件ずつの処理になる。
+
+リクエスト間隔は固定の待機や100件ごとの30分休憩ではなく、レスポンスに応じて自動調整する
+（backend/scraper/rate_limiter.AdaptiveRateLimiter）。速く正常なレスポンスが続けば間隔を縮め、
+429/5xx・タイムアウト・ブロックページでは間隔を広げる（最長間隔でも拒否されたら一定時間止める）。
+--batch-interval を指定すると、従来どおり100件ごとにも休憩する。
+
+詳細未取得のレースはジョブキュー（backend/scraper/job_queue.py）に登録し、100件ずつ取り出して
+処理する。結果は1件ごとに記録するため、中断・異常終了しても同じコマンドで続きから再開できる
+（offset を指定する必要はない）。複数のプロセスで同時に実行しても同じレースは取得しない。
 """
 
 import sys
@@ -10,16 +22,22 @@ import logging
 import argparse
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import sqlite3
 
 # プロジェクトルートをパスに追加
-project_root = Path(__file__).resolve().parent
+project_root = Path(__file__).resolve().parents[2]
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
+from backend.analysis.condition_cube import refresh_condition_cube
+from backend.data_version import bump_data_version
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.job_queue import JobQueue, drain
+from backend.scraper.rate_limiter import AdaptiveRateLimiter
+
 # ログ設定
-log_dir = project_root / "logs"
+log_dir = Path(__file__).resolve().parent / "logs"
 log_dir.mkdir(exist_ok=True)
 log_file = log_dir / f"batch_race_detail_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 
@@ -33,14 +51,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 従来のスクレイパーがリクエスト後に入れていたランダム待機（2-3秒）
+REQUEST_WAIT_MIN = 2.0
+REQUEST_WAIT_MEAN = 2.5
+
+# この件数ごとにキューから取り出し、間に休憩を入れる
+CHUNK_SIZE = 100
+
 
 class RaceDetailBatchProcessor:
-    """レース詳細情報のバッチ処理クラス（100件ごと30分休憩機能付き）"""
+    """レース詳細情報のバッチ処理クラス（リクエスト間隔の自動調整付き）"""
     
     def __init__(self, db_path: str = "data/keiba.db"):
         self.db_path = db_path
         self.conn = None
         self.cursor = None
+        self.rate_limiter: Optional[AdaptiveRateLimiter] = None
         
     def connect_db(self):
         """データベース接続"""
@@ -58,17 +84,13 @@ class RaceDetailBatchProcessor:
             self.conn.close()
             logger.info("データベース切断")
     
-    def get_pending_races(
-        self, 
-        offset: int = 0, 
-        limit: Optional[int] = None,
-        grade_only: bool = False
-    ) -> List[Dict]:
-        """詳細未取得のレース一覧を取得"""
+    def get_pending_race_ids(self, grade_only: bool = False) -> List[str]:
+        """詳細未取得のレースのrace_id一覧を取得"""
         query = """
-            SELECT id, race_id, race_name, grade, is_grade_race
+            SELECT race_id
             FROM races
-            WHERE track_type = '不明' OR track_type IS NULL
+            WHERE (track_type = '不明' OR track_type IS NULL)
+            AND race_id NOT LIKE 'temp_%'
         """
         
         if grade_only:
@@ -76,21 +98,28 @@ class RaceDetailBatchProcessor:
         
         query += " ORDER BY id"
         
-        if limit:
-            query += f" LIMIT {limit} OFFSET {offset}"
-        
         self.cursor.execute(query)
-        races = []
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def get_races(self, race_ids: List[str]) -> List[Dict]:
+        """race_idのレース情報を取得（race_ids の順）"""
+        placeholders = ", ".join("?" * len(race_ids))
+        self.cursor.execute(f"""
+            SELECT id, race_id, race_name, grade, is_grade_race
+            FROM races
+            WHERE race_id IN ({placeholders})
+        """, race_ids)
+        races = {}
         for row in self.cursor.fetchall():
-            races.append({
+            races[row[1]] = {
                 'id': row[0],
                 'race_id': row[1],
                 'race_name': row[2],
                 'grade': row[3],
                 'is_grade_race': row[4]
-            })
+            }
         
-        return races
+        return [races[race_id] for race_id in race_ids if race_id in races]
     
     def get_stats(self) -> Dict:
         """統計情報を取得"""
@@ -137,22 +166,165 @@ class RaceDetailBatchProcessor:
         
         logger.info(f"   ✅ 休憩終了。処理を再開します。")
     
+    def _log_rate_metrics(self):
+        """ホストごとの現在のリクエスト間隔と、間隔を広げた回数"""
+        if self.rate_limiter is None:
+            return
+        for m in self.rate_limiter.metrics().values():
+            backoffs = ', '.join(f"{reason}: {count}回" for reason, count in sorted(m.backoffs.items())) or 'なし'
+            logger.info(f"🚦 {m.host}: 間隔 {m.interval:.2f}秒（{m.rate_per_minute:.1f}件/分） | "
+                        f"平均応答 {m.latency:.2f}秒 | 間隔を広げた回数: {backoffs}")
+    
+    def _process_serial(
+        self,
+        races: List[Dict],
+        on_result: Optional[Callable[[str, bool], None]] = None
+    ):
+        """従来の逐次処理（1件ずつ取得・保存する。レース間の待機は self.rate_limiter が決める）"""
+        # race_detail_scraperをインポート
+        try:
+            from backend.scraper.race_detail_scraper_with_db import scrape_race_detail
+        except ImportError:
+            logger.error("race_detail_scraper_with_db.pyが見つかりません")
+            logger.error("backend/scraper/race_detail_scraper_with_db.pyが存在することを確認してください")
+            return 0, len(races)
+        
+        # 処理開始
+        success_count = 0
+        error_count = 0
+        start_time = time.time()
+        
+        for i, race in enumerate(races, 1):
+            try:
+                logger.info(f"\n[{i}/{len(races)}] 処理中: {race['race_name']} (race_id: {race['race_id']})")
+                if race['is_grade_race']:
+                    logger.info(f"  グレード: {race['grade']}")
+                
+                # レース詳細取得
+                success = scrape_race_detail(race['race_id'], self.db_path, rate_limiter=self.rate_limiter)
+                
+                if success:
+                    success_count += 1
+                    logger.info(f"  ✅ 成功 ({success_count}/{len(races)})")
+                else:
+                    error_count += 1
+                    logger.warning(f"  ❌ 失敗 ({error_count}/{len(races)})")
+                if on_result:
+                    on_result(race['race_id'], success)
+                
+                # 進捗表示
+                elapsed = time.time() - start_time
+                total_remaining = elapsed / i * (len(races) - i)
+                eta = datetime.now() + timedelta(seconds=total_remaining)
+                logger.info(f"  進捗: {i/len(races)*100:.1f}% | 経過: {elapsed/60:.1f}分 | 残り: {total_remaining/60:.1f}分 | ETA: {eta.strftime('%H:%M:%S')}")
+                
+            except Exception as e:
+                error_count += 1
+                logger.error(f"  エラー: {race['race_name']} - {e}")
+                if on_result:
+                    on_result(race['race_id'], False)
+                continue
+        
+        return success_count, error_count
+    
+    def _process_pipeline(
+        self,
+        races: List[Dict],
+        on_result: Optional[Callable[[str, bool], None]] = None
+    ):
+        """
+        並行パイプラインで処理
+        
+        同一ホストへのリクエスト間隔は self.rate_limiter が決める（チャンクをまたいで
+        調整した間隔を引き継ぐ）。--batch-interval の休憩はキューから取り出すチャンクの間に入れる
+        """
+        try:
+            from backend.scraper.race_detail_pipeline import scrape_race_details_concurrent
+        except ImportError:
+            logger.error("race_detail_pipeline.pyが見つかりません")
+            return 0, len(races)
+        
+        race_names = {race['race_id']: race['race_name'] for race in races}
+        progress = {'done': 0, 'success': 0}
+        start_time = time.time()
+        
+        def log_result(race_id: str, success: bool):
+            if on_result:
+                on_result(race_id, success)
+            progress['done'] += 1
+            if success:
+                progress['success'] += 1
+                logger.info(f"  ✅ 成功: {race_names.get(race_id)} (race_id: {race_id})")
+            else:
+                logger.warning(f"  ❌ 失敗: {race_names.get(race_id)} (race_id: {race_id})")
+            
+            done = progress['done']
+            if done % 10 == 0 or done == len(races):
+                elapsed = time.time() - start_time
+                eta = datetime.now() + timedelta(seconds=elapsed / done * (len(races) - done))
+                logger.info(f"  進捗: {done}/{len(races)} ({done/len(races)*100:.1f}%) | "
+                            f"成功: {progress['success']}件 | 経過: {elapsed/60:.1f}分 | ETA: {eta.strftime('%H:%M:%S')}")
+        
+        stats = scrape_race_details_concurrent(
+            [race['race_id'] for race in races],
+            db_path=self.db_path,
+            on_result=log_result,
+            rate_limiter=self.rate_limiter
+        )
+        
+        logger.info(f"リクエスト数: {stats.requests}件（リトライ含む）")
+        if stats.success + stats.failed < len(races):
+            # パイプラインが中断された（取得していないレースはキューに戻す）
+            raise KeyboardInterrupt
+        return stats.success, stats.failed
+    
     def process_batch(
         self,
-        offset: int = 0,
         limit: Optional[int] = None,
         grade_only: bool = False,
         sleep_interval: int = 3,
-        batch_interval: int = 1800  # 100件ごとの休憩時間（秒）デフォルト30分
+        batch_interval: int = 0,  # 100件ごとの休憩時間（秒）。0なら休憩せず間隔の自動調整に任せる
+        serial: bool = False,
+        lease_seconds: int = 600,
+        max_attempts: int = 3,
+        reclaim: bool = False,
+        retry_failed: bool = False,
+        min_interval: float = 1.0,
+        max_interval: float = 60.0,
+        report_every: float = 60,
+        metrics_port: Optional[int] = None
     ):
-        """バッチ処理を実行"""
+        """
+        バッチ処理を実行
+        
+        詳細未取得のレースをキューに登録し、CHUNK_SIZE 件ずつ取り出して処理する
+        （limit はこの実行で取り出す件数の上限）。
+        リクエスト間隔は従来の最短間隔（リクエスト後の2-3秒 + sleep_interval）から始め、
+        min_interval〜max_interval の範囲で自動調整する。
+        段階ごとの所要時間は report_every 秒ごとにログに出し、metrics_port を指定すると
+        /metrics でPrometheus形式でも公開する
+        """
         self.connect_db()
+        self.rate_limiter = AdaptiveRateLimiter(
+            interval=sleep_interval + REQUEST_WAIT_MIN,
+            min_interval=min_interval,
+            max_interval=max_interval,
+            jitter=1.0
+        )
+        stop_reporter = stage_metrics.start_reporter(report_every, logger.info) if report_every > 0 else None
+        metrics_server = stage_metrics.serve(metrics_port, rate_limiter=self.rate_limiter) if metrics_port is not None else None
+        queue = JobQueue(
+            self.db_path,
+            "race_detail_grade" if grade_only else "race_detail",
+            lease_seconds=lease_seconds,
+            max_attempts=max_attempts
+        )
         
         try:
             # 統計表示
             stats = self.get_stats()
             logger.info("=" * 60)
-            logger.info("レース詳細バッチ処理開始（pandas版 + 100件ごと休憩）")
+            logger.info("レース詳細バッチ処理開始（pandas版 + リクエスト間隔の自動調整）")
             logger.info("=" * 60)
             logger.info(f"総レース数: {stats['total_races']}件")
             logger.info(f"詳細取得済み: {stats['completed']}件 ({stats['completed']/stats['total_races']*100:.1f}%)")
@@ -160,22 +332,34 @@ class RaceDetailBatchProcessor:
             logger.info(f"重賞: {stats['grade_races']}件（未取得: {stats['grade_pending']}件）")
             logger.info("=" * 60)
             
-            # 処理対象レース取得
-            races = self.get_pending_races(offset, limit, grade_only)
+            if reclaim:
+                logger.info(f"処理中のまま残っていたジョブを取得待ちに戻しました: {queue.reclaim()}件")
+            if retry_failed:
+                logger.info(f"失敗したジョブを取得待ちに戻しました: {queue.retry_failed()}件")
             
-            if not races:
+            # 処理対象レースをキューに登録（登録済みのレースはそのまま）
+            added = queue.enqueue(self.get_pending_race_ids(grade_only))
+            counts = queue.counts()
+            logger.info(f"キュー（{queue.queue}）: 新規登録 {added}件 | 取得待ち {counts['pending']}件 | "
+                        f"処理中 {counts['in_flight']}件 | 完了 {counts['done']}件 | 失敗 {counts['failed']}件")
+            
+            total = counts['pending'] if limit is None else min(limit, counts['pending'])
+            if not total:
                 logger.info("処理対象のレースがありません")
                 return
             
-            logger.info(f"処理対象: {len(races)}件")
+            logger.info(f"処理対象: {total}件")
             if grade_only:
                 logger.info("（重賞のみ）")
-            logger.info(f"範囲: offset={offset}, limit={limit}")
             
-            # 推定時刻を計算
-            num_batches = (len(races) - 1) // 100  # 休憩回数
-            estimated_process_time = len(races) * 6  # 秒（平均6秒/件）
-            estimated_wait_time = len(races) * sleep_interval  # レース間待機
+            # 推定時刻を計算（リクエスト間隔が最初の値のままの場合。自動調整で短くなる）
+            num_batches = (total - 1) // CHUNK_SIZE if batch_interval else 0  # 休憩回数
+            if serial:
+                estimated_process_time = total * 1  # 秒（解析・保存に平均1秒/件）
+            else:
+                # パイプラインでは処理時間がリクエスト間隔に重なる
+                estimated_process_time = 0
+            estimated_wait_time = total * (sleep_interval + REQUEST_WAIT_MEAN)
             estimated_interval_time = num_batches * batch_interval  # 100件ごと休憩
             total_estimated_time = estimated_process_time + estimated_wait_time + estimated_interval_time
             estimated_completion = datetime.now() + timedelta(seconds=total_estimated_time)
@@ -183,87 +367,71 @@ class RaceDetailBatchProcessor:
             logger.info(f"")
             logger.info(f"⏱️  推定所要時間: {total_estimated_time/3600:.1f}時間")
             logger.info(f"   - 処理時間: {estimated_process_time/60:.0f}分")
-            logger.info(f"   - レース間待機: {estimated_wait_time/60:.0f}分")
+            logger.info(f"   - リクエスト間隔: {estimated_wait_time/60:.0f}分（最初の間隔 {self.rate_limiter.interval:.1f}秒）")
             logger.info(f"   - 100件ごと休憩: {num_batches}回 × {batch_interval/60:.0f}分 = {estimated_interval_time/60:.0f}分")
             logger.info(f"🎯 推定完了時刻: {estimated_completion.strftime('%Y-%m-%d %H:%M:%S')}")
             logger.info("=" * 60)
             
-            # race_detail_scraperをインポート
+            start_time = time.time()
+            result = {'success': 0, 'failed': 0}
+            
+            def record(race_id: str, success: bool):
+                """1レースの結果をキューに記録し、残りのジョブのリースを延長"""
+                if success:
+                    queue.complete(race_id)
+                    result['success'] += 1
+                else:
+                    queue.fail(race_id, "レース詳細を取得できませんでした")
+                    result['failed'] += 1
+                queue.heartbeat()
+            
+            def process_chunk(jobs):
+                races = self.get_races([job.key for job in jobs])
+                if serial:
+                    self._process_serial(races, on_result=record)
+                else:
+                    self._process_pipeline(races, on_result=record)
+                counts = queue.counts()
+                logger.info(f"📋 キュー: 取得待ち {counts['pending']}件 | 完了 {counts['done']}件 | 失敗 {counts['failed']}件")
+                self._log_rate_metrics()
+            
+            def pause(seconds: float):
+                self._sleep_with_countdown(
+                    int(seconds),
+                    f"netkeiba.comへの負荷軽減のため{seconds/60:.0f}分休憩します..."
+                )
+            
             try:
-                from backend.scraper.race_detail_scraper_with_db import scrape_race_detail
-            except ImportError:
-                logger.error("race_detail_scraper_with_db.pyが見つかりません")
-                logger.error("backend/scraper/race_detail_scraper_with_db.pyが存在することを確認してください")
-                return
+                claimed = drain(queue, process_chunk, CHUNK_SIZE, limit, batch_interval, sleep=pause)
+            except KeyboardInterrupt:
+                logger.warning("処理が中断されました。同じコマンドで続きから再開できます")
+                claimed = result['success'] + result['failed']
             
-            # 処理開始
-            success_count = 0
-            error_count = 0
-            start_time = time.time()
+            # 書き込みごとにも再集計しているが、失敗・中断で残った再集計待ちの予想家をここで片付ける
+            if result['success']:
+                cube_refreshed = refresh_condition_cube(self.conn)
+                if cube_refreshed:
+                    bump_data_version(self.db_path)
+                logger.info(f"条件別集計キューブ: {cube_refreshed}人の予想家を再集計")
             
-            for i, race in enumerate(races, 1):
-                try:
-                    logger.info(f"\n[{i}/{len(races)}] 処理中: {race['race_name']} (race_id: {race['race_id']})")
-                    if race['is_grade_race']:
-                        logger.info(f"  グレード: {race['grade']}")
-                    
-                    # レース詳細取得
-                    success = scrape_race_detail(race['race_id'], self.db_path)
-                    
-                    if success:
-                        success_count += 1
-                        logger.info(f"  ✅ 成功 ({success_count}/{len(races)})")
-                    else:
-                        error_count += 1
-                        logger.warning(f"  ❌ 失敗 ({error_count}/{len(races)})")
-                    
-                    # 進捗表示
-                    elapsed = time.time() - start_time
-                    avg_time = elapsed / i
-                    remaining_races = len(races) - i
-                    remaining_batches = remaining_races // 100
-                    remaining_process_time = remaining_races * avg_time
-                    remaining_interval_time = remaining_batches * batch_interval
-                    total_remaining = remaining_process_time + remaining_interval_time
-                    
-                    eta = datetime.now() + timedelta(seconds=total_remaining)
-                    logger.info(f"  進捗: {i/len(races)*100:.1f}% | 経過: {elapsed/60:.1f}分 | 残り: {total_remaining/60:.1f}分 | ETA: {eta.strftime('%H:%M:%S')}")
-                    
-                    # 100件ごとに30分休憩（最後のレースでない場合）
-                    if i % 100 == 0 and i < len(races):
-                        logger.info("")
-                        logger.info("🎉" + "=" * 58)
-                        logger.info(f"🎉 100件処理完了！ ({i}/{len(races)}件)")
-                        logger.info("🎉" + "=" * 58)
-                        self._sleep_with_countdown(
-                            batch_interval,
-                            f"netkeiba.comへの負荷軽減のため{batch_interval/60:.0f}分休憩します..."
-                        )
-                        logger.info("")
-                        logger.info("🚀" + "=" * 58)
-                        logger.info(f"🚀 処理再開: 残り{len(races)-i}件")
-                        logger.info("🚀" + "=" * 58)
-                    
-                    # レース間待機（最後のレース以外、かつ100件目でない場合）
-                    elif i < len(races):
-                        logger.info(f"  待機: {sleep_interval}秒...")
-                        time.sleep(sleep_interval)
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"  エラー: {race['race_name']} - {e}")
-                    continue
+            success_count, error_count = result['success'], result['failed']
             
             # 結果サマリー
             total_time = time.time() - start_time
+            processed = max(claimed, 1)
             logger.info("\n" + "=" * 60)
             logger.info("🎊 バッチ処理完了")
             logger.info("=" * 60)
-            logger.info(f"処理件数: {len(races)}件")
-            logger.info(f"成功: {success_count}件 ({success_count/len(races)*100:.1f}%)")
-            logger.info(f"失敗: {error_count}件 ({error_count/len(races)*100:.1f}%)")
+            logger.info(f"処理件数: {claimed}件")
+            logger.info(f"成功: {success_count}件 ({success_count/processed*100:.1f}%)")
+            logger.info(f"失敗: {error_count}件 ({error_count/processed*100:.1f}%)")
             logger.info(f"処理時間: {total_time/3600:.1f}時間 ({total_time/60:.1f}分)")
-            logger.info(f"平均処理時間: {total_time/len(races):.1f}秒/件")
+            logger.info(f"平均処理時間: {total_time/processed:.1f}秒/件")
+            self._log_rate_metrics()
+            stage_metrics.log_summary(logger.info)
+            failed_jobs = queue.failed_jobs()
+            if failed_jobs:
+                logger.info(f"失敗したレース（--retry-failed で再実行）: {', '.join(key for key, _ in failed_jobs)}")
             logger.info("=" * 60)
             
             # 最新統計
@@ -273,38 +441,60 @@ class RaceDetailBatchProcessor:
             logger.info(f"詳細未取得: {stats['pending']}件")
             
         finally:
+            if stop_reporter is not None:
+                stop_reporter.set()
+            if metrics_server is not None:
+                metrics_server.shutdown()
+            queue.close()
             self.close_db()
 
 
 def main():
     """メイン処理"""
-    parser = argparse.ArgumentParser(description='レース詳細情報のバッチ取得（pandas版 + 100件ごと休憩）')
+    parser = argparse.ArgumentParser(description='レース詳細情報のバッチ取得（pandas版 + リクエスト間隔の自動調整）')
     
-    parser.add_argument('--offset', type=int, default=0, help='開始位置（デフォルト: 0）')
-    parser.add_argument('--limit', type=int, default=None, help='取得件数（デフォルト: 全件）')
+    parser.add_argument('--limit', type=int, default=None, help='この実行で取得する件数（デフォルト: 全件）')
     parser.add_argument('--grade-only', action='store_true', help='重賞のみ取得')
-    parser.add_argument('--sleep', type=int, default=3, help='各レース処理後の待機秒数（デフォルト: 3）')
-    parser.add_argument('--batch-interval', type=int, default=1800, help='100件ごとの休憩時間（秒）（デフォルト: 1800秒=30分）')
+    parser.add_argument('--sleep', type=int, default=3, help='各レース処理後の最初の待機秒数。以後はレスポンスに応じて自動調整（デフォルト: 3）')
+    parser.add_argument('--min-interval', type=float, default=1.0, help='自動調整するリクエスト間隔の下限（秒）（デフォルト: 1.0）')
+    parser.add_argument('--max-interval', type=float, default=60.0, help='自動調整するリクエスト間隔の上限（秒）（デフォルト: 60.0）')
+    parser.add_argument('--batch-interval', type=int, default=0, help='100件ごとの休憩時間（秒）（デフォルト: 0=休憩せず自動調整に任せる）')
     parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--serial', action='store_true', help='並行パイプラインを使わず1件ずつ処理')
+    parser.add_argument('--lease', type=int, default=600, help='取り出したレースのリース期間（秒）。異常終了したプロセスのレースはこの時間が過ぎると再取得される')
+    parser.add_argument('--max-attempts', type=int, default=3, help='1レースを取り出す回数の上限（デフォルト: 3）')
+    parser.add_argument('--reclaim', action='store_true', help='処理中のまま残ったレースをすぐに取得待ちに戻す（他に実行中のプロセスがないときのみ）')
+    parser.add_argument('--retry-failed', action='store_true', help='失敗したレースを取得待ちに戻す')
+    parser.add_argument('--report-every', type=float, default=60, help='段階ごとの所要時間（p50/p95）・ページ数/分をログに出す間隔（秒、0で出さない。デフォルト: 60）')
+    parser.add_argument('--metrics-port', type=int, default=None, help='指定したポートの /metrics でPrometheus形式の計測値を公開')
     
     args = parser.parse_args()
     
     logger.info("")
     logger.info("=" * 60)
     logger.info("⚙️  設定:")
-    logger.info(f"   レース間待機: {args.sleep}秒")
+    logger.info(f"   リクエスト間隔: {args.sleep + REQUEST_WAIT_MIN:.0f}秒から自動調整（{args.min_interval}〜{args.max_interval}秒）")
     logger.info(f"   100件ごと休憩: {args.batch_interval}秒 ({args.batch_interval/60:.0f}分)")
+    logger.info(f"   処理方式: {'逐次' if args.serial else '並行パイプライン'}")
     logger.info("=" * 60)
     logger.info("")
     
     # バッチ処理実行
     processor = RaceDetailBatchProcessor(args.db)
     processor.process_batch(
-        offset=args.offset,
         limit=args.limit,
         grade_only=args.grade_only,
         sleep_interval=args.sleep,
-        batch_interval=args.batch_interval
+        batch_interval=args.batch_interval,
+        serial=args.serial,
+        lease_seconds=args.lease,
+        max_attempts=args.max_attempts,
+        reclaim=args.reclaim,
+        retry_failed=args.retry_failed,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        report_every=args.report_every,
+        metrics_port=args.metrics_port
     )
 
 
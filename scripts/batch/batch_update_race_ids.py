@@ -5,13 +5,17 @@ race_id一括更新スクリプト（バッチ処理版）
 全てのtemp形式race_idを自動的に更新
 
 夜間に実行開始すれば、翌朝には完了します。
+
+tempレースはジョブキュー（backend/scraper/job_queue.py の race_id キュー）に登録して
+少しずつ取り出すため、中断・異常終了しても同じコマンドで続きから再開できる。
 """
 import os
 import sys
 import time
 import re
 import sqlite3
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -20,6 +24,14 @@ from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from loguru import logger
 
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.scraper.job_queue import Job, JobQueue, drain
+from race_id_resolver import RACE_ID_QUEUE, temp_race_ids
+
 
 class BatchRaceIDUpdater:
     """race_idを一括更新するクラス"""
@@ -170,51 +182,55 @@ class BatchRaceIDUpdater:
         finally:
             self._safe_quit_driver()
             
-    def batch_update_all(self, batch_size: int = 100):
+    def batch_update_all(self, batch_size: int = 100, reclaim: bool = False, retry_failed: bool = False):
         """
         全てのrace_idを一括更新
         
+        tempレースをキューに登録し、batch_size 件ずつ取り出して処理する
+        
         Args:
             batch_size: 1バッチあたりの処理件数
+            reclaim: 処理中のまま残ったtempレースをすぐに取得待ちに戻す
+            retry_failed: 失敗したtempレースを取得待ちに戻す
         """
+        queue = JobQueue(self.db_path, RACE_ID_QUEUE)
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        
+        batch_num = 1
+        total_success = 0
+        total_fail = 0
+        failed_predictions = []
         
         try:
-            # 全体の件数を確認
-            cursor.execute("""
-                SELECT COUNT(DISTINCT r.id)
-                FROM races r
-                JOIN predictions p ON r.id = p.race_id
-                WHERE r.race_id LIKE 'temp_%'
-                AND p.netkeiba_prediction_id IS NOT NULL
-            """)
-            total_count = cursor.fetchone()[0]
+            if reclaim:
+                logger.info(f"処理中のまま残っていたtempレースを取得待ちに戻しました: {queue.reclaim()}件")
+            if retry_failed:
+                logger.info(f"失敗したtempレースを取得待ちに戻しました: {queue.retry_failed()}件")
+            
+            # temp形式のrace_idを持つレースをキューに登録（登録済みのレースはそのまま）
+            added = queue.enqueue(temp_race_ids(conn))
+            counts = queue.counts()
+            total_count = counts['pending'] + counts['in_flight']
             
             logger.info("=" * 70)
-            logger.info(f"全体: {total_count}件のrace_idを更新します")
+            logger.info(f"全体: {total_count}件のrace_idを更新します（新規登録: {added}件、完了済み: {counts['done']}件）")
             logger.info(f"バッチサイズ: {batch_size}件")
             logger.info(f"推定バッチ数: {(total_count + batch_size - 1) // batch_size}回")
             logger.info("=" * 70)
             logger.info("")
             
-            offset = 0
-            batch_num = 1
-            total_success = 0
-            total_fail = 0
-            failed_predictions = []
-            
             start_time = time.time()
             
-            while offset < total_count:
+            def process_chunk(jobs: List[Job]):
+                nonlocal batch_num, total_success, total_fail
                 batch_start_time = time.time()
                 
                 logger.info("=" * 70)
-                logger.info(f"バッチ {batch_num} 開始（{offset + 1} - {min(offset + batch_size, total_count)} / {total_count}）")
+                logger.info(f"バッチ {batch_num} 開始（{len(jobs)}件）")
                 logger.info("=" * 70)
                 
                 # バッチ処理
-                success, fail, failed_ids = self._process_batch(batch_size, offset)
+                success, fail, failed_ids = self._process_batch(queue, jobs)
                 
                 total_success += success
                 total_fail += fail
@@ -225,24 +241,24 @@ class BatchRaceIDUpdater:
                 logger.info(f"バッチ {batch_num} 完了: 成功={success}, 失敗={fail}, 処理時間={batch_elapsed:.1f}秒")
                 
                 # 進捗状況
-                progress = ((offset + batch_size) / total_count) * 100
+                remaining_items = queue.counts()['pending']
+                progress = (1 - remaining_items / total_count) * 100 if total_count else 100
                 elapsed_total = time.time() - start_time
                 if total_success > 0:
                     avg_time_per_item = elapsed_total / total_success
-                    remaining_items = total_count - (offset + batch_size)
                     eta_seconds = remaining_items * avg_time_per_item
                     eta_hours = eta_seconds / 3600
                     logger.info(f"進捗: {min(progress, 100):.1f}% | 成功: {total_success} | 失敗: {total_fail} | 推定残り時間: {eta_hours:.1f}時間")
                 
                 logger.info("")
-                
-                offset += batch_size
                 batch_num += 1
-                
+            
+            def pause(seconds: float):
                 # バッチ間で休憩（サーバー負荷軽減）
-                if offset < total_count:
-                    logger.info("次のバッチまで30秒待機...")
-                    time.sleep(30)
+                logger.info(f"次のバッチまで{seconds:.0f}秒待機...")
+                time.sleep(seconds)
+            
+            drain(queue, process_chunk, chunk_size=batch_size, pause_seconds=30, sleep=pause)
                 
             # 最終結果
             total_elapsed = time.time() - start_time
@@ -264,63 +280,84 @@ class BatchRaceIDUpdater:
             conn.rollback()
         finally:
             conn.close()
+            queue.close()
             self._safe_quit_driver()
             self._cleanup_chrome_processes()
             
-    def _process_batch(self, limit: int, offset: int):
-        """1バッチ分の処理"""
+    def _process_batch(self, queue: JobQueue, jobs: List[Job]):
+        """キューから取り出した1バッチ分の処理（tempレースごとにコミットしてから結果を記録）"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        total = len(jobs)
+        success_count = 0
+        fail_count = 0
+        failed_ids = []
+        
         try:
-            # temp形式のrace_idを持つレースを取得
-            cursor.execute("""
-                SELECT DISTINCT r.id, r.race_id, p.netkeiba_prediction_id
-                FROM races r
-                JOIN predictions p ON r.id = p.race_id
-                WHERE r.race_id LIKE 'temp_%'
-                AND p.netkeiba_prediction_id IS NOT NULL
-                LIMIT ? OFFSET ?
-            """, (limit, offset))
-            
-            races_to_update = cursor.fetchall()
-            total = len(races_to_update)
-            
-            success_count = 0
-            fail_count = 0
-            failed_ids = []
-            
-            for i, (race_internal_id, temp_race_id, prediction_id) in enumerate(races_to_update, 1):
+            for i, job in enumerate(jobs, 1):
+                race_internal_id = int(job.key)
+                
+                # temp形式のrace_idと予想IDを取得（統合・更新済みのレースはスキップ）
+                cursor.execute("""
+                    SELECT r.race_id, p.netkeiba_prediction_id
+                    FROM races r
+                    JOIN predictions p ON r.id = p.race_id
+                    WHERE r.id = ?
+                    AND r.race_id LIKE 'temp_%'
+                    AND p.netkeiba_prediction_id IS NOT NULL
+                    LIMIT 1
+                """, (race_internal_id,))
+                row = cursor.fetchone()
+                if not row:
+                    queue.complete(job.key)
+                    continue
+                temp_race_id, prediction_id = row
+                
                 logger.info(f"  [{i}/{total}] prediction_id={prediction_id}")
                 
                 # 正しいrace_idを取得
                 real_race_id = self.get_race_id_from_prediction(prediction_id)
                 
                 if real_race_id:
-                    # race_idを更新
-                    cursor.execute("""
-                        UPDATE races
-                        SET race_id = ?
-                        WHERE id = ?
-                    """, (real_race_id, race_internal_id))
-                    
-                    conn.commit()
-                    logger.success(f"  ✅ {temp_race_id} -> {real_race_id}")
-                    success_count += 1
+                    try:
+                        # race_idを更新
+                        cursor.execute("""
+                            UPDATE races
+                            SET race_id = ?
+                            WHERE id = ?
+                        """, (real_race_id, race_internal_id))
+                        
+                        conn.commit()
+                        queue.complete(job.key)
+                        logger.success(f"  ✅ {temp_race_id} -> {real_race_id}")
+                        success_count += 1
+                    except sqlite3.IntegrityError as e:
+                        conn.rollback()
+                        logger.error(f"  ❌ {temp_race_id} -> {real_race_id}: {e}")
+                        fail_count += 1
+                        failed_ids.append(prediction_id)
+                        queue.fail(job.key, str(e))
                 else:
                     logger.error(f"  ❌ Failed: prediction_id={prediction_id}")
                     fail_count += 1
                     failed_ids.append(prediction_id)
+                    queue.fail(job.key, f"race_id not found: prediction_id={prediction_id}")
+                
+                queue.heartbeat()
                     
                 # 負荷軽減のため待機
                 time.sleep(2)
                 
             return success_count, fail_count, failed_ids
             
+        except KeyboardInterrupt:
+            conn.rollback()
+            raise
         except Exception as e:
             logger.exception(f"バッチ処理中にエラー: {e}")
             conn.rollback()
-            return 0, 0, []
+            return success_count, fail_count, failed_ids
         finally:
             conn.close()
 
@@ -332,6 +369,8 @@ def main():
     parser = argparse.ArgumentParser(description='race_id一括更新スクリプト（バッチ処理版）')
     parser.add_argument('--batch-size', type=int, default=100, help='1バッチあたりの処理件数（デフォルト: 100）')
     parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--reclaim', action='store_true', help='処理中のまま残ったtempレースをすぐに取得待ちに戻す（他に実行中のプロセスがないときのみ）')
+    parser.add_argument('--retry-failed', action='store_true', help='失敗したtempレースを取得待ちに戻す')
     
     args = parser.parse_args()
     
@@ -344,7 +383,7 @@ def main():
     updater = BatchRaceIDUpdater(db_path=args.db)
     
     try:
-        updater.batch_update_all(batch_size=args.batch_size)
+        updater.batch_update_all(batch_size=args.batch_size, reclaim=args.reclaim, retry_failed=args.retry_failed)
         
         logger.info("")
         logger.info(f"終了時刻: {datetime.now().strftime('%Y/%m/%d %H:%M:%S')}")
@@ -7,13 +7,20 @@ race_id一括更新スクリプト（バッチ処理版 - UNIQUE制約エラー
 修正点：
 - 既に更新済みのrace_idはスキップ
 - UNIQUE制約違反を適切に処理
+
+デフォルトはHTTP版（race_id_resolver.py: ブラウザなし・同じレースは1回だけ解決・まとめてコミット）。
+--selenium で従来のSelenium版を実行する。
+
+どちらもtempレースをジョブキュー（backend/scraper/job_queue.py の race_id キュー）に登録して
+少しずつ取り出すため、中断・異常終了しても同じコマンドで続きから再開できる。
 """
 import os
 import sys
 import time
 import re
 import sqlite3
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -22,6 +29,14 @@ from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from loguru import logger
 
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.scraper.job_queue import Job, JobQueue, drain
+from race_id_resolver import RACE_ID_QUEUE, temp_race_ids
+
 
 class BatchRaceIDUpdater:
     """race_idを一括更新するクラス（修正版）"""
@@ -172,50 +187,52 @@ class BatchRaceIDUpdater:
         finally:
             self._safe_quit_driver()
             
-    def batch_update_all(self, batch_size: int = 100):
+    def batch_update_all(self, batch_size: int = 100, reclaim: bool = False, retry_failed: bool = False):
         """
         全てのrace_idを一括更新
         
+        tempレースをキューに登録し、batch_size 件ずつ取り出して処理する
+        
         Args:
             batch_size: 1バッチあたりの処理件数
+            reclaim: 処理中のまま残ったtempレースをすぐに取得待ちに戻す
+            retry_failed: 失敗したtempレースを取得待ちに戻す
         """
+        queue = JobQueue(self.db_path, RACE_ID_QUEUE)
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        batch_num = 1
+        total_success = 0
+        total_fail = 0
+        total_skip = 0
+        failed_predictions = []
+        
         try:
-            # 全体の件数を確認（temp形式のrace_idのみ）
-            cursor.execute("""
-                SELECT COUNT(DISTINCT r.id)
-                FROM races r
-                WHERE r.race_id LIKE 'temp_%'
-            """)
-            total_count = cursor.fetchone()[0]
+            if reclaim:
+                logger.info(f"処理中のまま残っていたtempレースを取得待ちに戻しました: {queue.reclaim()}件")
+            if retry_failed:
+                logger.info(f"失敗したtempレースを取得待ちに戻しました: {queue.retry_failed()}件")
+            
+            # temp形式のrace_idを持つレースをキューに登録（登録済みのレースはそのまま）
+            added = queue.enqueue(temp_race_ids(conn))
+            counts = queue.counts()
+            total_count = counts['pending'] + counts['in_flight']
             
             logger.info("=" * 70)
-            logger.info(f"全体: {total_count}件のrace_idを更新します")
+            logger.info(f"全体: {total_count}件のrace_idを更新します（新規登録: {added}件、完了済み: {counts['done']}件）")
             logger.info(f"バッチサイズ: {batch_size}件")
             logger.info(f"推定バッチ数: {(total_count + batch_size - 1) // batch_size}回")
             logger.info("=" * 70)
             logger.info("")
             
-            batch_num = 1
-            total_success = 0
-            total_fail = 0
-            total_skip = 0
-            failed_predictions = []
-            
             start_time = time.time()
             
-            while True:
+            def process_chunk(jobs: List[Job]):
+                nonlocal batch_num, total_success, total_fail, total_skip
                 batch_start_time = time.time()
                 
-                # バッチ処理（常にoffset=0で取得、処理済みは自動的に除外される）
-                success, fail, skip, failed_ids = self._process_batch(batch_size)
-                
-                if success == 0 and fail == 0 and skip == 0:
-                    # 処理するものがなくなった
-                    logger.info("処理対象のrace_idがなくなりました")
-                    break
+                success, fail, skip, failed_ids = self._process_batch(queue, jobs)
                 
                 total_success += success
                 total_fail += fail
@@ -225,35 +242,35 @@ class BatchRaceIDUpdater:
                 # 現在の進捗を確認
                 cursor.execute("SELECT COUNT(*) FROM races WHERE race_id LIKE 'temp_%'")
                 remaining = cursor.fetchone()[0]
+                counts = queue.counts()
                 
                 # バッチの処理時間
                 batch_elapsed = time.time() - batch_start_time
                 
                 logger.info("=" * 70)
                 logger.info(f"バッチ {batch_num} 完了: 成功={success}, 失敗={fail}, スキップ={skip}, 処理時間={batch_elapsed:.1f}秒")
-                logger.info(f"残り: {remaining}件 / 元: {total_count}件")
+                logger.info(f"残り: {remaining}件 / キュー: 取得待ち {counts['pending']}件, 失敗 {counts['failed']}件")
                 
                 # 進捗状況
-                progress = ((total_count - remaining) / total_count) * 100
                 elapsed_total = time.time() - start_time
-                if total_success > 0:
+                if total_success > 0 and total_count:
+                    progress = (total_success + total_skip) / total_count * 100
                     avg_time_per_item = elapsed_total / total_success
-                    eta_seconds = remaining * avg_time_per_item
+                    eta_seconds = counts['pending'] * avg_time_per_item
                     eta_hours = eta_seconds / 3600
-                    logger.info(f"進捗: {progress:.1f}% | 累計成功: {total_success} | 累計失敗: {total_fail} | 推定残り時間: {eta_hours:.1f}時間")
+                    logger.info(f"進捗: {min(progress, 100):.1f}% | 累計成功: {total_success} | 累計失敗: {total_fail} | 推定残り時間: {eta_hours:.1f}時間")
                 logger.info("=" * 70)
                 logger.info("")
                 
                 batch_num += 1
-                
-                # 終了条件
-                if remaining == 0:
-                    logger.success("全てのrace_idが更新されました！")
-                    break
-                
+            
+            def pause(seconds: float):
                 # バッチ間で休憩（サーバー負荷軽減）
-                logger.info("次のバッチまで10秒待機...")
-                time.sleep(10)
+                logger.info(f"次のバッチまで{seconds:.0f}秒待機...")
+                time.sleep(seconds)
+            
+            drain(queue, process_chunk, chunk_size=batch_size, pause_seconds=10, sleep=pause)
+            logger.info("処理対象のrace_idがなくなりました")
                 
             # 最終結果
             total_elapsed = time.time() - start_time
@@ -277,40 +294,43 @@ class BatchRaceIDUpdater:
             conn.rollback()
         finally:
             conn.close()
+            queue.close()
             self._safe_quit_driver()
             self._cleanup_chrome_processes()
             
-    def _process_batch(self, limit: int):
-        """1バッチ分の処理（修正版 - UNIQUE制約対応）"""
+    def _process_batch(self, queue: JobQueue, jobs: List[Job]):
+        """
+        キューから取り出した1バッチ分の処理（修正版 - UNIQUE制約対応）
+        
+        tempレースごとに結果をキューに記録する（DBをコミットした後）
+        """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        total = len(jobs)
+        success_count = 0
+        fail_count = 0
+        skip_count = 0
+        failed_ids = []
+        
+        logger.info("=" * 70)
+        logger.info(f"バッチ処理開始: {total}件")
+        logger.info("=" * 70)
+        
         try:
-            # temp形式のrace_idを持つレースを取得（常にoffset=0）
-            # 処理済みのものは自動的に除外される
-            cursor.execute("""
-                SELECT r.id, r.race_id
-                FROM races r
-                WHERE r.race_id LIKE 'temp_%'
-                LIMIT ?
-            """, (limit,))
-            
-            races_to_update = cursor.fetchall()
-            total = len(races_to_update)
-            
-            if total == 0:
-                return 0, 0, 0, []
-            
-            logger.info("=" * 70)
-            logger.info(f"バッチ処理開始: {total}件")
-            logger.info("=" * 70)
-            
-            success_count = 0
-            fail_count = 0
-            skip_count = 0
-            failed_ids = []
-            
-            for i, (race_internal_id, temp_race_id) in enumerate(races_to_update, 1):
+            for i, job in enumerate(jobs, 1):
+                race_internal_id = int(job.key)
+                
+                # まだtemp形式か確認（統合されて削除されたレースもスキップ）
+                cursor.execute("SELECT race_id FROM races WHERE id = ?", (race_internal_id,))
+                row = cursor.fetchone()
+                if not row or not row[0].startswith('temp_'):
+                    logger.info(f"  [{i}/{total}] ⏭️  既に更新済み: race_internal_id={race_internal_id}")
+                    skip_count += 1
+                    queue.complete(job.key)
+                    continue
+                current_race_id = row[0]
+                
                 # このレースに関連するprediction_idを1つ取得
                 cursor.execute("""
                     SELECT netkeiba_prediction_id
@@ -322,22 +342,14 @@ class BatchRaceIDUpdater:
                 
                 result = cursor.fetchone()
                 if not result:
-                    logger.warning(f"  [{i}/{total}] prediction_idが見つかりません: race_id={temp_race_id}")
+                    logger.warning(f"  [{i}/{total}] prediction_idが見つかりません: race_id={current_race_id}")
                     skip_count += 1
+                    queue.fail(job.key, "prediction_idが見つかりません")
                     continue
                 
                 prediction_id = result[0]
                 logger.info(f"  [{i}/{total}] race_internal_id={race_internal_id}, prediction_id={prediction_id}")
                 
-                # 念のため、まだtemp形式か再確認
-                cursor.execute("SELECT race_id FROM races WHERE id = ?", (race_internal_id,))
-                current_race_id = cursor.fetchone()[0]
-                
-                if not current_race_id.startswith('temp_'):
-                    logger.info(f"  ⏭️  既に更新済み: {current_race_id}")
-                    skip_count += 1
-                    continue
-                
                 # 正しいrace_idを取得
                 real_race_id = self.get_race_id_from_prediction(prediction_id)
                 
@@ -351,6 +363,7 @@ class BatchRaceIDUpdater:
                         """, (real_race_id, race_internal_id))
                         
                         conn.commit()
+                        queue.complete(job.key)
                         logger.success(f"  ✅ {current_race_id} -> {real_race_id}")
                         success_count += 1
                         
@@ -377,26 +390,35 @@ class BatchRaceIDUpdater:
                             cursor.execute("DELETE FROM races WHERE id = ?", (race_internal_id,))
                             
                             conn.commit()
+                            queue.complete(job.key)
                             logger.success(f"  ✅ 統合完了: {current_race_id} -> {real_race_id} (既存レコードに統合)")
                             success_count += 1
                         else:
+                            conn.rollback()
                             logger.error(f"  ❌ 既存レコードが見つかりません: {real_race_id}")
                             fail_count += 1
+                            queue.fail(job.key, f"既存レコードが見つかりません: {real_race_id}")
                             
                 else:
                     logger.error(f"  ❌ Failed: prediction_id={prediction_id}")
                     fail_count += 1
                     failed_ids.append(prediction_id)
+                    queue.fail(job.key, f"race_id not found: prediction_id={prediction_id}")
+                
+                queue.heartbeat()
                     
                 # 負荷軽減のため待機
                 time.sleep(2)
                 
             return success_count, fail_count, skip_count, failed_ids
             
+        except KeyboardInterrupt:
+            conn.rollback()
+            raise
         except Exception as e:
             logger.exception(f"バッチ処理中にエラー: {e}")
             conn.rollback()
-            return 0, 0, 0, []
+            return success_count, fail_count, skip_count, failed_ids
         finally:
             conn.close()
 
@@ -408,9 +430,18 @@ def main():
     parser = argparse.ArgumentParser(description='race_id一括更新スクリプト（修正版）')
     parser.add_argument('--batch-size', type=int, default=100, help='1バッチあたりの処理件数（デフォルト: 100）')
     parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--selenium', action='store_true', help='従来のSelenium版で更新（1件ごとにChromeを起動）')
+    parser.add_argument('--reclaim', action='store_true', help='処理中のまま残ったtempレースをすぐに取得待ちに戻す（他に実行中のプロセスがないときのみ）')
+    parser.add_argument('--retry-failed', action='store_true', help='失敗したtempレースを取得待ちに戻す')
     
     args = parser.parse_args()
     
+    if not args.selenium:
+        # HTTP版（ブラウザを使わない）
+        from race_id_resolver import run_resolver
+        run_resolver(db_path=args.db, commit_every=args.batch_size, reclaim=args.reclaim, retry_failed=args.retry_failed)
+        return
+    
     logger.info("=" * 70)
     logger.info("race_id一括更新スクリプト開始（修正版 - UNIQUE制約対応）")
     logger.info("=" * 70)
@@ -420,7 +451,7 @@ def main():
     updater = BatchRaceIDUpdater(db_path=args.db)
     
     try:
-        updater.batch_update_all(batch_size=args.batch_size)
+        updater.batch_update_all(batch_size=args.batch_size, reclaim=args.reclaim, retry_failed=args.retry_failed)
         
         logger.info("")
         logger.info(f"終了時刻: {datetime.now().strftime('%Y/%m/%d %H:%M:%S')}")
@@ -0,0 +1,488 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+temp形式race_idの一括解決（HTTP版）
+
+予想詳細ページ（yoso_detail）をブラウザなしで取得し、
+HTML中の race_id=\\d{12} を正規表現1回で抜き出して races.race_id を更新する。
+
+- 接続は requests.Session で使い回す（ページごとのChrome起動・終了なし）
+- 同じレース（競馬場・日付・レース名が同じ）を指すtempレースはまとめて1回だけ解決し、
+  1つのレース行に統合する（他のtemp行の予想を付け替えて削除）
+- UPDATEは commit_every グループごとにまとめてコミット
+- tempレースはジョブキュー（backend/scraper/job_queue.py の race_id キュー、キーは races.id）に
+  登録して commit_every 件ずつ取り出すため、中断しても同じコマンドで続きから再開でき、
+  複数のプロセスで同時に実行しても同じレースは解決しない（--dry-run ではキューを使わない）
+
+新馬・未勝利・N勝クラスなどの条件戦は同じ日・同じ競馬場で同名のレースが複数あるため、
+レース名での統合は行わず1件ずつ解決する。
+
+使い方:
+    python scripts/batch/race_id_resolver.py
+    python scripts/batch/race_id_resolver.py --limit 100 --dry-run
+"""
+import re
+import sys
+import time
+import sqlite3
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.analysis.condition_cube import refresh_condition_cube
+from backend.config import settings
+from backend.data_version import bump_data_version
+from backend.scraper.job_queue import JobQueue, drain
+from backend.scraper.race_identity import GENERIC_RACE_NAME_PATTERN
+from backend.scraper.instrumentation import stage_metrics
+from backend.scraper.rate_limiter import AdaptiveRateLimiter
+
+
+PREDICTION_DETAIL_URL = "https://yoso.netkeiba.com/?pid=yoso_detail&id={prediction_id}"
+
+# <a href="?pid=race_yoso_list&race_id=202508040411"> の最初のリンク
+RACE_ID_PATTERN = re.compile(rb'href="[^"]*?race_id=(\d{12})')
+
+# tempレースの解決に使うジョブキュー（batch_update_race_ids*.py と共通）
+RACE_ID_QUEUE = "race_id"
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+
+
+@dataclass
+class TempRaceGroup:
+    """同じレースを指すtempレースのまとまり"""
+    key: Tuple
+    race_ids: List[int] = field(default_factory=list)  # races.id
+    prediction_ids: List[int] = field(default_factory=list)  # 解決に使うnetkeiba予想ID（候補順）
+
+
+@dataclass
+class ResolveStats:
+    """解決結果"""
+    temp_races: int = 0
+    groups: int = 0
+    requests: int = 0
+    resolved: int = 0  # 解決できたグループ数
+    updated: int = 0  # race_idを書き換えたレース行
+    merged: int = 0  # 統合して削除したtempレース行
+    failed: int = 0  # 解決できなかったグループ数
+    failed_prediction_ids: List[int] = field(default_factory=list)
+
+
+def group_key(race_row: Tuple) -> Tuple:
+    """
+    tempレースの統合キー
+
+    race_row: (races.id, race_name, venue, 日付)
+    """
+    race_internal_id, race_name, venue, race_day = race_row
+    if not race_name or not race_day or GENERIC_RACE_NAME_PATTERN.search(race_name):
+        return ('race', race_internal_id)
+    return ('name', venue, race_day, race_name)
+
+
+def temp_race_ids(conn: sqlite3.Connection) -> List[int]:
+    """解決できる（予想IDを持つ）tempレースの races.id"""
+    rows = conn.execute("""
+        SELECT DISTINCT r.id
+        FROM races r
+        JOIN predictions p ON p.race_id = r.id
+        WHERE r.race_id LIKE 'temp_%'
+        AND p.netkeiba_prediction_id IS NOT NULL
+        ORDER BY r.id
+    """)
+    return [row[0] for row in rows]
+
+
+def collect_temp_race_groups(
+    conn: sqlite3.Connection,
+    limit: Optional[int] = None,
+    race_ids: Optional[List[int]] = None
+) -> List[TempRaceGroup]:
+    """
+    temp形式のrace_idを持つレースを取得し、同じレースごとにまとめる
+
+    Args:
+        conn: DB接続
+        limit: 取得するtempレース数の上限
+        race_ids: 指定すればこの races.id のレースだけ（キューから取り出したレース）
+
+    Returns:
+        グループの一覧（tempレースのID順）
+    """
+    query = """
+        SELECT r.id, r.race_name, r.venue, date(r.race_date),
+               group_concat(p.netkeiba_prediction_id)
+        FROM races r
+        JOIN predictions p ON p.race_id = r.id
+        WHERE r.race_id LIKE 'temp_%'
+        AND p.netkeiba_prediction_id IS NOT NULL
+    """
+    params: list = []
+    if race_ids is not None:
+        query += f" AND r.id IN ({', '.join('?' * len(race_ids))})"
+        params.extend(race_ids)
+    query += """
+        GROUP BY r.id
+        ORDER BY r.id
+    """
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    groups: Dict[Tuple, TempRaceGroup] = {}
+    for race_internal_id, race_name, venue, race_day, prediction_ids in conn.execute(query, params):
+        key = group_key((race_internal_id, race_name, venue, race_day))
+        group = groups.setdefault(key, TempRaceGroup(key))
+        group.race_ids.append(race_internal_id)
+        group.prediction_ids.extend(int(pid) for pid in prediction_ids.split(','))
+
+    return list(groups.values())
+
+
+def extract_race_id(content: bytes) -> Optional[str]:
+    """予想詳細ページのHTMLからrace_id（12桁）を抽出"""
+    match = RACE_ID_PATTERN.search(content)
+    return match.group(1).decode('ascii') if match else None
+
+
+def assign_race_id(cursor: sqlite3.Cursor, race_ids: List[int], real_race_id: str) -> Tuple[int, int]:
+    """
+    tempレースのグループに正しいrace_idを設定し、1つのレース行に統合
+
+    既に real_race_id のレース行があればそこへ、なければグループの先頭の行へ統合する。
+    統合先に race_key がなければ、削除するtempレースの race_key を引き継ぐ
+    （引き継がないと次の保存で同じレースのtempレースがまた作られる）
+
+    Returns:
+        (race_idを書き換えた行数, 削除したtempレース行数)
+    """
+    cursor.execute("SELECT id FROM races WHERE race_id = ?", (real_race_id,))
+    existing = cursor.fetchone()
+
+    updated = 0
+    if existing:
+        target_id = existing[0]
+        to_merge = [race_id for race_id in race_ids if race_id != target_id]
+    else:
+        target_id = race_ids[0]
+        cursor.execute("UPDATE races SET race_id = ? WHERE id = ?", (real_race_id, target_id))
+        updated = 1
+        to_merge = race_ids[1:]
+
+    for race_id in to_merge:
+        cursor.execute("UPDATE predictions SET race_id = ? WHERE race_id = ?", (target_id, race_id))
+        cursor.execute("SELECT race_key FROM races WHERE id = ?", (race_id,))
+        race_key = cursor.fetchone()[0]
+        # race_key は一意のため、tempレースを削除してから統合先に設定する
+        cursor.execute("DELETE FROM races WHERE id = ?", (race_id,))
+        if race_key:
+            cursor.execute("UPDATE races SET race_key = COALESCE(race_key, ?) WHERE id = ?", (race_key, target_id))
+
+    return updated, len(to_merge)
+
+
+class RaceIDResolver:
+    """temp形式race_idをHTTPで一括解決するクラス"""
+
+    def __init__(
+        self,
+        db_path: str = 'data/keiba.db',
+        interval: float = 2.0,
+        commit_every: int = 50,
+        max_attempts: int = 3,
+        timeout: int = 30
+    ):
+        """
+        Args:
+            db_path: データベースパス
+            interval: yoso.netkeiba.com への最初のリクエスト間隔（秒）。以後はレスポンスに応じて
+                設定の scraping_min_delay〜scraping_max_delay の範囲で自動調整
+            commit_every: このグループ数ごとにコミット
+            max_attempts: 1グループで試す予想IDの最大数（ページにrace_idがない場合は次の予想で試す）
+            timeout: リクエストのタイムアウト（秒）
+        """
+        self.db_path = db_path
+        self.commit_every = commit_every
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.rate_limiter = AdaptiveRateLimiter(
+            interval=interval,
+            min_interval=min(interval, settings.scraping_min_delay),
+            max_interval=settings.scraping_max_delay,
+            jitter=0.5
+        )
+
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=2))
+
+    def close(self):
+        self.session.close()
+
+    def fetch_race_id(self, prediction_id: int) -> Optional[str]:
+        """予想IDから正しいrace_idを取得（失敗時は None）"""
+        url = PREDICTION_DETAIL_URL.format(prediction_id=prediction_id)
+        with stage_metrics.stage('wait'):
+            self.rate_limiter.acquire(url)
+
+        try:
+            with stage_metrics.stage('fetch') as timer:
+                response = self.session.get(url, timeout=self.timeout)
+                timer.bytes = len(response.content)
+        except requests.exceptions.RequestException as e:
+            self.rate_limiter.observe(url, error=e)
+            logger.warning(f"Request error for prediction_id {prediction_id}: {e}")
+            return None
+        self.rate_limiter.observe(url, response)
+
+        if response.status_code != 200:
+            logger.warning(f"Status code {response.status_code} for prediction_id {prediction_id}")
+            return None
+
+        with stage_metrics.stage('parse'):
+            return extract_race_id(response.content)
+
+    def resolve_group(self, group: TempRaceGroup, stats: ResolveStats) -> Optional[str]:
+        """グループの予想IDを順に試してrace_idを取得"""
+        for prediction_id in group.prediction_ids[:self.max_attempts]:
+            stats.requests += 1
+            race_id = self.fetch_race_id(prediction_id)
+            if race_id:
+                return race_id
+            logger.debug(f"No race_id found for prediction_id: {prediction_id}")
+        return None
+
+    def _resolve_groups(
+        self,
+        conn: sqlite3.Connection,
+        groups: List[TempRaceGroup],
+        stats: ResolveStats,
+        dry_run: bool = False,
+        queue: Optional[JobQueue] = None
+    ):
+        """
+        グループを順に解決して commit_every グループごとにコミット
+
+        queue があれば、コミットしたグループのレースを完了、解決できなかったグループの
+        レースを失敗としてキューに記録する（どちらもコミットの後）。
+        中断時は解決済みの分をコミットしてから例外を送り直す。
+        """
+        cursor = conn.cursor()
+        start_time = time.time()
+        offset = stats.groups
+        stats.temp_races += sum(len(group.race_ids) for group in groups)
+        stats.groups += len(groups)
+        # コミット待ちのグループのレース（races.id）と、解決できなかったレース
+        pending: List[int] = []
+        failed: List[Tuple[int, str]] = []
+        pending_groups = 0
+
+        def flush():
+            """コミットしてからキューに結果を記録（キューの書き込みがこの接続のロックを待たないように）"""
+            nonlocal pending_groups
+            if conn.in_transaction:
+                with stage_metrics.stage('commit'):
+                    conn.commit()
+                bump_data_version(self.db_path)
+            if queue:
+                for race_id in pending:
+                    queue.complete(race_id)
+                for race_id, error in failed:
+                    queue.fail(race_id, error)
+                queue.heartbeat()
+            pending.clear()
+            failed.clear()
+            pending_groups = 0
+
+        try:
+            for i, group in enumerate(groups, offset + 1):
+                real_race_id = self.resolve_group(group, stats)
+
+                if not real_race_id:
+                    stats.failed += 1
+                    stats.failed_prediction_ids.append(group.prediction_ids[0])
+                    logger.error(f"  [{i}/{stats.groups}] ❌ Failed: prediction_id={group.prediction_ids[0]}")
+                    error = f"race_id not found: prediction_id={group.prediction_ids[0]}"
+                    failed.extend((race_id, error) for race_id in group.race_ids)
+                    if not conn.in_transaction:
+                        flush()
+                    continue
+
+                stats.resolved += 1
+                logger.info(f"  [{i}/{stats.groups}] ✅ {real_race_id} ← tempレース{len(group.race_ids)}件")
+
+                if dry_run:
+                    continue
+
+                updated, merged = assign_race_id(cursor, group.race_ids, real_race_id)
+                stats.updated += updated
+                stats.merged += merged
+                pending.extend(group.race_ids)
+                pending_groups += 1
+
+                if pending_groups >= self.commit_every:
+                    flush()
+
+                    elapsed = time.time() - start_time
+                    done = i - offset
+                    eta_seconds = elapsed / done * (len(groups) - done)
+                    logger.info(f"  進捗: {i}/{stats.groups} | 推定残り時間: {eta_seconds / 60:.1f}分")
+
+            flush()
+        except KeyboardInterrupt:
+            # 解決済みの分は保存してから中断する
+            flush()
+            raise
+
+    def _refresh_condition_cube(self, conn: sqlite3.Connection):
+        """統合で予想のレースが変わった予想家の条件別集計キューブを再集計"""
+        refreshed = refresh_condition_cube(conn)
+        if refreshed:
+            logger.info(f"条件別集計キューブ: {refreshed}人の予想家を再集計")
+            bump_data_version(self.db_path)
+
+    def resolve_all(
+        self,
+        limit: Optional[int] = None,
+        dry_run: bool = False,
+        queue: Optional[JobQueue] = None
+    ) -> ResolveStats:
+        """
+        全てのtempレースを解決
+
+        Args:
+            limit: 処理するtempレース数の上限
+            dry_run: DBを更新せずに解決結果だけ表示
+            queue: tempレースを登録して少しずつ取り出すジョブキュー（省略時は一度に全件）
+
+        Returns:
+            解決結果
+        """
+        conn = sqlite3.connect(self.db_path)
+        stats = ResolveStats()
+
+        try:
+            if queue is None or dry_run:
+                groups = collect_temp_race_groups(conn, limit)
+                logger.info(f"tempレース: {sum(len(group.race_ids) for group in groups)}件 → "
+                            f"解決するレース: {len(groups)}件")
+                self._resolve_groups(conn, groups, stats, dry_run)
+                if not dry_run:
+                    self._refresh_condition_cube(conn)
+                return stats
+
+            added = queue.enqueue(temp_race_ids(conn))
+            counts = queue.counts()
+            logger.info(f"キュー（{queue.queue}）: 新規登録 {added}件 | 取得待ち {counts['pending']}件 | "
+                        f"処理中 {counts['in_flight']}件 | 完了 {counts['done']}件 | 失敗 {counts['failed']}件")
+
+            def process_chunk(jobs):
+                race_ids = [int(job.key) for job in jobs]
+                groups = collect_temp_race_groups(conn, race_ids=race_ids)
+                # 他のグループに統合された・解決済みのレースは完了にする
+                grouped = {race_id for group in groups for race_id in group.race_ids}
+                for race_id in race_ids:
+                    if race_id not in grouped:
+                        queue.complete(race_id)
+                self._resolve_groups(conn, groups, stats, queue=queue)
+
+            drain(queue, process_chunk, chunk_size=self.commit_every, limit=limit)
+            self._refresh_condition_cube(conn)
+
+        except KeyboardInterrupt:
+            logger.warning("処理が中断されました。同じコマンドで続きから再開できます")
+        finally:
+            conn.close()
+
+        return stats
+
+
+def run_resolver(
+    db_path: str = 'data/keiba.db',
+    limit: Optional[int] = None,
+    interval: float = 2.0,
+    commit_every: int = 50,
+    dry_run: bool = False,
+    reclaim: bool = False,
+    retry_failed: bool = False
+) -> ResolveStats:
+    """
+    tempレースを解決して結果を表示
+
+    reclaim: 処理中のまま残ったtempレースをすぐに取得待ちに戻す（他に実行中のプロセスがないときのみ）
+    retry_failed: 解決できなかったtempレースを取得待ちに戻す
+    """
+    logger.info("=" * 70)
+    logger.info("temp形式race_idの一括解決（HTTP版）")
+    logger.info(f"開始時刻: {datetime.now().strftime('%Y/%m/%d %H:%M:%S')}")
+    logger.info("=" * 70)
+
+    resolver = RaceIDResolver(db_path=db_path, interval=interval, commit_every=commit_every)
+    queue = None if dry_run else JobQueue(db_path, RACE_ID_QUEUE)
+    start_time = time.time()
+    try:
+        if queue and reclaim:
+            logger.info(f"処理中のまま残っていたtempレースを取得待ちに戻しました: {queue.reclaim()}件")
+        if queue and retry_failed:
+            logger.info(f"解決できなかったtempレースを取得待ちに戻しました: {queue.retry_failed()}件")
+        stats = resolver.resolve_all(limit=limit, dry_run=dry_run, queue=queue)
+    finally:
+        resolver.close()
+        if queue:
+            queue.close()
+
+    logger.info("=" * 70)
+    logger.success(f"解決: {stats.resolved}/{stats.groups}レース（リクエスト {stats.requests}件）")
+    logger.info(f"race_id更新: {stats.updated}件 / 統合したtempレース: {stats.merged}件")
+    if stats.failed:
+        failed = stats.failed_prediction_ids
+        logger.error(f"失敗: {stats.failed}件 prediction_id: {failed[:10]}{'...' if len(failed) > 10 else ''}")
+    logger.info(f"処理時間: {(time.time() - start_time) / 60:.1f}分")
+    resolver.rate_limiter.log_metrics()
+    stage_metrics.log_summary()
+    logger.info("=" * 70)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='temp形式race_idの一括解決（HTTP版）')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--limit', type=int, default=None, help='処理するtempレース数の上限')
+    parser.add_argument('--interval', type=float, default=2.0, help='最初のリクエスト間隔（秒、以後は自動調整。デフォルト: 2.0）')
+    parser.add_argument('--commit-every', type=int, default=50, help='このレース数ごとにコミット（デフォルト: 50）')
+    parser.add_argument('--dry-run', action='store_true', help='DBを更新しない')
+    parser.add_argument('--reclaim', action='store_true', help='処理中のまま残ったtempレースをすぐに取得待ちに戻す（他に実行中のプロセスがないときのみ）')
+    parser.add_argument('--retry-failed', action='store_true', help='解決できなかったtempレースを取得待ちに戻す')
+
+    args = parser.parse_args()
+
+    run_resolver(
+        db_path=args.db,
+        limit=args.limit,
+        interval=args.interval,
+        commit_every=args.commit_every,
+        dry_run=args.dry_run,
+        reclaim=args.reclaim,
+        retry_failed=args.retry_failed
+    )
+
+
+if __name__ == "__main__":
+    main()
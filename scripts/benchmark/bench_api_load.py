@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+API負荷ベンチマーク（コネクションプール導入前後の比較）
+
+合成データベースに対して /api/search, /api/options, /api/stats を同時並行で叩き、
+requests/sec とレイテンシを計測する（サーバーは uvicorn で別プロセス起動）
+
+- before: リクエストごとに sqlite3.connect() し、async エンドポイント内でブロッキング実行
+- after : 読み取り専用コネクションプール + スレッドプール実行（現在の backend/api/api.py）
+
+負荷中に GET / を定期的に叩き、イベントループがブロックされていないかも確認する
+SQLiteはクエリ実行中にGILを解放するため、スレッドプールの効果はCPUコア数に比例して大きくなる
+
+使い方:
+    python scripts/benchmark/bench_api_load.py --requests 500 --concurrency 16
+"""
+import sys
+import time
+import random
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx
+from fastapi import FastAPI, Request
+
+from backend.api import api
+from backend.analysis.condition_cube import rebuild_condition_cube
+from synthetic_db import create_synthetic_db, VENUES, DISTANCES
+
+
+def build_legacy_app(db_path: Path) -> FastAPI:
+    """
+    導入前の挙動を再現したアプリ
+
+    エンドポイント本体は現在の実装を使い、接続取得とイベントループ上での実行だけを旧方式にする
+    """
+    @contextmanager
+    def connect_per_request():
+        conn = sqlite3.connect(db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    legacy = FastAPI()
+
+    @legacy.post("/api/search")
+    async def search(request: api.SearchRequest):
+        return api.search_predictors(request)
+
+    @legacy.get("/api/options")
+    async def options(request: Request):
+        return api.get_options(request)
+
+    @legacy.get("/api/stats")
+    async def stats(request: Request):
+        return api.get_stats(request)
+
+    legacy.state.get_db_connection = connect_per_request
+    return legacy
+
+
+def serve(mode: str, db_path: Path, port: int):
+    """ベンチマーク対象のAPIサーバーを起動（子プロセスで実行される）"""
+    import uvicorn
+
+    if mode == "before":
+        app = build_legacy_app(db_path)
+        api.get_db_connection = app.state.get_db_connection
+    else:
+        api.DB_PATH = db_path
+        app = api.app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(mode: str, db_path: Path, port: int) -> subprocess.Popen:
+    """APIサーバーを別プロセスで起動し、応答するまで待つ"""
+    process = subprocess.Popen([
+        sys.executable, __file__, "--serve", mode, "--db", str(db_path), "--port", str(port)
+    ])
+
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/stats", timeout=5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+
+    process.kill()
+    raise RuntimeError(f"APIサーバーが起動しませんでした: mode={mode}")
+
+
+def measure(mode: str, db_path: Path, port: int, workload: list, concurrency: int) -> dict:
+    """サーバーを起動してワークロードを流し、結果を返す"""
+    process = start_server(mode, db_path, port)
+    try:
+        return asyncio.run(run_load(f"http://127.0.0.1:{port}", workload, concurrency))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def make_workload(n_requests: int, seed: int = 0) -> list:
+    """リクエストの組み合わせを作成（検索8割、選択肢・統計が各1割）"""
+    rng = random.Random(seed)
+    workload = []
+
+    for _ in range(n_requests):
+        r = rng.random()
+        if r < 0.1:
+            workload.append(("GET", "/api/options", None))
+        elif r < 0.2:
+            workload.append(("GET", "/api/stats", None))
+        else:
+            payload = {"sort_by": rng.choice(["hit_rate", "roi"]), "limit": 50}
+            if rng.random() < 0.7:
+                payload["venue"] = rng.choice(VENUES)
+            if rng.random() < 0.5:
+                payload["track_type"] = rng.choice(["芝", "ダート"])
+            if rng.random() < 0.4:
+                payload["distances"] = rng.sample(DISTANCES, rng.randint(1, 3))
+            if rng.random() < 0.3:
+                payload["grade"] = rng.choice(["G1", "G2", "G3", "オープン", "一般"])
+            workload.append(("POST", "/api/search", payload))
+
+    return workload
+
+
+async def run_load(base_url: str, workload: list, concurrency: int) -> dict:
+    """ワークロードを指定の並列度で実行"""
+    latencies = []
+    probe_latencies = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in workload:
+        queue.put_nowait(item)
+
+    limits = httpx.Limits(max_connections=concurrency + 1)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    method, path, payload = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                response = await client.request(method, path, json=payload)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        async def probe():
+            # 負荷中のヘルスチェック応答時間（イベントループが塞がれていると遅れる）
+            while not queue.empty():
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        start_time = time.perf_counter()
+        await asyncio.gather(probe(), *(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    probe_latencies = sorted(probe_latencies) or [0.0]
+    return {
+        "requests": len(workload),
+        "errors": errors,
+        "elapsed": elapsed,
+        "rps": len(workload) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "health_p95": probe_latencies[max(int(len(probe_latencies) * 0.95) - 1, 0)] * 1000,
+    }
+
+
+def print_result(label: str, result: dict):
+    print(f"  {label:<8} {result['rps']:>9.1f} req/s | "
+          f"p50 {result['p50']:>8.1f}ms | p95 {result['p95']:>8.1f}ms | "
+          f"ヘルスチェックp95 {result['health_p95']:>7.1f}ms | エラー {result['errors']}件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API負荷ベンチマーク（コネクションプール導入前後）')
+    parser.add_argument('--requests', type=int, default=500, help='総リクエスト数')
+    parser.add_argument('--concurrency', type=int, default=16, help='同時リクエスト数')
+    parser.add_argument('--predictions', type=int, default=100000, help='合成DBの予想数')
+    parser.add_argument('--db', type=str, default=None, help='既存DBを使う場合のパス（省略時は一時ファイルに合成）')
+    parser.add_argument('--cube', action='store_true', help='条件別集計キューブを構築してから計測')
+    parser.add_argument('--port', type=int, default=8765, help='ベンチマーク用サーバーのポート')
+    parser.add_argument('--serve', choices=['before', 'after'], default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, Path(args.db), args.port)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.db:
+            db_path = Path(args.db)
+        else:
+            db_path = Path(tmp_dir) / "bench_keiba.db"
+            print(f"合成DBを作成中... (予想 {args.predictions:,}件)")
+            create_synthetic_db(str(db_path), n_predictions=args.predictions)
+
+        if args.cube:
+            conn = sqlite3.connect(db_path)
+            rebuild_condition_cube(conn)
+            conn.close()
+
+        workload = make_workload(args.requests)
+
+        print("=" * 70)
+        print(f"APIベンチマーク: {args.requests}リクエスト / 並列度 {args.concurrency}")
+        print("=" * 70)
+
+        # before: リクエストごとに接続 + イベントループ上でブロッキング実行
+        before = measure("before", db_path, args.port, workload, args.concurrency)
+
+        # after: 読み取り専用コネクションプール + スレッドプール
+        after = measure("after", db_path, args.port, workload, args.concurrency)
+
+        print_result("before", before)
+        print_result("after", after)
+        print("-" * 70)
+        print(f"  スループット: {after['rps'] / before['rps']:.2f}倍 "
+              f"(集計キューブ: {'あり' if args.cube else 'なし'})")
+        print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+予想データ保存のベンチマーク（ORM版 vs 一括保存）
+
+合成した予想家・予想（1人あたり最新50件、PredictionScraper と同じ形式）を空のDBに保存する
+
+- before: 導入前の save_predictions（予想ごとのSELECT・flush、予想家ごとのCOUNT）
+- after : backend/scraper/bulk_ingest.py の ingest_batch（1トランザクション）
+
+ORM版は時間がかかるため --legacy-predictions 件だけ実行して100k件あたりに換算する。
+同じ入力に対して両者の保存結果（予想・レース・予想家）が一致すること、
+予想家の集計列が実際の件数と一致することも確認する
+（一括保存は同じレースの予想を1つのレース行にまとめるため、race_id とレース行数は比較しない）
+
+使い方:
+    python scripts/benchmark/bench_bulk_ingest.py
+    python scripts/benchmark/bench_bulk_ingest.py --predictions 100000 --legacy-predictions 10000
+"""
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.database import Base, Predictor, Prediction, Race
+from backend.scraper.bulk_ingest import ingest_batch
+
+
+VENUES = ['札幌', '函館', '福島', '新潟', '東京', '中山', '中京', '京都', '阪神', '小倉']
+GRADES = [None, None, None, None, None, 'G1', 'G2', 'G3']
+PREDICTIONS_PER_PREDICTOR = 50
+
+
+def make_batch(n_predictions: int, seed: int = 42):
+    """合成の予想家一覧と {予想家のnetkeiba_id: 予想のリスト} を作成"""
+    rng = random.Random(seed)
+    n_predictors = (n_predictions + PREDICTIONS_PER_PREDICTOR - 1) // PREDICTIONS_PER_PREDICTOR
+    now = datetime(2025, 12, 1)
+
+    predictors = [{'netkeiba_id': 1000 + i, 'name': f"予想家{i:05d}"} for i in range(n_predictors)]
+    predictions_by_predictor = {}
+    prediction_id = 10000000
+    remaining = n_predictions
+    for predictor in predictors:
+        count = min(PREDICTIONS_PER_PREDICTOR, remaining)
+        remaining -= count
+        predictions = []
+        for _ in range(count):
+            prediction_id += 1
+            grade = rng.choice(GRADES)
+            is_hit = rng.random() < 0.2
+            payout = rng.randint(100, 30000) if is_hit else 0
+            predictions.append({
+                'prediction_id': prediction_id,
+                'race_name': f"レース{rng.randint(1, 5000)}" + (f"(G{grade[1]})" if grade else ""),
+                'race_date': now - timedelta(days=rng.randint(0, 365)),
+                'venue': rng.choice(VENUES),
+                'race_num': f"{rng.randint(1, 12)}R",
+                'grade': grade,
+                'favorite_horse': None,
+                'is_hit': is_hit,
+                'payout': payout,
+                'balance': 0,
+                'roi': None,
+            })
+        predictions_by_predictor[predictor['netkeiba_id']] = predictions
+
+    return predictors, predictions_by_predictor
+
+
+def create_empty_db(db_path: str):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def legacy_save_predictors(session_factory, predictors_data: list):
+    """導入前の save_predictors"""
+    db = session_factory()
+    try:
+        for predictor_data in predictors_data:
+            existing = db.query(Predictor).filter(
+                Predictor.netkeiba_id == predictor_data['netkeiba_id']
+            ).first()
+            if existing:
+                existing.name = predictor_data['name']
+                existing.updated_at = datetime.utcnow()
+            else:
+                db.add(Predictor(netkeiba_id=predictor_data['netkeiba_id'], name=predictor_data['name']))
+        db.commit()
+    finally:
+        db.close()
+
+
+def legacy_save_predictions(session_factory, predictor_id: int, predictions_data: list) -> int:
+    """導入前の save_predictions（backend/scraper/main.py）"""
+    db = session_factory()
+    try:
+        saved_count = 0
+        predictor = db.query(Predictor).filter(Predictor.netkeiba_id == predictor_id).first()
+        if not predictor:
+            return 0
+
+        for pred_data in predictions_data:
+            if not pred_data.get('race_name'):
+                continue
+            if pred_data.get('prediction_id'):
+                existing = db.query(Prediction).filter(
+                    Prediction.netkeiba_prediction_id == pred_data['prediction_id']
+                ).first()
+                if existing:
+                    continue
+
+            race = Race(
+                race_id=f"temp_{predictor_id}_{pred_data.get('prediction_id', 0)}",
+                race_name=pred_data['race_name'],
+                race_date=pred_data.get('race_date', datetime.utcnow()),
+                venue=pred_data.get('venue', '不明'),
+                grade=pred_data.get('grade'),
+                distance=0,
+                track_type='不明',
+                is_grade_race=pred_data.get('grade') in ['G1', 'G2', 'G3']
+            )
+            db.add(race)
+            db.flush()
+
+            db.add(Prediction(
+                predictor_id=predictor.id,
+                race_id=race.id,
+                netkeiba_prediction_id=pred_data.get('prediction_id'),
+                predicted_at=pred_data.get('race_date', datetime.utcnow()),
+                is_hit=pred_data.get('is_hit'),
+                payout=pred_data.get('payout')
+            ))
+            saved_count += 1
+
+        predictor.total_predictions = db.query(Prediction).filter(
+            Prediction.predictor_id == predictor.id
+        ).count()
+        predictor.grade_race_predictions = db.query(Prediction).join(Race).filter(
+            Prediction.predictor_id == predictor.id,
+            Race.is_grade_race == True
+        ).count()
+        if predictor.grade_race_predictions >= 15:
+            predictor.data_reliability = "high"
+        elif predictor.grade_race_predictions >= 10:
+            predictor.data_reliability = "medium"
+        else:
+            predictor.data_reliability = "low"
+
+        db.commit()
+        return saved_count
+    finally:
+        db.close()
+
+
+def run_legacy(db_path: str, predictors: list, predictions_by_predictor: dict) -> float:
+    engine = create_empty_db(db_path)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    start = time.perf_counter()
+    legacy_save_predictors(session_factory, predictors)
+    for predictor_id, predictions in predictions_by_predictor.items():
+        legacy_save_predictions(session_factory, predictor_id, predictions)
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return elapsed
+
+
+def run_bulk(db_path: str, predictors: list, predictions_by_predictor: dict, chunk_predictors: int) -> float:
+    create_empty_db(db_path).dispose()
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    ingest_batch(conn, predictors_data=predictors)
+    predictor_ids = list(predictions_by_predictor)
+    for i in range(0, len(predictor_ids), chunk_predictors):
+        chunk = {pid: predictions_by_predictor[pid] for pid in predictor_ids[i:i + chunk_predictors]}
+        ingest_batch(conn, predictions_by_predictor=chunk)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def snapshot(db_path: str):
+    """保存結果の比較用（自動採番のIDと作成時刻を除く）"""
+    conn = sqlite3.connect(db_path)
+    predictions = conn.execute("""
+        SELECT p.netkeiba_prediction_id, pr.netkeiba_id, r.race_name,
+               substr(r.race_date, 1, 19), r.venue, r.grade, r.distance, r.track_type, r.is_grade_race,
+               substr(p.predicted_at, 1, 19), p.is_hit, p.payout
+        FROM predictions p
+        JOIN predictors pr ON pr.id = p.predictor_id
+        JOIN races r ON r.id = p.race_id
+        ORDER BY p.netkeiba_prediction_id
+    """).fetchall()
+    predictors = conn.execute("""
+        SELECT netkeiba_id, name FROM predictors ORDER BY netkeiba_id
+    """).fetchall()
+    conn.close()
+    return predictions, predictors
+
+
+def count_races(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    race_count = conn.execute("SELECT COUNT(*) FROM races").fetchone()[0]
+    conn.close()
+    return race_count
+
+
+def count_wrong_totals(db_path: str) -> int:
+    """集計列（total_predictions / grade_race_predictions / data_reliability）が実際の件数と異なる予想家数"""
+    conn = sqlite3.connect(db_path)
+    wrong = conn.execute("""
+        SELECT COUNT(*)
+        FROM predictors pr
+        JOIN (
+            SELECT p.predictor_id, COUNT(*) AS total,
+                   COUNT(CASE WHEN r.is_grade_race = 1 THEN 1 END) AS grade
+            FROM predictions p JOIN races r ON r.id = p.race_id
+            GROUP BY p.predictor_id
+        ) c ON c.predictor_id = pr.id
+        WHERE pr.total_predictions != c.total
+           OR pr.grade_race_predictions != c.grade
+           OR pr.data_reliability != CASE WHEN c.grade >= 15 THEN 'high'
+                                          WHEN c.grade >= 10 THEN 'medium' ELSE 'low' END
+    """).fetchone()[0]
+    conn.close()
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description='予想データ保存のベンチマーク')
+    parser.add_argument('--predictions', type=int, default=100000, help='一括保存する予想数（デフォルト: 100000）')
+    parser.add_argument('--legacy-predictions', type=int, default=10000, help='ORM版で保存する予想数（デフォルト: 10000）')
+    parser.add_argument('--chunk-predictors', type=int, default=200, help='一括保存1回あたりの予想家数（デフォルト: 200）')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("予想データ保存のベンチマーク")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+
+        # 同じ入力で結果が一致することを確認（ORM版の件数で比較）
+        predictors, predictions_by_predictor = make_batch(args.legacy_predictions)
+        legacy_time = run_legacy(str(tmp / "legacy.db"), predictors, predictions_by_predictor)
+        bulk_small_time = run_bulk(str(tmp / "bulk_small.db"), predictors, predictions_by_predictor,
+                                   args.chunk_predictors)
+
+        legacy_snapshot = snapshot(str(tmp / "legacy.db"))
+        bulk_snapshot = snapshot(str(tmp / "bulk_small.db"))
+        if legacy_snapshot == bulk_snapshot:
+            print(f"✅ 保存結果が一致: 予想 {len(bulk_snapshot[0]):,}件 / 予想家 {len(bulk_snapshot[1]):,}人")
+            print(f"   レース行: 一括保存 {count_races(str(tmp / 'bulk_small.db')):,}件 / "
+                  f"ORM版 {count_races(str(tmp / 'legacy.db')):,}件")
+        else:
+            print("❌ 保存結果が一致しません")
+            sys.exit(1)
+
+        # ORM版は autoflush=False のため最後の1件を数え漏らしていた
+        legacy_wrong = count_wrong_totals(str(tmp / "legacy.db"))
+        bulk_wrong = count_wrong_totals(str(tmp / "bulk_small.db"))
+        print(f"{'✅' if bulk_wrong == 0 else '❌'} 予想家の集計が実際の件数と異なる予想家: "
+              f"一括保存 {bulk_wrong}人 / ORM版 {legacy_wrong}人")
+        if bulk_wrong:
+            sys.exit(1)
+
+        # 一括保存で全件
+        predictors, predictions_by_predictor = make_batch(args.predictions)
+        bulk_path = str(tmp / "bulk.db")
+        bulk_time = run_bulk(bulk_path, predictors, predictions_by_predictor, args.chunk_predictors)
+
+        # 同じデータをもう一度保存（再スクレイピング時。全件が保存済み）
+        conn = sqlite3.connect(bulk_path)
+        start = time.perf_counter()
+        stats = ingest_batch(conn, predictors_data=predictors, predictions_by_predictor=predictions_by_predictor)
+        rerun_time = time.perf_counter() - start
+        conn.close()
+
+    legacy_rate = args.legacy_predictions / legacy_time
+    bulk_rate = args.predictions / bulk_time
+
+    print("-" * 60)
+    print(f"ORM版     : {args.legacy_predictions:>7,}件 {legacy_time:8.2f}秒 ({legacy_rate:,.0f}件/秒)"
+          f" → {args.predictions:,}件換算 {args.predictions / legacy_rate:,.1f}秒")
+    print(f"一括保存  : {args.legacy_predictions:>7,}件 {bulk_small_time:8.2f}秒")
+    print(f"一括保存  : {args.predictions:>7,}件 {bulk_time:8.2f}秒 ({bulk_rate:,.0f}件/秒)")
+    print(f"再保存    : {args.predictions:>7,}件 {rerun_time:8.2f}秒 (保存済み {stats.predictions_existing:,}件をスキップ)")
+    print(f"高速化    : {bulk_rate / legacy_rate:.1f}倍")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+条件別の予想家統計の一括計算（backend/analysis/condition_stats.py）のベンチマーク
+
+- sweep : スナップショットから全ての軸の組み合わせ（GROUPING SETS）を1回の集計で計算
+- write : predictor_stats の条件行を置き換え
+- SQL   : 条件ごとに predictions ⨝ races を直接集計（/api/search を条件の数だけ呼ぶのと同じ）
+          全条件は時間がかかりすぎるため、無作為に選んだ条件の平均から全条件分を見積もる
+
+使い方:
+    python scripts/benchmark/bench_condition_stats.py
+    python scripts/benchmark/bench_condition_stats.py --predictions 1000000 --sql-samples 100
+"""
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from backend.analysis.condition_cube import search_with_cube
+from backend.analysis.condition_stats import GROUPING_SETS, sweep_condition_stats, write_condition_stats
+from backend.analysis.prediction_facts import load_prediction_facts, rebuild_prediction_facts
+from synthetic_db import create_synthetic_db
+
+
+def timed(func):
+    """(結果, 秒)"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def search_condition(conn: sqlite3.Connection, stat_type: str, condition: str):
+    """条件行1つ分を条件指定検索で直接集計"""
+    values = dict(zip(_dimensions(stat_type), condition.split('_')))
+    distance = values.get('distance')
+    return search_with_cube(
+        conn, values.get('venue'), values.get('track_type'),
+        [int(distance)] if distance else None, values.get('grade'),
+        'hit_rate', 100000, 1, use_cube=False
+    )
+
+
+def _dimensions(stat_type: str) -> list:
+    """stat_type → 軸のリスト（track_type は "_" を含むため GROUPING_SETS から引く）"""
+    return next(dimensions for dimensions in GROUPING_SETS if "_".join(dimensions) == stat_type)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='条件別の予想家統計の一括計算のベンチマーク')
+    parser.add_argument('--predictors', type=int, default=1000, help='合成する予想家数')
+    parser.add_argument('--predictions', type=int, default=300000, help='合成する予想数')
+    parser.add_argument('--sql-samples', type=int, default=50, help='直接集計で計測する条件の数')
+    parser.add_argument('--db', type=str, default=None, help='既存DBを使う場合のパス（省略時は一時ファイルに合成）')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.db:
+            db_path = Path(args.db)
+        else:
+            db_path = Path(tmp_dir) / "bench_keiba.db"
+            print(f"合成DBを作成中... (予想家 {args.predictors:,}人 / 予想 {args.predictions:,}件)")
+            create_synthetic_db(str(db_path), n_predictors=args.predictors, n_predictions=args.predictions)
+
+        directory = Path(tmp_dir) / "facts"
+        conn = sqlite3.connect(db_path)
+
+        print("=" * 70)
+        print(f"条件別の予想家統計（{len(GROUPING_SETS)}種類の軸の組み合わせ）")
+        print("=" * 70)
+
+        manifest, seconds = timed(lambda: rebuild_prediction_facts(conn, directory))
+        print(f"  スナップショット構築: {seconds:>7.2f}秒（{manifest['rows']:,}行, 更新のたびには不要）")
+        facts, seconds = timed(lambda: load_prediction_facts(directory))
+        print(f"  読み込み            : {seconds:>7.2f}秒")
+
+        stats, sweep_seconds = timed(lambda: sweep_condition_stats(facts))
+        conditions = stats[['stat_type', 'condition']].drop_duplicates()
+        print(f"  sweep               : {sweep_seconds:>7.2f}秒（{len(conditions):,}条件, {len(stats):,}行）")
+
+        written, seconds = timed(lambda: write_condition_stats(conn, stats))
+        print(f"  write               : {seconds:>7.2f}秒（{written:,}行）")
+
+        samples = conditions.sample(min(args.sql_samples, len(conditions)), random_state=0)
+        expected, sql_seconds = timed(lambda: [
+            search_condition(conn, stat_type, condition) for stat_type, condition in samples.itertuples(index=False)
+        ])
+
+        matched = 0
+        for (stat_type, condition), result in zip(samples.itertuples(index=False), expected):
+            actual = stats[(stats['stat_type'] == stat_type) & (stats['condition'] == condition)]
+            matched += (len(result) == len(actual)
+                        and result['prediction_count'].sum() == actual['sample_size'].sum())
+
+        estimate = sql_seconds / len(samples) * len(conditions)
+        print(f"  SQL（条件ごと）     : {sql_seconds / len(samples) * 1000:>7.1f}ms/条件 → "
+              f"全条件で約{estimate:.1f}秒（sweep の{estimate / sweep_seconds:.0f}倍）")
+        print(f"  結果の一致: {'✅' if matched == len(samples) else '❌'}（{matched}/{len(samples)}条件）")
+
+        conn.close()
+        print("=" * 70)
+
+    sys.exit(0 if matched == len(samples) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+レース詳細JSONの一括読み込みのベンチマーク
+
+race_202505050211_details.json をもとにレースIDを変えたJSONを --files 件作り、
+races に未取得（track_type='不明'）のレースを登録した空のDBに反映する
+
+- before: 1ファイルずつ json.load → SELECT → UPDATE → write_race_details（100件ごとにコミット）
+- after : scripts/utils/update_db_from_json.py の load_json_dir
+          （プロセスプールで解析、一時テーブル経由の集合演算でまとめて反映）
+- 再実行: 変更のないファイルは読まない（更新時刻・サイズ。未登録のレースは毎回読み直す）
+- touch後: 更新時刻だけ変わったファイルは解析しない（SHA-1）
+
+before と after で races・正規化テーブルの内容が一致することも確認する
+
+使い方:
+    python scripts/benchmark/bench_json_loader.py
+    python scripts/benchmark/bench_json_loader.py --files 100000 --workers 8
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.scraper.race_detail_tables import RACE_DETAIL_TABLES, ensure_race_detail_tables, write_race_details
+from scripts.benchmark.bench_bulk_ingest import create_empty_db
+from scripts.utils.update_db_from_json import load_json_dir
+
+
+TEMPLATE = project_root / "race_202505050211_details.json"
+# DBに登録しないレースの割合（未登録としてスキップされる）
+UNREGISTERED_EVERY = 10
+
+
+def make_files(json_dir: Path, n_files: int):
+    """レースIDを変えたJSONを作る"""
+    template = json.loads(TEMPLATE.read_text(encoding="utf-8"))
+    for i in range(n_files):
+        race_id = f"2025{i:08d}"
+        data = dict(template, race_id=race_id)
+        data['race_info'] = dict(template['race_info'], distance=1000 + (i % 20) * 100)
+        (json_dir / f"race_{race_id}.json").write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def make_db(db_path: Path, n_files: int):
+    """JSONのレース（一部を除く）を未取得の状態で登録したDB"""
+    create_empty_db(str(db_path)).dispose()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO races (race_id, race_name, race_date, venue, distance, track_type) VALUES (?, ?, ?, ?, 0, '不明')",
+        [(f"2025{i:08d}", f"レース{i}", datetime(2025, 5, 5).isoformat(), '不明')
+         for i in range(n_files) if i % UNREGISTERED_EVERY]
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_legacy(db_path: Path, json_dir: Path) -> float:
+    """導入前の1ファイルずつの更新（正規化テーブルへの書き込みを含む）"""
+    start_time = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    ensure_race_detail_tables(conn)
+    cursor = conn.cursor()
+    for i, json_file in enumerate(json_dir.glob("race_*.json"), 1):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        race_id = data.get('race_id')
+        race_info = data.get('race_info', {})
+        cursor.execute("SELECT id, track_type FROM races WHERE race_id = ?", (race_id,))
+        result = cursor.fetchone()
+        if not result:
+            continue
+        if result[1] and result[1] != '不明':
+            continue
+        cursor.execute("""
+            UPDATE races SET venue = ?, distance = ?, track_type = ?, track_condition = ?, horse_count = ?
+            WHERE race_id = ?
+        """, (
+            race_info.get('venue', '不明'), race_info.get('distance', 0), race_info.get('track_type', '不明'),
+            race_info.get('track_condition'), race_info.get('horse_count', 0), race_id
+        ))
+        write_race_details(cursor, result[0], data)
+        if i % 100 == 0:
+            conn.commit()
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - start_time
+
+
+def snapshot(db_path: Path) -> dict:
+    """races と正規化テーブルの内容（races.id ではなくレースIDで比較）"""
+    conn = sqlite3.connect(db_path)
+    tables = {
+        'races': conn.execute("""
+            SELECT race_id, venue, distance, track_type, track_condition, horse_count FROM races ORDER BY race_id
+        """).fetchall()
+    }
+    for table_name in RACE_DETAIL_TABLES:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})") if row[1] not in ('id', 'race_id')]
+        tables[table_name] = conn.execute(f"""
+            SELECT r.race_id, {', '.join(f't.{column}' for column in columns)}
+            FROM {table_name} t JOIN races r ON r.id = t.race_id
+            ORDER BY r.race_id, {', '.join(f't.{column}' for column in columns[:2])}
+        """).fetchall()
+    conn.close()
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description='レース詳細JSONの一括読み込みのベンチマーク')
+    parser.add_argument('--files', type=int, default=5000, help='JSONファイル数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='after のプロセス数')
+    parser.add_argument('--batch-size', type=int, default=5000, help='after の1トランザクションのファイル数')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = Path(tmp) / "race_details"
+        json_dir.mkdir()
+        legacy_db = Path(tmp) / "legacy.db"
+        loader_db = Path(tmp) / "loader.db"
+
+        make_files(json_dir, args.files)
+        make_db(legacy_db, args.files)
+        make_db(loader_db, args.files)
+
+        print("=" * 60)
+        print(f"レース詳細JSONの読み込み（{args.files:,}ファイル、ワーカー: {args.workers}）")
+        print("=" * 60)
+
+        before = run_legacy(legacy_db, json_dir)
+
+        conn = sqlite3.connect(loader_db)
+        stats = load_json_dir(conn, json_dir, args.workers, args.batch_size, verbose=False)
+        rerun = load_json_dir(conn, json_dir, args.workers, args.batch_size, verbose=False)
+        for path in json_dir.iterdir():
+            os.utime(path)
+        touched = load_json_dir(conn, json_dir, args.workers, args.batch_size, verbose=False)
+        conn.close()
+
+        print(f"  before (1ファイルずつ)  : {before:8.2f}秒（{args.files / before:8,.0f}件/秒）")
+        print(f"  after  (一括)           : {stats.elapsed:8.2f}秒（{stats.files_per_second:8,.0f}件/秒）"
+              f" 反映 {stats.loaded:,} / 未登録 {stats.not_found:,}")
+        print(f"  再実行 (変更なし)       : {rerun.elapsed:8.2f}秒 スキップ {rerun.unchanged:,}")
+        print(f"  touch後 (内容は同じ)    : {touched.elapsed:8.2f}秒 スキップ {touched.unchanged:,}")
+        print(f"  速度比: {before / stats.elapsed:.1f}倍")
+        print("-" * 60)
+
+        failed = False
+        legacy_tables, loader_tables = snapshot(legacy_db), snapshot(loader_db)
+        for table_name, rows in legacy_tables.items():
+            if rows != loader_tables[table_name]:
+                print(f"❌ {table_name} の内容が一致しません（before {len(rows):,}行 / after {len(loader_tables[table_name]):,}行）")
+                failed = True
+        # 未登録のレースのJSONは記録しないため毎回読み直す
+        registered = stats.loaded
+        if rerun.loaded or touched.loaded or rerun.unchanged != registered or touched.unchanged != registered:
+            print("❌ 変更のないファイルが読み直されました")
+            failed = True
+        if failed:
+            sys.exit(1)
+        print("✅ races・正規化テーブルの内容は一致、変更のないファイルは全件スキップ")
+
+
+if __name__ == "__main__":
+    main()
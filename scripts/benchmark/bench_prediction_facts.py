@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+予想ファクトのスナップショットによる条件別集計のベンチマーク
+
+競馬場 × コース種別 × グレードの全条件で予想家を検索する「条件スイープ」の時間を比較する
+
+- SQL     : 条件ごとに predictions ⨝ races を直接集計（condition_cube の live クエリ）
+- facts   : スナップショットをメモリマップで読み込み、条件ごとに search_facts()
+- facts x1: 全条件を summarize() の1回の groupby で集計
+
+あわせてスナップショットの構築・差分更新（1%の予想の結果を更新）・読み込みの時間と
+ファイルサイズを表示し、facts と SQL の検索結果が一致することを確認する
+
+使い方:
+    python scripts/benchmark/bench_prediction_facts.py
+    python scripts/benchmark/bench_prediction_facts.py --predictions 1000000
+"""
+import sys
+import time
+import sqlite3
+import argparse
+import itertools
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd
+
+from backend.analysis.condition_cube import search_with_cube
+from backend.analysis.prediction_facts import (
+    load_prediction_facts, rebuild_prediction_facts, refresh_prediction_facts, search_facts, summarize,
+)
+from synthetic_db import create_synthetic_db
+
+MIN_PREDICTIONS = 5
+
+
+def timed(func):
+    """(結果, 秒)"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def same_result(expected: pd.DataFrame, actual: pd.DataFrame) -> bool:
+    """
+    予想家ID順に並べて比較（ROIの平均は浮動小数の加算順で丸めの境界をまたぎうるため末尾1桁の差まで許容）
+    """
+    try:
+        pd.testing.assert_frame_equal(
+            expected.sort_values('predictor_id').reset_index(drop=True),
+            actual.sort_values('predictor_id').reset_index(drop=True),
+            check_dtype=False, check_exact=False, atol=0.011,
+        )
+    except AssertionError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='予想ファクトのスナップショットのベンチマーク')
+    parser.add_argument('--predictors', type=int, default=1000, help='合成する予想家数')
+    parser.add_argument('--predictions', type=int, default=300000, help='合成する予想数')
+    parser.add_argument('--db', type=str, default=None, help='既存DBを使う場合のパス（省略時は一時ファイルに合成）')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.db:
+            db_path = Path(args.db)
+        else:
+            db_path = Path(tmp_dir) / "bench_keiba.db"
+            print(f"合成DBを作成中... (予想家 {args.predictors:,}人 / 予想 {args.predictions:,}件)")
+            create_synthetic_db(str(db_path), n_predictors=args.predictors, n_predictions=args.predictions)
+
+        directory = Path(tmp_dir) / "facts"
+        conn = sqlite3.connect(db_path)
+
+        print("=" * 70)
+        print("スナップショット")
+        print("=" * 70)
+        manifest, seconds = timed(lambda: rebuild_prediction_facts(conn, directory))
+        size = sum(path.stat().st_size for path in (directory / manifest['generation']).glob("*.npy"))
+        print(f"  全件構築: {seconds:.2f}秒（{manifest['rows']:,}行, "
+              f"{size / 1024 / 1024:.1f}MB / DB {db_path.stat().st_size / 1024 / 1024:.1f}MB）")
+
+        conn.execute("UPDATE predictions SET is_hit = 1, payout = 1000 WHERE id % 100 = 0")
+        conn.commit()
+        (_, refreshed), seconds = timed(lambda: refresh_prediction_facts(conn, directory))
+        print(f"  差分更新: {seconds:.2f}秒（{refreshed:,}件を読み直し）")
+
+        facts, seconds = timed(lambda: load_prediction_facts(directory))
+        print(f"  読み込み: {seconds * 1000:.1f}ms（メモリマップ）")
+
+        venues = [None] + sorted(v for v in facts['venue'].cat.categories if v != '不明')
+        track_types = [None] + sorted(t for t in facts['track_type'].cat.categories if t != '不明')
+        grades = [None, 'G1', 'G2', 'G3', 'オープン', '一般']
+        conditions = list(itertools.product(venues, track_types, grades))
+
+        print()
+        print("=" * 70)
+        print(f"条件スイープ（{len(conditions)}条件）")
+        print("=" * 70)
+
+        def sweep_sql():
+            return [search_with_cube(conn, venue, track_type, None, grade, 'hit_rate', 10000,
+                                     MIN_PREDICTIONS, use_cube=False)
+                    for venue, track_type, grade in conditions]
+
+        def sweep_facts():
+            return [search_facts(facts, venue, track_type, None, grade, 'hit_rate', 10000, MIN_PREDICTIONS)
+                    for venue, track_type, grade in conditions]
+
+        sql_results, sql_seconds = timed(sweep_sql)
+        facts_results, facts_seconds = timed(sweep_facts)
+        cube, cube_seconds = timed(lambda: summarize(
+            facts, ['predictor_id', 'venue', 'track_type', 'grade'], min_predictions=1
+        ))
+
+        same = all(map(same_result, sql_results, facts_results))
+        print(f"  SQL     : {sql_seconds:>7.2f}秒（{sql_seconds / len(conditions) * 1000:.1f}ms/条件）")
+        print(f"  facts   : {facts_seconds:>7.2f}秒（{facts_seconds / len(conditions) * 1000:.1f}ms/条件, "
+              f"{sql_seconds / facts_seconds:.1f}倍）")
+        print(f"  facts x1: {cube_seconds:>7.2f}秒（{len(cube):,}グループ）")
+        print(f"  検索結果の一致: {'✅' if same else '❌'}")
+
+        conn.close()
+        print("=" * 70)
+
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+予想家統計テーブル（predictor_stats）の更新のベンチマーク
+
+- 旧方式 : BASIC_STATS_QUERY で全予想家を集計し、テーブルを DROP して to_sql で書き直す
+- 全件構築: rebuild_predictor_stats()
+- 差分更新: スクレイプ1回分（一部の予想家に新しい予想を追加）の後に refresh_predictor_stats()
+
+使い方:
+    python scripts/benchmark/bench_predictor_stats.py
+    python scripts/benchmark/bench_predictor_stats.py --predictions 1000000 --batch-predictors 100
+"""
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd
+
+from backend.analysis.calculate_basic_stats import BASIC_STATS_QUERY
+from backend.analysis.predictor_stats import rebuild_predictor_stats, refresh_predictor_stats
+from synthetic_db import create_synthetic_db
+
+
+def timed(func):
+    """(結果, 秒)"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def legacy_full_rewrite(conn: sqlite3.Connection) -> int:
+    """旧 calculate_basic_stats() のテーブル書き直し（比較用の別テーブルに書く）"""
+    df = pd.read_sql_query(BASIC_STATS_QUERY, conn)
+    conn.execute("DROP TABLE IF EXISTS bench_legacy_predictor_stats")
+    df.to_sql('bench_legacy_predictor_stats', conn, if_exists='replace', index=False)
+    conn.commit()
+    return len(df)
+
+
+def add_scrape_batch(conn: sqlite3.Connection, n_predictors: int, per_predictor: int) -> int:
+    """一部の予想家に結果確定済みの予想を追加（スクレイプ1回分の想定）"""
+    cursor = conn.execute("""
+        INSERT INTO predictions (predictor_id, race_id, netkeiba_prediction_id, predicted_at, bet_type, is_hit, payout, roi)
+        SELECT p.predictor_id, p.race_id, p.netkeiba_prediction_id + 100000000, p.predicted_at, p.bet_type,
+               p.is_hit, p.payout, p.roi
+        FROM (
+            SELECT p.*, ROW_NUMBER() OVER (PARTITION BY p.predictor_id ORDER BY p.id) AS n
+            FROM predictions p
+            WHERE p.predictor_id IN (SELECT id FROM predictors ORDER BY RANDOM() LIMIT ?)
+        ) p
+        WHERE p.n <= ?
+    """, (n_predictors, per_predictor))
+    conn.commit()
+    return cursor.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='予想家統計テーブルの更新のベンチマーク')
+    parser.add_argument('--predictors', type=int, default=1000, help='合成する予想家数')
+    parser.add_argument('--predictions', type=int, default=300000, help='合成する予想数')
+    parser.add_argument('--batch-predictors', type=int, default=50, help='1回のスクレイプで予想が増える予想家数')
+    parser.add_argument('--batch-size', type=int, default=20, help='予想家1人あたりの追加予想数')
+    parser.add_argument('--db', type=str, default=None, help='既存DBを使う場合のパス（省略時は一時ファイルに合成）')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.db:
+            db_path = Path(args.db)
+        else:
+            db_path = Path(tmp_dir) / "bench_keiba.db"
+            print(f"合成DBを作成中... (予想家 {args.predictors:,}人 / 予想 {args.predictions:,}件)")
+            create_synthetic_db(str(db_path), n_predictors=args.predictors, n_predictions=args.predictions)
+
+        conn = sqlite3.connect(db_path)
+
+        print("=" * 70)
+        print("predictor_stats の更新")
+        print("=" * 70)
+
+        rows, seconds = timed(lambda: legacy_full_rewrite(conn))
+        print(f"  旧方式  : {seconds:>7.3f}秒（{rows:,}行を書き直し）")
+
+        rows, seconds = timed(lambda: rebuild_predictor_stats(conn))
+        print(f"  全件構築: {seconds:>7.3f}秒（{rows:,}行）")
+
+        added, seconds = timed(lambda: add_scrape_batch(conn, args.batch_predictors, args.batch_size))
+        print(f"  予想追加: {seconds:>7.3f}秒（{added:,}件, トリガーで再集計対象を記録）")
+
+        refreshed, refresh_seconds = timed(lambda: refresh_predictor_stats(conn))
+        print(f"  差分更新: {refresh_seconds:>7.3f}秒（{refreshed:,}人の予想家を再集計）")
+
+        refreshed, seconds = timed(lambda: refresh_predictor_stats(conn))
+        print(f"  変更なし: {seconds * 1000:>7.1f}ms（{refreshed:,}人）")
+
+        conn.execute("DROP TABLE IF EXISTS bench_legacy_predictor_stats")
+        conn.commit()
+        conn.close()
+        print("=" * 70)
+
+    sys.exit(0 if refresh_seconds < 1.0 else 1)
+
+
+if __name__ == "__main__":
+    main()
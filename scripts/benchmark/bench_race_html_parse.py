@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+レース詳細ページの抽出のマイクロベンチマーク
+
+同じページから race_data ができるまでの1ページあたりの時間を比較する
+
+- before: pandas.read_html（表ごとにDataFrame）+ BeautifulSoup(html.parser)
+          （RaceDetailScraperPandas._parse_race_html_pandas）
+- after : lxmlで1回だけ解析（race_html_extractor.parse_race_html、現在の _parse_race_html）
+
+両者の race_data が一致すること（scraped_at を除く）も確認する
+
+使い方:
+    python scripts/benchmark/bench_race_html_parse.py
+    python scripts/benchmark/bench_race_html_parse.py --repeat 200
+    python scripts/benchmark/bench_race_html_parse.py --html-dir saved_pages
+"""
+import sys
+import gzip
+import time
+import argparse
+import warnings
+import statistics
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from loguru import logger
+
+from backend.config import settings
+from backend.scraper.race_detail_scraper_with_db import RaceDetailScraperPandas
+from backend.scraper.race_html_extractor import parse_race_html
+
+
+FIXTURE = project_root / "scripts" / "test" / "fixtures" / "race_202505050211.html"
+
+
+def load_pages(html_dir: str = None, limit: int = None):
+    """[(race_id, HTML)]（--html-dir がなければテスト用のページ）"""
+    if not html_dir:
+        return [("202505050211", FIXTURE.read_bytes())]
+
+    pages = []
+    paths = sorted(list(Path(html_dir).glob("*.html")) + list(Path(html_dir).glob("*.html.gz")))
+    for path in paths[:limit]:
+        content = path.read_bytes()
+        if path.suffix == ".gz":
+            content = gzip.decompress(content)
+        pages.append((path.name.split(".")[0], content))
+    return pages
+
+
+def time_per_page(parse, pages, repeat: int) -> float:
+    """1ページあたりの時間（ミリ秒、repeat 回の中央値）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for race_id, content in pages:
+            try:
+                parse(race_id, content)
+            except Exception:
+                pass
+        samples.append((time.perf_counter() - start) / len(pages) * 1000)
+    return statistics.median(samples)
+
+
+def count_mismatches(legacy_parse, pages) -> int:
+    """抽出結果が一致しないページ数"""
+    mismatches = 0
+    for race_id, content in pages:
+        try:
+            legacy = legacy_parse(race_id, content)
+        except Exception:
+            legacy = None
+        try:
+            extracted = parse_race_html(race_id, content)
+        except Exception:
+            extracted = None
+
+        if legacy is not None:
+            legacy.pop('scraped_at')
+        if extracted is not None:
+            extracted.pop('scraped_at')
+        if legacy != extracted:
+            mismatches += 1
+            print(f"  ❌ 不一致: {race_id}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='レース詳細ページの抽出のマイクロベンチマーク')
+    parser.add_argument('--html-dir', type=str, default=None, help='レース詳細ページのHTMLを置いたディレクトリ（省略時はテスト用のページ）')
+    parser.add_argument('--limit', type=int, default=None, help='--html-dir から読むページ数の上限')
+    parser.add_argument('--repeat', type=int, default=50, help='計測の繰り返し回数')
+
+    args = parser.parse_args()
+
+    settings.page_archive_dir = ""
+    logger.remove()
+    warnings.simplefilter("ignore")
+
+    pages = load_pages(args.html_dir, args.limit)
+    if not pages:
+        print(f"❌ エラー: {args.html_dir} にHTMLがありません")
+        sys.exit(1)
+
+    scraper = RaceDetailScraperPandas()
+    legacy_parse = scraper._parse_race_html_pandas
+
+    print("=" * 60)
+    print(f"レース詳細ページの抽出（{len(pages):,}ページ × {args.repeat}回）")
+    print("=" * 60)
+
+    mismatches = count_mismatches(legacy_parse, pages)
+
+    before = time_per_page(legacy_parse, pages, args.repeat)
+    after = time_per_page(parse_race_html, pages, args.repeat)
+
+    print(f"  before (read_html + BeautifulSoup): {before:8.2f} ms/ページ")
+    print(f"  after  (lxml 1パス)               : {after:8.2f} ms/ページ")
+    print(f"  速度比: {before / after:.1f}倍")
+    print("-" * 60)
+    if mismatches:
+        print(f"❌ 抽出結果が一致しないページ: {mismatches:,} / {len(pages):,}")
+        sys.exit(1)
+    print(f"✅ 抽出結果は全ページで一致（scraped_at を除く）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+/api/search レスポンス作成のマイクロベンチマーク
+
+同じ検索SQLの結果から、JSONバイト列ができるまでの時間を比較する
+（50件・500件・5000件）
+
+- before: DataFrame化 → DataFrame.iterrows で PredictorResult を生成
+          → SearchResponse（FastAPIと同様に jsonable_encoder + json.dumps）
+- after : カーソルの行タプル → encode_search_response()（現在の backend/api/api.py）
+
+「変換」は取得済みの行からの変換のみ、「SQL込み」は検索SQLの実行を含めた時間
+
+両者のJSONが一致することも確認する
+
+使い方:
+    python scripts/benchmark/bench_search_serialization.py
+    python scripts/benchmark/bench_search_serialization.py --repeat 20
+"""
+import sys
+import json
+import math
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from backend.api import api
+from backend.analysis.condition_cube import build_search_query, fetch_search_rows
+from synthetic_db import create_synthetic_db
+
+
+ROW_COUNTS = [50, 500, 5000]
+
+
+def legacy_encode(df: pd.DataFrame) -> bytes:
+    """導入前の変換（DataFrame.iterrows + 行ごとのPydanticモデル）"""
+    predictors = []
+    for _, row in df.iterrows():
+        predictors.append(api.PredictorResult(
+            predictor_id=int(row['predictor_id']),
+            predictor_name=row['predictor_name'],
+            netkeiba_id=int(row['netkeiba_id']),
+            prediction_count=int(row['prediction_count']),
+            hit_count=int(row['hit_count']),
+            hit_rate=float(row['hit_rate']),
+            total_payout=int(row['total_payout']),
+            avg_payout=float(row['avg_payout']),
+            roi_count=int(row['roi_count']),
+            avg_roi=float(row['avg_roi']) if pd.notna(row['avg_roi']) else None
+        ))
+
+    response = api.SearchResponse(
+        total_count=len(df),
+        avg_hit_rate=float(df['hit_rate'].mean()),
+        max_hit_rate=float(df['hit_rate'].max()),
+        total_predictions=int(df['prediction_count'].sum()),
+        predictors=predictors
+    )
+
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def legacy_response(conn: sqlite3.Connection, query: str, params: list) -> bytes:
+    """導入前の処理（pandas.read_sql_query から変換まで）"""
+    return legacy_encode(pd.read_sql_query(query, conn, params=params))
+
+
+def fast_response(conn: sqlite3.Connection, limit: int) -> bytes:
+    """現在の処理（カーソルの行タプルから直接JSON）"""
+    _, rows = fetch_search_rows(
+        conn, None, None, None, None, 'hit_rate', limit, api.MIN_PREDICTIONS, use_cube=False
+    )
+    return api.encode_search_response(rows)
+
+
+def same_response(before: bytes, after: bytes) -> bool:
+    """平均的中率（浮動小数の加算順で末尾が変わりうる）以外が完全一致するか"""
+    a, b = json.loads(before), json.loads(after)
+    avg_a, avg_b = a.pop('avg_hit_rate'), b.pop('avg_hit_rate')
+    return a == b and math.isclose(avg_a, avg_b, rel_tol=1e-12)
+
+
+def time_it(func, repeat: int) -> float:
+    """repeat 回実行したときの中央値（ミリ秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/search レスポンス作成のベンチマーク')
+    parser.add_argument('--repeat', type=int, default=10, help='各件数での繰り返し回数')
+    parser.add_argument('--db', type=str, default=None, help='既存DBを使う場合のパス（省略時は一時ファイルに合成）')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.db:
+            db_path = Path(args.db)
+        else:
+            # 5000件返せるよう、最小予想数を超える予想家を十分に作る
+            db_path = Path(tmp_dir) / "bench_keiba.db"
+            print("合成DBを作成中... (予想家 6,000人 / 予想 90,000件)")
+            create_synthetic_db(str(db_path), n_predictors=6000, n_predictions=90000)
+
+        conn = sqlite3.connect(db_path)
+
+        print("=" * 70)
+        print(f"/api/search レスポンス作成（中央値, {args.repeat}回）")
+        print("=" * 70)
+
+        all_same = True
+        for limit in ROW_COUNTS:
+            query, params = build_search_query(
+                conn, None, None, None, None, 'hit_rate', limit, api.MIN_PREDICTIONS, use_cube=False
+            )
+            columns, rows = fetch_search_rows(
+                conn, None, None, None, None, 'hit_rate', limit, api.MIN_PREDICTIONS, use_cube=False
+            )
+
+            same = same_response(legacy_response(conn, query, params), fast_response(conn, limit))
+            all_same = all_same and same
+
+            encode_before = time_it(
+                lambda: legacy_encode(pd.DataFrame.from_records(rows, columns=columns)), args.repeat
+            )
+            encode_after = time_it(lambda: api.encode_search_response(rows), args.repeat)
+            total_before = time_it(lambda: legacy_response(conn, query, params), args.repeat)
+            total_after = time_it(lambda: fast_response(conn, limit), args.repeat)
+
+            print(f"  {len(rows):>5}件 | 変換 {encode_before:>7.2f}ms → {encode_after:>6.2f}ms "
+                  f"({encode_before / encode_after:>5.1f}倍) | "
+                  f"SQL込み {total_before:>7.1f}ms → {total_after:>7.1f}ms | "
+                  f"出力一致: {'✅' if same else '❌'}")
+
+        conn.close()
+
+        print("=" * 70)
+
+    sys.exit(0 if all_same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク用の合成データベース作成
+本番と同じスキーマ（backend/models/database.py）で、予想家・レース・予想をランダム生成する
+"""
+import os
+import sys
+import random
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine
+from backend.models.database import Base
+from backend.scraper.bulk_ingest import RELIABILITY_HIGH, RELIABILITY_MEDIUM
+
+
+VENUES = ['札幌', '函館', '福島', '新潟', '東京', '中山', '中京', '京都', '阪神', '小倉']
+TRACK_TYPES = ['芝', 'ダート', '障害']
+DISTANCES = [1000, 1150, 1200, 1400, 1600, 1700, 1800, 2000, 2200, 2400, 2500, 3000, 3200, 3600]
+GRADES = ['G1', 'G2', 'G3']
+
+
+def create_synthetic_db(
+    db_path: str,
+    n_predictors: int = 300,
+    n_races: int = 5000,
+    n_predictions: int = 100000,
+    seed: int = 42
+) -> str:
+    """
+    合成データベースを作成
+
+    Args:
+        db_path: 作成先パス（既存ファイルは上書き）
+        n_predictors: 予想家数
+        n_races: レース数
+        n_predictions: 予想数
+        seed: 乱数シード
+
+    Returns:
+        作成したデータベースのパス
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    rng = random.Random(seed)
+    now = datetime(2025, 12, 1)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.executemany("""
+        INSERT INTO predictors (id, netkeiba_id, name, total_predictions, grade_race_predictions, data_reliability, created_at, updated_at)
+        VALUES (?, ?, ?, 0, 0, 'low', ?, ?)
+    """, [
+        (i, 100000 + i, f"予想家{i:05d}", now, now)
+        for i in range(1, n_predictors + 1)
+    ])
+
+    races = []
+    for i in range(1, n_races + 1):
+        race_date = now - timedelta(days=rng.randint(0, 730))
+        grade = rng.choice(GRADES) if rng.random() < 0.08 else None
+
+        # 約1割は詳細未取得（temp_形式のrace_id、track_type='不明'）
+        if rng.random() < 0.1:
+            race_id = f"temp_{i}"
+            venue, distance, track_type, horse_count = '不明', 0, '不明', None
+        else:
+            race_id = f"{race_date.year}{i:08d}"
+            venue = rng.choice(VENUES)
+            distance = rng.choice(DISTANCES)
+            track_type = TRACK_TYPES[2] if rng.random() < 0.03 else rng.choice(TRACK_TYPES[:2])
+            horse_count = rng.randint(8, 18)
+
+        races.append((
+            i, race_id, f"レース{i}" + (f"({grade})" if grade else ""), race_date,
+            venue, grade, distance, track_type, horse_count, grade is not None, now
+        ))
+
+    cursor.executemany("""
+        INSERT INTO races (id, race_id, race_name, race_date, venue, grade, distance, track_type, horse_count, is_grade_race, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, races)
+
+    predictions = []
+    for i in range(1, n_predictions + 1):
+        race = races[rng.randrange(n_races)]
+        # 約5%は結果未確定
+        is_hit = None if rng.random() < 0.05 else rng.random() < 0.2
+        payout = rng.randint(100, 30000) if is_hit else 0
+        roi = None
+        if is_hit:
+            roi = payout / rng.choice([1000, 1200, 1500, 2000]) * 100
+        predictions.append((
+            i,
+            rng.randint(1, n_predictors),
+            race[0],
+            10000000 + i,
+            race[3],
+            is_hit,
+            payout,
+            roi,
+            now,
+        ))
+
+    cursor.executemany("""
+        INSERT INTO predictions (id, predictor_id, race_id, netkeiba_prediction_id, predicted_at, is_hit, payout, roi, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, predictions)
+
+    conn.commit()
+    conn.close()
+
+    return db_path
+
+
+def fill_predictor_totals(conn: sqlite3.Connection):
+    """
+    予想家の集計（total_predictions / grade_race_predictions / data_reliability）を予想から埋める
+
+    合成直後は0のままなので、集計列を読む処理のテストで使う。
+    重賞の判定は本番の集計（bulk_ingest.py）と同じ races.is_grade_race
+    """
+    conn.execute(f"""
+        UPDATE predictors SET
+            total_predictions = c.total_predictions,
+            grade_race_predictions = c.grade_race_predictions,
+            data_reliability = CASE
+                WHEN c.grade_race_predictions >= {RELIABILITY_HIGH} THEN 'high'
+                WHEN c.grade_race_predictions >= {RELIABILITY_MEDIUM} THEN 'medium'
+                ELSE 'low'
+            END
+        FROM (
+            SELECT pr.id AS predictor_id,
+                   COUNT(p.id) AS total_predictions,
+                   COUNT(CASE WHEN r.is_grade_race = 1 THEN 1 END) AS grade_race_predictions
+            FROM predictors pr
+            LEFT JOIN predictions p ON p.predictor_id = pr.id
+            LEFT JOIN races r ON r.id = p.race_id
+            GROUP BY pr.id
+        ) AS c
+        WHERE predictors.id = c.predictor_id
+    """)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ベンチマーク用の合成データベース作成')
+    parser.add_argument('--db', type=str, default='data/bench_keiba.db', help='作成先パス')
+    parser.add_argument('--predictors', type=int, default=300, help='予想家数')
+    parser.add_argument('--races', type=int, default=5000, help='レース数')
+    parser.add_argument('--predictions', type=int, default=100000, help='予想数')
+    parser.add_argument('--seed', type=int, default=42, help='乱数シード')
+
+    args = parser.parse_args()
+
+    Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+    create_synthetic_db(args.db, args.predictors, args.races, args.predictions, args.seed)
+
+    print(f"✅ 合成データベースを作成しました: {args.db}")
+    print(f"   予想家: {args.predictors:,}人 / レース: {args.races:,}件 / 予想: {args.predictions:,}件")
+
+
+if __name__ == "__main__":
+    main()
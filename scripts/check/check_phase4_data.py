@@ -4,21 +4,27 @@ Phase 4用データ確認スクリプト
 データ分析に必要なデータが揃っているか確認
 """
 
-import sqlite3
+import argparse
 import sys
 from pathlib import Path
 
-def check_phase4_data():
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.analysis.diagnostics import MIN_ANALYZABLE_PREDICTIONS, load_diagnostics
+
+
+def check_phase4_data(db_path: str = 'data/keiba.db', refresh: bool = False):
     """Phase 4に必要なデータを確認"""
     
-    db_path = Path('data/keiba.db')
-    
-    if not db_path.exists():
-        print("❌ エラー: data/keiba.db が見つかりません")
+    if not Path(db_path).exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
         sys.exit(1)
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    # 全指標をまとめて集計（データが変わっていなければ前回の集計を使う）
+    s = load_diagnostics(db_path, refresh=refresh)
     
     print("=" * 70)
     print("Phase 4 データ確認レポート")
@@ -27,128 +33,64 @@ def check_phase4_data():
     
     # 1. 予想家データ
     print("【1. 予想家データ】")
-    cursor.execute("SELECT COUNT(*) FROM predictors")
-    predictor_count = cursor.fetchone()[0]
+    predictor_count = s.predictors
     print(f"  予想家数: {predictor_count}人")
-    
-    cursor.execute("""
-        SELECT data_reliability, COUNT(*) 
-        FROM predictors 
-        GROUP BY data_reliability
-    """)
-    for reliability, count in cursor.fetchall():
+    for reliability, count in s.predictors_by_reliability.items():
         print(f"    - {reliability}: {count}人")
     print()
     
     # 2. 予想データ
     print("【2. 予想データ】")
-    cursor.execute("SELECT COUNT(*) FROM predictions")
-    total_predictions = cursor.fetchone()[0]
+    total_predictions = s.predictions
     print(f"  総予想数: {total_predictions:,}件")
     
-    cursor.execute("SELECT COUNT(*) FROM predictions WHERE is_hit IS NOT NULL")
-    predictions_with_result = cursor.fetchone()[0]
+    predictions_with_result = s.predictions_with_result
     print(f"  結果あり: {predictions_with_result:,}件 ({predictions_with_result/total_predictions*100:.1f}%)")
     
-    cursor.execute("SELECT COUNT(*) FROM predictions WHERE is_hit = 1")
-    hit_count = cursor.fetchone()[0]
     if predictions_with_result > 0:
-        hit_rate = hit_count / predictions_with_result * 100
-        print(f"  的中数: {hit_count:,}件 (的中率: {hit_rate:.1f}%)")
-    
-    cursor.execute("SELECT COUNT(*) FROM predictions WHERE roi IS NOT NULL")
-    predictions_with_roi = cursor.fetchone()[0]
-    cursor.execute("SELECT AVG(roi) FROM predictions WHERE roi IS NOT NULL")
-    avg_roi = cursor.fetchone()[0]
-    if predictions_with_roi > 0:
-        print(f"  ROIあり: {predictions_with_roi:,}件 (平均ROI: {avg_roi:.1f}%)")
+        hit_rate = s.hits / predictions_with_result * 100
+        print(f"  的中数: {s.hits:,}件 (的中率: {hit_rate:.1f}%)")
+    
+    if s.roi_count > 0:
+        print(f"  ROIあり: {s.roi_count:,}件 (平均ROI: {s.avg_roi:.1f}%)")
     print()
     
     # 3. レースデータ
     print("【3. レースデータ】")
-    cursor.execute("SELECT COUNT(*) FROM races")
-    total_races = cursor.fetchone()[0]
+    total_races = s.races
     print(f"  総レース数: {total_races}件")
     
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM races 
-        WHERE track_type IS NOT NULL AND track_type != '不明'
-    """)
-    races_with_detail = cursor.fetchone()[0]
+    races_with_detail = s.races_with_detail
     print(f"  詳細あり: {races_with_detail}件 ({races_with_detail/total_races*100:.1f}%)")
     
     # コース種別
-    cursor.execute("""
-        SELECT track_type, COUNT(*) 
-        FROM races 
-        WHERE track_type IS NOT NULL AND track_type != '不明'
-        GROUP BY track_type
-    """)
     print(f"\n  コース種別:")
-    for track_type, count in cursor.fetchall():
-        print(f"    - {track_type}: {count}件")
+    for track_type, count in s.races_by_track_type.items():
+        if track_type not in ('NULL', '不明'):
+            print(f"    - {track_type}: {count}件")
     
     # グレード
-    cursor.execute("""
-        SELECT grade, COUNT(*) 
-        FROM races 
-        WHERE is_grade_race = 1 
-        GROUP BY grade 
-        ORDER BY grade
-    """)
     print(f"\n  重賞:")
-    total_grade_races = 0
-    for grade, count in cursor.fetchall():
+    for grade, count in sorted(s.grade_races_by_grade.items()):
         print(f"    - {grade}: {count}件")
-        total_grade_races += count
-    print(f"    合計: {total_grade_races}件")
+    print(f"    合計: {s.grade_races}件")
     print()
     
     # 4. 分析可能性チェック
     print("【4. 分析可能性チェック】")
     
     # 予想家ごとの予想数
-    cursor.execute("""
-        SELECT 
-            COUNT(DISTINCT predictor_id) as predictor_count,
-            MIN(prediction_count) as min_predictions,
-            MAX(prediction_count) as max_predictions,
-            AVG(prediction_count) as avg_predictions
-        FROM (
-            SELECT predictor_id, COUNT(*) as prediction_count
-            FROM predictions
-            WHERE is_hit IS NOT NULL
-            GROUP BY predictor_id
-        )
-    """)
-    row = cursor.fetchone()
-    if row:
-        print(f"  結果ありの予想家数: {row[0]}人")
-        print(f"  予想数: 最小{row[1]}件 / 平均{row[2]:.0f}件 / 最大{row[3]}件")
+    if s.predictors_with_result:
+        print(f"  結果ありの予想家数: {s.predictors_with_result}人")
+        print(f"  予想数: 最小{s.results_per_predictor_min}件 / 平均{s.results_per_predictor_avg:.0f}件 / "
+              f"最大{s.results_per_predictor_max}件")
     
     # 分析可能な予想家（10件以上）
-    cursor.execute("""
-        SELECT COUNT(DISTINCT predictor_id)
-        FROM predictions
-        WHERE is_hit IS NOT NULL
-        GROUP BY predictor_id
-        HAVING COUNT(*) >= 10
-    """)
-    analyzable_predictors = len(cursor.fetchall())
-    print(f"  分析可能な予想家（10件以上）: {analyzable_predictors}人")
+    analyzable_predictors = s.analyzable_predictors
+    print(f"  分析可能な予想家（{MIN_ANALYZABLE_PREDICTIONS}件以上）: {analyzable_predictors}人")
     
     # レース詳細と予想の紐付け確認
-    cursor.execute("""
-        SELECT COUNT(DISTINCT p.id)
-        FROM predictions p
-        JOIN races r ON p.race_id = r.id
-        WHERE r.track_type IS NOT NULL 
-          AND r.track_type != '不明'
-          AND p.is_hit IS NOT NULL
-    """)
-    predictions_with_race_detail = cursor.fetchone()[0]
-    print(f"  レース詳細と紐付く予想: {predictions_with_race_detail:,}件")
+    print(f"  レース詳細と紐付く予想: {s.predictions_with_race_detail:,}件")
     
     print()
     
@@ -196,10 +138,13 @@ def check_phase4_data():
     print()
     print("=" * 70)
     
-    conn.close()
-    
     return ready
 
 if __name__ == "__main__":
-    ready = check_phase4_data()
+    parser = argparse.ArgumentParser(description='Phase 4用データ確認')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--refresh', action='store_true', help='保存した集計を使わずに集計し直す')
+    args = parser.parse_args()
+    
+    ready = check_phase4_data(args.db, args.refresh)
     sys.exit(0 if ready else 1)
@@ -1,5 +1,13 @@
-import sqlite3
 import re
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.analysis.diagnostics import load_diagnostics
 
 # ログファイルから最後に処理したインデックスを取得
 def get_last_processed_index():
@@ -30,31 +38,18 @@ def get_last_processed_index():
     
     return None
 
-# データベース接続
-conn = sqlite3.connect('data/keiba.db')
-cursor = conn.cursor()
+# 全指標をまとめて集計（データが変わっていなければ前回の集計を使う）
+snapshot = load_diagnostics('data/keiba.db')
 
 print("=" * 70)
 print("現在の進捗状況")
 print("=" * 70)
 
 # 基本統計
-cursor.execute("SELECT COUNT(*) FROM predictors")
-total = cursor.fetchone()[0]
-
-cursor.execute("SELECT COUNT(*) FROM predictors WHERE total_predictions > 0")
-successful = cursor.fetchone()[0]
-
-cursor.execute("SELECT COUNT(*) FROM predictions")
-total_predictions = cursor.fetchone()[0]
-
-cursor.execute("""
-    SELECT COUNT(*) 
-    FROM predictions p 
-    JOIN races r ON p.race_id = r.id
-    WHERE r.grade IS NOT NULL
-""")
-grade_predictions = cursor.fetchone()[0]
+total = snapshot.predictors
+successful = snapshot.active_predictors
+total_predictions = snapshot.predictions
+grade_predictions = snapshot.grade_predictions
 
 print(f"\n【データベース統計】")
 print(f"登録予想家: {total}人")
@@ -95,5 +90,3 @@ else:
     print(f"\n注意: この方法だと一部の予想家を重複処理する可能性があります")
 
 print("=" * 70)
-
-conn.close()
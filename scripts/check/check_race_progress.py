@@ -16,31 +16,28 @@
 
 import sys
 import argparse
-import sqlite3
 from pathlib import Path
 from typing import Dict, List
 
-project_root = Path(__file__).resolve().parent
-db_path = project_root / "keiba.db"
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
 
+from backend.analysis.diagnostics import load_diagnostics
 
-def get_progress_stats(db_path: str, verbose: bool = False) -> Dict:
+
+def get_progress_stats(db_path: str, verbose: bool = False, refresh: bool = False) -> Dict:
     """進捗統計を取得"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    # 全指標をまとめて集計（データが変わっていなければ前回の集計を使う）
+    snapshot = load_diagnostics(db_path, refresh=refresh)
     
     stats = {}
     
-    # 総レース数
-    cursor.execute("SELECT COUNT(*) FROM races")
-    stats['total_races'] = cursor.fetchone()[0]
-    
-    # 詳細取得済み
-    cursor.execute("SELECT COUNT(*) FROM races WHERE track_type != '不明' AND track_type IS NOT NULL")
-    stats['completed'] = cursor.fetchone()[0]
-    
-    # 詳細未取得
-    stats['pending'] = stats['total_races'] - stats['completed']
+    # 総レース数・詳細取得済み・詳細未取得
+    stats['total_races'] = snapshot.races
+    stats['completed'] = snapshot.races_with_detail
+    stats['pending'] = snapshot.races_pending
     
     # 進捗率
     if stats['total_races'] > 0:
@@ -49,70 +46,36 @@ def get_progress_stats(db_path: str, verbose: bool = False) -> Dict:
         stats['progress_pct'] = 0
     
     # 重賞統計
-    cursor.execute("SELECT COUNT(*) FROM races WHERE is_grade_race = 1")
-    stats['grade_races'] = cursor.fetchone()[0]
-    
-    cursor.execute("""
-        SELECT COUNT(*) FROM races 
-        WHERE is_grade_race = 1 AND track_type != '不明' AND track_type IS NOT NULL
-    """)
-    stats['grade_completed'] = cursor.fetchone()[0]
-    
-    stats['grade_pending'] = stats['grade_races'] - stats['grade_completed']
+    stats['grade_races'] = snapshot.grade_races
+    stats['grade_completed'] = snapshot.grade_races_with_detail
+    stats['grade_pending'] = snapshot.grade_races_pending
     
     if stats['grade_races'] > 0:
         stats['grade_progress_pct'] = stats['grade_completed'] / stats['grade_races'] * 100
     else:
         stats['grade_progress_pct'] = 0
     
-    # グレード別統計
     if verbose:
+        # グレード別統計
         stats['by_grade'] = {}
         for grade in ['G1', 'G2', 'G3']:
-            cursor.execute(f"""
-                SELECT 
-                    COUNT(*) as total,
-                    COUNT(CASE WHEN track_type != '不明' AND track_type IS NOT NULL THEN 1 END) as completed
-                FROM races
-                WHERE grade = '{grade}'
-            """)
-            row = cursor.fetchone()
+            row = snapshot.races_by_grade.get(grade, {'total': 0, 'completed': 0})
             stats['by_grade'][grade] = {
-                'total': row[0],
-                'completed': row[1],
-                'pending': row[0] - row[1],
-                'progress_pct': row[1] / row[0] * 100 if row[0] > 0 else 0
+                'total': row['total'],
+                'completed': row['completed'],
+                'pending': row['total'] - row['completed'],
+                'progress_pct': row['completed'] / row['total'] * 100 if row['total'] > 0 else 0
             }
+        
+        # コース別統計
+        stats['by_course'] = {
+            course: count for course, count in snapshot.races_by_track_type.items()
+            if course not in ('NULL', '不明')
+        }
+        
+        # 場所別統計
+        stats['by_track'] = dict(snapshot.races_by_venue)
     
-    # コース別統計
-    if verbose:
-        cursor.execute("""
-            SELECT track_type, COUNT(*) as count
-            FROM races
-            WHERE track_type IS NOT NULL AND track_type != '不明'
-            GROUP BY track_type
-            ORDER BY count DESC
-        """)
-        stats['by_course'] = {}
-        for row in cursor.fetchall():
-            if row[0]:
-                stats['by_course'][row[0]] = row[1]
-    
-    # 場所別統計
-    if verbose:
-        cursor.execute("""
-            SELECT venue, COUNT(*) as count
-            FROM races
-            WHERE venue IS NOT NULL AND venue != '不明'
-            GROUP BY venue
-            ORDER BY count DESC
-        """)
-        stats['by_track'] = {}
-        for row in cursor.fetchall():
-            if row[0]:
-                stats['by_track'][row[0]] = row[1]
-    
-    conn.close()
     return stats
 
 
@@ -195,12 +158,13 @@ def main():
     parser.add_argument('--verbose', '-v', action='store_true', help='詳細表示')
     parser.add_argument('--grade-only', '-g', action='store_true', help='重賞のみ表示')
     parser.add_argument('--db', type=str, default='keiba.db', help='データベースパス')
+    parser.add_argument('--refresh', action='store_true', help='保存した集計を使わずに集計し直す')
     
     args = parser.parse_args()
     
     try:
         # 進捗取得
-        stats = get_progress_stats(args.db, args.verbose)
+        stats = get_progress_stats(args.db, args.verbose, args.refresh)
         
         # 表示
         display_progress(stats, args.verbose)
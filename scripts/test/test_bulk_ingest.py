@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+予想家・予想データの一括保存（backend/scraper/bulk_ingest.py）のテスト
+
+空の一時DB（本番と同じスキーマ）に ingest_batch で保存し、
+- 予想家の登録・更新件数、予想の保存・保存済み・スキップの件数（IngestStats）
+- 予想IDのない予想を保存しないこと、同じレースの予想が1つのレース行を共有すること
+- 予想家の集計（total_predictions / grade_race_predictions / data_reliability）
+を確認する
+
+使い方:
+    python scripts/test/test_bulk_ingest.py
+    pytest scripts/test/test_bulk_ingest.py
+"""
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine
+
+from backend.models.database import Base
+from backend.scraper.bulk_ingest import RELIABILITY_HIGH, RELIABILITY_MEDIUM, IngestStats, ingest_batch
+from backend.scraper.race_identity import race_identity_key, temp_race_id
+
+
+PREDICTORS = [
+    {'netkeiba_id': 1001, 'name': '予想家A'},
+    {'netkeiba_id': 1002, 'name': '予想家B'},
+    {'netkeiba_id': 1003, 'name': '予想家C'},
+]
+
+
+def make_db(tmp: str) -> sqlite3.Connection:
+    db_path = Path(tmp) / "ingest_keiba.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return sqlite3.connect(db_path)
+
+
+def prediction(prediction_id, race_name, day, grade=None, race_num="11R", venue="東京", is_hit=False, payout=0):
+    """PredictionScraper が返す予想（day は2025-01-01からの日数）"""
+    return {
+        'prediction_id': prediction_id,
+        'race_name': race_name,
+        'race_date': datetime(2025, 1, 1) + timedelta(days=day),
+        'race_num': race_num,
+        'venue': venue,
+        'grade': grade,
+        'is_hit': is_hit,
+        'payout': payout,
+    }
+
+
+def first_batch():
+    """
+    A: 重賞 RELIABILITY_HIGH 件 + 予想IDなし・レース名なし・同じバッチ内で重複する予想
+    B: 重賞 RELIABILITY_MEDIUM 件 + 重賞でない予想2件（1件はAと同じレース）
+    C: 重賞 RELIABILITY_MEDIUM - 1 件
+    """
+    a = [prediction(10_000 + i, f"重賞A{i}", i, 'G1', is_hit=i % 3 == 0, payout=500) for i in range(RELIABILITY_HIGH)]
+    a += [
+        prediction(None, "予想IDなし", 100, 'G1'),
+        prediction(19_999, "", 101, 'G1'),
+        prediction(10_000, "重賞A0", 0, 'G1'),
+    ]
+    b = [prediction(20_000 + i, f"重賞B{i}", i, 'G3') for i in range(RELIABILITY_MEDIUM)]
+    b += [
+        prediction(20_100, "3歳未勝利", 200, race_num="1R"),
+        prediction(20_101, "重賞A0", 0, 'G1'),
+    ]
+    c = [prediction(30_000 + i, f"重賞C{i}", i, 'G2') for i in range(RELIABILITY_MEDIUM - 1)]
+    return {1001: a, 1002: b, 1003: c}
+
+
+def predictor_totals(conn: sqlite3.Connection) -> dict:
+    """{netkeiba_id: (total_predictions, grade_race_predictions, data_reliability)}"""
+    rows = conn.execute("""
+        SELECT netkeiba_id, total_predictions, grade_race_predictions, data_reliability FROM predictors
+    """)
+    return {row[0]: row[1:] for row in rows}
+
+
+def test_first_ingest_counts():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(tmp)
+        stats = ingest_batch(conn, PREDICTORS, first_batch())
+
+        assert stats == IngestStats(
+            predictors_inserted=3,
+            predictors_updated=0,
+            predictions_received=RELIABILITY_HIGH + 3 + RELIABILITY_MEDIUM + 2 + RELIABILITY_MEDIUM - 1,
+            predictions_inserted=RELIABILITY_HIGH + RELIABILITY_MEDIUM + 2 + RELIABILITY_MEDIUM - 1,
+            predictions_existing=0,
+            predictions_skipped=3,
+        )
+        # 予想IDのない予想は保存しない
+        assert conn.execute("SELECT COUNT(*) FROM predictions WHERE netkeiba_prediction_id IS NULL").fetchone() == (0,)
+        assert conn.execute("SELECT COUNT(*) FROM races WHERE race_name = '予想IDなし'").fetchone() == (0,)
+        conn.close()
+
+
+def test_same_race_shares_row():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(tmp)
+        ingest_batch(conn, PREDICTORS, first_batch())
+
+        race_key = race_identity_key(datetime(2025, 1, 1), "東京", "11R", "重賞A0")
+        rows = conn.execute("""
+            SELECT r.race_id, r.race_key, r.is_grade_race, COUNT(p.id)
+            FROM races r JOIN predictions p ON p.race_id = r.id
+            WHERE r.race_name = '重賞A0'
+            GROUP BY r.id
+        """).fetchall()
+        assert rows == [(temp_race_id(race_key), race_key, 1, 2)]
+        conn.close()
+
+
+def test_predictor_totals():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(tmp)
+        ingest_batch(conn, PREDICTORS, first_batch())
+
+        assert predictor_totals(conn) == {
+            1001: (RELIABILITY_HIGH, RELIABILITY_HIGH, 'high'),
+            # Aと同じ重賞の予想も重賞予想に数える
+            1002: (RELIABILITY_MEDIUM + 2, RELIABILITY_MEDIUM + 1, 'medium'),
+            1003: (RELIABILITY_MEDIUM - 1, RELIABILITY_MEDIUM - 1, 'low'),
+        }
+        conn.close()
+
+
+def test_rerun_counts_existing_and_updates_totals():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(tmp)
+        ingest_batch(conn, PREDICTORS, first_batch())
+
+        # 同じ予想を取り直しても増えず、新しい予想だけ保存して集計に足す
+        batch = first_batch()
+        batch[1003].append(prediction(30_100, "重賞C新", 300, 'G2'))
+        renamed = [dict(PREDICTORS[2], name='予想家C（改名）')]
+        stats = ingest_batch(conn, renamed, batch)
+
+        assert (stats.predictors_inserted, stats.predictors_updated) == (0, 1)
+        assert stats.predictions_inserted == 1
+        assert stats.predictions_existing == RELIABILITY_HIGH + RELIABILITY_MEDIUM + 2 + RELIABILITY_MEDIUM - 1
+        assert stats.predictions_skipped == 3
+
+        totals = predictor_totals(conn)
+        assert totals[1003] == (RELIABILITY_MEDIUM, RELIABILITY_MEDIUM, 'medium')
+        assert totals[1001] == (RELIABILITY_HIGH, RELIABILITY_HIGH, 'high')
+        assert conn.execute("SELECT name FROM predictors WHERE netkeiba_id = 1003").fetchone() == ('予想家C（改名）',)
+        conn.close()
+
+
+def test_unknown_predictor_is_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(tmp)
+        stats = ingest_batch(conn, predictions_by_predictor={9999: [prediction(90_000, "重賞X", 0, 'G1')]})
+
+        assert (stats.predictions_received, stats.predictions_inserted, stats.predictions_skipped) == (1, 0, 1)
+        assert conn.execute("SELECT COUNT(*) FROM predictions").fetchone() == (0,)
+        conn.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("予想家・予想データの一括保存のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_first_ingest_counts,
+        test_same_race_shares_row,
+        test_predictor_totals,
+        test_rerun_counts_existing_and_updates_totals,
+        test_unknown_predictor_is_skipped,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+条件別の予想家統計（backend/analysis/condition_stats.py）のテスト
+
+合成DBで、一括計算した条件行が条件指定検索（予想の直接集計）と一致すること、
+ロールアップの行が細かい条件の行の合計と一致すること、
+書き込みで overall / grade_race の行が保たれることを確認する
+
+使い方:
+    python scripts/test/test_condition_stats.py
+    pytest scripts/test/test_condition_stats.py
+"""
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts" / "benchmark"))
+
+from backend.analysis.condition_cube import search_with_cube
+from backend.analysis.condition_stats import (
+    GROUPING_SETS, SWEEP_STAT_TYPES, sweep_condition_stats, write_condition_stats,
+)
+from backend.analysis.prediction_facts import load_prediction_facts, rebuild_prediction_facts
+from backend.analysis.predictor_stats import STATS_TABLE
+from synthetic_db import create_synthetic_db
+
+
+def make_facts(tmp: str):
+    db_path = Path(tmp) / "sweep_keiba.db"
+    create_synthetic_db(str(db_path), n_predictors=30, n_races=200, n_predictions=3000)
+    conn = sqlite3.connect(db_path)
+    rebuild_prediction_facts(conn, Path(tmp) / "facts")
+    return conn, load_prediction_facts(Path(tmp) / "facts")
+
+
+def test_sweep_matches_search():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, facts = make_facts(tmp)
+        stats = sweep_condition_stats(facts)
+
+        assert set(stats['stat_type']) == set(SWEEP_STAT_TYPES)
+        assert not stats.duplicated(['predictor_id', 'stat_type', 'condition']).any()
+        assert not stats['condition'].str.contains('不明').any()
+
+        for dimensions in GROUPING_SETS:
+            stat_type = "_".join(dimensions)
+            for condition in stats.loc[stats['stat_type'] == stat_type, 'condition'].drop_duplicates().head(3):
+                values = dict(zip(dimensions, condition.split('_')))
+                distance = values.get('distance')
+                expected = search_with_cube(
+                    conn, values.get('venue'), values.get('track_type'),
+                    [int(distance)] if distance else None, values.get('grade'),
+                    'hit_rate', 10000, 1, use_cube=False
+                ).set_index('predictor_id')
+                actual = stats[(stats['stat_type'] == stat_type) & (stats['condition'] == condition)] \
+                    .set_index('predictor_id')
+
+                assert set(actual.index) == set(expected.index), condition
+                assert (actual['sample_size'] == expected.loc[actual.index, 'prediction_count']).all()
+                assert (actual['hit_rate'] - expected.loc[actual.index, 'hit_rate']).abs().max() < 0.011
+                roi_diff = (actual['roi'] - expected.loc[actual.index, 'avg_roi']).abs().fillna(0)
+                assert roi_diff.max() < 0.011
+        conn.close()
+
+
+def test_rollups_add_up():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, facts = make_facts(tmp)
+        stats = sweep_condition_stats(facts)
+
+        finest = stats[stats['stat_type'] == 'venue_track_type_distance_grade']
+        venue = finest.assign(condition=finest['condition'].str.split('_').str[0]) \
+            .groupby(['predictor_id', 'condition'])['sample_size'].sum()
+        rollup = stats[stats['stat_type'] == 'venue'].set_index(['predictor_id', 'condition'])['sample_size']
+        assert venue.sort_index().equals(rollup.sort_index())
+
+        # 下限未満のサンプル数の行は除く
+        filtered = sweep_condition_stats(facts, min_sample_size=5)
+        assert filtered['sample_size'].min() >= 5
+        assert len(filtered) == (stats['sample_size'] >= 5).sum()
+        conn.close()
+
+
+def test_write_replaces_condition_rows_only():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, facts = make_facts(tmp)
+        stats = sweep_condition_stats(facts)
+
+        assert write_condition_stats(conn, stats) == len(stats)
+        assert write_condition_stats(conn, stats) == len(stats)
+
+        counts = dict(conn.execute(f"SELECT stat_type, COUNT(*) FROM {STATS_TABLE} GROUP BY stat_type"))
+        assert sum(counts[stat_type] for stat_type in SWEEP_STAT_TYPES) == len(stats)
+        assert counts['overall'] > 0
+
+        row = stats.iloc[len(stats) // 2]
+        stored = conn.execute(f"""
+            SELECT sample_size, hit_rate, roi, confidence_level FROM {STATS_TABLE}
+            WHERE predictor_id = ? AND stat_type = ? AND condition = ?
+        """, (int(row['predictor_id']), row['stat_type'], row['condition'])).fetchone()
+        assert stored[0] == row['sample_size'] and stored[1] == row['hit_rate']
+        assert stored[3] == row['confidence_level']
+        conn.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("条件別の予想家統計のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_sweep_matches_search,
+        test_rollups_add_up,
+        test_write_replaces_condition_rows_only,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
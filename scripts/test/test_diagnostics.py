@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+健全性・進捗の指標（backend/analysis/diagnostics.py）のテスト
+
+合成DBで、まとめて集計した指標が個別の COUNT(*) の結果と一致すること、
+保存した集計がデータの変更で作り直されることを確認する
+
+使い方:
+    python scripts/test/test_diagnostics.py
+    pytest scripts/test/test_diagnostics.py
+"""
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts" / "benchmark"))
+
+from backend.analysis.diagnostics import collect_diagnostics, diagnostics_cache_path, load_diagnostics
+from backend.data_version import bump_data_version
+from synthetic_db import create_synthetic_db, fill_predictor_totals
+
+NOW = datetime(2025, 11, 1)
+
+
+def make_db(tmp: str) -> Path:
+    """
+    合成DB（重賞でないグレード付きのレース（リステッド）を混ぜて予想家の予想数を集計し、
+    払戻なしの的中と名前なしのレースを混ぜる）
+    """
+    db_path = Path(tmp) / "diag_keiba.db"
+    create_synthetic_db(str(db_path), n_predictors=40, n_races=300, n_predictions=4000)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE races SET grade = 'L', is_grade_race = 0 WHERE grade IS NULL AND id % 20 = 0")
+    fill_predictor_totals(conn)
+    conn.execute("UPDATE predictors SET total_predictions = 5, data_reliability = 'high' WHERE id % 7 = 0")
+    conn.execute("UPDATE predictions SET payout = 0 WHERE is_hit = 1 AND id % 5 = 0")
+    conn.execute("UPDATE races SET race_name = '' WHERE id % 50 = 0")
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def scalar(conn: sqlite3.Connection, sql: str, *params):
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def test_snapshot_matches_individual_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        conn = sqlite3.connect(db_path)
+        s = collect_diagnostics(conn, now=NOW)
+        detail = "track_type IS NOT NULL AND track_type != '不明'"
+
+        assert s.predictors == scalar(conn, "SELECT COUNT(*) FROM predictors")
+        assert s.active_predictors == scalar(conn, "SELECT COUNT(*) FROM predictors WHERE total_predictions > 0")
+        assert s.low_prediction_predictors == scalar(
+            conn, "SELECT COUNT(*) FROM predictors WHERE total_predictions > 0 AND total_predictions < 10")
+        assert s.predictors_by_reliability == dict(
+            conn.execute("SELECT data_reliability, COUNT(*) FROM predictors GROUP BY data_reliability").fetchall())
+
+        assert s.predictions == scalar(conn, "SELECT COUNT(*) FROM predictions")
+        assert s.hits == scalar(conn, "SELECT COUNT(*) FROM predictions WHERE is_hit = 1")
+        assert s.misses == scalar(conn, "SELECT COUNT(*) FROM predictions WHERE is_hit = 0")
+        assert s.predictions_unknown == scalar(conn, "SELECT COUNT(*) FROM predictions WHERE is_hit IS NULL")
+        assert s.hit_without_payout == scalar(conn, "SELECT COUNT(*) FROM predictions WHERE is_hit = 1 AND payout = 0")
+        assert s.hit_without_payout > 0
+        count, low, high, avg = conn.execute(
+            "SELECT COUNT(*), MIN(payout), MAX(payout), AVG(payout) FROM predictions WHERE payout > 0").fetchone()
+        assert (s.payout_count, s.payout_min, s.payout_max) == (count, low, high)
+        assert abs(s.payout_avg - avg) < 1e-6
+        assert abs(s.avg_roi - scalar(conn, "SELECT AVG(roi) FROM predictions WHERE roi IS NOT NULL")) < 1e-6
+        assert s.future_predictions == scalar(conn, """
+            SELECT COUNT(*) FROM predictions p JOIN races r ON r.id = p.race_id WHERE r.race_date > ?
+        """, NOW.strftime('%Y-%m-%d %H:%M:%S.%f'))
+        assert 0 < s.future_predictions < s.predictions
+        # 重賞の予想は予想家の重賞予想数と同じ is_grade_race で数える
+        assert s.predictions_by_grade == dict(conn.execute("""
+            SELECT r.grade, COUNT(*) FROM predictions p JOIN races r ON r.id = p.race_id
+            WHERE r.is_grade_race = 1 GROUP BY r.grade
+        """).fetchall())
+        assert 'L' not in s.predictions_by_grade
+        assert s.grade_predictions == scalar(conn, "SELECT SUM(grade_race_predictions) FROM predictors")
+        assert s.grade_hits == scalar(conn, """
+            SELECT COUNT(*) FROM predictions p JOIN races r ON r.id = p.race_id
+            WHERE r.is_grade_race = 1 AND p.is_hit = 1
+        """)
+        assert s.predictions_with_race_detail == scalar(conn, f"""
+            SELECT COUNT(*) FROM predictions p JOIN races r ON r.id = p.race_id
+            WHERE r.{detail.replace(' AND ', ' AND r.')} AND p.is_hit IS NOT NULL
+        """)
+
+        per_predictor = [n for (n,) in conn.execute(
+            "SELECT COUNT(*) FROM predictions WHERE is_hit IS NOT NULL GROUP BY predictor_id")]
+        assert s.predictors_with_result == len(per_predictor)
+        assert (s.results_per_predictor_min, s.results_per_predictor_max) == (min(per_predictor), max(per_predictor))
+        assert s.analyzable_predictors == sum(1 for n in per_predictor if n >= 10)
+
+        assert s.races == scalar(conn, "SELECT COUNT(*) FROM races")
+        assert s.races_with_detail == scalar(conn, f"SELECT COUNT(*) FROM races WHERE {detail}")
+        assert s.races_without_name == scalar(conn, "SELECT COUNT(*) FROM races WHERE race_name IS NULL OR race_name = ''")
+        assert s.grade_races_with_detail == scalar(conn, f"SELECT COUNT(*) FROM races WHERE is_grade_race = 1 AND {detail}")
+        assert s.races_by_grade['G1']['total'] == scalar(conn, "SELECT COUNT(*) FROM races WHERE grade = 'G1'")
+        conn.close()
+
+
+def test_samples_and_top_predictors():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        conn = sqlite3.connect(db_path)
+        s = collect_diagnostics(conn, now=NOW, sample_size=5)
+
+        assert len(s.top_predictors) == len(s.latest_predictions) == len(s.latest_grade_races) == 5
+        totals = [p['total_predictions'] for p in s.top_predictors]
+        assert totals == sorted(totals, reverse=True)
+        for p in s.top_predictors:
+            hits, payout = conn.execute("""
+                SELECT COUNT(CASE WHEN pr.is_hit = 1 THEN 1 END), COALESCE(SUM(CASE WHEN pr.payout > 0 THEN pr.payout END), 0)
+                FROM predictions pr JOIN predictors p ON p.id = pr.predictor_id
+                WHERE p.netkeiba_id = ?
+            """, (p['netkeiba_id'],)).fetchone()
+            assert (p['hits'], p['total_payout']) == (hits, payout)
+        assert all(race['grade'] and race['grade'] != 'L' for race in s.latest_grade_races)
+        conn.close()
+
+
+def test_cache_is_reused_until_data_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        first = load_diagnostics(db_path)
+        assert diagnostics_cache_path(db_path).exists()
+
+        cached = load_diagnostics(db_path)
+        assert cached.computed_at == first.computed_at
+        assert cached.predictions == first.predictions
+        assert cached.top_predictors == first.top_predictors
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM predictions WHERE id % 2 = 0")
+        conn.commit()
+        conn.close()
+        bump_data_version(db_path)
+
+        updated = load_diagnostics(db_path)
+        assert updated.data_version != first.data_version
+        assert updated.predictions < first.predictions
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("健全性・進捗の指標のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_snapshot_matches_individual_queries,
+        test_samples_and_top_predictors,
+        test_cache_is_reused_until_data_changes,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Chromeドライバーのプール（backend/scraper/driver_pool.py）のテスト（Chrome不要）
+
+ドライバーの起動を偽物に置き換え、壊れたドライバーが破棄されたときに
+空きを待っていたスレッドが新しいドライバーを起動して続行できることを確認する
+
+使い方:
+    python scripts/test/test_driver_pool.py
+    pytest scripts/test/test_driver_pool.py
+"""
+import sys
+import threading
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from selenium.common.exceptions import WebDriverException
+
+from backend.scraper.driver_pool import ChromeDriverPool, PooledDriver
+
+
+class FakeDriver:
+    """webdriver.Chrome の代わり"""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.quit_called = False
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeDriverPool(ChromeDriverPool):
+    """Chromeを起動せず FakeDriver を作るプール"""
+
+    checkout_poll_interval = 0.05
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.drivers = []
+
+    def _create(self) -> PooledDriver:
+        driver = FakeDriver(len(self.drivers) + 1)
+        self.drivers.append(driver)
+        pooled = PooledDriver(driver)
+        with self._lock:
+            self._all.append(pooled)
+        return pooled
+
+
+def test_waiter_recovers_after_broken_driver_is_discarded():
+    pool = FakeDriverPool(size=1, max_pages=0)
+    holding = threading.Event()
+    release = threading.Event()
+    waiter_got = []
+
+    def break_driver():
+        try:
+            with pool.driver():
+                holding.set()
+                release.wait(5)
+                raise WebDriverException("chrome crashed")
+        except WebDriverException:
+            pass
+
+    def wait_for_driver():
+        with pool.driver() as driver:
+            waiter_got.append(driver)
+
+    breaker = threading.Thread(target=break_driver, daemon=True)
+    breaker.start()
+    assert holding.wait(5)
+
+    waiter = threading.Thread(target=wait_for_driver, daemon=True)
+    waiter.start()
+    # 上限（1台）まで貸し出し中なので、待っている側はまだ借りられない
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    release.set()
+    breaker.join(5)
+    waiter.join(5)
+    assert not waiter.is_alive(), "waiting thread never woke up after the broken driver was discarded"
+
+    assert [driver.number for driver in waiter_got] == [2]
+    assert pool.drivers[0].quit_called
+    assert pool.active_count == 1
+    pool.close()
+
+
+def test_healthy_driver_is_reused():
+    pool = FakeDriverPool(size=2, max_pages=2)
+    with pool.driver() as first:
+        pass
+    with pool.driver() as second:
+        pass
+    assert first is second
+
+    # max_pages 回貸し出したドライバーは作り直す
+    with pool.driver() as third:
+        pass
+    assert third is not first and first.quit_called
+    pool.close()
+    assert pool.active_count == 0
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("Chromeドライバーのプールのテスト")
+    print("=" * 60)
+
+    tests = [
+        test_waiter_recovers_after_broken_driver_is_discarded,
+        test_healthy_driver_is_reused,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
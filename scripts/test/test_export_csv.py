@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+データエクスポート（scripts/utils/export_csv.py）のテスト
+
+合成DBから CSV・gzip圧縮CSV を出力し、行数・集計値・差分エクスポート（--since）が
+DBを直接集計した結果と一致することを確認する
+
+使い方:
+    python scripts/test/test_export_csv.py
+    pytest scripts/test/test_export_csv.py
+"""
+import csv
+import gzip
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts" / "benchmark"))
+sys.path.insert(0, str(project_root / "scripts" / "utils"))
+
+from sqlalchemy import create_engine
+
+from export_csv import export_grade_races, export_predictions, export_predictors, export_summary
+from synthetic_db import create_synthetic_db, fill_predictor_totals
+
+SINCE = datetime(2025, 12, 15)
+
+
+def make_db(tmp: str) -> Path:
+    """
+    合成DB（一部を重賞でないグレード付きのレース（リステッド）にして予想家の予想数を集計し、
+    一部の予想を SINCE 以降の登録にする）
+    """
+    db_path = Path(tmp) / "export_keiba.db"
+    create_synthetic_db(str(db_path), n_predictors=50, n_races=300, n_predictions=3000)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE races SET grade = 'L', is_grade_race = 0 WHERE grade IS NULL AND id % 20 = 0")
+    fill_predictor_totals(conn)
+    conn.execute("UPDATE predictions SET created_at = '2025-12-20 00:00:00.000000' WHERE id % 10 = 0")
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def read_csv(path: str) -> list:
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))
+
+
+def query(db_path: Path, sql: str) -> list:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_exports_match_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        engine = create_engine(f"sqlite:///{db_path}")
+        out_dir = str(Path(tmp) / "exports")
+
+        rows = read_csv(export_predictors(engine, out_dir=out_dir, batch_size=7))
+        assert rows[0] == ['ID', '名前', '総予想数', '重賞予想数', '信頼度']
+        assert len(rows) - 1 == query(db_path, "SELECT COUNT(*) FROM predictors WHERE total_predictions > 0")[0][0]
+
+        rows = read_csv(export_predictions(engine, out_dir=out_dir, limit=100, batch_size=7))
+        assert len(rows) == 101
+        dates = [row[3] for row in rows[1:]]
+        assert dates == sorted(dates, reverse=True)
+        assert {row[6] for row in rows[1:]} <= {'○', '×', ''}
+
+        rows = read_csv(export_grade_races(engine, fmt='gzip', out_dir=out_dir, batch_size=7))
+        expected = query(db_path, """
+            SELECT COUNT(*) FROM predictions JOIN races ON races.id = predictions.race_id
+            WHERE races.is_grade_race = 1
+        """)[0][0]
+        assert len(rows) - 1 == expected
+        assert all(row[5] for row in rows[1:])
+        engine.dispose()
+
+
+def test_summary_matches_per_predictor_counts():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        engine = create_engine(f"sqlite:///{db_path}")
+
+        rows = read_csv(export_summary(engine, out_dir=str(Path(tmp) / "exports")))
+        expected = {
+            str(netkeiba_id): (str(hits), str(grade_predictions), str(grade_hits), str(payout))
+            for netkeiba_id, hits, grade_predictions, grade_hits, payout in query(db_path, """
+                SELECT p.netkeiba_id,
+                       SUM(pr.is_hit = 1),
+                       SUM(r.is_grade_race = 1),
+                       SUM(pr.is_hit = 1 AND r.is_grade_race = 1),
+                       SUM(COALESCE(pr.payout, 0))
+                FROM predictors p
+                JOIN predictions pr ON pr.predictor_id = p.id
+                JOIN races r ON r.id = pr.race_id
+                GROUP BY p.id
+            """)
+        }
+        assert len(rows) - 1 == len(expected)
+        for row in rows[1:]:
+            # 重賞予想数・重賞的中数は同じ重賞の判定（is_grade_race）で数える
+            assert (row[3], row[5], row[6], row[8]) == expected[row[0]]
+            assert float(row[4]) == round(int(row[3]) * 100 / int(row[2]), 1)
+            if int(row[5]):
+                assert float(row[7]) == round(int(row[6]) * 100 / int(row[5]), 1)
+        engine.dispose()
+
+
+def test_since_exports_only_new_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        engine = create_engine(f"sqlite:///{db_path}")
+        out_dir = str(Path(tmp) / "exports")
+
+        rows = read_csv(export_predictions(engine, since=SINCE, limit=None, out_dir=out_dir))
+        assert len(rows) - 1 == 300
+
+        rows = read_csv(export_summary(engine, since=SINCE, out_dir=out_dir))
+        expected = query(db_path, "SELECT COUNT(DISTINCT predictor_id) FROM predictions WHERE id % 10 = 0")[0][0]
+        assert len(rows) - 1 == expected
+
+        # 予想家は更新日時で絞り込む（合成DBは全員 SINCE より前）
+        rows = read_csv(export_predictors(engine, since=SINCE, out_dir=out_dir))
+        assert len(rows) == 1
+        engine.dispose()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("データエクスポートのテスト")
+    print("=" * 60)
+
+    tests = [
+        test_exports_match_database,
+        test_summary_matches_per_predictor_counts,
+        test_since_exports_only_new_rows,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
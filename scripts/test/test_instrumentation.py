@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+スクレイピングの段階ごとの計測（backend/scraper/instrumentation.py）のテスト
+
+p50/p95・エラー件数・律速の判定と、Prometheus形式の出力・/metrics の公開を確認する
+
+使い方:
+    python scripts/test/test_instrumentation.py
+    pytest scripts/test/test_instrumentation.py
+"""
+import sys
+import urllib.request
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.scraper.instrumentation import StageMetrics
+from backend.scraper.rate_limiter import AdaptiveRateLimiter
+
+
+def make_metrics() -> StageMetrics:
+    metrics = StageMetrics()
+    for i in range(1, 101):
+        metrics.record('fetch', i / 100, nbytes=1000)
+    for _ in range(100):
+        metrics.record('parse', 0.01)
+    metrics.record('db', 0.5)
+    return metrics
+
+
+def test_quantiles_and_totals():
+    summary = make_metrics().snapshot()
+    fetch = summary['fetch']
+    assert (fetch.count, fetch.bytes, fetch.errors) == (100, 100000, 0)
+    assert fetch.p50 == 0.5
+    assert fetch.p95 == 0.95
+    assert abs(fetch.total - 50.5) < 1e-9
+    assert summary['parse'].p95 == 0.01
+
+
+def test_stage_counts_errors_and_bytes():
+    metrics = StageMetrics()
+    with metrics.stage('fetch') as timer:
+        timer.bytes = 42
+    try:
+        with metrics.stage('fetch'):
+            raise TimeoutError
+    except TimeoutError:
+        pass
+
+    fetch = metrics.snapshot()['fetch']
+    assert (fetch.count, fetch.errors, fetch.bytes) == (2, 1, 42)
+    assert metrics.pages_per_minute() > 0
+
+
+def test_bottleneck_and_summary_lines():
+    metrics = make_metrics()
+    resource, share = metrics.bottleneck()
+    assert resource == 'network'
+    assert share > 0.95
+
+    lines = metrics.summary_lines()
+    assert lines[0].startswith('fetch')
+    assert '律速: ネットワーク' in lines[-1]
+    assert StageMetrics().bottleneck() is None
+
+
+def test_prometheus_text():
+    limiter = AdaptiveRateLimiter(interval=4.0, jitter=0.0)
+    limiter.backoff("https://db.netkeiba.com/race/1", "429")
+    text = make_metrics().prometheus_text(limiter)
+
+    assert 'scraper_stage_seconds{stage="fetch",quantile="0.95"} 0.950000' in text
+    assert 'scraper_stage_seconds_count{stage="parse"} 100' in text
+    assert 'scraper_stage_bytes_total{stage="fetch"} 100000' in text
+    assert 'scraper_request_interval_seconds{host="db.netkeiba.com"} 8.000' in text
+    assert 'scraper_backoffs_total{host="db.netkeiba.com",reason="429"} 1' in text
+    assert text.endswith("\n")
+
+
+def test_metrics_endpoint():
+    server = make_metrics().serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode('utf-8')
+        assert 'scraper_pages_per_minute' in body
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("スクレイピングの段階ごとの計測のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_quantiles_and_totals,
+        test_stage_counts_errors_and_bytes,
+        test_bottleneck_and_summary_lines,
+        test_prometheus_text,
+        test_metrics_endpoint,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+バッチ処理のジョブキュー（backend/scraper/job_queue.py）のテスト
+
+一時DBに対して、複数ワーカーでの取り出しの重複・リース切れの再取得・
+失敗の再試行・中断時の取得待ちへの戻しを確認する
+
+使い方:
+    python scripts/test/test_job_queue.py
+    pytest scripts/test/test_job_queue.py
+"""
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.scraper.job_queue import DONE, FAILED, IN_FLIGHT, PENDING, JobQueue, drain
+
+
+def make_queue(tmp: str, worker_id: str, **kwargs) -> JobQueue:
+    return JobQueue(str(Path(tmp) / "jobs.db"), "test", worker_id=worker_id, **kwargs)
+
+
+def test_enqueue_is_idempotent():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = make_queue(tmp, "w1")
+        assert queue.enqueue(["a", "b", "c"]) == 3
+        assert queue.enqueue(["b", "c", "d"]) == 1
+        assert queue.counts()[PENDING] == 4
+        queue.close()
+
+
+def test_concurrent_workers_do_not_share_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        setup = make_queue(tmp, "setup")
+        setup.enqueue([f"job{i:04d}" for i in range(500)])
+        setup.close()
+
+        processed = {}
+
+        def worker(worker_id: str):
+            queue = make_queue(tmp, worker_id)
+
+            def process_chunk(jobs):
+                for job in jobs:
+                    processed.setdefault(job.key, []).append(worker_id)
+                    queue.complete(job.key)
+
+            drain(queue, process_chunk, chunk_size=7)
+            queue.close()
+
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(processed) == 500
+        assert all(len(workers) == 1 for workers in processed.values())
+
+        check = make_queue(tmp, "check")
+        assert check.counts()[DONE] == 500
+        check.close()
+
+
+def test_expired_lease_is_reclaimed():
+    with tempfile.TemporaryDirectory() as tmp:
+        crashed = make_queue(tmp, "crashed", lease_seconds=0)
+        crashed.enqueue(["a", "b"])
+        assert [job.key for job in crashed.claim(1)] == ["a"]
+
+        # リースが切れた "a" から再開する
+        restarted = make_queue(tmp, "restarted")
+        jobs = restarted.claim(10)
+        assert [(job.key, job.attempts) for job in jobs] == [("a", 2), ("b", 1)]
+
+        # 元のワーカーは他のワーカーが取り出したジョブの失敗を記録できない
+        assert not crashed.fail("a", "late")
+        restarted.complete("a")
+        assert restarted.counts() == {PENDING: 0, IN_FLIGHT: 1, DONE: 1, FAILED: 0}
+        crashed.close()
+        restarted.close()
+
+
+def test_fail_retries_until_max_attempts():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = make_queue(tmp, "w1", max_attempts=2)
+        queue.enqueue(["a"])
+
+        queue.claim(1)
+        assert queue.fail("a", "timeout")
+        assert queue.counts()[PENDING] == 1
+
+        queue.claim(1)
+        assert queue.fail("a", "timeout")
+        assert queue.counts()[FAILED] == 1
+        assert queue.claim(1) == []
+        assert queue.failed_jobs() == [("a", "timeout")]
+
+        assert queue.retry_failed() == 1
+        assert [job.attempts for job in queue.claim(1)] == [1]
+        queue.close()
+
+
+def test_drain_releases_unprocessed_jobs_on_interrupt():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = make_queue(tmp, "w1")
+        queue.enqueue(["a", "b", "c"])
+
+        def process_chunk(jobs):
+            queue.complete(jobs[0].key)
+            raise KeyboardInterrupt
+
+        try:
+            drain(queue, process_chunk, chunk_size=3)
+        except KeyboardInterrupt:
+            pass
+
+        assert queue.counts() == {PENDING: 2, IN_FLIGHT: 0, DONE: 1, FAILED: 0}
+        # 取得待ちに戻したジョブは取り出した回数に数えない
+        assert [(job.key, job.attempts) for job in queue.claim(10)] == [("b", 1), ("c", 1)]
+        queue.close()
+
+
+def test_drain_fails_jobs_without_result():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = make_queue(tmp, "w1", max_attempts=1)
+        queue.enqueue(["a", "b"])
+
+        assert drain(queue, lambda jobs: queue.complete("a"), chunk_size=10) == 2
+        assert queue.counts() == {PENDING: 0, IN_FLIGHT: 0, DONE: 1, FAILED: 1}
+        queue.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("ジョブキューのテスト")
+    print("=" * 60)
+
+    tests = [
+        test_enqueue_is_idempotent,
+        test_concurrent_workers_do_not_share_jobs,
+        test_expired_lease_is_reclaimed,
+        test_fail_retries_until_max_attempts,
+        test_drain_releases_unprocessed_jobs_on_interrupt,
+        test_drain_fails_jobs_without_result,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
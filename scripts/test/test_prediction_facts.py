@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+予想ファクトの列指向スナップショット（backend/analysis/prediction_facts.py）のテスト
+
+合成DBで、スナップショットの集計がSQLの直接集計と一致すること、
+差分更新の結果が全件再構築と一致することを確認する
+
+使い方:
+    python scripts/test/test_prediction_facts.py
+    pytest scripts/test/test_prediction_facts.py
+"""
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts" / "benchmark"))
+
+from backend.analysis.condition_cube import search_with_cube
+from backend.analysis.prediction_facts import (
+    count_by, load_prediction_facts, open_prediction_facts, rebuild_prediction_facts,
+    refresh_prediction_facts, search_facts,
+)
+from backend.data_version import bump_data_version
+from synthetic_db import create_synthetic_db
+
+
+def make_db(tmp: str) -> Path:
+    db_path = Path(tmp) / "facts_keiba.db"
+    create_synthetic_db(str(db_path), n_predictors=30, n_races=200, n_predictions=3000)
+    return db_path
+
+
+def as_plain(facts: pd.DataFrame) -> pd.DataFrame:
+    """カテゴリのコードの違いを無視して比較できるようにする"""
+    return facts.astype({
+        name: object for name, dtype in facts.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)
+    })
+
+
+def is_memory_mapped(array: np.ndarray) -> bool:
+    """配列がファイルのメモリマップを参照しているか"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def test_search_matches_sql():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        conn = sqlite3.connect(db_path)
+        rebuild_prediction_facts(conn, Path(tmp) / "facts")
+        facts = load_prediction_facts(Path(tmp) / "facts")
+
+        conditions = [
+            {},
+            {'venue': '東京'},
+            {'track_type': '芝', 'distances': [1600, 2000]},
+            {'venue': '中山', 'grade': 'オープン'},
+            {'grade': 'G1'},
+            {'track_type': 'ダート', 'grade': '一般'},
+        ]
+        for condition in conditions:
+            for sort_by in ['hit_rate', 'roi']:
+                args = (condition.get('venue'), condition.get('track_type'), condition.get('distances'),
+                        condition.get('grade'), sort_by, 10000, 3)
+                expected = search_with_cube(conn, *args, use_cube=False)
+                actual = search_facts(facts, *args)
+
+                assert list(actual.columns) == list(expected.columns)
+                assert len(actual) == len(expected), condition
+                order_by = 'hit_rate' if sort_by == 'hit_rate' else 'avg_roi'
+                values = actual[order_by].fillna(-1).to_numpy()
+                assert np.all(np.diff(values) <= 0)
+
+                # 平均ROIは浮動小数の加算順で丸めの境界をまたぎうるため、末尾1桁の差まで許容する
+                pd.testing.assert_frame_equal(
+                    actual.sort_values('predictor_id').reset_index(drop=True),
+                    expected.sort_values('predictor_id').reset_index(drop=True),
+                    check_dtype=False, atol=0.011,
+                )
+        conn.close()
+
+
+def test_count_by_matches_sql():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        conn = sqlite3.connect(db_path)
+        rebuild_prediction_facts(conn, Path(tmp) / "facts")
+        facts = load_prediction_facts(Path(tmp) / "facts")
+
+        actual = count_by(facts, ['venue', 'track_type'])
+        expected = pd.read_sql_query("""
+            SELECT r.venue, r.track_type, COUNT(*) AS prediction_count,
+                   COUNT(DISTINCT p.predictor_id) AS predictor_count
+            FROM predictions p JOIN races r ON r.id = p.race_id
+            GROUP BY r.venue, r.track_type
+        """, conn)
+        merged = as_plain(actual).merge(expected, on=['venue', 'track_type'], suffixes=('', '_sql'))
+        assert len(merged) == len(expected) == len(actual)
+        assert (merged['prediction_count'] == merged['prediction_count_sql']).all()
+        assert (merged['predictor_count'] == merged['predictor_count_sql']).all()
+        conn.close()
+
+
+def test_refresh_matches_rebuild():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        conn = sqlite3.connect(db_path)
+        directory = Path(tmp) / "facts"
+        rebuild_prediction_facts(conn, directory)
+
+        # 結果の更新・レース詳細の取得・予想家名の変更・削除・追加
+        conn.execute("UPDATE predictions SET is_hit = 1, payout = 1230, roi = 1230.0 WHERE id % 97 = 0")
+        conn.execute("UPDATE races SET track_type = '芝', track_condition = '稍重' WHERE track_type = '不明'")
+        conn.execute("UPDATE predictors SET name = '改名した予想家' WHERE id = 3")
+        conn.execute("UPDATE predictors SET total_predictions = 99")
+        conn.execute("DELETE FROM predictions WHERE id % 101 = 0")
+        conn.execute("""
+            INSERT INTO predictions (predictor_id, race_id, netkeiba_prediction_id, predicted_at, bet_type, is_hit, payout)
+            SELECT predictor_id, race_id, netkeiba_prediction_id + 1000000, predicted_at, '3連単', 0, 0
+            FROM predictions WHERE id % 50 = 0
+        """)
+        conn.commit()
+        dirty = conn.execute("SELECT COUNT(*) FROM prediction_facts_dirty").fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        assert 0 < dirty < total
+
+        manifest, refreshed = refresh_prediction_facts(conn, directory)
+        assert 0 < refreshed < total
+        assert manifest['rows'] == total
+        assert conn.execute("SELECT COUNT(*) FROM prediction_facts_dirty").fetchone()[0] == 0
+        incremental = as_plain(load_prediction_facts(directory))
+
+        rebuild_prediction_facts(conn, Path(tmp) / "rebuilt")
+        rebuilt = as_plain(load_prediction_facts(Path(tmp) / "rebuilt"))
+        pd.testing.assert_frame_equal(incremental, rebuilt)
+        assert '改名した予想家' in set(incremental['predictor_name'])
+        assert '不明' not in set(incremental['track_type'])
+
+        # 変更がなければ読み直さない
+        assert refresh_prediction_facts(conn, directory)[1] == 0
+        conn.close()
+
+
+def test_open_reuses_snapshot_until_data_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        directory = Path(tmp) / "facts"
+
+        first = open_prediction_facts(db_path, directory)
+        again = open_prediction_facts(db_path, directory)
+        assert first.attrs['generation'] == again.attrs['generation']
+        assert is_memory_mapped(first['prediction_id'].to_numpy())
+        assert is_memory_mapped(first['venue'].cat.codes.to_numpy())
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE predictions SET is_hit = 1 WHERE id = 1")
+        conn.commit()
+        conn.close()
+        bump_data_version(db_path)
+
+        updated = open_prediction_facts(db_path, directory)
+        assert updated.attrs['generation'] != first.attrs['generation']
+        assert updated.loc[updated['prediction_id'] == 1, 'is_hit'].item() == 1
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("予想ファクトのスナップショットのテスト")
+    print("=" * 60)
+
+    tests = [
+        test_search_matches_sql,
+        test_count_by_matches_sql,
+        test_refresh_matches_rebuild,
+        test_open_reuses_snapshot_until_data_changes,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
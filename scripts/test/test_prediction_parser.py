@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+予想履歴パーサーのオフラインテスト（ネットワーク不要）
+
+- scripts/test/fixtures/goods_list_prof_284.jsonp
+    予想一覧API（api_get_goods_list_prof.html）のJSONPレスポンス
+- debug_prediction_list.html（リポジトリ直下）
+    JavaScript実行前のプロフィールページ（予想一覧はまだ含まれない）
+
+使い方:
+    python scripts/test/test_prediction_parser.py
+    pytest scripts/test/test_prediction_parser.py
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.config import settings
+from backend.scraper.prediction import PredictionScraper, decode_jsonp, GOODS_LIST_API_URL
+
+# テストで取得したレスポンスを保存庫（data/archive）に書き込まない
+settings.page_archive_dir = ""
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+GOODS_LIST_FIXTURE = FIXTURE_DIR / "goods_list_prof_284.jsonp"
+PROFILE_PAGE_FIXTURE = project_root / "debug_prediction_list.html"
+
+
+class FakeResponse:
+    """requests.Response の代わり"""
+
+    def __init__(self, text: str, status_code: int = 200, headers: dict = None):
+        self.content = text.encode("utf-8")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeRateLimiter:
+    """AdaptiveRateLimiter の代わり（待機せず、呼び出しを記録する）"""
+
+    def __init__(self):
+        self.calls = []
+
+    def acquire(self, url, stop_event=None):
+        self.calls.append(("acquire", url, None))
+        return 0.0
+
+    def observe(self, url, response=None, error=None, latency=None, blocked=False):
+        self.calls.append(("observe", url, error if error is not None else response))
+        return None
+
+    def success(self, url, latency=None):
+        self.calls.append(("success", url, latency))
+
+
+def make_scraper(response_text: str, status_code: int = 200, error: Exception = None):
+    """API呼び出しをフィクスチャで置き換えたスクレイパーを作成"""
+    scraper = PredictionScraper(rate_limiter=FakeRateLimiter())
+    calls = []
+
+    def fake_post(url, **kwargs):
+        calls.append((url, kwargs))
+        if error is not None:
+            raise error
+        return FakeResponse(response_text, status_code)
+
+    scraper.session.post = fake_post
+    return scraper, calls
+
+
+def test_decode_jsonp():
+    """JSONP・JSON・素のHTMLのいずれからもHTMLを取り出せること"""
+    assert decode_jsonp('cb("<div>\\u4e88\\u60f3</div>");') == "<div>予想</div>"
+    assert decode_jsonp('jQuery1120_1 ( "<p>a</p>" )') == "<p>a</p>"
+    assert decode_jsonp('"<p>a</p>"') == "<p>a</p>"
+    assert decode_jsonp("<p>a</p>") == "<p>a</p>"
+
+
+def test_parse_goods_list_fixture():
+    """APIレスポンスのフィクスチャから全項目を取り出せること"""
+    html = decode_jsonp(GOODS_LIST_FIXTURE.read_text(encoding="utf-8"))
+    predictions = PredictionScraper().parse_prediction_list(html, 284)
+
+    assert len(predictions) == 4
+
+    first = predictions[0]
+    assert first["prediction_id"] == 10234567
+    assert first["is_hit"] is True
+    assert first["venue"] == "東京"
+    assert first["race_num"] == "11R"
+    assert first["race_name"] == "ジャパンカップ(GI)"
+    assert first["grade"] == "G1"
+    assert first["race_date"] == datetime(2025, 11, 30)
+    assert first["favorite_horse"] == "カランダガン"
+    assert first["payout"] == 12300
+    assert first["balance"] == 9300
+    assert round(first["roi"], 1) == 410.0
+
+    assert [p["is_hit"] for p in predictions] == [True, False, True, False]
+    assert [p["grade"] for p in predictions] == ["G1", "G1", "G2", None]
+    assert predictions[1]["payout"] == 0
+    assert predictions[1]["balance"] == -3000
+    assert predictions[1]["roi"] is None
+
+
+def test_parse_respects_limit():
+    """limit 件までしか返さないこと"""
+    html = decode_jsonp(GOODS_LIST_FIXTURE.read_text(encoding="utf-8"))
+    predictions = PredictionScraper().parse_prediction_list(html, 284, limit=2)
+
+    assert [p["prediction_id"] for p in predictions] == [10234567, 10230001]
+
+
+def test_profile_page_calls_goods_list_api():
+    """プロフィールページは予想一覧を含まず、HTTP取得で呼ぶAPIから読み込んでいること"""
+    html = PROFILE_PAGE_FIXTURE.read_text(encoding="utf-8")
+
+    # JavaScript実行前のページには予想一覧がない（Seleniumが必要だった理由）
+    assert PredictionScraper().parse_prediction_list(html, 284) is None
+
+    api_path = GOODS_LIST_API_URL.replace("https://yoso.sp.netkeiba.com", "")
+    assert api_path in html
+    assert "ShowGoodsListProfile('goods_list_main', '', 284, 'all')" in html
+
+
+def test_http_path_does_not_start_browser():
+    """APIから取得できればChromeを起動しないこと"""
+    scraper, calls = make_scraper(GOODS_LIST_FIXTURE.read_text(encoding="utf-8"))
+
+    def fail_selenium(predictor_id, limit):
+        raise AssertionError("Selenium should not be used")
+
+    scraper._get_predictor_predictions_selenium = fail_selenium
+    predictions = scraper.get_predictor_predictions(284, limit=50)
+
+    assert len(predictions) == 4
+    assert scraper._driver_pool is None
+
+    url, kwargs = calls[0]
+    assert url == GOODS_LIST_API_URL
+    assert kwargs["data"]["yosoka_id"] == 284
+    assert kwargs["data"]["pid"] == "api_get_goods_list_prof"
+
+
+def test_falls_back_to_selenium():
+    """APIが予想一覧を返さない・エラーの場合はSeleniumで取得すること"""
+    profile_html = PROFILE_PAGE_FIXTURE.read_text(encoding="utf-8")
+
+    for response_text, status_code in [(profile_html, 200), ("", 500)]:
+        scraper, _ = make_scraper(response_text, status_code)
+        fallback_calls = []
+
+        def fake_selenium(predictor_id, limit):
+            fallback_calls.append(predictor_id)
+            return [{"prediction_id": 1}]
+
+        scraper._get_predictor_predictions_selenium = fake_selenium
+
+        assert scraper.get_predictor_predictions(284) == [{"prediction_id": 1}]
+        assert fallback_calls == [284]
+        assert scraper.get_predictor_predictions(284, use_selenium_fallback=False) == []
+
+
+def test_api_fetch_goes_through_rate_limiter():
+    """予想一覧APIへのリクエストの前に acquire し、結果（レスポンス・例外）を observe に渡すこと"""
+    scraper, calls = make_scraper(GOODS_LIST_FIXTURE.read_text(encoding="utf-8"))
+    page = scraper.fetch_prediction_list_page(284)
+
+    assert page is not None and page.html
+    limiter_calls = scraper.rate_limiter.calls
+    assert [(kind, url) for kind, url, _ in limiter_calls] == [
+        ("acquire", GOODS_LIST_API_URL), ("observe", GOODS_LIST_API_URL)
+    ]
+    assert limiter_calls[1][2].status_code == 200
+    assert len(calls) == 1
+
+    # 429 も observe に渡す（頻度を下げるのはレートリミッター側）
+    scraper, _ = make_scraper("", 429)
+    assert scraper.fetch_prediction_list_page(284) is None
+    assert scraper.rate_limiter.calls[-1][2].status_code == 429
+
+    error = requests.exceptions.Timeout("timed out")
+    scraper, _ = make_scraper("", error=error)
+    assert scraper.fetch_prediction_list_page(284) is None
+    assert [kind for kind, _, _ in scraper.rate_limiter.calls] == ["acquire", "observe"]
+    assert scraper.rate_limiter.calls[-1][2] is error
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("予想履歴パーサーのオフラインテスト")
+    print("=" * 60)
+
+    tests = [
+        test_decode_jsonp,
+        test_parse_goods_list_fixture,
+        test_parse_respects_limit,
+        test_profile_page_calls_goods_list_api,
+        test_http_path_does_not_start_browser,
+        test_falls_back_to_selenium,
+        test_api_fetch_goes_through_rate_limiter,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
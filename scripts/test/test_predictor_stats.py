@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+予想家統計テーブルの差分更新（backend/analysis/predictor_stats.py）のテスト
+
+合成DBで、統計行が予想の直接集計と一致すること、差分更新の結果が全件再構築と一致すること、
+テーブルがORM（PredictorStats）のスキーマのまま保たれることを確認する
+
+使い方:
+    python scripts/test/test_predictor_stats.py
+    pytest scripts/test/test_predictor_stats.py
+"""
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts" / "benchmark"))
+
+from backend.analysis.predictor_stats import (
+    DIRTY_TABLE, STATS_TABLE, rebuild_predictor_stats, refresh_predictor_stats,
+)
+from backend.models.database import PredictorStats
+from synthetic_db import create_synthetic_db
+
+
+def make_db(tmp: str) -> Path:
+    db_path = Path(tmp) / "stats_keiba.db"
+    create_synthetic_db(str(db_path), n_predictors=30, n_races=200, n_predictions=3000)
+    return db_path
+
+
+def stats_rows(conn: sqlite3.Connection) -> list:
+    """比較用の統計行（id・更新日時を除く）"""
+    return conn.execute(f"""
+        SELECT predictor_id, stat_type, condition, sample_size, hit_rate, roi, confidence_level
+        FROM {STATS_TABLE}
+        ORDER BY predictor_id, stat_type, condition
+    """).fetchall()
+
+
+def table_columns(conn: sqlite3.Connection) -> list:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({STATS_TABLE})")]
+
+
+def test_rebuild_matches_direct_query():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(make_db(tmp))
+        rebuild_predictor_stats(conn)
+
+        assert table_columns(conn) == [column.name for column in PredictorStats.__table__.columns]
+
+        expected = dict(
+            ((predictor_id, 'overall'), (n, hit_rate, roi))
+            for predictor_id, n, hit_rate, roi in conn.execute("""
+                SELECT predictor_id, COUNT(*), ROUND(SUM(is_hit = 1) * 100.0 / COUNT(*), 2), ROUND(AVG(roi), 2)
+                FROM predictions WHERE is_hit IS NOT NULL GROUP BY predictor_id
+            """)
+        )
+        expected.update(
+            ((predictor_id, 'grade_race'), (n, hit_rate, roi))
+            for predictor_id, n, hit_rate, roi in conn.execute("""
+                SELECT p.predictor_id, COUNT(*), ROUND(SUM(p.is_hit = 1) * 100.0 / COUNT(*), 2), ROUND(AVG(p.roi), 2)
+                FROM predictions p JOIN races r ON r.id = p.race_id
+                WHERE p.is_hit IS NOT NULL AND r.is_grade_race = 1 GROUP BY p.predictor_id
+            """)
+        )
+
+        rows = stats_rows(conn)
+        assert len(rows) == len(expected)
+        for predictor_id, stat_type, condition, n, hit_rate, roi, confidence in rows:
+            assert condition is None
+            expected_n, expected_hit_rate, expected_roi = expected[(predictor_id, stat_type)]
+            assert n == expected_n
+            assert abs(hit_rate - expected_hit_rate) < 0.011
+            assert roi == expected_roi or abs(roi - expected_roi) < 0.011
+            assert confidence == ('high' if n >= 100 else 'medium' if n >= 30 else 'low')
+        conn.close()
+
+
+def test_refresh_matches_rebuild():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(make_db(tmp))
+        assert refresh_predictor_stats(conn) > 0
+        conn.execute(f"""
+            INSERT INTO {STATS_TABLE} (predictor_id, stat_type, condition, sample_size, hit_rate, roi)
+            VALUES (1, 'venue', '東京', 10, 10.0, 80.0)
+        """)
+        conn.commit()
+
+        # 結果の更新・重賞判定の変更・削除・追加
+        conn.execute("UPDATE predictions SET is_hit = 1, payout = 1230, roi = 1230.0 WHERE id % 97 = 0")
+        conn.execute("UPDATE races SET is_grade_race = 1 - is_grade_race WHERE id % 41 = 0")
+        conn.execute("DELETE FROM predictions WHERE id % 101 = 0")
+        conn.execute("""
+            INSERT INTO predictions (predictor_id, race_id, netkeiba_prediction_id, predicted_at, bet_type, is_hit, payout)
+            SELECT predictor_id, race_id, netkeiba_prediction_id + 1000000, predicted_at, '3連単', 0, 0
+            FROM predictions WHERE id % 50 = 0
+        """)
+        conn.commit()
+        dirty = conn.execute(f"SELECT COUNT(*) FROM {DIRTY_TABLE}").fetchone()[0]
+        assert dirty > 0
+
+        assert refresh_predictor_stats(conn) == dirty
+        assert conn.execute(f"SELECT COUNT(*) FROM {DIRTY_TABLE}").fetchone()[0] == 0
+        incremental = stats_rows(conn)
+
+        # 管理外の stat_type の行は残す
+        assert ('venue', '東京') in {(row[1], row[2]) for row in incremental}
+
+        rebuild_predictor_stats(conn)
+        assert stats_rows(conn) == incremental
+
+        # 変更がなければ再集計しない
+        assert refresh_predictor_stats(conn) == 0
+        conn.close()
+
+
+def test_legacy_table_is_recreated_with_orm_schema():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(make_db(tmp))
+        # 旧 calculate_basic_stats() が作っていた独自スキーマ
+        conn.execute(f"DROP TABLE {STATS_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {STATS_TABLE} (
+                predictor_id INTEGER PRIMARY KEY, predictor_name TEXT, total_predictions INTEGER, hit_rate REAL
+            )
+        """)
+        conn.execute(f"INSERT INTO {STATS_TABLE} VALUES (1, 'old', 10, 50.0)")
+        conn.commit()
+
+        assert refresh_predictor_stats(conn) > 0
+        assert table_columns(conn) == [column.name for column in PredictorStats.__table__.columns]
+        indexes = {row[1] for row in conn.execute(f"PRAGMA index_list({STATS_TABLE})")}
+        assert {index.name for index in PredictorStats.__table__.indexes} <= indexes
+        assert conn.execute(f"SELECT COUNT(*) FROM {STATS_TABLE} WHERE stat_type = 'overall'").fetchone()[0] > 0
+        conn.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("予想家統計テーブルの差分更新のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_rebuild_matches_direct_query,
+        test_refresh_matches_rebuild,
+        test_legacy_table_is_recreated_with_orm_schema,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
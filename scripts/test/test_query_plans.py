@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+検索・統計SQLのクエリプラン回帰テスト
+
+合成DBにインデックスのマイグレーションを適用し、APIが受け付ける全ての
+条件の組み合わせ（直接集計・キューブの両方）と基本統計のクエリで
+EXPLAIN QUERY PLAN を実行する。テーブルの全件走査
+（"SCAN テーブル" またはカバリングでないインデックスの全走査）や、
+適切なインデックスがないときに作られる自動インデックスがあれば失敗
+
+使い方:
+    python scripts/test/test_query_plans.py
+    pytest scripts/test/test_query_plans.py
+"""
+import sys
+import sqlite3
+import tempfile
+import itertools
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts" / "benchmark"))
+sys.path.insert(0, str(project_root / "scripts" / "utils"))
+
+from backend.analysis.condition_cube import build_search_query, rebuild_condition_cube, GRADES
+from backend.analysis.calculate_basic_stats import BASIC_STATS_QUERY
+from migrate_search_indexes import migrate_search_indexes, REDUNDANT_INDEXES
+from synthetic_db import create_synthetic_db
+
+
+# APIが受け付ける条件の形（値そのものではなく、WHERE句の形が変わる組み合わせ）
+VENUE_OPTIONS = [None, "東京"]
+TRACK_TYPE_OPTIONS = [None, "芝", "ダート"]
+DISTANCE_OPTIONS = [None, [1600], [1600, 2000], [1200, 1600, 2000, 2400]]
+GRADE_OPTIONS = [None] + GRADES
+SORT_OPTIONS = ["hit_rate", "roi"]
+
+# マイグレーションで追加されるインデックス
+SEARCH_INDEXES = [
+    "ix_predictors_search",
+    "ix_races_venue", "ix_races_track_type", "ix_races_distance", "ix_races_grade",
+    "ix_predictions_predictor_hit", "ix_predictions_race_hit",
+]
+
+_tmp_dir = None
+_db_path = None
+
+
+def get_test_db() -> Path:
+    """合成DBを作成し、マイグレーションとキューブ構築を済ませる（初回のみ）"""
+    global _tmp_dir, _db_path
+
+    if _db_path is None:
+        _tmp_dir = tempfile.TemporaryDirectory()
+        _db_path = Path(_tmp_dir.name) / "plan_keiba.db"
+        create_synthetic_db(str(_db_path), n_predictors=300, n_races=3000, n_predictions=30000)
+
+        # 旧スキーマのインデックス構成に戻してからマイグレーションを適用する
+        conn = sqlite3.connect(_db_path)
+        for index_name in SEARCH_INDEXES:
+            conn.execute(f"DROP INDEX {index_name}")
+        conn.execute("CREATE INDEX ix_predictors_id ON predictors (id)")
+        conn.execute("CREATE INDEX ix_predictions_predictor_id ON predictions (predictor_id)")
+        conn.execute("CREATE INDEX ix_predictions_race_id ON predictions (race_id)")
+        migrate_search_indexes(conn)
+        rebuild_condition_cube(conn)
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.close()
+
+    return _db_path
+
+
+def explain(conn: sqlite3.Connection, query: str, params: list) -> list:
+    """EXPLAIN QUERY PLAN の各ステップの説明を返す"""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+def find_full_scans(plan: list) -> list:
+    """全件走査のステップを抽出（カバリングインデックスのみの走査は許可）"""
+    return [step for step in plan if step.startswith("SCAN ") and "USING COVERING INDEX" not in step]
+
+
+def find_automatic_indexes(plan: list) -> list:
+    """クエリ実行時に作られる自動インデックスのステップを抽出"""
+    return [step for step in plan if "AUTOMATIC" in step]
+
+
+def test_search_queries_avoid_full_scans():
+    """/api/search の全条件の組み合わせでテーブルの全件走査・自動インデックスがないこと"""
+    conn = sqlite3.connect(get_test_db())
+
+    failures = []
+    checked = 0
+    for venue, track_type, distances, grade, sort_by, use_cube in itertools.product(
+        VENUE_OPTIONS, TRACK_TYPE_OPTIONS, DISTANCE_OPTIONS, GRADE_OPTIONS, SORT_OPTIONS, [False, True]
+    ):
+        query, params = build_search_query(
+            conn, venue, track_type, distances, grade, sort_by, 50, 5, use_cube=use_cube
+        )
+        plan = explain(conn, query, params)
+        checked += 1
+
+        scans = find_full_scans(plan) + find_automatic_indexes(plan)
+        if scans:
+            failures.append((venue, track_type, distances, grade, sort_by, use_cube, scans))
+
+    conn.close()
+
+    for failure in failures:
+        print(f"❌ 全件走査・自動インデックス: venue={failure[0]}, track_type={failure[1]}, distances={failure[2]}, "
+              f"grade={failure[3]}, sort_by={failure[4]}, cube={failure[5]} → {failure[6]}")
+
+    assert checked == 2 * 3 * 4 * 6 * 2 * 2
+    assert not failures, f"{len(failures)}/{checked}件のクエリで全件走査・自動インデックス"
+
+
+def test_basic_stats_query_avoids_full_scans():
+    """基本統計（calculate_basic_stats）のクエリでテーブルの全件走査・自動インデックスがないこと"""
+    conn = sqlite3.connect(get_test_db())
+    plan = explain(conn, BASIC_STATS_QUERY, [])
+    conn.close()
+
+    scans = find_full_scans(plan) + find_automatic_indexes(plan)
+    assert not scans, f"基本統計クエリで全件走査・自動インデックス: {scans}"
+
+
+def test_predictions_use_covering_index():
+    """予想テーブルは本体を読まず、カバリングインデックスだけで集計されること"""
+    conn = sqlite3.connect(get_test_db())
+    query, params = build_search_query(conn, None, None, None, None, "hit_rate", 50, 5, use_cube=False)
+    plan = explain(conn, query, params) + explain(conn, BASIC_STATS_QUERY, [])
+    conn.close()
+
+    prediction_steps = [step for step in plan if step.split()[1] == "p"]
+    assert prediction_steps
+    assert all("COVERING INDEX" in step for step in prediction_steps), prediction_steps
+
+
+def test_migration_drops_redundant_indexes():
+    """マイグレーションで検索用インデックスが作られ、重複インデックスが残っていないこと"""
+    conn = sqlite3.connect(get_test_db())
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+
+    assert not indexes & set(REDUNDANT_INDEXES), indexes & set(REDUNDANT_INDEXES)
+    assert set(SEARCH_INDEXES) <= indexes
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("クエリプラン回帰テスト")
+    print("=" * 60)
+
+    tests = [
+        test_search_queries_avoid_full_scans,
+        test_basic_stats_query_avoids_full_scans,
+        test_predictions_use_covering_index,
+        test_migration_drops_redundant_indexes,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+レース詳細の書き込み後の条件別集計キューブの鮮度のテスト（ネットワーク不要）
+
+レース詳細の書き込み（races の venue / track_type / distance の更新）はトリガーで
+予想家を再集計待ちにするため、書き込んだ処理がキューブを再集計しないと
+/api/search は直接集計に戻ってしまう。次の書き込み経路の後に is_cube_fresh が
+True であることを確認する
+
+- RaceDetailScraperPandas._update_database（1レースずつの保存）
+- RaceDetailPipeline の保存スレッド（取得は保存済みのページで置き換える）
+- scripts/utils/reparse_race_pages.py の reparse（--update-db）
+
+使い方:
+    python scripts/test/test_race_detail_cube.py
+    pytest scripts/test/test_race_detail_cube.py
+"""
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts" / "benchmark"))
+
+from backend.analysis.condition_cube import CUBE_TABLE, is_cube_fresh, rebuild_condition_cube
+from backend.config import settings
+from backend.scraper.race_detail_pipeline import RaceDetailPipeline
+from backend.scraper.race_detail_scraper_with_db import RaceDetailScraperPandas
+from backend.scraper.race_html_extractor import parse_race_html
+from backend.scraper.rate_limiter import AdaptiveRateLimiter
+from scripts.utils.reparse_race_pages import iter_html_dir, reparse
+from synthetic_db import create_synthetic_db
+
+# テストで保存庫（data/archive）を作らない
+settings.page_archive_dir = ""
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+RACE_ID = "202505050211"
+RACE_PAGE_FIXTURE = FIXTURE_DIR / f"race_{RACE_ID}.html"
+
+
+class FixtureScraper(RaceDetailScraperPandas):
+    """ページの取得を保存済みのページで置き換え、JSONは書かないスクレイパー"""
+
+    def _fetch_html(self, race_id, session=None, rate_limiter=None) -> bytes:
+        return RACE_PAGE_FIXTURE.read_bytes()
+
+    def _save_json(self, race_id, race_data):
+        pass
+
+
+def make_db(tmp: str) -> Path:
+    """
+    合成DBの予想のあるレース1件を詳細未取得の RACE_ID にし、キューブを構築した状態にする
+    """
+    db_path = Path(tmp) / "cube_keiba.db"
+    create_synthetic_db(str(db_path), n_predictors=20, n_races=100, n_predictions=2000)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        UPDATE races SET race_id = ?, venue = '不明', track_type = '不明', distance = 0
+        WHERE id = (SELECT race_id FROM predictions ORDER BY id LIMIT 1)
+    """, (RACE_ID,))
+    conn.commit()
+    rebuild_condition_cube(conn)
+    assert is_cube_fresh(conn)
+    conn.close()
+    return db_path
+
+
+def assert_cube_updated(db_path: Path):
+    """キューブに再集計待ちがなく、更新したレースの条件が反映されている"""
+    conn = sqlite3.connect(db_path)
+    assert is_cube_fresh(conn), "condition cube left dirty after race detail update"
+
+    race = conn.execute("SELECT id, venue, track_type, distance FROM races WHERE race_id = ?", (RACE_ID,)).fetchone()
+    assert race[1:] == ("東京", "芝", 2500)
+    predictor_id = conn.execute("SELECT predictor_id FROM predictions WHERE race_id = ? LIMIT 1", (race[0],)).fetchone()[0]
+    assert conn.execute(f"""
+        SELECT COUNT(*) FROM {CUBE_TABLE}
+        WHERE predictor_id = ? AND venue = '東京' AND track_type = '芝' AND distance = 2500
+    """, (predictor_id,)).fetchone()[0] > 0
+    conn.close()
+
+
+def test_update_database_refreshes_cube():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        scraper = RaceDetailScraperPandas(str(db_path))
+        race_data = parse_race_html(RACE_ID, RACE_PAGE_FIXTURE.read_bytes())
+
+        assert scraper._update_database(RACE_ID, race_data)
+        assert_cube_updated(db_path)
+
+
+def test_pipeline_refreshes_cube():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        pipeline = RaceDetailPipeline(
+            str(db_path),
+            rate_limiter=AdaptiveRateLimiter(interval=0.01, min_interval=0.01, jitter=0.0),
+            fetch_workers=1,
+            scraper=FixtureScraper(str(db_path))
+        )
+
+        stats = pipeline.run([RACE_ID])
+        assert (stats.success, stats.failed) == (1, 0)
+        assert_cube_updated(db_path)
+
+
+def test_reparse_refreshes_cube():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        html_dir = Path(tmp) / "pages"
+        html_dir.mkdir()
+        shutil.copy(RACE_PAGE_FIXTURE, html_dir / RACE_PAGE_FIXTURE.name)
+
+        stats = reparse(iter_html_dir(html_dir), str(db_path), workers=1, update_db=True)
+        assert (stats.parsed, stats.updated) == (1, 1)
+        assert stats.cube_refreshed > 0
+        assert_cube_updated(db_path)
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("レース詳細の書き込み後のキューブの鮮度のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_update_database_refreshes_cube,
+        test_pipeline_refreshes_cube,
+        test_reparse_refreshes_cube,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+レース詳細の正規化テーブル（backend/scraper/race_detail_tables.py）のオフラインテスト
+
+保存済みのレース詳細ページ（fixtures/race_202505050211.html）を抽出して行に分解し、
+出走馬・払い戻し（複勝・ワイドの組み合わせの分割、馬単・3連単の着順）・コーナー通過順・
+ラップの行数と値を確認する。race.netkeiba.com 形式のJSONからも同じ行になることも確認する
+
+使い方:
+    python scripts/test/test_race_detail_tables.py
+    pytest scripts/test/test_race_detail_tables.py
+"""
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.config import settings
+from backend.scraper.race_detail_tables import (
+    ensure_race_detail_tables, race_detail_rows, write_race_details,
+)
+from backend.scraper.race_html_extractor import parse_race_html
+
+# テストで保存庫（data/archive）を作らない
+settings.page_archive_dir = ""
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+RACE_ID = "202505050211"
+RACE_PAGE_FIXTURE = FIXTURE_DIR / f"race_{RACE_ID}.html"
+RACE_DETAILS_JSON = project_root / f"race_{RACE_ID}_details.json"
+
+
+def fixture_rows():
+    return race_detail_rows(parse_race_html(RACE_ID, RACE_PAGE_FIXTURE.read_bytes()))
+
+
+def test_row_counts():
+    rows = fixture_rows()
+    assert {table: len(table_rows) for table, table_rows in rows.items()} == {
+        'race_entries': 18,
+        'race_payouts': 12,
+        'race_corner_passes': 4,
+        'race_laps': 13,
+    }
+
+
+def test_entry_rows():
+    entries = {row[0]: row for row in fixture_rows()['race_entries']}
+    assert sorted(entries) == list(range(1, 19))
+
+    # (馬番, 枠, 着順, 馬名, 性齢, 斤量, 騎手, タイム, 秒, 着差, 単勝, 人気, 馬体重, 増減, 所属, 調教師, ...)
+    winner = entries[13]
+    assert winner[:9] == (13, 7, 1, 'ミステリーウェイ', 'セ7', 56.0, '松本', '2:30.2', 150.2)
+    assert winner[9] is None  # 1着に着差はない
+    assert winner[10:16] == (27.7, 9, 500, -2, '西', '小林')
+
+    second = entries[18]
+    assert second[2] == 2 and second[9] == '1/2'
+    assert second[10:14] == (3.4, 1, 474, -8)
+
+
+def test_payout_rows():
+    payouts = fixture_rows()['race_payouts']
+    by_type = {}
+    for bet_type, combination, payout, popularity in payouts:
+        by_type.setdefault(bet_type, []).append((combination, payout, popularity))
+
+    assert by_type['単勝'] == [('13', 2770, 9)]
+    assert by_type['複勝'] == [('13', 550, 10), ('18', 180, 2), ('6', 200, 3)]
+    # "三連複" などの表記は "3連複" にそろえる
+    assert '三連複' not in by_type and '三連単' not in by_type
+
+    # 組み合わせは払戻金の数で等分し、着順を問わない馬券種は馬番順に並べる
+    assert by_type['馬連'] == [('13-18', 7050, 25)]
+    assert by_type['ワイド'] == [('13-18', 2260, 27), ('6-13', 2440, 32), ('6-18', 680, 3)]
+    assert by_type['3連複'] == [('6-13-18', 11560, 34)]
+
+    # 馬単・3連単は着順のまま
+    assert by_type['馬単'] == [('13-18', 16850, 62)]
+    assert by_type['3連単'] == [('13-18-6', 101470, 323)]
+
+
+def test_corner_and_lap_rows():
+    rows = fixture_rows()
+    assert [corner for corner, _ in rows['race_corner_passes']] == [1, 2, 3, 4]
+    assert rows['race_corner_passes'][3][1].startswith('13(10,11,14)')
+
+    laps = rows['race_laps']
+    assert [lap[0] for lap in laps] == list(range(1, 14))
+    assert laps[0] == (1, 7.7, 7.7)
+    assert laps[1] == (2, 11.3, 19.0)
+    # 最後の累積タイムは勝ち馬のタイム（2:30.2）と一致する
+    assert laps[-1] == (13, 11.6, 150.2)
+
+
+def test_details_json_gives_same_rows():
+    # race.netkeiba.com 形式（"2,770円"・"9人気"・"三連複"）のJSONからも同じ行になる
+    expected = fixture_rows()
+    rows = race_detail_rows(json.loads(RACE_DETAILS_JSON.read_text(encoding="utf-8")))
+    assert rows['race_payouts'] == expected['race_payouts']
+    assert rows['race_corner_passes'] == expected['race_corner_passes']
+    assert rows['race_laps'] == expected['race_laps']
+    assert len(rows['race_entries']) == len(expected['race_entries'])
+
+
+def test_write_race_details_replaces_rows():
+    conn = sqlite3.connect(":memory:")
+    ensure_race_detail_tables(conn)
+    race_data = parse_race_html(RACE_ID, RACE_PAGE_FIXTURE.read_bytes())
+    cursor = conn.cursor()
+
+    first = write_race_details(cursor, 1, race_data)
+    # 同じレースを書き直しても行は重複しない
+    second = write_race_details(cursor, 1, race_data)
+    conn.commit()
+
+    assert first == second == {table: len(rows) for table, rows in race_detail_rows(race_data).items()}
+    for table, count in second.items():
+        assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE race_id = 1").fetchone() == (count,), table
+    assert conn.execute(
+        "SELECT payout, popularity FROM race_payouts WHERE race_id = 1 AND bet_type = 'ワイド' AND combination = '6-18'"
+    ).fetchone() == (680, 3)
+    conn.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("レース詳細の正規化テーブルのオフラインテスト")
+    print("=" * 60)
+
+    tests = [
+        test_row_counts,
+        test_entry_rows,
+        test_payout_rows,
+        test_corner_and_lap_rows,
+        test_details_json_gives_same_rows,
+        test_write_race_details_replaces_rows,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+レース詳細ページのlxml抽出（race_html_extractor.py）のオフラインテスト（ネットワーク不要）
+
+- scripts/test/fixtures/race_202505050211.html
+    レース詳細ページ（db.netkeiba.com/race/202505050211）のレイアウトを、
+    リポジトリ直下の race_202505050211_details.json の値から再構成したもの（EUC-JP）
+
+1. lxmlの抽出と従来の抽出（pandas.read_html + BeautifulSoup）の race_data が一致する
+   （scraped_at を除く。取消・除外のある表、非表示の行、colspan/rowspan、表が足りないページなど）
+2. 抽出結果が race_202505050211_details.json と一致する（両者に共通する項目）
+
+使い方:
+    python scripts/test/test_race_html_extractor.py
+    pytest scripts/test/test_race_html_extractor.py
+"""
+import re
+import sys
+import json
+import warnings
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.config import settings
+from backend.scraper.race_detail_scraper_with_db import RaceDetailScraperPandas
+from backend.scraper.race_html_extractor import parse_race_html
+
+# テストで保存庫（data/archive）を作らない
+settings.page_archive_dir = ""
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+RACE_ID = "202505050211"
+RACE_PAGE_FIXTURE = FIXTURE_DIR / f"race_{RACE_ID}.html"
+RACE_DETAILS_JSON = project_root / f"race_{RACE_ID}_details.json"
+
+# 取消・除外の行（着順・単勝・人気・馬体重が数値でない）
+SCRATCHED_ROWS = """
+<tr><td>中</td><td>2</td><td>19</td><td><a href="/horse/1/">チュウシウマ</a></td><td>牡5</td><td>57</td>
+<td><a href="/jockey/1/">騎手</a></td><td></td><td></td><td>**</td><td>3-3-</td><td></td><td>45.1</td><td>12</td>
+<td>480(0)</td><td>[東] <a href="/trainer/1/">調教</a></td></tr>
+<tr><td>除</td><td>3</td><td>20</td><td><a href="/horse/2/">ジョガイウマ</a></td><td>牝4</td><td>55</td>
+<td><a href="/jockey/2/">騎手</a></td><td></td><td></td><td>**</td><td></td><td></td><td>---</td><td></td>
+<td>計不</td><td>[西] <a href="/trainer/2/">調教</a></td></tr>
+"""
+
+
+def load_fixture() -> str:
+    return RACE_PAGE_FIXTURE.read_bytes().decode("euc_jp")
+
+
+def encode(html: str) -> bytes:
+    return html.encode("euc_jp")
+
+
+def parse_both(content: bytes):
+    """(従来の抽出, lxmlの抽出)（scraped_at を除く）"""
+    scraper = RaceDetailScraperPandas()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        legacy = scraper._parse_race_html_pandas(RACE_ID, content)
+    extracted = parse_race_html(RACE_ID, content)
+    legacy.pop("scraped_at")
+    extracted.pop("scraped_at")
+    return legacy, extracted
+
+
+def assert_same(html: str):
+    legacy, extracted = parse_both(encode(html))
+    for key in legacy:
+        assert extracted[key] == legacy[key], f"{key}: {extracted[key]!r} != {legacy[key]!r}"
+    assert extracted == legacy
+    return extracted
+
+
+def test_fixture_matches_legacy():
+    race_data = assert_same(load_fixture())
+    assert race_data["race_info"]["horse_count"] == 18
+    assert len(race_data["payback"]) == 8
+    assert len(race_data["corner_pass"]) == 4
+
+
+def test_scratched_horses_match_legacy():
+    html = load_fixture().replace("</tr>\n</table>", "</tr>\n" + SCRATCHED_ROWS + "</table>", 1)
+    race_data = assert_same(html)
+    # 着順が「中」「除」の行は数値にできないため除く
+    assert race_data["race_info"]["horse_count"] == 18
+
+
+def test_hidden_rows_and_spans_match_legacy():
+    html = load_fixture()
+    # 非表示の行と <style> は読まない
+    html = html.replace(
+        '<th class="tan">単勝</th>',
+        '<th class="tan">単勝<style>.x {}</style></th>', 1
+    ).replace(
+        '<tr>\n<th class="waku">枠連</th>',
+        '<tr style="display: none"><th>WIN5</th><td>1</td><td>1</td><td>1</td></tr>\n<tr>\n<th class="waku">枠連</th>', 1
+    )
+    # colspan / rowspan は隣の列・下の行に複製される
+    html = html.replace("<th>馬場コメント</th>", '<th rowspan="2">馬場コメント</th>', 1)
+    html = html.replace("<th>4コーナー</th>\n<td>", '<th colspan="2">4コーナー</th>\n<td>', 1)
+    race_data = assert_same(html)
+    assert "WIN5" not in race_data["payback"]
+
+
+def test_data_intro_markup_matches_legacy():
+    html = load_fixture().replace(
+        "<h1>アルゼンチン共和国杯(GII)</h1>",
+        "<h1><!-- レース名 -->アルゼンチン共和国杯<script>var g = 2;</script>(GII)</h1>", 1
+    )
+    race_data = assert_same(html)
+    assert race_data["race_info"]["race_name"] == "アルゼンチン共和国杯"
+
+
+def test_missing_tables_match_legacy():
+    html = load_fixture()
+    lap_start = html.index('<table summary="ラップタイム"')
+    html = html[:lap_start] + html[html.index("</table>", lap_start) + len("</table>"):]
+    race_data = assert_same(html)
+    assert race_data["lap_times"] == {}
+
+    corner_start = html.index('<table summary="コーナー通過順位"')
+    html = html[:corner_start] + html[html.index("</table>", corner_start) + len("</table>"):]
+    race_data = assert_same(html)
+    assert race_data["corner_pass"] == {}
+
+
+def test_numeric_tables_match_legacy():
+    # 全ての列が数値の表（DataFrameでは行の値が float になる）、桁区切り、欠損
+    tables = """
+    <table><tr><th>着<br>順</th><th>馬名</th></tr><tr><td>1</td><td>A</td></tr></table>
+    <table><tr><td>1</td><td>1,230</td><td>2.5</td></tr><tr><td>2</td><td></td><td>NaN</td></tr></table>
+    <table><tr><td>3</td><td>True</td></tr><tr><td>4</td><td>false</td></tr></table>
+    <table><tr><td>x</td></tr></table>
+    <table><tr><td>1コーナー</td><td>1</td></tr><tr><td>2コーナー</td><td></td></tr></table>
+    <table><tr><td>ラップ</td><td>12.5</td></tr></table>
+    """
+    html = ('<html><head><meta http-equiv="Content-Type" content="text/html; charset=EUC-JP"></head>'
+            f'<body><div class="race_head data_intro"><dt>1 R</dt><h1>テスト</h1></div>{tables}</body></html>')
+    race_data = assert_same(html)
+    assert race_data["payback"]["1.0"] == {"result": "1230.0", "payout": "2.5", "popularity": ""}
+    assert race_data["lap_times"]["intervals"] == ["12.5"]
+
+
+def test_page_without_tables_raises():
+    content = encode('<html><body><div class="data_intro">11 R</div></body></html>')
+    for parse in (RaceDetailScraperPandas()._parse_race_html_pandas, parse_race_html):
+        try:
+            parse(RACE_ID, content)
+        except Exception:
+            continue
+        raise AssertionError(f"{parse.__name__} should raise on a page without tables")
+
+
+def digits(text: str):
+    return re.findall(r"\d+", text.replace(",", ""))
+
+
+def test_fixture_matches_details_json():
+    expected = json.loads(RACE_DETAILS_JSON.read_text(encoding="utf-8"))
+    race_data = parse_race_html(RACE_ID, RACE_PAGE_FIXTURE.read_bytes())
+
+    # グレード・重量条件・馬齢条件はレース詳細ページの表記（"(GII)"）から取れないため比較しない
+    info, expected_info = race_data["race_info"], expected["race_info"]
+    for key in ["race_name", "post_time", "track_type", "distance", "weather", "track_condition",
+                "kaisai_count", "venue", "day", "race_class", "horse_count"]:
+        assert info[key] == expected_info[key], f"race_info.{key}: {info[key]!r} != {expected_info[key]!r}"
+
+    locations = {"美浦": "東", "栗東": "西"}
+    assert len(race_data["race_results"]) == len(expected["race_results"])
+    for result, expected_result in zip(race_data["race_results"], expected["race_results"]):
+        for key in ["rank", "bracket", "horse_number", "horse_name", "sex_age", "jockey_weight", "jockey",
+                    "time", "margin", "odds", "popularity", "horse_weight", "weight_change"]:
+            assert result[key] == expected_result[key], f"{result['horse_number']}.{key}"
+        location, trainer = expected_result["trainer_name"].split(" ", 1)
+        assert (result["trainer_location"], result["trainer_name"]) == (locations[location], trainer)
+
+    # 払い戻しは表記が異なる（"2,770円" / "2770"、"三連複" / "3連複"）ため数字の並びで比較
+    payback = {bet_type.replace("三", "3"): value for bet_type, value in race_data["payback"].items()}
+    assert payback.keys() == expected["payback"].keys()
+    for bet_type, expected_value in expected["payback"].items():
+        for key in ["result", "payout", "popularity"]:
+            assert digits(payback[bet_type][key]) == digits(expected_value[key]), f"{bet_type}.{key}"
+
+    assert race_data["corner_pass"] == expected["corner_pass"]
+    assert race_data["lap_times"]["intervals"] == expected["lap_times"]["intervals"]
+    assert race_data["lap_times"]["cumulative"] == expected["lap_times"]["cumulative"]
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("レース詳細ページのlxml抽出のオフラインテスト")
+    print("=" * 60)
+
+    tests = [
+        test_fixture_matches_legacy,
+        test_scratched_horses_match_legacy,
+        test_hidden_rows_and_spans_match_legacy,
+        test_data_intro_markup_matches_legacy,
+        test_missing_tables_match_legacy,
+        test_numeric_tables_match_legacy,
+        test_page_without_tables_raises,
+        test_fixture_matches_details_json,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+temp形式race_idの一括解決（scripts/batch/race_id_resolver.py）のテスト（ネットワーク不要）
+
+予想詳細ページのHTMLからのrace_idの抽出、tempレースの統合キー、
+解決したrace_idの設定（レース行の統合・予想の付け替え・race_key の引き継ぎ）を確認する
+
+使い方:
+    python scripts/test/test_race_id_resolver.py
+    pytest scripts/test/test_race_id_resolver.py
+"""
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine
+
+from backend.models.database import Base
+from backend.scraper.bulk_ingest import ingest_batch
+from scripts.batch.race_id_resolver import (
+    assign_race_id, collect_temp_race_groups, extract_race_id, group_key,
+)
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+YOSO_DETAIL_FIXTURE = FIXTURE_DIR / "yoso_detail_sample.html"
+
+NHK_MILE_KEY = "2025-05-11|東京|11|NHKマイルC"
+CLASS_RACE_KEY = "2025-05-11|東京|12|4歳以上2勝クラス"
+
+
+def make_db() -> sqlite3.Connection:
+    """races / predictions の必要な列だけを持つDB"""
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE races (
+            id INTEGER PRIMARY KEY,
+            race_id TEXT UNIQUE,
+            race_name TEXT,
+            venue TEXT,
+            race_date DATETIME,
+            race_key TEXT UNIQUE
+        );
+        CREATE TABLE predictions (
+            id INTEGER PRIMARY KEY,
+            race_id INTEGER,
+            netkeiba_prediction_id INTEGER
+        );
+    """)
+    conn.executemany("INSERT INTO races VALUES (?, ?, ?, ?, ?, ?)", [
+        # 1 はレース番号が分からない古い予想のtempレース（race_key なし）
+        (1, "temp_aaaaaaaaaaaa", "NHKマイルC", "東京", "2025-05-11 15:40:00", None),
+        (2, "temp_bbbbbbbbbbbb", "NHKマイルC", "東京", "2025-05-11 00:00:00", NHK_MILE_KEY),
+        (3, "temp_cccccccccccc", "3歳未勝利", "東京", "2025-05-11 10:00:00", None),
+        (4, "temp_dddddddddddd", "3歳未勝利", "東京", "2025-05-11 10:00:00", None),
+        (5, "202505050212", "4歳以上2勝クラス", "東京", "2025-05-11 16:25:00", None),
+        (6, "temp_eeeeeeeeeeee", "4歳以上2勝クラス", "東京", "2025-05-11 00:00:00", CLASS_RACE_KEY),
+    ])
+    conn.executemany("INSERT INTO predictions VALUES (?, ?, ?)", [
+        (1, 1, 101), (2, 1, 102), (3, 2, 201),
+        (4, 3, 301), (5, 4, 401),
+        (6, 5, 501), (7, 6, 601),
+        (8, 2, None),
+    ])
+    conn.commit()
+    return conn
+
+
+def test_extract_race_id_from_fixture():
+    content = YOSO_DETAIL_FIXTURE.read_bytes()
+    # 関連レースのリンクではなく、最初のリンク（予想対象のレース）を使う
+    assert extract_race_id(content) == "202505050211"
+
+    assert extract_race_id(b"<html><body>no link</body></html>") is None
+    # 12桁でないrace_idは拾わない
+    assert extract_race_id(b'<a href="?pid=race_yoso_list&race_id=2025050502">') is None
+
+
+def test_group_key():
+    assert group_key((1, "NHKマイルC", "東京", "2025-05-11")) == ('name', "東京", "2025-05-11", "NHKマイルC")
+    # 条件戦は同じ日・同じ競馬場に同名のレースがあるので統合しない
+    assert group_key((3, "3歳未勝利", "東京", "2025-05-11")) == ('race', 3)
+    assert group_key((7, "2歳新馬", "東京", "2025-05-11")) == ('race', 7)
+    assert group_key((8, "4歳以上1勝クラス", "東京", "2025-05-11")) == ('race', 8)
+    # 名前・日付が分からなければ統合しない
+    assert group_key((9, None, "東京", "2025-05-11")) == ('race', 9)
+    assert group_key((10, "NHKマイルC", "東京", None)) == ('race', 10)
+
+
+def test_collect_groups_merges_same_race_only():
+    conn = make_db()
+    groups = {tuple(group.race_ids): group for group in collect_temp_race_groups(conn)}
+
+    assert set(groups) == {(1, 2), (3,), (4,), (6,)}
+    assert groups[(1, 2)].prediction_ids == [101, 102, 201]
+    assert groups[(3,)].key == ('race', 3)
+
+    limited = collect_temp_race_groups(conn, race_ids=[3, 6])
+    assert [group.race_ids for group in limited] == [[3], [6]]
+    conn.close()
+
+
+def test_assign_race_id_merges_group_into_first_race():
+    conn = make_db()
+    cursor = conn.cursor()
+
+    assert assign_race_id(cursor, [1, 2], "202505050211") == (1, 1)
+    conn.commit()
+
+    # race_key のない統合先は、削除したtempレースの race_key を引き継ぐ
+    assert conn.execute("SELECT race_id, race_key FROM races WHERE id = 1").fetchone() == ("202505050211", NHK_MILE_KEY)
+    assert conn.execute("SELECT COUNT(*) FROM races WHERE id = 2").fetchone() == (0,)
+    # 削除したtempレースの予想（予想IDのないものも含む）は統合先に付け替える
+    assert [row[0] for row in conn.execute("SELECT race_id FROM predictions WHERE id IN (1, 2, 3, 8)")] == [1, 1, 1, 1]
+    conn.close()
+
+
+def test_assign_race_id_merges_into_existing_race():
+    conn = make_db()
+    cursor = conn.cursor()
+
+    # 正しいrace_idのレース行が既にあれば、tempレースはそちらへ統合する
+    assert assign_race_id(cursor, [6], "202505050212") == (0, 1)
+    conn.commit()
+
+    assert conn.execute("SELECT COUNT(*) FROM races WHERE race_id LIKE 'temp_e%'").fetchone() == (0,)
+    assert conn.execute("SELECT race_id FROM predictions WHERE id = 7").fetchone() == (5,)
+    assert conn.execute("SELECT COUNT(*) FROM predictions WHERE race_id = 5").fetchone() == (2,)
+    # 他のtempレースには触れない
+    assert conn.execute("SELECT COUNT(*) FROM races WHERE race_id LIKE 'temp_%'").fetchone() == (4,)
+    # 既存のレース行が削除したtempレースの race_key を引き継ぐ
+    assert conn.execute("SELECT race_key FROM races WHERE id = 5").fetchone() == (CLASS_RACE_KEY,)
+    conn.close()
+
+
+def test_resolved_race_keeps_receiving_predictions():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "resolve_keiba.db"
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=engine)
+        engine.dispose()
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            INSERT INTO races (race_id, race_name, race_date, venue, distance, track_type, is_grade_race)
+            VALUES ('202505050211', 'NHKマイルC', '2025-05-11 15:40:00', '東京', 1600, '芝', 1)
+        """)
+        predictors = [{'netkeiba_id': 1001, 'name': '予想家A'}, {'netkeiba_id': 1002, 'name': '予想家B'}]
+
+        def prediction(prediction_id):
+            return {'prediction_id': prediction_id, 'race_name': 'NHKマイルC', 'race_date': datetime(2025, 5, 11),
+                    'race_num': '11R', 'venue': '東京', 'grade': 'G1', 'is_hit': False, 'payout': 0}
+
+        # 予想から作ったtempレースを、詳細取得済みのレース行へ統合する
+        ingest_batch(conn, predictors, {1001: [prediction(101)]})
+        temp_id = conn.execute("SELECT id FROM races WHERE race_id LIKE 'temp_%'").fetchone()[0]
+        assert assign_race_id(conn.cursor(), [temp_id], "202505050211") == (0, 1)
+        conn.commit()
+
+        # 同じレースの予想は統合先のレース行に入り、tempレースは作り直されない
+        stats = ingest_batch(conn, predictions_by_predictor={1002: [prediction(102)]})
+        assert stats.predictions_inserted == 1
+        assert conn.execute("SELECT COUNT(*) FROM races").fetchone() == (1,)
+        assert conn.execute("""
+            SELECT COUNT(*) FROM predictions p JOIN races r ON r.id = p.race_id WHERE r.race_id = '202505050211'
+        """).fetchone() == (2,)
+        conn.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("temp形式race_idの一括解決のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_extract_race_id_from_fixture,
+        test_group_key,
+        test_collect_groups_merges_same_race_only,
+        test_assign_race_id_merges_group_into_first_race,
+        test_assign_race_id_merges_into_existing_race,
+        test_resolved_race_keeps_receiving_predictions,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+レースの同一性（backend/scraper/race_identity.py）と
+そのマイグレーション（scripts/utils/migrate_race_identity.py）のテスト
+
+一時DBに予想ごとに作られた重複tempレースを入れ、同じ日付・競馬場・レース名の
+tempレースが統合されること、条件戦の名前のレース・レース結果を持つレース・
+解決済みのレースが複数あるグループは統合されないことを確認する
+
+使い方:
+    python scripts/test/test_race_identity.py
+    pytest scripts/test/test_race_identity.py
+"""
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.scraper.race_identity import parse_race_number, race_identity_key, temp_race_id
+from scripts.utils import migrate_race_identity
+from scripts.utils.migrate_race_identity import (
+    add_race_key_column, count_races, find_duplicate_races, merge_races,
+)
+
+
+# (races.id, race_id, race_name, venue, race_date, レース結果あり)
+RACES = [
+    # 同じ重賞のtempレース3件 → 最も古い 1 に統合
+    (1, "temp_000000000001", "ジャパンカップ(GI)", "東京", "2025-11-30 15:40:00", False),
+    (2, "temp_000000000002", "ジャパンカップ(GI) ", "東京", "2025-11-30 00:00:00", False),
+    (3, "temp_000000000003", "ジャパンカップ(GI)", "東京", "2025-11-30 15:40:00", False),
+    # 解決済みのレースがあればそちらに統合。レース結果を持つtempレースは統合しない
+    (4, "202505050211", "NHKマイルC", "東京", "2025-05-11 15:40:00", True),
+    (5, "temp_000000000005", "NHKマイルC", "東京", "2025-05-11 00:00:00", False),
+    (6, "temp_000000000006", "NHKマイルC", "東京", "2025-05-11 00:00:00", True),
+    # 条件戦は同じ日・同じ競馬場に同名のレースがありうるので統合しない
+    (7, "temp_000000000007", "2歳未勝利", "東京", "2025-11-30 10:00:00", False),
+    (8, "temp_000000000008", "2歳未勝利", "東京", "2025-11-30 10:00:00", False),
+    (9, "temp_000000000009", "3歳以上1勝クラス", "東京", "2025-11-30 12:00:00", False),
+    (10, "temp_000000000010", "3歳以上1勝クラス", "東京", "2025-11-30 12:00:00", False),
+    # 競馬場が不明なレースは統合しない
+    (11, "temp_000000000011", "ステイヤーズS", "不明", "2025-11-29 00:00:00", False),
+    (12, "temp_000000000012", "ステイヤーズS", "不明", "2025-11-29 00:00:00", False),
+    # 解決済みのレースが2件あるグループは別のレース
+    (13, "202506050111", "カペラS", "中山", "2025-12-14 15:25:00", False),
+    (14, "202506050112", "カペラS", "中山", "2025-12-14 15:25:00", False),
+    (15, "temp_000000000015", "カペラS", "中山", "2025-12-14 00:00:00", False),
+]
+
+
+def make_db(path) -> sqlite3.Connection:
+    """races / predictions / race_results の必要な列だけを持つDB（各レースに予想を2件）"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE races (
+            id INTEGER PRIMARY KEY,
+            race_id TEXT UNIQUE,
+            race_name TEXT,
+            venue TEXT,
+            race_date DATETIME
+        );
+        CREATE TABLE predictions (
+            id INTEGER PRIMARY KEY,
+            race_id INTEGER
+        );
+        CREATE TABLE race_results (
+            id INTEGER PRIMARY KEY,
+            race_id INTEGER
+        );
+    """)
+    conn.executemany("INSERT INTO races VALUES (?, ?, ?, ?, ?)", [race[:5] for race in RACES])
+    conn.executemany("INSERT INTO predictions (race_id) VALUES (?)", [(race[0],) for race in RACES * 2])
+    conn.executemany("INSERT INTO race_results (race_id) VALUES (?)", [(race[0],) for race in RACES if race[5]])
+    conn.commit()
+    return conn
+
+
+def prediction_counts(conn: sqlite3.Connection) -> dict:
+    """{races.id: 予想数}"""
+    return dict(conn.execute("SELECT race_id, COUNT(*) FROM predictions GROUP BY race_id"))
+
+
+def test_parse_race_number():
+    assert parse_race_number("11R") == 11
+    assert parse_race_number("１１Ｒ") == 11
+    assert parse_race_number(3) == 3
+    assert parse_race_number(" 1R ") == 1
+    assert parse_race_number(None) is None
+    assert parse_race_number("R") is None
+    assert parse_race_number("0R") is None
+    assert parse_race_number("13R") is None
+
+
+def test_race_identity_key():
+    race_date = datetime(2025, 11, 30, 15, 40)
+    key = race_identity_key(race_date, " 東京 ", "11R", "ジャパンカップ(GI) ")
+    assert key == "2025-11-30|東京|11|ジャパンカップ(GI)"
+    # 時刻・表記の揺れがあっても同じキーになる
+    assert race_identity_key(datetime(2025, 11, 30), "東京", "１１", "ジャパンカップ(GI)") == key
+
+    # いずれかが不明ならキーを作らない
+    assert race_identity_key(None, "東京", "11R", "ジャパンカップ(GI)") is None
+    assert race_identity_key(race_date, "不明", "11R", "ジャパンカップ(GI)") is None
+    assert race_identity_key(race_date, "東京", None, "ジャパンカップ(GI)") is None
+    assert race_identity_key(race_date, "東京", "11R", "") is None
+
+    race_id = temp_race_id(key)
+    assert race_id.startswith("temp_") and len(race_id) == len("temp_") + 12
+    assert race_id == temp_race_id(key)
+    assert race_id != temp_race_id("2025-11-30|東京|12|ジャパンカップ(GI)")
+
+
+def test_find_duplicate_races():
+    conn = make_db(":memory:")
+    merges = sorted(find_duplicate_races(conn))
+    assert merges == [(1, [2, 3]), (4, [5])]
+    conn.close()
+
+
+def test_merge_races_moves_predictions():
+    conn = make_db(":memory:")
+    moved, deleted = merge_races(conn, find_duplicate_races(conn))
+    conn.commit()
+
+    assert (moved, deleted) == (6, 3)
+    assert count_races(conn) == (len(RACES) - 3, len(RACES) - 3 - 3)
+
+    counts = prediction_counts(conn)
+    assert counts[1] == 6 and counts[4] == 4
+    assert not {2, 3, 5} & set(counts)
+    # 統合しないレースの予想はそのまま
+    for race_internal_id in [6, 7, 8, 9, 10, 11, 12, 13, 14, 15]:
+        assert counts[race_internal_id] == 2, race_internal_id
+    # 統合後に残るグループはない
+    assert find_duplicate_races(conn) == []
+    conn.close()
+
+
+def test_add_race_key_column():
+    conn = make_db(":memory:")
+    assert add_race_key_column(conn) is True
+    assert add_race_key_column(conn) is False
+
+    conn.execute("UPDATE races SET race_key = 'k' WHERE id = 1")
+    try:
+        conn.execute("UPDATE races SET race_key = 'k' WHERE id = 2")
+        assert False, "race_key must be unique"
+    except sqlite3.IntegrityError:
+        pass
+    conn.close()
+
+
+def test_main_migrates_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "keiba.db"
+        make_db(db_path).close()
+
+        with mock.patch.object(sys, "argv", ["migrate_race_identity.py", "--db", str(db_path), "--dry-run"]):
+            migrate_race_identity.main()
+        conn = sqlite3.connect(db_path)
+        assert count_races(conn)[0] == len(RACES)
+        conn.close()
+
+        with mock.patch.object(sys, "argv", ["migrate_race_identity.py", "--db", str(db_path)]):
+            migrate_race_identity.main()
+        conn = sqlite3.connect(db_path)
+        assert count_races(conn)[0] == len(RACES) - 3
+        assert "race_key" in {row[1] for row in conn.execute("PRAGMA table_info(races)")}
+        assert prediction_counts(conn)[1] == 6
+        conn.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("レースの同一性とマイグレーションのテスト")
+    print("=" * 60)
+
+    tests = [
+        test_parse_race_number,
+        test_race_identity_key,
+        test_find_duplicate_races,
+        test_merge_races_moves_predictions,
+        test_add_race_key_column,
+        test_main_migrates_database,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+リクエスト間隔の自動調整（backend/scraper/rate_limiter.AdaptiveRateLimiter）のテスト
+
+速く正常なレスポンスで間隔が縮み、429/5xx・ブロック・タイムアウトで広がること、
+同時に失敗したリクエストで何度も広げないこと、Retry-After で止まることを確認する
+
+使い方:
+    python scripts/test/test_rate_limiter.py
+    pytest scripts/test/test_rate_limiter.py
+"""
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import requests
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.scraper.rate_limiter import AdaptiveRateLimiter
+
+URL = "https://db.netkeiba.com/race/202505050211"
+
+
+def make_response(status_code: int, latency: float = 0.2, headers=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.elapsed = timedelta(seconds=latency)
+    response.headers.update(headers or {})
+    return response
+
+
+def make_limiter(**kwargs) -> AdaptiveRateLimiter:
+    options = dict(interval=4.0, min_interval=1.0, max_interval=16.0, increase=0.05, jitter=0.0)
+    options.update(kwargs)
+    return AdaptiveRateLimiter(**options)
+
+
+def test_fast_responses_shorten_interval_down_to_min():
+    limiter = make_limiter()
+    assert limiter.observe(URL, make_response(200)) is None
+    # 0.25回/秒 + 0.05回/秒 = 0.3回/秒
+    assert abs(limiter.current_interval(URL) - 1 / 0.3) < 1e-9
+
+    for _ in range(100):
+        limiter.observe(URL, make_response(200))
+    assert limiter.current_interval(URL) == 1.0
+    # トークンバケットにも反映される
+    assert limiter._buckets["db.netkeiba.com"].interval == 1.0
+
+
+def test_slow_and_not_found_responses_keep_interval():
+    limiter = make_limiter(slow_latency=2.0)
+    limiter.observe(URL, make_response(200, latency=5.0))
+    limiter.observe(URL, make_response(404))
+    assert limiter.current_interval(URL) == 4.0
+
+    metrics = limiter.metrics()["db.netkeiba.com"]
+    assert (metrics.requests, metrics.successes, metrics.slow) == (2, 1, 1)
+    assert metrics.backoff_count == 0
+
+
+def test_errors_lengthen_interval_once_per_interval():
+    limiter = make_limiter()
+    assert limiter.observe(URL, make_response(503)) == "5xx"
+    assert limiter.current_interval(URL) == 8.0
+
+    # 同時に送っていたリクエストの失敗では続けて広げない
+    assert limiter.observe(URL, error=requests.exceptions.ReadTimeout()) == "timeout"
+    assert limiter.observe(URL, make_response(403)) == "block"
+    assert limiter.current_interval(URL) == 8.0
+
+    metrics = limiter.metrics()["db.netkeiba.com"]
+    assert metrics.backoffs == {"5xx": 1, "timeout": 1, "block": 1}
+    assert metrics.rate_per_minute == 7.5
+    assert metrics.cooldown_remaining == 0.0
+
+
+def test_retry_after_pauses_host():
+    limiter = make_limiter()
+    limiter.observe(URL, make_response(429, headers={"Retry-After": "120"}))
+    metrics = limiter.metrics()["db.netkeiba.com"]
+    assert metrics.interval == 8.0
+    assert 119 < metrics.cooldown_remaining <= 120
+    assert metrics.backoffs == {"429": 1}
+
+    # 他のホストには影響しない
+    other = "https://yoso.netkeiba.com/?pid=yoso_detail&id=1"
+    assert limiter.acquire(other) == 0.0
+    assert limiter.current_interval(other) == 4.0
+
+
+def test_max_interval_rejection_triggers_cooldown():
+    limiter = make_limiter(interval=16.0, cooldown_seconds=300)
+    limiter.observe(URL, make_response(200, headers={}), blocked=True)
+    metrics = limiter.metrics()["db.netkeiba.com"]
+    assert metrics.interval == 16.0
+    assert 299 < metrics.cooldown_remaining <= 300
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("リクエスト間隔の自動調整のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_fast_responses_shorten_interval_down_to_min,
+        test_slow_and_not_found_responses_keep_interval,
+        test_errors_lengthen_interval_once_per_interval,
+        test_retry_after_pauses_host,
+        test_max_interval_rejection_triggers_cooldown,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+保存済みのレース詳細ページの再解析（scripts/utils/reparse_race_pages.py）のテスト（ネットワーク不要）
+
+保存庫・HTMLディレクトリから作るジョブがページの本文ではなくファイルのパスであること
+（読み込み・展開はワーカープロセスで行う）と、そのジョブをプロセスプールで解析できることを確認する
+
+使い方:
+    python scripts/test/test_reparse_race_pages.py
+    pytest scripts/test/test_reparse_race_pages.py
+"""
+import gzip
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.config import settings
+from backend.scraper.page_archive import PageArchive
+from scripts.utils.reparse_race_pages import RACE_URL_PREFIX, iter_archive, iter_html_dir, reparse
+
+# テストで保存庫（data/archive）を作らない
+settings.page_archive_dir = ""
+
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+RACE_ID = "202505050211"
+RACE_PAGE_FIXTURE = FIXTURE_DIR / f"race_{RACE_ID}.html"
+
+
+def test_archive_jobs_are_paths():
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PageArchive(str(Path(tmp) / "archive"))
+        content = RACE_PAGE_FIXTURE.read_bytes()
+        archive.put(RACE_URL_PREFIX + RACE_ID, b"<html>old</html>")
+        archive.put(RACE_URL_PREFIX + RACE_ID, content)
+        archive.put("https://example.com/other", b"<html>other</html>")
+
+        jobs = list(iter_archive(archive))
+        assert len(jobs) == 1
+        race_id, path = jobs[0]
+        assert race_id == RACE_ID
+        # 親プロセスは本文を読まず、ワーカーに渡すのは最新の本文のファイル
+        assert isinstance(path, str) and path.endswith(".gz")
+        assert gzip.decompress(Path(path).read_bytes()) == content
+
+        stats = reparse(iter(jobs), str(Path(tmp) / "unused.db"), workers=2)
+        assert (stats.pages, stats.parsed, stats.failed) == (1, 1, 0)
+        archive.close()
+
+
+def test_html_dir_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        html_dir = Path(tmp) / "pages"
+        html_dir.mkdir()
+        content = RACE_PAGE_FIXTURE.read_bytes()
+        (html_dir / f"race_{RACE_ID}.html").write_bytes(content)
+        (html_dir / "race_202505050212.html.gz").write_bytes(gzip.compress(content))
+        (html_dir / "race_202505050213.html").write_bytes(b"<html>broken</html>")
+
+        jobs = list(iter_html_dir(html_dir))
+        assert [race_id for race_id, _ in jobs] == ["202505050211", "202505050212", "202505050213"]
+
+        stats = reparse(iter(jobs), str(Path(tmp) / "unused.db"), workers=2)
+        assert (stats.pages, stats.parsed, stats.failed) == (3, 2, 1)
+        assert stats.failed_race_ids == ["202505050213"]
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("レース詳細ページの再解析のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_archive_jobs_are_paths,
+        test_html_dir_jobs,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSONファイルからのDB更新（scripts/utils/update_db_from_json.py）のテスト
+
+一時ディレクトリのレース詳細JSONを一時DBに反映し、
+- 反映した内容と race_json_loads の記録（同じレースの複数のJSONも全て記録する）
+- 2回目の実行で変わっていないファイルを読まないこと
+- 更新時刻だけ変わったファイルは解析せず記録だけ更新すること
+を確認する
+
+使い方:
+    python scripts/test/test_update_db_from_json.py
+    pytest scripts/test/test_update_db_from_json.py
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from scripts.utils.update_db_from_json import LOAD_STATE_TABLE, load_json_dir
+
+
+RACE_ID = "202505050211"
+RACE_DETAILS_JSON = project_root / f"race_{RACE_ID}_details.json"
+MISSING_RACE_ID = "202505050212"  # DBに登録していないレース
+
+
+def make_db(path: Path) -> sqlite3.Connection:
+    """races の必要な列だけを持つDB（詳細未取得のレースを1件）"""
+    conn = sqlite3.connect(path)
+    conn.executescript(f"""
+        CREATE TABLE races (
+            id INTEGER PRIMARY KEY,
+            race_id TEXT UNIQUE,
+            venue TEXT,
+            distance INTEGER,
+            track_type TEXT,
+            track_condition TEXT,
+            horse_count INTEGER
+        );
+        INSERT INTO races (id, race_id, venue, distance, track_type, horse_count)
+        VALUES (1, '{RACE_ID}', '不明', 0, '不明', 0);
+    """)
+    conn.commit()
+    return conn
+
+
+def write_json(path: Path, data: dict, mtime: int):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+
+
+def make_json_dir(json_dir: Path) -> dict:
+    """
+    同じレースのJSON 2件（古い方は払い戻しを減らしたもの）と、DBにないレースのJSON 1件
+
+    Returns:
+        {名前: パス}
+    """
+    json_dir.mkdir()
+    data = json.loads(RACE_DETAILS_JSON.read_text(encoding="utf-8"))
+
+    old = dict(data, payback={"単勝": data["payback"]["単勝"]})
+    missing = dict(data, race_id=MISSING_RACE_ID)
+
+    paths = {
+        "old": json_dir / f"race_{RACE_ID}_old.json",
+        "new": json_dir / f"race_{RACE_ID}.json",
+        "missing": json_dir / f"race_{MISSING_RACE_ID}.json",
+    }
+    write_json(paths["old"], old, 1_700_000_000_000_000_000)
+    write_json(paths["new"], data, 1_700_000_100_000_000_000)
+    write_json(paths["missing"], missing, 1_700_000_100_000_000_000)
+    return paths
+
+
+def load_state(conn: sqlite3.Connection) -> dict:
+    """{パス: (更新時刻, race_id)}"""
+    rows = conn.execute(f"SELECT path, mtime_ns, race_id FROM {LOAD_STATE_TABLE}")
+    return {path: (mtime_ns, race_id) for path, mtime_ns, race_id in rows}
+
+
+def test_load_records_every_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(Path(tmp) / "keiba.db")
+        paths = make_json_dir(Path(tmp) / "race_details")
+
+        stats = load_json_dir(conn, Path(tmp) / "race_details", verbose=False)
+        assert (stats.files, stats.loaded, stats.races_updated, stats.not_found, stats.errors) == (3, 1, 1, 1, 0)
+
+        race = conn.execute("SELECT venue, distance, track_type, horse_count FROM races WHERE id = 1").fetchone()
+        assert race == ("東京", 2500, "芝", 18)
+        # 同じレースのJSONは更新時刻が新しい方を反映する
+        assert conn.execute("SELECT COUNT(*) FROM race_payouts WHERE race_id = 1").fetchone() == (12,)
+        assert conn.execute("SELECT COUNT(*) FROM race_entries WHERE race_id = 1").fetchone() == (18,)
+
+        # 反映に使わなかった同じレースのJSONも記録し、DBにないレースのJSONは記録しない
+        state = load_state(conn)
+        assert set(state) == {str(paths["old"]), str(paths["new"])}
+        assert state[str(paths["old"])] == (1_700_000_000_000_000_000, RACE_ID)
+        conn.close()
+
+
+def test_rerun_skips_recorded_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(Path(tmp) / "keiba.db")
+        make_json_dir(Path(tmp) / "race_details")
+        load_json_dir(conn, Path(tmp) / "race_details", verbose=False)
+
+        # 1件目で書いた行を消しておき、読み直していないことを確かめる
+        conn.execute("DELETE FROM race_payouts")
+        conn.commit()
+
+        stats = load_json_dir(conn, Path(tmp) / "race_details", verbose=False)
+        # DBにないレースのJSONだけは、レースが登録されるまで毎回読む
+        assert (stats.files, stats.unchanged, stats.loaded, stats.not_found) == (3, 2, 0, 1)
+        assert conn.execute("SELECT COUNT(*) FROM race_payouts").fetchone() == (0,)
+
+        # --full なら記録を無視して読み直す
+        stats = load_json_dir(conn, Path(tmp) / "race_details", full=True, verbose=False)
+        assert (stats.unchanged, stats.loaded) == (0, 1)
+        assert conn.execute("SELECT COUNT(*) FROM race_payouts").fetchone() == (12,)
+        conn.close()
+
+
+def test_mtime_only_change_is_not_reapplied():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(Path(tmp) / "keiba.db")
+        paths = make_json_dir(Path(tmp) / "race_details")
+        load_json_dir(conn, Path(tmp) / "race_details", verbose=False)
+        conn.execute("DELETE FROM race_payouts")
+        conn.commit()
+
+        # 内容が同じまま更新時刻だけ変わった（古い方のJSONが新しい方より新しくなった）
+        touched = 1_700_000_200_000_000_000
+        os.utime(paths["old"], ns=(touched, touched))
+
+        stats = load_json_dir(conn, Path(tmp) / "race_details", verbose=False)
+        assert (stats.unchanged, stats.loaded, stats.errors) == (2, 0, 0)
+        assert conn.execute("SELECT COUNT(*) FROM race_payouts").fetchone() == (0,)
+        assert load_state(conn)[str(paths["old"])] == (touched, RACE_ID)
+
+        # 記録し直した更新時刻で、次回は内容も読まない
+        stats = load_json_dir(conn, Path(tmp) / "race_details", verbose=False)
+        assert (stats.unchanged, stats.loaded) == (2, 0)
+
+        # 内容が変われば反映する
+        data = json.loads(RACE_DETAILS_JSON.read_text(encoding="utf-8"))
+        write_json(paths["new"], dict(data, payback={"馬連": data["payback"]["馬連"]}), touched + 1)
+        stats = load_json_dir(conn, Path(tmp) / "race_details", verbose=False)
+        assert (stats.unchanged, stats.loaded) == (1, 1)
+        assert conn.execute("SELECT bet_type FROM race_payouts WHERE race_id = 1").fetchall() == [("馬連",)]
+        conn.close()
+
+
+def main():
+    """pytestなしで実行する場合"""
+    print("=" * 60)
+    print("JSONファイルからのDB更新のテスト")
+    print("=" * 60)
+
+    tests = [
+        test_load_records_every_file,
+        test_rerun_skips_recorded_files,
+        test_mtime_only_change_is_not_reapplied,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
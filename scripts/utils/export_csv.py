@@ -3,239 +3,361 @@
 """
 データをCSVファイルにエクスポート
 Excel等で開いて詳細に確認できる
+
+ORMオブジェクトを作らず、必要な列だけを batch_size 行ずつ取り出して（yield_per）
+チャンクごとに書き出すため、予想の件数が増えてもメモリ使用量は一定。
+出力形式は CSV・gzip圧縮CSV・Parquet（pyarrow が必要）から選べる。
+
+使い方:
+    python scripts/utils/export_csv.py                         # 全種類をCSVで出力
+    python scripts/utils/export_csv.py predictions --limit 0   # 予想を全件出力
+    python scripts/utils/export_csv.py --format gzip --since 2025-01-01  # 差分をgzipで出力
+    python scripts/utils/export_csv.py --format parquet
 """
-import sys
 import os
+import sys
 import csv
+import gzip
+import argparse
+from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
 
-project_root = os.path.dirname(os.path.abspath(__file__))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, case, func, select
+from sqlalchemy.engine import Engine
 
-from backend.database import SessionLocal
 from backend.models.database import Predictor, Prediction, Race
 
 
-def export_predictors():
-    """予想家データをCSV出力"""
-    db = SessionLocal()
-    
-    predictors = db.query(Predictor).filter(
-        Predictor.total_predictions > 0
-    ).order_by(Predictor.total_predictions.desc()).all()
-    
-    filename = f"exports/predictors_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    os.makedirs('exports', exist_ok=True)
-    
-    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            'ID', '名前', '総予想数', '重賞予想数', '信頼度'
-        ])
-        
-        for p in predictors:
-            writer.writerow([
-                p.netkeiba_id,
-                p.name,
-                p.total_predictions,
-                p.grade_race_predictions,
-                p.data_reliability
-            ])
-    
-    print(f"✅ 予想家データを出力: {filename}")
-    print(f"   {len(predictors)}人のデータ")
-    
-    db.close()
-    return filename
+FORMATS = {
+    'csv': '.csv',
+    'gzip': '.csv.gz',
+    'parquet': '.parquet',
+}
+
+# 1回に取り出す行数
+DEFAULT_BATCH_SIZE = 5000
+
+
+@dataclass
+class ExportColumn:
+    """出力する列（見出し・取得する式・CSVでの表示形式）"""
+    header: str
+    expr: object
+    format: Optional[Callable] = None
+
+
+def _date(value) -> str:
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def _hit(value) -> str:
+    if value is None:
+        return ''
+    return '○' if value else '×'
+
+
+def _rate(value) -> str:
+    return f"{value or 0:.1f}"
+
+
+def _blank(value):
+    return '' if value is None else value
+
+
+class CsvChunkWriter:
+    """CSV（gzip圧縮も可）にチャンクごとに書き出す"""
+
+    def __init__(self, path: Path, columns: Sequence[ExportColumn], compress: bool = False):
+        # Excelで文字化けしないようBOM付きUTF-8で出力する
+        if compress:
+            self._file = gzip.open(path, 'wt', encoding='utf-8-sig', newline='')
+        else:
+            self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._formats = [column.format for column in columns]
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column.header for column in columns])
+
+    def write(self, rows: Sequence[tuple]):
+        formats = self._formats
+        if any(formats):
+            rows = [
+                [fmt(value) if fmt else value for fmt, value in zip(formats, row)]
+                for row in rows
+            ]
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetChunkWriter:
+    """Parquetにチャンクごとに行グループとして書き出す（値は表示形式にせずそのまま）"""
+
+    def __init__(self, path: Path, columns: Sequence[ExportColumn]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([(column.header, _arrow_type(pa, column.expr)) for column in columns])
+        self._writer = pq.ParquetWriter(str(path), self._schema, compression='zstd')
+
+    def write(self, rows: Sequence[tuple]):
+        arrays = [
+            self._pa.array([row[i] for row in rows], type=field.type)
+            for i, field in enumerate(self._schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def _arrow_type(pa, expr):
+    """SQLAlchemyの列の型に対応するArrowの型"""
+    column_type = expr.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Numeric):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    return pa.string()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def open_writer(path: Path, columns: Sequence[ExportColumn], fmt: str):
+    if fmt == 'parquet':
+        return ParquetChunkWriter(path, columns)
+    return CsvChunkWriter(path, columns, compress=(fmt == 'gzip'))
+
 
+def stream_rows(engine: Engine, stmt, batch_size: int) -> Iterator[List[tuple]]:
+    """クエリの結果を batch_size 行ずつ返す（全件をメモリに載せない）"""
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for partition in result.partitions():
+            yield partition
 
-def export_predictions():
-    """予想データをCSV出力"""
-    db = SessionLocal()
-    
-    predictions = db.query(Prediction).join(
+
+def export_query(
+    engine: Engine,
+    name: str,
+    columns: Sequence[ExportColumn],
+    stmt,
+    fmt: str = 'csv',
+    out_dir: str = 'exports',
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> tuple:
+    """
+    クエリ（columns の式を select したもの）の結果をファイルに書き出す
+
+    Returns:
+        (ファイル名, 行数)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    path = Path(out_dir) / f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{FORMATS[fmt]}"
+
+    count = 0
+    writer = open_writer(path, columns, fmt)
+    try:
+        for rows in stream_rows(engine, stmt, batch_size):
+            writer.write(rows)
+            count += len(rows)
+    finally:
+        writer.close()
+    return str(path), count
+
+
+PREDICTION_COLUMNS = [
+    ExportColumn('予想家ID', Predictor.netkeiba_id),
+    ExportColumn('予想家名', Predictor.name),
+    ExportColumn('レース名', Race.race_name),
+    ExportColumn('開催日', Race.race_date, _date),
+    ExportColumn('競馬場', Race.venue),
+    ExportColumn('グレード', Race.grade, _blank),
+    ExportColumn('的中', Prediction.is_hit, _hit),
+    ExportColumn('払戻金', func.coalesce(Prediction.payout, 0)),
+]
+
+
+def select_columns(columns: Sequence[ExportColumn]):
+    return select(*[column.expr for column in columns])
+
+
+def _predictions_query(since: Optional[datetime]):
+    stmt = select_columns(PREDICTION_COLUMNS).select_from(Prediction).join(
         Predictor, Prediction.predictor_id == Predictor.id
     ).join(
         Race, Prediction.race_id == Race.id
-    ).order_by(Race.race_date.desc()).limit(1000).all()
-    
-    filename = f"exports/predictions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    os.makedirs('exports', exist_ok=True)
-    
-    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            '予想家ID', '予想家名', 'レース名', '開催日', '競馬場', 
-            'グレード', '的中', '払戻金'
-        ])
-        
-        for pred in predictions:
-            predictor = db.query(Predictor).filter(
-                Predictor.id == pred.predictor_id
-            ).first()
-            race = db.query(Race).filter(Race.id == pred.race_id).first()
-            
-            race_date = race.race_date.strftime('%Y-%m-%d') if race.race_date else ''
-            hit = '○' if pred.is_hit else ('×' if pred.is_hit == False else '')
-            
-            writer.writerow([
-                predictor.netkeiba_id,
-                predictor.name,
-                race.race_name,
-                race_date,
-                race.venue,
-                race.grade or '',
-                hit,
-                pred.payout or 0
-            ])
-    
+    ).order_by(Race.race_date.desc())
+    if since is not None:
+        stmt = stmt.where(Prediction.created_at >= since)
+    return stmt
+
+
+def export_predictors(engine: Engine, fmt: str = 'csv', since: Optional[datetime] = None, **kwargs):
+    """予想家データを出力（since: この日時以降に更新された予想家のみ）"""
+    columns = [
+        ExportColumn('ID', Predictor.netkeiba_id),
+        ExportColumn('名前', Predictor.name),
+        ExportColumn('総予想数', Predictor.total_predictions),
+        ExportColumn('重賞予想数', Predictor.grade_race_predictions),
+        ExportColumn('信頼度', Predictor.data_reliability),
+    ]
+    stmt = select_columns(columns).where(
+        Predictor.total_predictions > 0
+    ).order_by(Predictor.total_predictions.desc())
+    if since is not None:
+        stmt = stmt.where(Predictor.updated_at >= since)
+
+    filename, count = export_query(engine, 'predictors', columns, stmt, fmt, **kwargs)
+    print(f"✅ 予想家データを出力: {filename}")
+    print(f"   {count}人のデータ")
+    return filename
+
+
+def export_predictions(
+    engine: Engine,
+    fmt: str = 'csv',
+    since: Optional[datetime] = None,
+    limit: Optional[int] = 1000,
+    **kwargs
+):
+    """予想データを出力（開催日の新しい順に limit 件。since: この日時以降に登録された予想のみ）"""
+    stmt = _predictions_query(since)
+    if limit:
+        stmt = stmt.limit(limit)
+
+    filename, count = export_query(engine, 'predictions', PREDICTION_COLUMNS, stmt, fmt, **kwargs)
     print(f"✅ 予想データを出力: {filename}")
-    print(f"   {len(predictions)}件のデータ（最新1000件）")
-    
-    db.close()
+    print(f"   {count}件のデータ" + (f"（最新{limit}件）" if limit else ""))
     return filename
 
 
-def export_grade_races():
-    """重賞レースの予想のみをCSV出力"""
-    db = SessionLocal()
-    
-    predictions = db.query(Prediction).join(
-        Predictor, Prediction.predictor_id == Predictor.id
-    ).join(
-        Race, Prediction.race_id == Race.id
-    ).filter(
-        Race.grade != None
-    ).order_by(Race.race_date.desc()).all()
-    
-    filename = f"exports/grade_races_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    os.makedirs('exports', exist_ok=True)
-    
-    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            '予想家ID', '予想家名', 'レース名', '開催日', '競馬場', 
-            'グレード', '的中', '払戻金'
-        ])
-        
-        for pred in predictions:
-            predictor = db.query(Predictor).filter(
-                Predictor.id == pred.predictor_id
-            ).first()
-            race = db.query(Race).filter(Race.id == pred.race_id).first()
-            
-            race_date = race.race_date.strftime('%Y-%m-%d') if race.race_date else ''
-            hit = '○' if pred.is_hit else ('×' if pred.is_hit == False else '')
-            
-            writer.writerow([
-                predictor.netkeiba_id,
-                predictor.name,
-                race.race_name,
-                race_date,
-                race.venue,
-                race.grade,
-                hit,
-                pred.payout or 0
-            ])
-    
+def export_grade_races(engine: Engine, fmt: str = 'csv', since: Optional[datetime] = None, **kwargs):
+    """重賞レースの予想のみを出力（since: この日時以降に登録された予想のみ）"""
+    # 重賞の判定は予想家の重賞予想数（grade_race_predictions）と同じ is_grade_race
+    stmt = _predictions_query(since).where(Race.is_grade_race == True)
+
+    filename, count = export_query(engine, 'grade_races', PREDICTION_COLUMNS, stmt, fmt, **kwargs)
     print(f"✅ 重賞予想データを出力: {filename}")
-    print(f"   {len(predictions)}件のデータ")
-    
-    db.close()
+    print(f"   {count}件のデータ")
     return filename
 
 
-def export_summary():
-    """サマリー統計をCSV出力"""
-    db = SessionLocal()
-    
-    predictors = db.query(Predictor).filter(
+def export_summary(engine: Engine, fmt: str = 'csv', since: Optional[datetime] = None, **kwargs):
+    """
+    サマリー統計を出力
+
+    予想家ごとの集計は1回のGROUP BYで求める。
+    since を指定すると、その日時以降に予想が登録された予想家のみ（集計は全期間）
+    """
+    hits = func.sum(case((Prediction.is_hit == True, 1), else_=0))
+    grade_hits = func.sum(case(((Prediction.is_hit == True) & (Race.is_grade_race == True), 1), else_=0))
+    columns = [
+        ExportColumn('予想家ID', Predictor.netkeiba_id),
+        ExportColumn('予想家名', Predictor.name),
+        ExportColumn('総予想数', Predictor.total_predictions),
+        ExportColumn('的中数', hits),
+        ExportColumn('的中率%', (hits * 100.0 / func.nullif(Predictor.total_predictions, 0)).label('hit_rate'), _rate),
+        ExportColumn('重賞予想数', Predictor.grade_race_predictions),
+        ExportColumn('重賞的中数', grade_hits),
+        ExportColumn('重賞的中率%', (grade_hits * 100.0 / func.nullif(Predictor.grade_race_predictions, 0)).label('grade_hit_rate'), _rate),
+        ExportColumn('総払戻金', func.coalesce(func.sum(Prediction.payout), 0)),
+        ExportColumn('信頼度', Predictor.data_reliability),
+    ]
+    stmt = select_columns(columns).select_from(Predictor).outerjoin(
+        Prediction, Prediction.predictor_id == Predictor.id
+    ).outerjoin(
+        Race, Prediction.race_id == Race.id
+    ).where(
         Predictor.total_predictions > 0
-    ).all()
-    
-    filename = f"exports/summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    os.makedirs('exports', exist_ok=True)
-    
-    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            '予想家ID', '予想家名', '総予想数', '的中数', '的中率%', 
-            '重賞予想数', '重賞的中数', '重賞的中率%', '総払戻金', '信頼度'
-        ])
-        
-        for predictor in predictors:
-            # 的中数を計算
-            total_hits = db.query(Prediction).filter(
-                Prediction.predictor_id == predictor.id,
-                Prediction.is_hit == True
-            ).count()
-            
-            hit_rate = (total_hits / predictor.total_predictions * 100) if predictor.total_predictions > 0 else 0
-            
-            # 重賞的中数
-            grade_hits = db.query(Prediction).join(
-                Race, Prediction.race_id == Race.id
-            ).filter(
-                Prediction.predictor_id == predictor.id,
-                Race.grade != None,
-                Prediction.is_hit == True
-            ).count()
-            
-            grade_hit_rate = (grade_hits / predictor.grade_race_predictions * 100) if predictor.grade_race_predictions > 0 else 0
-            
-            # 総払戻金
-            total_payout = db.query(func.sum(Prediction.payout)).filter(
-                Prediction.predictor_id == predictor.id
-            ).scalar() or 0
-            
-            writer.writerow([
-                predictor.netkeiba_id,
-                predictor.name,
-                predictor.total_predictions,
-                total_hits,
-                f"{hit_rate:.1f}",
-                predictor.grade_race_predictions,
-                grade_hits,
-                f"{grade_hit_rate:.1f}",
-                total_payout,
-                predictor.data_reliability
-            ])
-    
+    ).group_by(Predictor.id).order_by(Predictor.id)
+    if since is not None:
+        stmt = stmt.where(Predictor.id.in_(
+            select(Prediction.predictor_id).where(Prediction.created_at >= since)
+        ))
+
+    filename, count = export_query(engine, 'summary', columns, stmt, fmt, **kwargs)
     print(f"✅ サマリー統計を出力: {filename}")
-    print(f"   {len(predictors)}人のデータ")
-    
-    db.close()
+    print(f"   {count}人のデータ")
     return filename
 
 
+EXPORTS = {
+    'predictors': ('予想家データ', export_predictors),
+    'predictions': ('予想データ', export_predictions),
+    'grade_races': ('重賞予想データ', export_grade_races),
+    'summary': ('サマリー統計', export_summary),
+}
+
+
+def parse_since(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付は YYYY-MM-DD または YYYY-MM-DDTHH:MM:SS で指定してください: {value}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description='データをCSV・gzip圧縮CSV・Parquetにエクスポート')
+    parser.add_argument('targets', nargs='*',
+                        help=f"出力するデータ（省略時は全種類: {', '.join(EXPORTS)}）")
+    parser.add_argument('--format', choices=list(FORMATS), default='csv', help='出力形式（デフォルト: csv）')
+    parser.add_argument('--since', type=parse_since, default=None,
+                        help='この日時以降に登録・更新されたデータのみ出力（差分エクスポート）')
+    parser.add_argument('--limit', type=int, default=1000, help='予想データの出力件数（開催日の新しい順、0で全件。デフォルト: 1000）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f'1回に取り出す行数（デフォルト: {DEFAULT_BATCH_SIZE}）')
+    parser.add_argument('--out-dir', default='exports', help='出力先ディレクトリ（デフォルト: exports）')
+    args = parser.parse_args()
+
+    unknown = [target for target in args.targets if target not in EXPORTS]
+    if unknown:
+        parser.error(f"不明なデータ: {', '.join(unknown)}（{', '.join(EXPORTS)} から選んでください）")
+    if args.format == 'parquet' and not parquet_available():
+        parser.error("--format parquet には pyarrow が必要です（pip install pyarrow）")
+
+    from backend.database import engine
+
     print("\n" + "=" * 80)
-    print(" データCSVエクスポート")
+    print(" データエクスポート")
     print("=" * 80)
-    
-    from sqlalchemy import func
-    
+    if args.since:
+        print(f"差分: {args.since} 以降")
+
     try:
-        print("\n1. 予想家データ...")
-        export_predictors()
-        
-        print("\n2. 予想データ（最新1000件）...")
-        export_predictions()
-        
-        print("\n3. 重賞予想データ...")
-        export_grade_races()
-        
-        print("\n4. サマリー統計...")
-        export_summary()
-        
+        for i, target in enumerate(args.targets or list(EXPORTS), 1):
+            label, export = EXPORTS[target]
+            print(f"\n{i}. {label}...")
+            options = dict(fmt=args.format, since=args.since, out_dir=args.out_dir, batch_size=args.batch_size)
+            if target == 'predictions':
+                options['limit'] = args.limit or None
+            export(engine, **options)
+
         print("\n" + "=" * 80)
         print(" エクスポート完了")
         print("=" * 80)
-        print("\nexports/ フォルダにCSVファイルが生成されました。")
-        print("Excelで開いて確認できます。")
+        print(f"\n{args.out_dir}/ フォルダにファイルが生成されました。")
+        if args.format != 'parquet':
+            print("Excelで開いて確認できます。")
         print()
-        
+
     except Exception as e:
         print(f"\nエラーが発生しました: {e}")
         import traceback
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+レースの同一性（races.race_key）のマイグレーション
+
+1. races に race_key 列と一意インデックス ix_races_race_key を追加
+2. 予想ごとに作られていた重複レース（temp形式のrace_id）を1つのレース行に統合
+
+既存のレース行にはレース番号が保存されていないため、統合は
+「日付・競馬場・レース名」が同じレースで行う。新馬・未勝利・N勝クラスなどの
+条件戦（同じ日・同じ競馬場で同名のレースがありうる）、競馬場が不明のレース、
+レース結果を持つtempレースは統合しない。
+
+統合先は、グループに解決済み（temp形式でない）のレースが1件あればそのレース、
+なければ最も古い（IDが最小の）tempレース。解決済みのレースが複数ある
+グループは別のレースとみなして統合しない。
+
+全体を1トランザクションで実行する。
+
+使い方:
+    python scripts/utils/migrate_race_identity.py --dry-run
+    python scripts/utils/migrate_race_identity.py --db data/keiba.db
+"""
+import sys
+import time
+import sqlite3
+import argparse
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.data_version import bump_data_version
+from backend.scraper.race_identity import GENERIC_RACE_NAME_PATTERN
+
+
+def add_race_key_column(conn: sqlite3.Connection) -> bool:
+    """race_key 列と一意インデックスを追加（追加した場合 True）"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(races)")}
+    added = 'race_key' not in columns
+    if added:
+        conn.execute("ALTER TABLE races ADD COLUMN race_key VARCHAR(200)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_races_race_key ON races (race_key)")
+    return added
+
+
+def find_duplicate_races(conn: sqlite3.Connection) -> List[Tuple[int, List[int]]]:
+    """
+    統合するレースのグループを取得
+
+    Returns:
+        [(統合先のraces.id, 統合して削除するraces.idのリスト), ...]
+    """
+    rows = conn.execute("""
+        SELECT r.id, r.race_id, date(r.race_date), r.venue, r.race_name,
+               EXISTS (SELECT 1 FROM race_results rr WHERE rr.race_id = r.id)
+        FROM races r
+        WHERE r.venue IS NOT NULL AND r.venue != '不明'
+        AND r.race_name IS NOT NULL AND r.race_date IS NOT NULL
+        ORDER BY r.id
+    """).fetchall()
+
+    groups: Dict[Tuple, List[Tuple]] = defaultdict(list)
+    for race_internal_id, race_id, race_day, venue, race_name, has_result in rows:
+        if GENERIC_RACE_NAME_PATTERN.search(race_name):
+            continue
+        groups[(race_day, venue, race_name.strip())].append((race_internal_id, race_id, has_result))
+
+    merges = []
+    for races in groups.values():
+        resolved = [race for race in races if not race[1].startswith('temp_')]
+        if len(resolved) > 1:
+            continue
+        target_id = resolved[0][0] if resolved else races[0][0]
+        to_merge = [
+            race_internal_id for race_internal_id, race_id, has_result in races
+            if race_internal_id != target_id and race_id.startswith('temp_') and not has_result
+        ]
+        if to_merge:
+            merges.append((target_id, to_merge))
+
+    return merges
+
+
+def merge_races(conn: sqlite3.Connection, merges: List[Tuple[int, List[int]]]) -> Tuple[int, int]:
+    """
+    予想を統合先のレースに付け替えて重複レースを削除
+
+    Returns:
+        (付け替えた予想数, 削除したレース数)
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _race_merge (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+    conn.execute("DELETE FROM _race_merge")
+    conn.executemany(
+        "INSERT INTO _race_merge (old_id, new_id) VALUES (?, ?)",
+        [(old_id, target_id) for target_id, old_ids in merges for old_id in old_ids]
+    )
+
+    moved = conn.execute("""
+        UPDATE predictions
+        SET race_id = m.new_id
+        FROM _race_merge m
+        WHERE predictions.race_id = m.old_id
+    """).rowcount
+    deleted = conn.execute("DELETE FROM races WHERE id IN (SELECT old_id FROM _race_merge)").rowcount
+
+    conn.execute("DROP TABLE _race_merge")
+    return moved, deleted
+
+
+def count_races(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """(レース数, tempレース数)"""
+    return conn.execute("""
+        SELECT COUNT(*), COUNT(CASE WHEN race_id LIKE 'temp_%' THEN 1 END) FROM races
+    """).fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='レースの同一性（race_key）のマイグレーション')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--dry-run', action='store_true', help='統合対象の件数だけ表示してDBを更新しない')
+
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("レースの同一性（race_key）のマイグレーション")
+    print("=" * 60)
+
+    start_time = time.time()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        total_before, temp_before = count_races(conn)
+        print(f"  移行前: レース {total_before:,}件（tempレース {temp_before:,}件）")
+
+        merges = find_duplicate_races(conn)
+        duplicate_count = sum(len(old_ids) for _, old_ids in merges)
+        print(f"  統合対象: {len(merges):,}レース / 重複レース行 {duplicate_count:,}件")
+
+        if args.dry_run:
+            print("-" * 60)
+            print("✅ ドライラン（DBは更新していません）")
+            return
+
+        if add_race_key_column(conn):
+            print("  ➕ races.race_key")
+        moved, deleted = merge_races(conn, merges)
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"❌ エラー: {e}")
+        sys.exit(1)
+    finally:
+        total_after, temp_after = count_races(conn)
+        conn.close()
+
+    bump_data_version(db_path)
+
+    print(f"  移行後: レース {total_after:,}件（tempレース {temp_after:,}件）")
+    print("-" * 60)
+    print(f"✅ 付け替えた予想: {moved:,}件 / 削除した重複レース: {deleted:,}件")
+    print(f"   処理時間: {time.time() - start_time:.2f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+検索・統計クエリ用インデックスのマイグレーション
+
+backend/models/database.py で定義したインデックスを既存DBに作成し、
+不要になったインデックスを削除してから ANALYZE で統計情報を更新する
+
+- 追加: ix_predictors_search / ix_races_venue, track_type, distance, grade /
+        ix_predictions_predictor_hit / ix_predictions_race_hit（カバリングインデックス）
+- 削除: 主キー（rowid）への重複インデックス、複合インデックスの先頭列と重複する単独インデックス
+        （ix_predictors_id はオプティマイザが非カバリングの走査を選ぶ原因にもなっていた）
+
+使い方:
+    python scripts/utils/migrate_search_indexes.py
+    python scripts/utils/migrate_search_indexes.py --db data/keiba.db
+"""
+import sys
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+from typing import Tuple
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.schema import CreateIndex
+
+from backend.models.database import Base
+
+
+# インデックスを揃える対象テーブル
+TARGET_TABLES = ["predictors", "races", "predictions"]
+
+# 削除するインデックス
+REDUNDANT_INDEXES = [
+    # INTEGER PRIMARY KEY は rowid そのものなので別インデックスは不要
+    "ix_predictors_id",
+    "ix_races_id",
+    "ix_predictions_id",
+    "ix_race_results_id",
+    "ix_predictor_stats_id",
+    # ix_predictions_predictor_hit / ix_predictions_race_hit が兼ねる
+    "ix_predictions_predictor_id",
+    "ix_predictions_race_id",
+]
+
+
+def migrate_search_indexes(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """
+    インデックスをモデル定義に合わせる
+
+    Returns:
+        (作成したインデックス数, 削除したインデックス数)
+    """
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing_tables = {row[0] for row in cursor.fetchall()}
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing_indexes = {row[0] for row in cursor.fetchall()}
+
+    created = 0
+    for table_name in TARGET_TABLES:
+        if table_name not in existing_tables:
+            continue
+
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+
+        for index in sorted(Base.metadata.tables[table_name].indexes, key=lambda i: i.name):
+            if index.name in existing_indexes:
+                continue
+            missing = [column.name for column in index.columns if column.name not in existing_columns]
+            if missing:
+                # 列の追加は別のマイグレーション（例: race_key は migrate_race_identity.py）
+                print(f"  ⏭️  {index.name}（列 {', '.join(missing)} がないためスキップ）")
+                continue
+            ddl = CreateIndex(index, if_not_exists=True).compile(dialect=sqlite_dialect.dialect())
+            cursor.execute(str(ddl))
+            print(f"  ➕ {index.name}")
+            created += 1
+
+    dropped = 0
+    for index_name in REDUNDANT_INDEXES:
+        if index_name in existing_indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+            print(f"  ➖ {index_name}")
+            dropped += 1
+
+    conn.commit()
+
+    # オプティマイザがインデックスを正しく選べるよう統計情報を更新
+    cursor.execute("ANALYZE")
+    conn.commit()
+
+    return created, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='検索・統計クエリ用インデックスのマイグレーション')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("検索・統計クエリ用インデックスのマイグレーション")
+    print("=" * 60)
+
+    start_time = time.time()
+
+    conn = sqlite3.connect(db_path)
+    created, dropped = migrate_search_indexes(conn)
+    conn.close()
+
+    print("-" * 60)
+    print(f"✅ 作成: {created}件 / 削除: {dropped}件 / ANALYZE 実行済み")
+    print(f"   処理時間: {time.time() - start_time:.2f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+保存済みのレース詳細ページを複数プロセスで解析し直す
+
+pandas.read_html + BeautifulSoup による解析（_extract_race_info / _extract_race_results /
+_extract_payback_info など）はCPU負荷が高く、スクレイピング中は2-3秒の待機に隠れていたが、
+保存済みのページから作り直すときは解析そのものが律速になる。
+ページの読み込み・解析をプロセスプールで全コアに振り分け、DB更新は親プロセスで
+--batch-size 件ごとに1トランザクションでまとめて行う。
+
+入力:
+- --html-dir : レース詳細ページのHTMLを置いたディレクトリ（ファイル名に12桁のrace_idを含む *.html / *.html.gz）
+- --archive  : スクレイパーの保存庫（page_archive.py）。レースごとに最新のページを使う
+
+使い方:
+    python scripts/utils/reparse_race_pages.py --html-dir saved_pages
+    python scripts/utils/reparse_race_pages.py --archive data/archive --update-db --save-json
+    python scripts/utils/reparse_race_pages.py --html-dir saved_pages --workers 4 --batch-size 2000
+"""
+import gzip
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from loguru import logger
+
+from backend.analysis.condition_cube import refresh_condition_cube
+from backend.config import settings
+from backend.data_version import bump_data_version
+from backend.scraper.page_archive import PageArchive
+from backend.scraper.race_detail_scraper_with_db import RaceDetailScraperPandas
+from backend.scraper.race_detail_tables import ensure_race_detail_tables
+
+
+RACE_ID_PATTERN = re.compile(r'(\d{12})')
+RACE_URL_PREFIX = RaceDetailScraperPandas.RACE_URL.format(race_id="")
+
+# (race_id, HTMLファイルのパス（.gz なら展開して読む）)
+# 本文は送らず、読み込み・展開もワーカープロセスで行う
+Job = Tuple[str, str]
+
+# ワーカープロセスごとのスクレイパー（_init_worker で作成）
+_scraper: Optional[RaceDetailScraperPandas] = None
+
+
+@dataclass
+class ReparseStats:
+    """解析し直した結果"""
+    pages: int = 0
+    parsed: int = 0
+    failed: int = 0
+    updated: int = 0
+    cube_refreshed: int = 0  # 条件別集計キューブを再集計した予想家数
+    elapsed: float = 0.0
+    failed_race_ids: List[str] = field(default_factory=list)
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+
+def iter_html_dir(html_dir: Path) -> Iterator[Job]:
+    """ディレクトリ内のレース詳細ページ（ファイル名のrace_id順）"""
+    paths = sorted(list(html_dir.glob("*.html")) + list(html_dir.glob("*.html.gz")))
+    for path in paths:
+        match = RACE_ID_PATTERN.search(path.name)
+        if match:
+            yield match.group(1), str(path)
+
+
+def iter_archive(archive: PageArchive) -> Iterator[Job]:
+    """保存庫のレース詳細ページ（レースごとに最新のもの。本文のファイルのパスを返す）"""
+    for url, path in archive.iter_latest_paths(RACE_URL_PREFIX):
+        match = RACE_ID_PATTERN.search(url)
+        if match:
+            yield match.group(1), str(path)
+
+
+def _init_worker():
+    """ワーカープロセスの初期化（解析のみ行うため保存庫は使わない）"""
+    global _scraper
+    settings.page_archive_dir = ""
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    _scraper = RaceDetailScraperPandas()
+
+
+def _parse_job(job: Job) -> Tuple[str, Optional[Dict], Optional[str]]:
+    """
+    1ページを解析（ワーカープロセスで実行）
+
+    Returns:
+        (race_id, レース詳細 または None, エラー内容)
+    """
+    race_id, path = job
+    try:
+        if path.endswith(".gz"):
+            content = gzip.decompress(Path(path).read_bytes())
+        else:
+            content = Path(path).read_bytes()
+
+        race_data = _scraper._parse_race_html(race_id, content)
+    except Exception as e:
+        return race_id, None, str(e)
+
+    if not race_data or not race_data.get('race_info'):
+        return race_id, None, "no race_info"
+    return race_id, race_data, None
+
+
+def reparse(
+    jobs: Iterator[Job],
+    db_path: str,
+    workers: int,
+    batch_size: int = 1000,
+    update_db: bool = False,
+    save_json: bool = False
+) -> ReparseStats:
+    """
+    ページをプロセスプールで解析し、結果をまとめてDBに書き込む
+
+    Args:
+        jobs: 解析するページ
+        db_path: データベースパス
+        workers: ワーカープロセス数
+        batch_size: この件数ごとにコミット
+        update_db: races テーブルを更新
+        save_json: data/race_details のJSONを書き直す
+    """
+    stats = ReparseStats()
+    writer = RaceDetailScraperPandas(db_path)
+    conn = sqlite3.connect(db_path) if update_db else None
+    if conn:
+        ensure_race_detail_tables(conn)
+    cursor = conn.cursor() if conn else None
+    pending = 0
+    start_time = time.time()
+
+    def commit():
+        nonlocal pending
+        if conn and pending:
+            conn.commit()
+        pending = 0
+        elapsed = time.time() - start_time
+        print(f"  {stats.pages:,}ページ / {elapsed:.1f}秒 ({stats.pages / max(elapsed, 1e-9):,.1f}ページ/秒)")
+
+    try:
+        with Pool(processes=workers, initializer=_init_worker) as pool:
+            for race_id, race_data, error in pool.imap_unordered(_parse_job, jobs, chunksize=16):
+                stats.pages += 1
+                if race_data is None:
+                    stats.failed += 1
+                    stats.failed_race_ids.append(race_id)
+                    logger.debug(f"Failed to parse race {race_id}: {error}")
+                else:
+                    stats.parsed += 1
+                    if save_json:
+                        writer._save_json(race_id, race_data)
+                    if cursor and writer._apply_race_update(cursor, race_id, race_data):
+                        stats.updated += 1
+
+                pending += 1
+                if pending >= batch_size:
+                    commit()
+        commit()
+
+        # レースの条件が変わった予想家のキューブは最後に1回だけ再集計する
+        if conn and stats.updated:
+            stats.cube_refreshed = refresh_condition_cube(conn)
+    finally:
+        if conn:
+            conn.close()
+
+    stats.elapsed = time.time() - start_time
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='保存済みのレース詳細ページを複数プロセスで解析し直す')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--html-dir', type=str, help='レース詳細ページのHTMLを置いたディレクトリ')
+    source.add_argument('--archive', type=str, help='スクレイパーの保存庫のディレクトリ')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='ワーカープロセス数（デフォルト: CPUコア数）')
+    parser.add_argument('--batch-size', type=int, default=1000, help='この件数ごとにコミット（デフォルト: 1000）')
+    parser.add_argument('--update-db', action='store_true', help='解析結果で races テーブルを更新')
+    parser.add_argument('--save-json', action='store_true', help='data/race_details のJSONを書き直す')
+
+    args = parser.parse_args()
+
+    if args.update_db and not Path(args.db).exists():
+        print(f"❌ エラー: {args.db} が見つかりません")
+        sys.exit(1)
+
+    # 解析し直すだけなので取得したページの保存庫には書き込まない
+    settings.page_archive_dir = ""
+
+    # 親プロセスも1件ごとのログは出さない
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    archive = None
+    if args.html_dir:
+        html_dir = Path(args.html_dir)
+        if not html_dir.is_dir():
+            print(f"❌ エラー: {html_dir} が見つかりません")
+            sys.exit(1)
+        jobs = iter_html_dir(html_dir)
+    else:
+        archive = PageArchive(args.archive)
+        jobs = iter_archive(archive)
+
+    print("=" * 60)
+    print(f"レース詳細ページの再解析（{args.workers}プロセス）")
+    print("=" * 60)
+
+    stats = reparse(jobs, args.db, args.workers, args.batch_size, args.update_db, args.save_json)
+
+    if archive:
+        archive.close()
+    if stats.updated:
+        bump_data_version(args.db)
+
+    print("-" * 60)
+    print(f"✅ 解析: {stats.parsed:,}ページ / 失敗: {stats.failed:,}ページ / DB更新: {stats.updated:,}件")
+    if stats.updated:
+        print(f"   条件別集計キューブ: {stats.cube_refreshed:,}人の予想家を再集計")
+    print(f"   処理時間: {stats.elapsed:.2f}秒 ({stats.pages_per_second:,.1f}ページ/秒)")
+    if stats.failed_race_ids:
+        failed = stats.failed_race_ids
+        print(f"❌ 失敗したrace_id: {failed[:10]}{'...' if len(failed) > 10 else ''}")
+
+
+if __name__ == "__main__":
+    main()
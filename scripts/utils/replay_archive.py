@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+保存庫のページを解析し直す（replay）
+
+スクレイパーが data/archive に保存したページを、ネットワークに接続せず・待機なしで
+現在のパーサーに通す。パーサーを直したあとに再スクレイピングせずにデータを作り直すためのもの。
+
+- race       : レース詳細ページ（db.netkeiba.com/race/<race_id>）→ JSON・races テーブル
+- prediction : 予想一覧API（api_get_goods_list_prof）→ predictions テーブル（未保存の予想のみ）
+
+--update-db を付けない場合は解析だけ行い、件数と速度を表示する。
+
+使い方:
+    python scripts/utils/replay_archive.py
+    python scripts/utils/replay_archive.py --kind race --update-db --save-json
+    python scripts/utils/replay_archive.py --archive data/archive --db data/keiba.db --limit 100
+"""
+import re
+import sys
+import time
+import sqlite3
+import argparse
+from itertools import islice
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from loguru import logger
+
+from backend.data_version import bump_data_version
+from backend.scraper.bulk_ingest import ingest_batch
+from backend.scraper.page_archive import PageArchive
+from backend.scraper.prediction import GOODS_LIST_API_URL, PredictionScraper
+from backend.scraper.race_detail_scraper_with_db import RaceDetailScraperPandas
+from backend.scraper.race_detail_tables import ensure_race_detail_tables
+
+
+RACE_URL_PREFIX = RaceDetailScraperPandas.RACE_URL.format(race_id="")
+RACE_ID_PATTERN = re.compile(r'/race/(\d{12})/?$')
+
+
+def replay_races(archive: PageArchive, db_path: str, update_db: bool, save_json: bool,
+                 limit: int = None, commit_every: int = 500):
+    """
+    保存済みのレース詳細ページを解析し直す
+
+    Returns:
+        (解析したページ数, 解析に失敗したページ数, 更新したレース数)
+    """
+    scraper = RaceDetailScraperPandas(db_path, archive=archive, replay=True)
+    conn = sqlite3.connect(db_path) if update_db else None
+    if conn:
+        ensure_race_detail_tables(conn)
+    cursor = conn.cursor() if conn else None
+
+    parsed = failed = updated = 0
+    try:
+        for url, content in islice(archive.iter_latest(RACE_URL_PREFIX), limit):
+            match = RACE_ID_PATTERN.search(url)
+            if not match:
+                continue
+            race_id = match.group(1)
+
+            try:
+                race_data = scraper._parse_race_html(race_id, content)
+            except Exception as e:
+                logger.warning(f"Error parsing race {race_id}: {e}")
+                race_data = None
+            if not race_data or not race_data.get('race_info'):
+                failed += 1
+                continue
+            parsed += 1
+
+            if save_json:
+                scraper._save_json(race_id, race_data)
+            if cursor and scraper._apply_race_update(cursor, race_id, race_data):
+                updated += 1
+                if updated % commit_every == 0:
+                    conn.commit()
+
+        if conn:
+            conn.commit()
+    finally:
+        if conn:
+            conn.close()
+
+    return parsed, failed, updated
+
+
+def replay_predictions(archive: PageArchive, db_path: str, update_db: bool,
+                       limit: int = None, chunk_predictors: int = 200):
+    """
+    保存済みの予想一覧APIのレスポンスを解析し直す
+
+    Returns:
+        (解析したページ数, 解析に失敗したページ数, 新たに保存した予想数)
+    """
+    scraper = PredictionScraper(archive=archive, replay=True)
+    conn = sqlite3.connect(db_path) if update_db else None
+
+    parsed = failed = inserted = 0
+    batch = {}
+
+    def flush():
+        nonlocal inserted
+        if conn and batch:
+            inserted += ingest_batch(conn, predictions_by_predictor=batch).predictions_inserted
+        batch.clear()
+
+    try:
+        for url, content in islice(archive.iter_latest(GOODS_LIST_API_URL + "?"), limit):
+            predictor_id = int(parse_qs(urlsplit(url).query)['yosoka_id'][0])
+            page = scraper._prediction_list_page(content, None)
+            predictions = scraper.parse_prediction_list(page.html, predictor_id)
+            if predictions is None:
+                failed += 1
+                continue
+            parsed += 1
+
+            batch[predictor_id] = predictions
+            if len(batch) >= chunk_predictors:
+                flush()
+        flush()
+    finally:
+        if conn:
+            conn.close()
+
+    return parsed, failed, inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='保存庫のページを解析し直す（replay）')
+    parser.add_argument('--archive', type=str, default='data/archive', help='保存庫のディレクトリ')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--kind', choices=['race', 'prediction', 'all'], default='all', help='解析し直すページの種類')
+    parser.add_argument('--update-db', action='store_true', help='解析結果でDBを更新')
+    parser.add_argument('--save-json', action='store_true', help='レース詳細のJSON（data/race_details）を書き直す')
+    parser.add_argument('--limit', type=int, default=None, help='種類ごとに解析するページ数の上限')
+
+    args = parser.parse_args()
+
+    archive_dir = Path(args.archive)
+    if not (archive_dir / "index.db").exists():
+        print(f"❌ エラー: {archive_dir} に保存庫がありません")
+        sys.exit(1)
+    if args.update_db and not Path(args.db).exists():
+        print(f"❌ エラー: {args.db} が見つかりません")
+        sys.exit(1)
+
+    # 1件ごとのINFOログは解析速度に影響するため抑える
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    print("=" * 60)
+    print("保存庫のページを解析し直す（replay）")
+    print("=" * 60)
+
+    archive = PageArchive(args.archive)
+    changed = False
+
+    if args.kind in ('race', 'all'):
+        start_time = time.time()
+        parsed, failed, updated = replay_races(archive, args.db, args.update_db, args.save_json, args.limit)
+        elapsed = time.time() - start_time
+        changed |= updated > 0
+        print(f"✅ レース詳細: {parsed:,}ページ（失敗 {failed:,}） / DB更新 {updated:,}件 / "
+              f"{elapsed:.2f}秒 ({(parsed + failed) / max(elapsed, 1e-9):,.1f}ページ/秒)")
+
+    if args.kind in ('prediction', 'all'):
+        start_time = time.time()
+        parsed, failed, inserted = replay_predictions(archive, args.db, args.update_db, args.limit)
+        elapsed = time.time() - start_time
+        changed |= inserted > 0
+        print(f"✅ 予想一覧: {parsed:,}ページ（失敗 {failed:,}） / 新たに保存した予想 {inserted:,}件 / "
+              f"{elapsed:.2f}秒 ({(parsed + failed) / max(elapsed, 1e-9):,.1f}ページ/秒)")
+
+    archive.close()
+    if changed:
+        bump_data_version(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,108 +5,18 @@ import sys
 import os
 
 # プロジェクトルートをsys.pathに追加
-project_root = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from backend.scraper.prediction import PredictionScraper
+from backend.scraper.main import save_predictions
 from backend.database import SessionLocal
-from backend.models.database import Predictor, Prediction, Race
+from backend.models.database import Predictor, Prediction
 from loguru import logger
-from datetime import datetime
 import time
 
 
-def save_predictions(predictor_id: int, predictions_data: list):
-    """予想情報をデータベースに保存"""
-    db = SessionLocal()
-    try:
-        saved_count = 0
-        
-        # 予想家を取得
-        predictor = db.query(Predictor).filter(
-            Predictor.netkeiba_id == predictor_id
-        ).first()
-        
-        if not predictor:
-            logger.error(f"Predictor {predictor_id} not found in database")
-            return 0
-        
-        for pred_data in predictions_data:
-            # レース名がない予想はスキップ
-            if not pred_data.get('race_name'):
-                logger.debug(f"Skipping prediction with no race_name")
-                continue
-            
-            # 既存の予想をチェック
-            if pred_data.get('prediction_id'):
-                existing = db.query(Prediction).filter(
-                    Prediction.netkeiba_prediction_id == pred_data['prediction_id']
-                ).first()
-                
-                if existing:
-                    logger.debug(f"Prediction {pred_data['prediction_id']} already exists")
-                    continue
-            
-            # レースを作成または取得
-            race = None
-            if pred_data.get('race_name'):
-                race = Race(
-                    race_id=f"temp_{predictor_id}_{pred_data.get('prediction_id', 0)}",
-                    race_name=pred_data['race_name'],
-                    race_date=pred_data.get('race_date', datetime.utcnow()),
-                    venue=pred_data.get('venue', '不明'),
-                    grade=pred_data.get('grade'),
-                    distance=0,
-                    track_type='不明',
-                    is_grade_race=pred_data.get('grade') in ['G1', 'G2', 'G3']
-                )
-                db.add(race)
-                db.flush()
-            
-            # 予想を作成
-            prediction = Prediction(
-                predictor_id=predictor.id,
-                race_id=race.id if race else None,
-                netkeiba_prediction_id=pred_data.get('prediction_id'),
-                predicted_at=pred_data.get('race_date', datetime.utcnow()),
-                is_hit=pred_data.get('is_hit'),
-                payout=pred_data.get('payout')
-            )
-            
-            db.add(prediction)
-            saved_count += 1
-        
-        # 予想家の統計を更新
-        predictor.total_predictions = db.query(Prediction).filter(
-            Prediction.predictor_id == predictor.id
-        ).count()
-        
-        predictor.grade_race_predictions = db.query(Prediction).join(Race).filter(
-            Prediction.predictor_id == predictor.id,
-            Race.is_grade_race == True
-        ).count()
-        
-        # 信頼度を更新
-        if predictor.grade_race_predictions >= 15:
-            predictor.data_reliability = "high"
-        elif predictor.grade_race_predictions >= 10:
-            predictor.data_reliability = "medium"
-        else:
-            predictor.data_reliability = "low"
-        
-        db.commit()
-        logger.info(f"Saved {saved_count} predictions for predictor {predictor_id}")
-        return saved_count
-        
-    except Exception as e:
-        logger.error(f"Error saving predictions for predictor {predictor_id}: {e}")
-        db.rollback()
-        return 0
-    finally:
-        db.close()
-
-
 def retry_failed_predictors():
     """失敗した予想家をリトライ"""
     
@@ -170,6 +80,9 @@ def retry_failed_predictors():
             logger.debug(f"Waiting 15 seconds before next predictor...")
             time.sleep(15)
     
+    # 使い回していたChromeを終了
+    scraper.close()
+    
     # 結果サマリー
     logger.info("\n" + "=" * 70)
     logger.info("Retry Results")
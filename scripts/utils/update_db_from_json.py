@@ -1,135 +1,413 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-JSONファイルからデータベースを更新するスクリプト
-既存のJSONファイル（989件）を読み込んでDBに反映
+JSONファイル（data/race_details）からデータベースを更新するスクリプト
+
+レース詳細のJSONを races と正規化テーブル（race_entries / race_payouts /
+race_corner_passes / race_laps）に反映する。
+
+- JSONの読み込み・解析・行への分解はプロセスプールで全コアに振り分ける
+  （orjson があれば使い、なければ標準の json）
+- 親プロセスは --batch-size 件ごとに一時テーブルへ executemany で入れ、
+  UPDATE ... FROM / INSERT ... SELECT の集合演算1回ずつで反映して1トランザクションでコミット
+- 読み込んだファイルの更新時刻・サイズ・SHA-1を race_json_loads テーブルに記録し、
+  次回は変わっていないファイルを読まない（更新時刻だけ変わって内容が同じファイルは解析しない）
+- races の列は従来どおり track_type が未取得（NULL / '不明'）のレースだけ更新する
+- DBにないレースのJSONは記録しないため、レースが登録されたあとの実行で反映される
+
+使い方:
+    python scripts/utils/update_db_from_json.py
+    python scripts/utils/update_db_from_json.py --json-dir data/race_details --db data/keiba.db
+    python scripts/utils/update_db_from_json.py --workers 4 --batch-size 5000
+    python scripts/utils/update_db_from_json.py --full   # 記録を無視して全ファイルを読み直す
 """
-import json
+import os
+import sys
+import time
+import hashlib
 import sqlite3
-from pathlib import Path
+import argparse
+from dataclasses import dataclass, field
 from datetime import datetime
+from itertools import islice
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+try:
+    import orjson
+
+    def _loads(content: bytes):
+        return orjson.loads(content)
+except ImportError:
+    import json
+
+    def _loads(content: bytes):
+        return json.loads(content)
+
+from backend.analysis.condition_cube import refresh_condition_cube
+from backend.data_version import bump_data_version
+from backend.scraper.race_detail_tables import (
+    RACE_DETAIL_TABLES, TABLE_COLUMNS, ensure_race_detail_tables, race_detail_rows
+)
+
+
+LOAD_STATE_TABLE = "race_json_loads"
+
+_LOAD_STATE_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {LOAD_STATE_TABLE} (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        sha1 TEXT NOT NULL,
+        race_id TEXT,
+        loaded_at TEXT NOT NULL
+    )
+"""
+
+# races に反映する列（_apply_race_update と同じ）
+RACE_COLUMNS = ("race_id", "venue", "distance", "track_type", "track_condition", "horse_count")
+
+
+class FileJob(NamedTuple):
+    """読み込むファイル（known_sha1 は前回読み込んだときのSHA-1）"""
+    path: str
+    mtime_ns: int
+    size: int
+    known_sha1: Optional[str]
+
 
-# 設定
-json_dir = Path("data/race_details")
-db_path = "data/keiba.db"
+class ParsedFile(NamedTuple):
+    """ワーカーの解析結果"""
+    job: FileJob
+    sha1: Optional[str]
+    race: Optional[Tuple]  # RACE_COLUMNS の値
+    rows: Optional[Dict[str, List[Tuple]]]  # race_detail_rows の結果
+    error: Optional[str]
 
-print("=" * 60)
-print("JSONファイルからDB更新")
-print("=" * 60)
 
-# JSONファイル一覧を取得
-json_files = list(json_dir.glob("race_*.json"))
-print(f"JSONファイル数: {len(json_files)}件")
+@dataclass
+class LoadStats:
+    """読み込みの結果"""
+    files: int = 0
+    unchanged: int = 0  # 更新時刻・サイズ、または内容が前回と同じ
+    loaded: int = 0
+    races_updated: int = 0  # races の列を更新したレース
+    not_found: int = 0  # DBにないレース
+    errors: int = 0
+    elapsed: float = 0.0
+    error_files: List[str] = field(default_factory=list)
 
-if not json_files:
-    print("JSONファイルが見つかりません")
-    exit(1)
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
 
-# データベース接続
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
 
-# 統計
-success_count = 0
-skip_count = 0
-error_count = 0
-not_found_count = 0
+def ensure_load_state_table(conn: sqlite3.Connection):
+    conn.execute(_LOAD_STATE_SCHEMA)
 
-print(f"\n処理開始...")
-print("-" * 60)
 
-for i, json_file in enumerate(json_files, 1):
+def load_known_files(conn: sqlite3.Connection) -> Dict[str, Tuple[int, int, str]]:
+    """{パス: (更新時刻, サイズ, SHA-1)}"""
+    rows = conn.execute(f"SELECT path, mtime_ns, size, sha1 FROM {LOAD_STATE_TABLE}")
+    return {path: (mtime_ns, size, sha1) for path, mtime_ns, size, sha1 in rows}
+
+
+def scan_json_dir(json_dir: Path, known: Dict[str, Tuple[int, int, str]], stats: LoadStats) -> Iterator[FileJob]:
+    """
+    読み込みが必要なファイル
+
+    更新時刻とサイズが記録と同じファイルは stats.unchanged に数えて返さない。
+    """
+    with os.scandir(json_dir) as entries:
+        for entry in entries:
+            if not (entry.name.startswith("race_") and entry.name.endswith(".json")):
+                continue
+            stat = entry.stat()
+            stats.files += 1
+            previous = known.get(entry.path)
+            if previous and previous[0] == stat.st_mtime_ns and previous[1] == stat.st_size:
+                stats.unchanged += 1
+                continue
+            yield FileJob(entry.path, stat.st_mtime_ns, stat.st_size, previous[2] if previous else None)
+
+
+def parse_file(job: FileJob) -> ParsedFile:
+    """JSONを1件読み込んで行に分解（ワーカープロセスで実行）"""
     try:
-        # JSONファイルを読み込み
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
+        content = Path(job.path).read_bytes()
+    except OSError as e:
+        return ParsedFile(job, None, None, None, str(e))
+
+    sha1 = hashlib.sha1(content).hexdigest()
+    if sha1 == job.known_sha1:
+        return ParsedFile(job, sha1, None, None, None)
+
+    try:
+        data = _loads(content)
         race_id = data.get('race_id')
-        race_info = data.get('race_info', {})
-        
+        race_info = data.get('race_info') or {}
         if not race_id or not race_info:
-            error_count += 1
-            print(f"[{i}/{len(json_files)}] ❌ エラー: {json_file.name} - race_id or race_info not found")
-            continue
-        
-        # DBにrace_idが存在するか確認
-        cursor.execute("SELECT id, track_type FROM races WHERE race_id = ?", (race_id,))
-        result = cursor.fetchone()
-        
-        if not result:
-            not_found_count += 1
-            if not_found_count <= 5:  # 最初の5件だけ表示
-                print(f"[{i}/{len(json_files)}] ⚠️  スキップ: {race_id} - DBに存在しません")
-            continue
-        
-        db_id, current_track_type = result
-        
-        # すでに更新済みか確認
-        if current_track_type and current_track_type != '不明':
-            skip_count += 1
-            continue
-        
-        # DB更新
-        cursor.execute("""
-            UPDATE races
-            SET 
-                venue = ?,
-                distance = ?,
-                track_type = ?,
-                track_condition = ?,
-                horse_count = ?
-            WHERE race_id = ?
-        """, (
+            return ParsedFile(job, sha1, None, None, "race_id or race_info not found")
+        race = (
+            str(race_id),
             race_info.get('venue', '不明'),
             race_info.get('distance', 0),
             race_info.get('track_type', '不明'),
             race_info.get('track_condition'),
             race_info.get('horse_count', 0),
-            race_id
-        ))
-        
-        if cursor.rowcount > 0:
-            success_count += 1
-            if success_count <= 10 or success_count % 100 == 0:  # 最初の10件と100件ごと
-                print(f"[{i}/{len(json_files)}] ✅ 更新: {race_id} - {race_info.get('track_type')} {race_info.get('distance')}m")
-        
-        # 100件ごとにコミット
-        if i % 100 == 0:
-            conn.commit()
-            print(f"  → {i}件処理済み（成功: {success_count}, スキップ: {skip_count}, エラー: {error_count}, 未登録: {not_found_count}）")
-    
+        )
+        return ParsedFile(job, sha1, race, race_detail_rows(data), None)
     except Exception as e:
-        error_count += 1
-        print(f"[{i}/{len(json_files)}] ❌ エラー: {json_file.name} - {e}")
-        continue
-
-# 最終コミット
-conn.commit()
-
-print("-" * 60)
-print(f"\n処理完了")
-print("=" * 60)
-print(f"処理件数: {len(json_files)}件")
-print(f"成功: {success_count}件")
-print(f"スキップ（既に更新済み）: {skip_count}件")
-print(f"エラー: {error_count}件")
-print(f"DBに未登録: {not_found_count}件")
-print("=" * 60)
-
-# 更新後の統計を確認
-cursor.execute("SELECT COUNT(*) FROM races WHERE track_type IS NOT NULL AND track_type != '不明'")
-completed = cursor.fetchone()[0]
-
-cursor.execute("SELECT COUNT(*) FROM races")
-total = cursor.fetchone()[0]
-
-print(f"\n【更新後の状態】")
-print(f"総レース数: {total}件")
-print(f"詳細取得済み: {completed}件 ({completed/total*100:.1f}%)")
-print(f"詳細未取得: {total - completed}件 ({(total - completed)/total*100:.1f}%)")
-
-conn.close()
-
-print("\n" + "=" * 60)
-print("完了")
-print("=" * 60)
+        return ParsedFile(job, sha1, None, None, f"{type(e).__name__}: {e}")
+
+
+def _create_staging_tables(conn: sqlite3.Connection):
+    """一時テーブル（race_id はnetkeibaのレースID、race_pk は races.id）"""
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS _load_races (
+            race_id TEXT PRIMARY KEY, venue TEXT, distance INTEGER, track_type TEXT,
+            track_condition TEXT, horse_count INTEGER, race_pk INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS _load_files (
+            path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha1 TEXT, race_id TEXT
+        )
+    """)
+    for table_name in RACE_DETAIL_TABLES:
+        columns = ", ".join(TABLE_COLUMNS[table_name])
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS _load_{table_name} ({columns})")
+
+
+def apply_batch(conn: sqlite3.Connection, parsed: List[ParsedFile], loaded_at: str) -> Tuple[int, int, int]:
+    """
+    解析済みのファイルを一時テーブル経由でまとめて反映（コミットは呼び出し側で行う）
+
+    同じレースのJSONが複数ある場合は更新時刻が新しいファイルを使う。使わなかったファイルも
+    race_json_loads に記録し、次回は読まない（記録しないと毎回読み直して反映し直してしまう）。
+
+    Returns:
+        (反映したレース数, races の列を更新したレース数, DBにないレース数)
+    """
+    by_race: Dict[str, ParsedFile] = {}
+    for item in sorted(parsed, key=lambda item: (item.job.mtime_ns, item.job.path)):
+        by_race[item.race[0]] = item
+
+    _create_staging_tables(conn)
+    conn.executemany(
+        "INSERT INTO _load_races VALUES (?, ?, ?, ?, ?, ?, NULL)",
+        [item.race for item in by_race.values()]
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO _load_files VALUES (?, ?, ?, ?, ?)",
+        [(item.job.path, item.job.mtime_ns, item.job.size, item.sha1, item.race[0]) for item in parsed]
+    )
+    for table_name in RACE_DETAIL_TABLES:
+        placeholders = ", ".join("?" * len(TABLE_COLUMNS[table_name]))
+        conn.executemany(
+            f"INSERT INTO _load_{table_name} VALUES ({placeholders})",
+            [(race_id, *row) for race_id, item in by_race.items() for row in item.rows[table_name]]
+        )
+
+    # DBにあるレースだけ残す
+    conn.execute("""
+        UPDATE _load_races SET race_pk = r.id
+        FROM races r WHERE r.race_id = _load_races.race_id
+    """)
+    not_found = conn.execute("DELETE FROM _load_races WHERE race_pk IS NULL").rowcount
+    loaded = len(by_race) - not_found
+
+    races_updated = conn.execute("""
+        UPDATE races
+        SET venue = s.venue, distance = s.distance, track_type = s.track_type,
+            track_condition = s.track_condition, horse_count = s.horse_count
+        FROM _load_races s
+        WHERE races.id = s.race_pk
+        AND (races.track_type IS NULL OR races.track_type = '不明')
+    """).rowcount
+
+    for table_name in RACE_DETAIL_TABLES:
+        columns = TABLE_COLUMNS[table_name]
+        conn.execute(f"DELETE FROM {table_name} WHERE race_id IN (SELECT race_pk FROM _load_races)")
+        # 同じ馬番・組み合わせが2回現れた場合は最初の行を残す（write_race_details と同じ）
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {table_name} ({', '.join(columns)})
+            SELECT s.race_pk, {', '.join(f't.{column}' for column in columns[1:])}
+            FROM _load_{table_name} t
+            JOIN _load_races s ON s.race_id = t.race_id
+            ORDER BY t.rowid
+        """)
+
+    conn.execute(f"""
+        INSERT INTO {LOAD_STATE_TABLE} (path, mtime_ns, size, sha1, race_id, loaded_at)
+        SELECT f.path, f.mtime_ns, f.size, f.sha1, f.race_id, ?
+        FROM _load_files f
+        JOIN _load_races s ON s.race_id = f.race_id
+        WHERE true
+        ON CONFLICT(path) DO UPDATE SET
+            mtime_ns = excluded.mtime_ns, size = excluded.size, sha1 = excluded.sha1,
+            race_id = excluded.race_id, loaded_at = excluded.loaded_at
+    """, (loaded_at,))
+
+    for table_name in ["races", "files", *RACE_DETAIL_TABLES]:
+        conn.execute(f"DELETE FROM _load_{table_name}")
+
+    return loaded, races_updated, not_found
+
+
+def _mark_unchanged(conn: sqlite3.Connection, items: List[ParsedFile]):
+    """内容が前回と同じファイルの更新時刻・サイズだけ記録し直す（次回は読まない）"""
+    conn.executemany(
+        f"UPDATE {LOAD_STATE_TABLE} SET mtime_ns = ?, size = ? WHERE path = ?",
+        [(item.job.mtime_ns, item.job.size, item.job.path) for item in items]
+    )
+
+
+def _parse_all(jobs: Iterator[FileJob], workers: int) -> Iterator[ParsedFile]:
+    """ファイルを解析（workers が1ならこのプロセスで、2以上ならプロセスプールで）"""
+    if workers <= 1:
+        yield from map(parse_file, jobs)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap_unordered(parse_file, jobs, chunksize=64)
+
+
+def _batches(iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def load_json_dir(
+    conn: sqlite3.Connection,
+    json_dir: Path,
+    workers: int = 1,
+    batch_size: int = 5000,
+    full: bool = False,
+    verbose: bool = True
+) -> LoadStats:
+    """
+    ディレクトリのJSONをDBに反映
+
+    Args:
+        conn: DB接続
+        json_dir: race_*.json を置いたディレクトリ
+        workers: 解析に使うプロセス数（1ならこのプロセスで解析）
+        batch_size: 1トランザクションで反映するファイル数
+        full: True なら前回の記録を無視して全ファイルを読み直す
+        verbose: バッチごとに進捗を表示するか
+
+    Returns:
+        LoadStats
+    """
+    start_time = time.perf_counter()
+    stats = LoadStats()
+
+    ensure_race_detail_tables(conn)
+    ensure_load_state_table(conn)
+    conn.commit()
+
+    known = {} if full else load_known_files(conn)
+    jobs = scan_json_dir(json_dir, known, stats)
+
+    for batch in _batches(_parse_all(jobs, workers), batch_size):
+        to_apply, unchanged = [], []
+        for item in batch:
+            if item.error:
+                stats.errors += 1
+                if len(stats.error_files) < 10:
+                    stats.error_files.append(f"{Path(item.job.path).name} - {item.error}")
+            elif item.race is None:
+                unchanged.append(item)
+            else:
+                to_apply.append(item)
+
+        stats.unchanged += len(unchanged)
+        if unchanged:
+            _mark_unchanged(conn, unchanged)
+        if to_apply:
+            loaded, races_updated, not_found = apply_batch(conn, to_apply, datetime.now().isoformat())
+            stats.loaded += loaded
+            stats.races_updated += races_updated
+            stats.not_found += not_found
+        conn.commit()
+
+        if verbose:
+            print(f"  → {stats.files:,}件確認（反映: {stats.loaded:,}, 変更なし: {stats.unchanged:,}, "
+                  f"未登録: {stats.not_found:,}, エラー: {stats.errors:,}）")
+
+    stats.elapsed = time.perf_counter() - start_time
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSONファイル（data/race_details）からDB更新')
+    parser.add_argument('--json-dir', type=str, default='data/race_details', help='レース詳細JSONのディレクトリ')
+    parser.add_argument('--db', type=str, default='data/keiba.db', help='データベースパス')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='解析に使うプロセス数（1ならこのプロセスで解析）')
+    parser.add_argument('--batch-size', type=int, default=5000, help='1トランザクションで反映するファイル数')
+    parser.add_argument('--full', action='store_true', help='前回の記録を無視して全ファイルを読み直す')
+
+    args = parser.parse_args()
+
+    json_dir = Path(args.json_dir)
+    db_path = Path(args.db)
+
+    if not json_dir.is_dir():
+        print(f"❌ エラー: {json_dir} が見つかりません")
+        sys.exit(1)
+    if not db_path.exists():
+        print(f"❌ エラー: {db_path} が見つかりません")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("JSONファイルからDB更新")
+    print("=" * 60)
+    print(f"ディレクトリ: {json_dir}（ワーカー: {args.workers}、{args.batch_size:,}件ごとにコミット）")
+    print("-" * 60)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        stats = load_json_dir(conn, json_dir, args.workers, args.batch_size, args.full)
+
+        # レースの条件が変わった予想家のキューブを再集計し、APIのキャッシュを無効化
+        if stats.loaded > 0:
+            cube_refreshed = refresh_condition_cube(conn)
+            bump_data_version(db_path)
+
+        print("-" * 60)
+        print(f"JSONファイル数: {stats.files:,}件")
+        print(f"反映: {stats.loaded:,}件（races の列を更新: {stats.races_updated:,}件）")
+        print(f"スキップ（前回から変更なし）: {stats.unchanged:,}件")
+        print(f"DBに未登録: {stats.not_found:,}件")
+        print(f"エラー: {stats.errors:,}件")
+        for error_file in stats.error_files:
+            print(f"  ❌ {error_file}")
+        print(f"処理時間: {stats.elapsed:.1f}秒（{stats.files_per_second:,.0f}件/秒）")
+        if stats.loaded > 0:
+            print(f"条件別集計キューブ: {cube_refreshed:,}人の予想家を再集計")
+
+        # 更新後の統計を確認
+        completed = conn.execute(
+            "SELECT COUNT(*) FROM races WHERE track_type IS NOT NULL AND track_type != '不明'"
+        ).fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM races").fetchone()[0]
+    finally:
+        conn.close()
+
+    if total:
+        print(f"\n【更新後の状態】")
+        print(f"総レース数: {total:,}件")
+        print(f"詳細取得済み: {completed:,}件 ({completed / total * 100:.1f}%)")
+        print(f"詳細未取得: {total - completed:,}件 ({(total - completed) / total * 100:.1f}%)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()